@@ -2,14 +2,48 @@
 Main Flask application file.
 API endpoints for B2C Customer App.
 """
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
+from app_logging import bind_request, configure_logging, unbind_request
 from database import db
 from config import Config
-from datetime import datetime, timedelta
+from otp_store import create_otp_store
+from rate_limit import check_limits, client_address, create_rate_limiter
+from sms_dispatch import SMSDispatcher, STATUS_SENT, STATUS_FAILED, STATUS_TIMEOUT
+from sms_gateway import SMSGatewayClient
+from mobile_numbers import legacy_contact_formats, normalize_mobile
+from id_allocator import IdAllocator
+from customer_cache import CustomerCache
+from idempotency import MAX_KEY_LENGTH, StoredResponse, create_idempotency_store, request_fingerprint
+import notifications
+from migrations import migrate
+from push import PushMessage, PushTarget, create_push_fanout
+from http_cache import make_etag, not_modified, with_etag
+from response_encoding import FastJSONProvider, compress_response_body, encoded_etag
+import metrics
+from bulk_import import CustomerImporter, SUPPORTED_CONTENT_TYPES, iter_rows
+from queries import CUSTOMER_BY_ID, CUSTOMER_BY_MOBILE, CUSTOMER_BY_MOBILE_LEGACY, DEVICE_TOKEN_UPSERT
+from query_stats import query_stats
+from login import (
+    LoginError, approved_customer, check_otp, consumed_customer_id, found_customer, generate_response, new_otp,
+    otp_expired, otp_record, parse_generate_request, parse_profile_request, parse_status_request,
+    parse_verify_request, status_response, too_many_requests, verify_response
+)
+from customers import (
+    ValidationError, parse_profile_edit, parse_signup, profile_data,
+    insert_params, insert_query as insert_customer_query
+)
+from datetime import datetime
+import functools
+import hmac
+import io
+import logging
+import queue
 import re
-import random
-import requests
+import time
+
+
+logger = logging.getLogger(__name__)
 
 
 def create_app() -> Flask:
@@ -19,15 +53,276 @@ def create_app() -> Flask:
     Returns:
         Flask: Configured Flask application instance
     """
+    # Structured logs go through a background queue (see app_logging.py)
+    configure_logging(Config())
+    
     app = Flask(__name__)
     app.config.from_object(Config)
+    # Compact JSON (orjson when installed), MessagePack on request
+    app.json = FastJSONProvider(app)
     
     # Enable CORS for React Native app
     CORS(app, resources={r"/*": {"origins": "*"}})
     
-    # In-memory OTP storage (in production, use Redis or database)
-    # Format: {mobile_number: {'otp': '123456', 'expires_at': datetime, 'verified': False}}
-    otp_storage = {}
+    # Apply pending schema migrations once at startup so handlers can
+    # assume tables exist (or run python -m tools.migrate at deploy time)
+    if Config.DB_MIGRATE_ON_STARTUP:
+        try:
+            applied = migrate()
+            if applied:
+                logger.info("Applied %s schema migration(s)", len(applied))
+        except Exception as e:
+            logger.warning("Could not apply schema migrations: %s", e)
+    
+    # OTP storage shared by all workers (backend selected by OTP_STORE_BACKEND)
+    # Record format: {'otp': '123456', 'expires_at': datetime, 'verified': False, 'customer_id': '1001'}
+    otp_storage = create_otp_store(Config())
+    app.extensions['otp_storage'] = otp_storage
+    
+    # Token buckets per client address and per mobile number for OTP
+    # generation (None when a limit is disabled)
+    rate_limiters = {
+        'otp_client': create_rate_limiter(Config(), 'otp_client', Config.RATE_LIMIT_OTP_PER_CLIENT),
+        'otp_mobile': create_rate_limiter(Config(), 'otp_mobile', Config.RATE_LIMIT_OTP_PER_MOBILE),
+    }
+    app.extensions['rate_limiters'] = rate_limiters
+    
+    def otp_rate_limited(mobile_number):
+        """
+        Take a token from the client's and the number's OTP buckets.
+        
+        Returns:
+            429 response with Retry-After if a limit is exceeded, else None
+        """
+        client = client_address(
+            request.remote_addr, request.headers.get('X-Forwarded-For'), Config.RATE_LIMIT_TRUSTED_PROXIES
+        )
+        limit, retry_after = check_limits((
+            (rate_limiters['otp_client'], client),
+            (rate_limiters['otp_mobile'], mobile_number),
+        ))
+        if limit is None:
+            return None
+        if Config.METRICS_ENABLED:
+            metrics.RATE_LIMITED.labels(limit).inc()
+        return login_error(too_many_requests(retry_after))
+    
+    def login_error(error):
+        """Error response for a LoginError (see login.py)."""
+        response = jsonify(error.payload)
+        response.headers.update(error.headers)
+        return response, error.status
+    
+    # Pooled keep-alive client for the PRP SMS gateway (one per app)
+    sms_gateway = SMSGatewayClient.from_config(Config())
+    app.extensions['sms_gateway'] = sms_gateway
+    
+    def record_sms_status(job) -> None:
+        """Write the delivery status back to the OTP record it belongs to."""
+        # Skipped by the store if the OTP has since been replaced or consumed
+        otp_storage.update(job.mobile_number, job.otp, {'sms_status': job.status})
+    
+    # Background SMS delivery so login requests never wait on the gateway
+    sms_dispatcher = SMSDispatcher(
+        sms_gateway.send_otp,
+        workers=Config.SMS_DISPATCH_WORKERS,
+        max_queue=Config.SMS_DISPATCH_QUEUE_SIZE,
+        max_attempts=Config.SMS_DISPATCH_MAX_ATTEMPTS,
+        backoff_seconds=Config.SMS_DISPATCH_BACKOFF_SECONDS,
+        on_status=record_sms_status
+    )
+    app.extensions['sms_dispatcher'] = sms_dispatcher
+    
+    # customer_id allocator (hi/lo blocks from the id_sequences table)
+    customer_ids = IdAllocator('customer_id', block_size=Config.CUSTOMER_ID_BLOCK_SIZE)
+    
+    # Customer rows by customer_id; invalidated by signup and edit_profile
+    customer_cache = CustomerCache(
+        ttl_seconds=Config.CUSTOMER_CACHE_TTL_SECONDS,
+        max_entries=Config.CUSTOMER_CACHE_MAX_ENTRIES
+    )
+    app.extensions['customer_cache'] = customer_cache
+    
+    def fetch_customer(customer_id):
+        """Read one customer row from the database (None if not found)."""
+        result = db.execute_named(CUSTOMER_BY_ID, (customer_id,))
+        return result[0] if result else None
+    
+    def load_customer(customer_id):
+        """Read one customer row through the cache (None if not found)."""
+        return customer_cache.get(customer_id, lambda: fetch_customer(customer_id))
+    
+    # Responses to signup and profile edits by Idempotency-Key, so a client
+    # retrying after a dropped connection gets the original result
+    idempotency_cache = create_idempotency_store(Config)
+    app.extensions['idempotency_cache'] = idempotency_cache
+    
+    def idempotent(view):
+        """
+        Honor the Idempotency-Key header on a mutating endpoint.
+        
+        The first request with a key runs the view. A successful (2xx)
+        response is stored and replayed, with Idempotent-Replayed: true, to
+        later requests with the same key and body without running the view
+        again; a request arriving while the first is still running waits for
+        it. Failed responses are not stored, so a retry runs again.
+        """
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if key is None or not idempotency_cache.enabled:
+                return view(*args, **kwargs)
+            key = key.strip()
+            if not key or len(key) > MAX_KEY_LENGTH:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters.'
+                }), 400
+            
+            scoped_key = f'{request.endpoint}:{key}'
+            fingerprint = request_fingerprint(request.method, request.path, request.get_data())
+            deadline = time.monotonic() + Config.IDEMPOTENCY_WAIT_SECONDS
+            waited = False
+            while True:
+                entry, owner = idempotency_cache.begin(scoped_key, fingerprint)
+                if entry.fingerprint != fingerprint:
+                    return jsonify({
+                        'status': 'error',
+                        'message': 'Idempotency-Key was already used for a different request.'
+                    }), 422
+                if owner:
+                    break
+                stored = entry.response
+                if stored is not None:
+                    idempotency_cache.record_replay(waited)
+                    response = app.response_class(stored.body, status=stored.status, headers=stored.headers)
+                    response.headers['Idempotent-Replayed'] = 'true'
+                    return response
+                # Still running (possibly on another worker); once it ends,
+                # look again: replay its response or, if it failed, run again
+                waited = True
+                if not idempotency_cache.wait(scoped_key, entry, max(deadline - time.monotonic(), 0)):
+                    response = jsonify({
+                        'status': 'error',
+                        'message': 'A request with this Idempotency-Key is still being processed.'
+                    })
+                    response.headers['Retry-After'] = '1'
+                    return response, 409
+            
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            except Exception:
+                idempotency_cache.abandon(scoped_key, entry)
+                raise
+            if 200 <= response.status_code < 300 and not response.is_streamed:
+                idempotency_cache.complete(scoped_key, entry, StoredResponse(
+                    response.status_code, list(response.headers.items()), response.get_data()
+                ))
+            else:
+                idempotency_cache.abandon(scoped_key, entry)
+            return response
+        
+        return wrapper
+    
+    # Push notification fan-out (jobs in push_jobs; background threads start
+    # on first use, or in each worker's post_fork under serve.py)
+    push_fanout = create_push_fanout(Config())
+    app.extensions['push_fanout'] = push_fanout
+    
+    def is_admin_request() -> bool:
+        """True if the request carries the ADMIN_API_TOKEN (X-Admin-Token header)."""
+        admin_token = Config.ADMIN_API_TOKEN
+        supplied_token = request.headers.get('X-Admin-Token', '')
+        return bool(admin_token) and hmac.compare_digest(supplied_token.encode(), admin_token.encode())
+    
+    # Per-endpoint latency, status codes and in-flight requests for /metrics,
+    # summed over the workers when METRICS_BACKEND is 'sqlite'
+    shared_metrics = metrics.create_shared_metrics(Config()) if Config.METRICS_ENABLED else None
+    app.extensions['shared_metrics'] = shared_metrics
+    if Config.METRICS_ENABLED:
+        @app.before_request
+        def start_request_metrics():
+            if shared_metrics is not None:
+                shared_metrics.ensure_started()
+            g.request_started = time.perf_counter()
+            g.in_flight_gauge = metrics.HTTP_IN_FLIGHT.labels(request.endpoint or 'unmatched')
+            g.in_flight_gauge.inc()
+        
+        @app.after_request
+        def record_request_metrics(response):
+            started = g.get('request_started')
+            if started is not None:
+                metrics.observe_request(
+                    request.endpoint, request.method, response.status_code, time.perf_counter() - started
+                )
+            return response
+        
+        @app.teardown_request
+        def end_request_metrics(error=None):
+            gauge = g.pop('in_flight_gauge', None)
+            if gauge is not None:
+                gauge.dec()
+        
+        # Counters kept by the pool, dispatcher, gateway client and cache
+        # are read when /metrics is scraped
+        metrics.registry.register_collector('db_pool', metrics.stats_collector(
+            'db_pool', db.pool_stats,
+            counters=('checkouts', 'timeouts', 'recycled', 'ping_failures', 'wait_seconds_total')
+        ))
+        metrics.registry.register_collector('sms_dispatch', metrics.stats_collector(
+            'sms_dispatch', sms_dispatcher.stats,
+            counters=('submitted', 'dropped', 'attempts', 'retries', STATUS_SENT, STATUS_FAILED, STATUS_TIMEOUT)
+        ))
+        metrics.registry.register_collector('sms_gateway', metrics.stats_collector(
+            'sms_gateway', sms_gateway.stats,
+            counters=('sends', 'timeouts', 'errors', 'connections_opened', 'requests')
+        ))
+        metrics.registry.register_collector('customer_cache', metrics.stats_collector(
+            'customer_cache', customer_cache.stats,
+            counters=('hits', 'misses', 'evictions', 'invalidations')
+        ))
+        metrics.registry.register_collector('idempotency', metrics.stats_collector(
+            'idempotency', idempotency_cache.stats,
+            counters=('executed', 'replayed', 'waited', 'abandoned', 'evictions')
+        ))
+    
+    # brotli/gzip for clients that accept it; streamed responses (NDJSON)
+    # are sent as they are produced
+    if Config.RESPONSE_COMPRESSION:
+        @app.after_request
+        def compress_response(response):
+            if (
+                response.is_streamed or response.direct_passthrough
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+            ):
+                return response
+            response.vary.add('Accept-Encoding')
+            body, coding = compress_response_body(
+                response.get_data(), response.mimetype, request.headers.get('Accept-Encoding'), Config
+            )
+            if coding is None:
+                return response
+            response.set_data(body)
+            response.headers['Content-Encoding'] = coding
+            if 'ETag' in response.headers:
+                response.headers['ETag'] = encoded_etag(response.headers['ETag'], coding)
+            return response
+    
+    # One database connection per request, released at teardown
+    @app.before_request
+    def open_db_session():
+        g.log_context_token = bind_request(request.endpoint)
+        g.db_session_token = db.begin_request()
+    
+    @app.teardown_request
+    def close_db_session(error=None):
+        token = g.pop('db_session_token', None)
+        if token is not None:
+            db.end_request(token)
+        log_token = g.pop('log_context_token', None)
+        if log_token is not None:
+            unbind_request(log_token)
     
     @app.route('/health', methods=['GET'])
     def health_check():
@@ -42,6 +337,49 @@ def create_app() -> Flask:
             'message': 'Flask backend is running'
         }), 200
     
+    @app.route('/health/db-pool', methods=['GET'])
+    def db_pool_stats():
+        """
+        Database connection pool statistics endpoint.
+        
+        Returns:
+            JSON response with live pool statistics
+        """
+        return jsonify({
+            'status': 'success',
+            'data': db.pool_stats()
+        }), 200
+    
+    @app.route('/health/customer-cache', methods=['GET'])
+    def customer_cache_stats():
+        """
+        Customer record cache statistics endpoint.
+        
+        Returns:
+            JSON response with hit/miss counters and cache size
+        """
+        return jsonify({
+            'status': 'success',
+            'data': customer_cache.stats()
+        }), 200
+    
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        """
+        Prometheus metrics endpoint.
+        
+        Returns:
+            Metrics in the Prometheus text format (of every worker on this
+            host with METRICS_BACKEND=sqlite, else of this worker process)
+        """
+        if not Config.METRICS_ENABLED:
+            return jsonify({
+                'status': 'error',
+                'message': 'Metrics are disabled'
+            }), 404
+        source = shared_metrics if shared_metrics is not None else metrics.registry
+        return Response(source.render(), content_type=metrics.CONTENT_TYPE)
+    
     @app.route('/api/test-otp', methods=['POST'])
     def test_otp():
         """
@@ -58,17 +396,19 @@ def create_app() -> Flask:
                     'message': 'Valid 10-digit mobile number required'
                 }), 400
             
+            limited = otp_rate_limited(mobile_number)
+            if limited is not None:
+                return limited
+            
             # Generate OTP
-            otp = str(random.randint(100000, 999999))
+            otp = new_otp()
             
             # Store OTP for 5 minutes
-            expires_at = datetime.now() + timedelta(minutes=5)
-            otp_storage[mobile_number] = {
+            expires_at = otp_storage.set(mobile_number, {
                 'otp': otp,
-                'expires_at': expires_at,
                 'verified': False,
                 'customer_id': None
-            }
+            })
             
             return jsonify({
                 'status': 'success',
@@ -87,6 +427,7 @@ def create_app() -> Flask:
             }), 500
     
     @app.route('/api/signup', methods=['POST'])
+    @idempotent
     def signup():
         """
         Customer signup endpoint.
@@ -113,139 +454,45 @@ def create_app() -> Flask:
         try:
             data = request.get_json()
             
-            # Validate required fields
-            required_fields = [
-                'fullName', 'email', 'mobileNumber', 'houseNumber',
-                'address', 'city', 'state', 'userType', 'knowAboutUs', 'expectation'
-            ]
-            
-            missing_fields = [field for field in required_fields if not data.get(field)]
-            if missing_fields:
-                return jsonify({
-                    'status': 'error',
-                    'message': f'Missing required fields: {", ".join(missing_fields)}'
-                }), 400
-            
-            # Extract and sanitize data
-            # Handle None values by converting to empty string before strip
-            full_name = (data.get('fullName') or '').strip()
-            email = (data.get('email') or '').strip().lower()
-            mobile_number = (data.get('mobileNumber') or '').strip()
-            house_number = (data.get('houseNumber') or '').strip()
-            address = (data.get('address') or '').strip()
-            city = (data.get('city') or '').strip()
-            state = (data.get('state') or '').strip()
-            
-            # Map user_type from frontend to database enum values
-            user_type_mapping = {
-                'Household Apartment': 'RESIDENTIAL',
-                'School/Institution': 'INSTITUTIONAL',
-                'Office': 'COMMERCIAL',
-                'Shop': 'COMMERCIAL',
-                'Other': 'OTHERS'
-            }
-            user_type_frontend = (data.get('userType') or '').strip()
-            user_type = user_type_mapping.get(user_type_frontend, 'OTHERS')
-            
-            know_about_us = (data.get('knowAboutUs') or '').strip()
-            
-            # Extract numeric value from expectation (handles cases like "23kgs" or "23")
-            expectation_raw = (data.get('expectation') or '').strip()
-            # Extract only numbers and decimal point, convert to float
-            expectation_numeric = re.sub(r'[^0-9.]', '', expectation_raw)
-            expectation = float(expectation_numeric) if expectation_numeric else None
-            
-            alternate_contact = (data.get('alternateContact') or '').strip() if data.get('alternateContact') else ''
-            
-            # Validate mobile number (10 digits)
-            if not mobile_number.isdigit() or len(mobile_number) != 10:
-                return jsonify({
-                    'status': 'error',
-                    'message': 'Invalid mobile number. Must be 10 digits.'
-                }), 400
-            
-            # Validate alternate contact if provided
-            if alternate_contact and (not alternate_contact.isdigit() or len(alternate_contact) != 10):
-                return jsonify({
-                    'status': 'error',
-                    'message': 'Invalid alternate contact number. Must be 10 digits.'
-                }), 400
-            
-            # Validate email format
-            if '@' not in email or '.' not in email.split('@')[1]:
-                return jsonify({
-                    'status': 'error',
-                    'message': 'Invalid email format.'
-                }), 400
-            
-            # Validate waste quantity
-            if expectation is None or expectation <= 0:
+            # Validate and normalize fields (rules shared with bulk import)
+            try:
+                customer = parse_signup(data)
+            except ValidationError as e:
                 return jsonify({
                     'status': 'error',
-                    'message': 'Please enter a valid waste quantity (must be greater than 0).'
+                    'message': str(e),
+                    'errors': e.errors
                 }), 400
             
-            # Prepare mobile numbers with country code (format: +919876543210 - without slash)
-            contact_no = f"+91{mobile_number}" if mobile_number else None
-            poc = f"+91{alternate_contact}" if alternate_contact else None
-            
-            # Get latitude and longitude
-            latitude = data.get('latitude')
-            longitude = data.get('longitude')
-            # Convert to float if they exist, otherwise set to None
-            latitude = float(latitude) if latitude is not None else None
-            longitude = float(longitude) if longitude is not None else None
-            
-            # Combine house number with address if house number exists
-            full_address = f"{house_number}, {address}".strip() if house_number else address
-            
-            # Generate customer_id starting from 1001
-            # Get the maximum customer_id that is numeric, or start from 1000
-            try:
-                max_id_result = db.execute_query(
-                    "SELECT MAX(CAST(customer_id AS UNSIGNED)) as max_id "
-                    "FROM b2c_customer_master WHERE customer_id REGEXP '^[0-9]+$'"
-                )
-                max_id = max_id_result[0].get('max_id') if max_id_result and max_id_result[0].get('max_id') else 1000
-                # Ensure we start from at least 1001
-                customer_id = str(max(max_id + 1, 1001))
-            except Exception as e:
-                # If query fails, start from 1001
-                print(f"Warning: Could not get max customer_id, starting from 1001: {e}")
-                customer_id = "1001"
+            # Generate customer_id (starting from 1001) from the pre-reserved
+            # block; the sequence is created and seeded by migration 2
+            customer_id = str(customer_ids.next_id())
             
             # Get current timestamp
             current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             
-            # Insert into database with correct column names including customer_id
-            # Set area_id to 0 as default (column is NOT NULL with no default value)
-            # Set created_by to 'APP' as default (column is NOT NULL varchar(50) with no default)
-            # Set updated_by to 'APP' as default (column is NOT NULL varchar(50) with no default)
-            insert_query = """
-                INSERT INTO b2c_customer_master (
-                    customer_id, customer_name, contact_no, email, address,
-                    city, state, est_waste_qty, poc, user_type, reference,
-                    status, area_id, latitude, longitude, created_by, updated_by, created_at, updated_at
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-                )
-            """
-            
-            params = (
-                customer_id, full_name, contact_no, email, full_address,
-                                    city, state, expectation, poc, user_type, know_about_us,
-                    'PENDING', 0, latitude, longitude, 'APP', 'APP', current_time, current_time
-            )
-            
-            db.execute_query(insert_query, params, fetch=False)
+            # Insert into database with status PENDING, created_by/updated_by 'APP'
+            params = insert_params(customer, customer_id, 'APP', current_time)
+            with db.transaction():
+                db.execute_query(insert_customer_query(), params, fetch=False)
+                
+                # Start the customer's notification feed (welcome, review, ...)
+                notifications.seed(dict(
+                    customer,
+                    customer_id=customer_id,
+                    status='PENDING',
+                    created_at=current_time,
+                    updated_at=current_time
+                ))
+            customer_cache.invalidate(customer_id)
             
             return jsonify({
                 'status': 'success',
                 'message': 'Account created successfully! Your profile is under consideration.',
                                     'data': {
-                        'fullName': full_name,
-                        'email': email,
-                        'mobileNumber': mobile_number,
+                        'fullName': customer['customer_name'],
+                        'email': customer['email'],
+                        'mobileNumber': customer['mobile_number'],
                         'status': 'PENDING'
                     }
             }), 201
@@ -277,6 +524,67 @@ def create_app() -> Flask:
                 'message': f'Failed to create account: {str(e)}'
             }), 500
     
+    @app.route('/api/customers/bulk-import', methods=['POST'])
+    def bulk_import_customers():
+        """
+        Bulk customer import endpoint for institutional onboarding.
+        
+        Streams the request body (text/csv with a header row, or
+        application/x-ndjson with one signup object per line) through the
+        signup validation rules and inserts valid rows in batches of
+        BULK_IMPORT_BATCH_SIZE. Rows use the same field names as /api/signup.
+        
+        Headers:
+            X-Admin-Token: Must match ADMIN_API_TOKEN
+        
+        Returns:
+            JSON response with import counters and per-row errors
+        """
+        if not is_admin_request():
+            return jsonify({
+                'status': 'error',
+                'message': 'Not authorized to import customers'
+            }), 403
+        
+        if request.mimetype not in SUPPORTED_CONTENT_TYPES:
+            return jsonify({
+                'status': 'error',
+                'message': f'Unsupported Content-Type. Use one of: {", ".join(SUPPORTED_CONTENT_TYPES)}'
+            }), 415
+        
+        importer = CustomerImporter(
+            customer_ids,
+            batch_size=Config.BULK_IMPORT_BATCH_SIZE,
+            max_errors=Config.BULK_IMPORT_MAX_ERRORS
+        )
+        try:
+            rows = iter_rows(
+                request.stream,
+                request.mimetype,
+                encoding=request.mimetype_params.get('charset', 'utf-8-sig')
+            )
+            summary = importer.run(rows)
+        except UnicodeDecodeError:
+            summary = importer.summary()
+            return jsonify({
+                'status': 'error',
+                'message': f'Upload is not valid text; stopped after row {summary["received"]}.',
+                'data': summary
+            }), 400
+        except Exception as e:
+            # Batches written before the failure stay committed
+            return jsonify({
+                'status': 'error',
+                'message': f'Import stopped: {str(e)}',
+                'data': importer.summary()
+            }), 500
+        
+        return jsonify({
+            'status': 'success',
+            'message': f'Imported {summary["imported"]} of {summary["received"]} customers',
+            'data': summary
+        }), 200
+    
     @app.errorhandler(404)
     def not_found(error):
         """Handle 404 errors."""
@@ -307,199 +615,81 @@ def create_app() -> Flask:
             JSON response with success/error status
         """
         try:
-            data = request.get_json()
-            mobile_number = (data.get('mobileNumber') or '').strip()
+            # Validation and response bodies are shared with asgi.py (login.py)
+            mobile_number = parse_generate_request(request.get_json())
             
-            # Validate mobile number
-            if not mobile_number:
-                return jsonify({
-                    'status': 'error',
-                    'message': 'Mobile number is required'
-                }), 400
-            
-            if not re.match(r'^[0-9]{10}$', mobile_number):
-                return jsonify({
-                    'status': 'error',
-                    'message': 'Please enter a valid 10-digit mobile number'
-                }), 400
+            # Refuse clients and numbers over their OTP limit before the
+            # customer lookup and the SMS
+            limited = otp_rate_limited(mobile_number)
+            if limited is not None:
+                return limited
             
             # Check if mobile number exists in database (customer should be registered)
-            # Check multiple formats: +91{mobile}, +91/{mobile}, 91{mobile}, plain {mobile}
-            check_query = """
-                SELECT customer_id, customer_name, status, contact_no 
-                FROM b2c_customer_master 
-                WHERE contact_no = %s 
-                   OR contact_no = %s 
-                   OR contact_no = %s
-                   OR contact_no = %s
-                   OR contact_no LIKE %s
-                LIMIT 1
-            """
-            check_params = (
-                f"+91{mobile_number}",
-                f"+91/{mobile_number}",
-                f"91{mobile_number}",
-                mobile_number,
-                f"%{mobile_number}"
-            )
-            customer_result = db.execute_query(check_query, check_params)
-            
-            if not customer_result:
-                return jsonify({
-                    'status': 'error',
-                    'message': 'Mobile number not registered. Please sign up first.'
-                }), 404
-            
-            customer = customer_result[0]
-            
-            # Check if customer is approved (only approved customers can login)
-            if customer.get('status') != 'APPROVED':
-                return jsonify({
-                    'status': 'error',
-                    'message': 'Your profile is under consideration. Please wait for approval.'
-                }), 403
-            
-            # Generate 6-digit OTP
-            otp = str(random.randint(100000, 999999))
+            # Single probe on the unique mobile_normalized index; every stored
+            # contact_no format (+91{mobile}, +91/{mobile}, 91{mobile}, {mobile})
+            # is reduced to the same 10 digits (see tools/backfill_mobile_numbers.py)
+            customer_result = db.execute_named(CUSTOMER_BY_MOBILE, (mobile_number,))
+            
+            if not customer_result and app.config.get('MOBILE_LOOKUP_FALLBACK', False):
+                # Legacy scan, only while the backfill has not been run yet
+                customer_result = db.execute_query(
+                    CUSTOMER_BY_MOBILE_LEGACY.sql,
+                    legacy_contact_formats(mobile_number),
+                    read_only=True
+                )
             
-            print(f"\n{'='*70}")
-            print(f"📱 OTP GENERATION FOR: {mobile_number}")
-            print(f"{'='*70}")
-            print(f"🔑 Generated OTP: {otp}")
-            print(f"👤 Customer: {customer.get('customer_name')} (ID: {customer.get('customer_id')})")
-            print(f"📞 Contact: {customer.get('contact_no')}")
-            print(f"✅ Status: {customer.get('status')}")
-            print(f"{'='*70}\n")
+            customer = approved_customer(customer_result)
+            otp = new_otp()
             
-            # Store OTP with expiration (5 minutes)
-            expires_at = datetime.now() + timedelta(minutes=5)
-            otp_storage[mobile_number] = {
-                'otp': otp,
-                'expires_at': expires_at,
-                'verified': False,
+            # The OTP itself is never logged
+            logger.info("OTP generated", extra={
+                'mobile': mobile_number,
                 'customer_id': customer.get('customer_id')
-            }
-            
-            # Send OTP via PRP SMS API using Template Name (as per PRP documentation)
-            prp_api_key = app.config.get('PRP_API_KEY', '9n5ZIuuNKTkIGyJ')
-            prp_api_base = app.config.get('PRP_API_BASE_URL', 'https://api.bulksmsadmin.com/BulkSMSapi/keyApiSendSMS')
-            prp_sender_id = app.config.get('PRP_SENDER_ID', 'PRP***')
-            prp_template_name = app.config.get('PRP_TEMPLATE_NAME', 'OSG_SMS_OTP')
-            
-            # PRP API endpoint for sending SMS using template name
-            prp_api_url = f"{prp_api_base}/SendSmsTemplateName"
-            
-            # Mobile number format: 91{10-digit} (country code + mobile, no + sign)
-            mobile_with_country = f"91{mobile_number}"
-            
-            # PRP API request body format (as per documentation)
-            # IMPORTANT: templateParams must be a STRING, not an array
-            payload = {
-                "sender": prp_sender_id,
-                "templateName": prp_template_name,
-                "smsReciever": [
-                    {
-                        "mobileNo": mobile_with_country,
-                        "templateParams": otp  # OTP as STRING (PRP API requirement)
-                    }
-                ]
-            }
-            
-            # PRP API headers (as per documentation)
-            headers = {
-                "apikey": prp_api_key,  # Note: lowercase 'apikey' in header
-                "Content-Type": "application/json"
-            }
-            
-            print(f"\n{'='*70}")
-            print(f"📱 SENDING OTP VIA PRP API")
-            print(f"{'='*70}")
-            print(f"📞 Mobile: {mobile_with_country}")
-            print(f"🔑 OTP: {otp}")
-            print(f"📋 Template: {prp_template_name}")
-            print(f"📤 Sender: {prp_sender_id}")
-            print(f"🌐 URL: {prp_api_url}")
-            print(f"📦 templateParams: {otp}")
-            print(f"{'='*70}\n")
+            })
             
-            sms_sent = False
-            error_message = None
+            # Store OTP with expiration (5 minutes)
+            expires_at = otp_storage.set(mobile_number, otp_record(otp, customer))
             
-            try:
-                # Use 3 second timeout for fast SMS delivery
-                response = requests.post(prp_api_url, json=payload, headers=headers, timeout=3)
-                print(f"PRP API Response - Status: {response.status_code}")
-                print(f"PRP API Response Body: {response.text}")
-                
-                if response.status_code == 200:
-                    # Check if response indicates success
-                    try:
-                        response_data = response.json()
-                        # PRP API returns isSuccess: true for successful SMS
-                        if response_data.get('isSuccess') == True or response_data.get('status') == 'success' or 'success' in response.text.lower():
-                            sms_sent = True
-                            print(f"✅ PRP API confirmed SMS sent: {response_data.get('returnMessage', 'N/A')}")
-                        else:
-                            error_message = response.text
-                    except Exception as json_error:
-                        # If response is not JSON but status is 200, consider it success
-                        print(f"⚠️ Could not parse JSON response: {json_error}")
-                        sms_sent = True  # Status 200 usually means success
-                else:
-                    error_message = response.text
-                    
-            except requests.exceptions.Timeout:
-                error_message = "SMS API timeout (may still be sent)"
-                print(f"⚠️ PRP API timeout - SMS may still be delivered")
-            except Exception as e:
-                print(f"PRP API Error: {e}")
-                error_message = str(e)
-            
-            # Log result
-            if sms_sent:
-                print(f"\n{'='*70}")
-                print(f"✅ OTP SMS SENT SUCCESSFULLY")
-                print(f"{'='*70}")
-                print(f"📱 Mobile: {mobile_number}")
-                print(f"🔑 OTP: {otp}")
-                print(f"⏰ Valid for 5 minutes")
-                print(f"💬 PRP Response: {response.text if 'response' in locals() else 'N/A'}")
-                print(f"{'='*70}\n")
-                success_message = 'OTP sent successfully to your mobile number'
-            else:
-                print(f"\n{'='*70}")
-                print(f"⚠️ WARNING: OTP SMS MAY NOT HAVE BEEN SENT")
-                print(f"{'='*70}")
-                print(f"📱 Mobile: {mobile_number}")
-                print(f"🔑 GENERATED OTP: {otp}")
-                print(f"⏰ Valid for 5 minutes")
-                print(f"❌ Error: {error_message}")
-                print(f"{'='*70}\n")
-                success_message = f'OTP generated. Please check SMS on {mobile_number}'
-            
-            # Prepare response data
-            response_data = {
-                'mobileNumber': mobile_number,
-                'smsSent': sms_sent
-            }
+            # Hand the SMS to the background dispatcher and return immediately.
+            # Delivery status is written back to the OTP record and can be
+            # polled through /api/login/otp-status.
+            job = sms_dispatcher.submit(mobile_number, otp, expires_at.timestamp())
             
-            # Include OTP in response for testing/debugging (remove in production)
-            # This helps verify OTP generation when SMS delivery is problematic
-            if not sms_sent or app.config.get('FLASK_DEBUG', False):
-                response_data['otp'] = otp  # Include OTP for manual testing
-                response_data['otpMessage'] = f'OTP: {otp} (Valid for 5 minutes) - Use this to test if SMS is not received'
+            return jsonify(generate_response(
+                mobile_number, otp, job.status, app.config.get('FLASK_DEBUG', False)
+            )), 200
             
+        except LoginError as e:
+            return login_error(e)
+        except Exception as e:
+            logger.exception("Error in generate_otp: %s", e)
             return jsonify({
-                'status': 'success',
-                'message': success_message,
-                'data': response_data
-            }), 200
+                'status': 'error',
+                'message': f'Failed to generate OTP: {str(e)}'
+            }), 500
+    
+    @app.route('/api/login/otp-status', methods=['GET'])
+    def otp_status():
+        """
+        Get SMS delivery status of the latest OTP for a mobile number.
+        
+        Query Parameters:
+            mobileNumber: string (required) - 10-digit mobile number
+        
+        Returns:
+            JSON response with delivery status
+        """
+        try:
+            mobile_number = parse_status_request(request.args)
+            return jsonify(status_response(mobile_number, otp_storage.get(mobile_number))), 200
             
+        except LoginError as e:
+            return login_error(e)
         except Exception as e:
-            print(f"Error in generate_otp: {str(e)}")
+            logger.exception("Error in otp_status: %s", e)
             return jsonify({
                 'status': 'error',
-                'message': f'Failed to generate OTP: {str(e)}'
+                'message': f'Failed to fetch OTP status: {str(e)}'
             }), 500
     
     @app.route('/api/login/verify-otp', methods=['POST'])
@@ -517,108 +707,30 @@ def create_app() -> Flask:
             JSON response with customer data on success
         """
         try:
-            data = request.get_json()
-            mobile_number = (data.get('mobileNumber') or '').strip()
-            otp = (data.get('otp') or '').strip()
-            
-            # Validate inputs
-            if not mobile_number:
-                return jsonify({
-                    'status': 'error',
-                    'message': 'Mobile number is required'
-                }), 400
-            
-            if not otp:
-                return jsonify({
-                    'status': 'error',
-                    'message': 'OTP is required'
-                }), 400
-            
-            if not re.match(r'^[0-9]{10}$', mobile_number):
-                return jsonify({
-                    'status': 'error',
-                    'message': 'Invalid mobile number format'
-                }), 400
+            mobile_number, otp = parse_verify_request(request.get_json())
             
-            if not re.match(r'^[0-9]{6}$', otp):
-                return jsonify({
-                    'status': 'error',
-                    'message': 'OTP must be 6 digits'
-                }), 400
+            stored_otp_data = otp_storage.get(mobile_number)
+            if otp_expired(stored_otp_data):
+                otp_storage.delete(mobile_number)
+            check_otp(stored_otp_data, otp)
             
-            # Check if OTP exists for this mobile number
-            if mobile_number not in otp_storage:
-                return jsonify({
-                    'status': 'error',
-                    'message': 'OTP not found. Please generate a new OTP.'
-                }), 404
+            # OTP is valid - consume it atomically so a concurrent request
+            # with the same OTP cannot log in as well
+            customer_id = consumed_customer_id(otp_storage.consume(mobile_number, otp))
             
-            stored_otp_data = otp_storage[mobile_number]
+            # Get customer details from database; login always reads the
+            # current row (approval status) and primes the cache for the
+            # notification and profile reads that follow
+            customer = fetch_customer(customer_id)
+            response_body = verify_response(mobile_number, customer)
+            customer_cache.put(customer_id, customer)
             
-            # Check if OTP has expired
-            if datetime.now() > stored_otp_data['expires_at']:
-                del otp_storage[mobile_number]
-                return jsonify({
-                    'status': 'error',
-                    'message': 'OTP has expired. Please generate a new OTP.'
-                }), 400
-            
-            # Check if OTP is already verified
-            if stored_otp_data['verified']:
-                return jsonify({
-                    'status': 'error',
-                    'message': 'OTP already used. Please generate a new OTP.'
-                }), 400
-            
-            # Verify OTP
-            if stored_otp_data['otp'] != otp:
-                return jsonify({
-                    'status': 'error',
-                    'message': 'Invalid OTP. Please try again.'
-                }), 400
-            
-            # OTP is valid - mark as verified and get customer data
-            stored_otp_data['verified'] = True
-            customer_id = stored_otp_data['customer_id']
-            
-            # Get customer details from database
-            customer_query = """
-                SELECT customer_id, customer_name, email, contact_no, address, 
-                       city, state, status, user_type
-                FROM b2c_customer_master 
-                WHERE customer_id = %s
-            """
-            customer_result = db.execute_query(customer_query, (customer_id,))
-            
-            if not customer_result:
-                return jsonify({
-                    'status': 'error',
-                    'message': 'Customer not found'
-                }), 404
-            
-            customer = customer_result[0]
-            
-            # Clean up OTP from storage after successful verification
-            del otp_storage[mobile_number]
-            
-            return jsonify({
-                'status': 'success',
-                'message': 'OTP verified successfully',
-                'data': {
-                    'customerId': customer.get('customer_id'),
-                    'customerName': customer.get('customer_name'),
-                    'email': customer.get('email'),
-                    'mobileNumber': mobile_number,
-                    'address': customer.get('address'),
-                    'city': customer.get('city'),
-                    'state': customer.get('state'),
-                    'userType': customer.get('user_type'),
-                    'status': customer.get('status')
-                }
-            }), 200
+            return jsonify(response_body), 200
             
+        except LoginError as e:
+            return login_error(e)
         except Exception as e:
-            print(f"Error in verify_otp: {str(e)}")
+            logger.exception("Error in verify_otp: %s", e)
             return jsonify({
                 'status': 'error',
                 'message': f'Failed to verify OTP: {str(e)}'
@@ -627,14 +739,17 @@ def create_app() -> Flask:
     @app.route('/api/notifications', methods=['GET'])
     def get_notifications():
         """
-        Get notifications for a customer.
-        Generates notifications dynamically from customer data (no database table needed).
+        Get notifications for a customer, newest first.
+        Notifications are stored as customer events happen (signup, approval,
+        profile edits); the feed is created on first read for older customers.
         
         Query Parameters:
             customerId: string (required) - Customer ID
+            limit: int (optional) - Page size (default NOTIFICATION_PAGE_SIZE)
+            cursor: string (optional) - nextCursor from the previous page
         
         Returns:
-            JSON response with list of notifications
+            JSON response with one page of notifications and the unread count
         """
         try:
             customer_id = request.args.get('customerId')
@@ -645,174 +760,63 @@ def create_app() -> Flask:
                     'message': 'Customer ID is required'
                 }), 400
             
+            try:
+                limit = int(request.args.get('limit', Config.NOTIFICATION_PAGE_SIZE))
+                cursor = request.args.get('cursor')
+                cursor = int(cursor) if cursor else None
+            except ValueError:
+                return jsonify({
+                    'status': 'error',
+                    'message': 'limit and cursor must be integers'
+                }), 400
+            limit = max(1, min(limit, Config.NOTIFICATION_MAX_PAGE_SIZE))
+            
             # Get customer data
-            customer_query = """
-                SELECT customer_id, customer_name, status, created_at, updated_at,
-                       est_waste_qty, user_type, city, state
-                FROM b2c_customer_master 
-                WHERE customer_id = %s
-            """
-            customer_result = db.execute_query(customer_query, (customer_id,))
+            customer = load_customer(customer_id)
             
-            if not customer_result:
+            if customer is None:
                 return jsonify({
                     'status': 'error',
                     'message': 'Customer not found'
                 }), 404
             
-            customer = customer_result[0]
-            notifications = []
-            
-            # Calculate time differences
-            created_at = customer.get('created_at')
-            updated_at = customer.get('updated_at')
-            status = customer.get('status', '')
-            customer_name = customer.get('customer_name', 'Customer')
-            
-            # Helper function to format time ago
-            def get_time_ago(date_str):
-                if not date_str:
-                    return 'Recently'
-                try:
-                    if isinstance(date_str, str):
-                        date_obj = datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S')
-                    else:
-                        date_obj = date_str
-                    now = datetime.now()
-                    diff = now - date_obj
-                    
-                    if diff.days > 0:
-                        if diff.days == 1:
-                            return '1 day ago'
-                        elif diff.days < 7:
-                            return f'{diff.days} days ago'
-                        elif diff.days < 30:
-                            weeks = diff.days // 7
-                            return f'{weeks} week{"s" if weeks > 1 else ""} ago'
-                        else:
-                            months = diff.days // 30
-                            return f'{months} month{"s" if months > 1 else ""} ago'
-                    elif diff.seconds >= 3600:
-                        hours = diff.seconds // 3600
-                        return f'{hours} hour{"s" if hours > 1 else ""} ago'
-                    elif diff.seconds >= 60:
-                        minutes = diff.seconds // 60
-                        return f'{minutes} minute{"s" if minutes > 1 else ""} ago'
-                    else:
-                        return 'Just now'
-                except:
-                    return 'Recently'
-            
-            # Notification 1: Account Approval (if approved)
-            if status == 'APPROVED':
-                notifications.append({
-                    'id': f'approval_{customer_id}',
-                    'title': 'Account Approved',
-                    'message': f'Great news, {customer_name}! Your account has been approved. You can now access all features of the app.',
-                    'time': get_time_ago(updated_at if updated_at and updated_at != created_at else created_at),
-                    'type': 'update',
-                    'icon': '✅',
-                    'isRead': False,
-                    'priority': 'high',
-                    'createdAt': updated_at if updated_at and updated_at != created_at else created_at
-                })
-            
-            # Notification 2: Welcome message (if recently created)
-            if created_at:
-                try:
-                    if isinstance(created_at, str):
-                        created_date = datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S')
-                    else:
-                        created_date = created_at
-                    days_since_creation = (datetime.now() - created_date).days
-                    if days_since_creation <= 7:
-                        notifications.append({
-                            'id': f'welcome_{customer_id}',
-                            'title': 'Welcome to OneStep Greener!',
-                            'message': f'Welcome {customer_name}! Thank you for joining our recycling community. Start your eco-journey today!',
-                            'time': get_time_ago(created_at),
-                            'type': 'update',
-                            'icon': '🌱',
-                            'isRead': days_since_creation > 1,
-                            'priority': 'high',
-                            'createdAt': created_at
-                        })
-                except Exception as date_error:
-                    print(f"Warning: Could not parse created_at date: {date_error}")
-            
-            # Notification 3: Profile under consideration (if pending)
-            if status == 'PENDING':
-                notifications.append({
-                    'id': f'pending_{customer_id}',
-                    'title': 'Profile Under Review',
-                    'message': f'Hi {customer_name}, your profile is currently under consideration. We\'ll notify you once it\'s approved.',
-                    'time': get_time_ago(created_at),
-                    'type': 'update',
-                    'icon': '⏳',
-                    'isRead': False,
-                    'priority': 'medium',
-                    'createdAt': created_at
-                })
-            
-            # Notification 4: Environmental impact (based on waste quantity)
-            est_waste = customer.get('est_waste_qty')
-            if est_waste and est_waste > 0:
-                try:
-                    # Convert to float if it's a Decimal or string
-                    est_waste_float = float(est_waste) if est_waste else 0
-                    
-                    if est_waste_float > 0:
-                        # Calculate environmental impact
-                        trees_saved = int(est_waste_float * 0.08)  # Approx 0.08 trees per kg
-                        co2_reduced = int(est_waste_float * 6)  # Approx 6kg CO2 per kg waste
-                        
-                        notifications.append({
-                            'id': f'impact_{customer_id}',
-                            'title': 'Environmental Impact',
-                            'message': f'Your estimated waste quantity of {est_waste_float}kg could save approximately {trees_saved} trees and reduce {co2_reduced}kg of CO2 emissions!',
-                            'time': get_time_ago(created_at),
-                            'type': 'impact',
-                            'icon': '🌍',
-                            'isRead': True,
-                            'priority': 'medium',
-                            'createdAt': created_at
-                        })
-                except (ValueError, TypeError) as e:
-                    print(f"Warning: Could not process waste quantity {est_waste}: {e}")
-                    # Skip this notification if conversion fails
-            
-            # Notification 5: Service information
-            user_type = customer.get('user_type', '')
-            city = customer.get('city', '')
-            if city:
-                notifications.append({
-                    'id': f'service_{customer_id}',
-                    'title': 'Service Available',
-                    'message': f'Our recycling pickup service is available in {city}. Schedule your first pickup from the dashboard!',
-                    'time': get_time_ago(created_at),
-                    'type': 'update',
-                    'icon': '♻️',
-                    'isRead': True,
-                    'priority': 'low',
-                    'createdAt': created_at
-                })
-            
-            # Sort notifications by creation date (newest first)
-            notifications.sort(key=lambda x: x.get('createdAt', ''), reverse=True)
-            
-            # Limit to 20 most recent
-            notifications = notifications[:20]
+            state, rows = notifications.page(customer_id, cursor, limit)
+            if state is None or state['last_status'] != customer.get('status'):
+                # First read of an existing customer, or the status changed
+                # (e.g. approved by the back office) since the feed was written
+                if state is None:
+                    notifications.seed(customer)
+                else:
+                    notifications.sync_status(customer, state['last_status'])
+                state, rows = notifications.page(customer_id, cursor, limit)
+            
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            now = datetime.now()
+            items = [notifications.to_response(row, customer_id, now) for row in rows]
+            
+            # The stored feed only changes with its version; the relative
+            # times are the only part that moves with the clock
+            etag = make_etag(
+                'notifications', customer_id, customer.get('updated_at'), customer.get('status'),
+                state['version'] if state else 0, cursor, limit,
+                *(item['time'] for item in items)
+            )
+            response = not_modified(etag)
+            if response is not None:
+                return response
             
-            return jsonify({
+            return with_etag(jsonify({
                 'status': 'success',
                 'data': {
-                    'notifications': notifications,
-                    'unreadCount': sum(1 for n in notifications if not n.get('isRead', False))
+                    'notifications': items,
+                    'unreadCount': state['unread_count'] if state else 0,
+                    'nextCursor': str(rows[-1]['id']) if has_more else None
                 }
-            }), 200
+            }), etag), 200
             
         except Exception as e:
-            print(f"Error in get_notifications: {str(e)}")
+            logger.exception("Error in get_notifications: %s", e)
             return jsonify({
                 'status': 'error',
                 'message': f'Failed to fetch notifications: {str(e)}'
@@ -821,8 +825,8 @@ def create_app() -> Flask:
     @app.route('/api/notifications/mark-read', methods=['POST'])
     def mark_notification_read():
         """
-        Mark notification as read (optional - for future use with stored notifications).
-        Currently notifications are generated dynamically, so this is a placeholder.
+        Mark a notification as read, or every notification when
+        notificationId is omitted.
         
         Expected JSON body:
         {
@@ -831,11 +835,13 @@ def create_app() -> Flask:
         }
         
         Returns:
-            JSON response with success status
+            JSON response with the number of notifications marked and the
+            remaining unread count
         """
         try:
             data = request.get_json()
             customer_id = data.get('customerId')
+            notification_id = data.get('notificationId')
             
             if not customer_id:
                 return jsonify({
@@ -843,11 +849,26 @@ def create_app() -> Flask:
                     'message': 'Customer ID is required'
                 }), 400
             
-            # Since notifications are generated dynamically, we can't mark them as read permanently
-            # This endpoint is here for future use if we implement notification storage
+            key = None
+            if notification_id:
+                # IDs have the form <key>_<customerId>
+                suffix = f'_{customer_id}'
+                if not str(notification_id).endswith(suffix):
+                    return jsonify({
+                        'status': 'error',
+                        'message': 'Notification not found'
+                    }), 404
+                key = str(notification_id)[:-len(suffix)]
+            
+            marked = notifications.mark_read(customer_id, key)
+            
             return jsonify({
                 'status': 'success',
-                'message': 'Notification marked as read'
+                'message': 'Notification marked as read',
+                'data': {
+                    'marked': marked,
+                    'unreadCount': notifications.unread_count(customer_id)
+                }
             }), 200
             
         except Exception as e:
@@ -856,6 +877,184 @@ def create_app() -> Flask:
                 'message': f'Failed to mark notification as read: {str(e)}'
             }), 500
     
+    @app.route('/api/notifications/batch', methods=['POST'])
+    def batch_notifications():
+        """
+        Evaluate the notification rules for many customers (ops tooling and
+        push jobs). Customers are loaded NOTIFICATION_BATCH_CHUNK_SIZE at a
+        time and the result is streamed as NDJSON, one line per customer:
+        {"customerId": "1001", "notifications": [...]} or
+        {"customerId": "1002", "error": "Customer not found"}
+        
+        Headers:
+            X-Admin-Token: Must match ADMIN_API_TOKEN
+        
+        Request body, either:
+            application/json: {"customerIds": ["1001", "1002", ...]}
+            text/plain: one customer ID per line (read as it streams in)
+        
+        Returns:
+            Streamed application/x-ndjson response
+        """
+        if not is_admin_request():
+            return jsonify({
+                'status': 'error',
+                'message': 'Not authorized to generate notifications'
+            }), 403
+        
+        if request.mimetype == 'text/plain':
+            lines = io.TextIOWrapper(request.stream, encoding='utf-8-sig')
+            customer_ids = (line.strip() for line in lines if line.strip())
+        else:
+            data = request.get_json(silent=True) or {}
+            customer_ids = data.get('customerIds')
+            if not isinstance(customer_ids, list):
+                return jsonify({
+                    'status': 'error',
+                    'message': 'customerIds must be a list'
+                }), 400
+        
+        def generate():
+            results = notifications.generate_for_customers(
+                customer_ids, chunk_size=Config.NOTIFICATION_BATCH_CHUNK_SIZE
+            )
+            for customer_id, items in results:
+                if items is None:
+                    line = {'customerId': customer_id, 'error': 'Customer not found'}
+                else:
+                    line = {'customerId': customer_id, 'notifications': items}
+                yield app.json.dumps(line) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    @app.route('/api/push/send', methods=['POST'])
+    def send_push():
+        """
+        Queue a push notification to every registered device of an audience.
+        The fan-out runs in the background; poll /api/push/jobs/<jobId>.
+        
+        Headers:
+            X-Admin-Token: Must match ADMIN_API_TOKEN
+        
+        Expected JSON body:
+        {
+            "title": "string",
+            "body": "string",
+            "data": {},  // Optional: extra payload for the app
+            "customerIds": ["1001"],  // Optional audience filters; all
+            "city": "Mumbai",  // given filters must match, none means
+            "status": "APPROVED"  // every registered device
+        }
+        
+        Returns:
+            JSON response with the job ID (202)
+        """
+        if not is_admin_request():
+            return jsonify({
+                'status': 'error',
+                'message': 'Not authorized to send push notifications'
+            }), 403
+        
+        data = request.get_json(silent=True) or {}
+        title = (data.get('title') or '').strip()
+        body = (data.get('body') or '').strip()
+        customer_ids = data.get('customerIds')
+        if not title or not body:
+            return jsonify({
+                'status': 'error',
+                'message': 'title and body are required'
+            }), 400
+        if customer_ids is not None and not isinstance(customer_ids, list):
+            return jsonify({
+                'status': 'error',
+                'message': 'customerIds must be a list'
+            }), 400
+        
+        target = PushTarget(customer_ids=customer_ids, city=data.get('city'), status=data.get('status'))
+        try:
+            job = push_fanout.submit(target, PushMessage(title, body, data.get('data')))
+        except queue.Full:
+            return jsonify({
+                'status': 'error',
+                'message': 'Too many push jobs queued. Please try again later.'
+            }), 503
+        
+        return jsonify({
+            'status': 'success',
+            'message': 'Push notification queued',
+            'data': job.to_dict()
+        }), 202
+    
+    @app.route('/api/push/jobs/<job_id>', methods=['GET'])
+    def push_job_status(job_id):
+        """
+        Progress of a push fan-out job.
+        
+        Headers:
+            X-Admin-Token: Must match ADMIN_API_TOKEN
+        
+        Returns:
+            JSON response with job state and counters
+        """
+        if not is_admin_request():
+            return jsonify({
+                'status': 'error',
+                'message': 'Not authorized to view push jobs'
+            }), 403
+        
+        job = push_fanout.get(job_id)
+        if job is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Push job not found'
+            }), 404
+        
+        return jsonify({
+            'status': 'success',
+            'data': job.to_dict()
+        }), 200
+    
+    @app.route('/api/admin/query-stats', methods=['GET', 'DELETE'])
+    def admin_query_stats():
+        """
+        Per-statement database statistics of this worker process.
+        
+        Headers:
+            X-Admin-Token: Must match ADMIN_API_TOKEN
+        
+        Query parameters:
+            sort: 'total' (default), 'count', 'p99', 'max' or 'errors'
+            limit: Number of statements to return (default 50)
+        
+        DELETE resets the statistics.
+        
+        Returns:
+            JSON response with one entry per statement fingerprint
+        """
+        if not is_admin_request():
+            return jsonify({
+                'status': 'error',
+                'message': 'Not authorized to view query statistics'
+            }), 403
+        
+        if request.method == 'DELETE':
+            query_stats.reset()
+            return jsonify({
+                'status': 'success',
+                'message': 'Query statistics reset'
+            }), 200
+        
+        sort = request.args.get('sort', 'total')
+        limit = request.args.get('limit', 50, type=int)
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'since': datetime.fromtimestamp(query_stats.started_at).isoformat(),
+                'slowQueryThresholdMs': Config.DB_SLOW_QUERY_MS,
+                'statements': query_stats.snapshot(sort=sort, limit=limit)
+            }
+        }), 200
+    
     @app.route('/api/notifications/register-device', methods=['POST'])
     def register_device_token():
         """
@@ -891,45 +1090,17 @@ def create_app() -> Flask:
                 }), 400
             
             # Check if customer exists
-            customer_query = "SELECT customer_id FROM b2c_customer_master WHERE customer_id = %s"
-            customer_result = db.execute_query(customer_query, (customer_id,))
-            
-            if not customer_result:
+            if load_customer(customer_id) is None:
                 return jsonify({
                     'status': 'error',
                     'message': 'Customer not found'
                 }), 404
             
-            # Check if device_tokens table exists, if not create it
-            # This is a minimal table just for push notification tokens
+            # device_tokens is created by the schema migrations
             try:
-                # Try to create table if it doesn't exist
-                create_table_query = """
-                    CREATE TABLE IF NOT EXISTS device_tokens (
-                        id INT AUTO_INCREMENT PRIMARY KEY,
-                        customer_id VARCHAR(50) NOT NULL,
-                        device_token TEXT NOT NULL,
-                        platform VARCHAR(10) NOT NULL,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                        UNIQUE KEY unique_customer_token (customer_id, device_token(255)),
-                        INDEX idx_customer_id (customer_id),
-                        INDEX idx_device_token (device_token(255))
-                    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-                """
-                db.execute_query(create_table_query, fetch=False)
-                
                 # Insert or update device token
-                insert_query = """
-                    INSERT INTO device_tokens (customer_id, device_token, platform, updated_at)
-                    VALUES (%s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                        device_token = VALUES(device_token),
-                        platform = VALUES(platform),
-                        updated_at = VALUES(updated_at)
-                """
                 current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                db.execute_query(insert_query, (customer_id, device_token, platform, current_time), fetch=False)
+                db.execute_named(DEVICE_TOKEN_UPSERT, (customer_id, device_token, platform, current_time), fetch=False)
                 
                 return jsonify({
                     'status': 'success',
@@ -937,22 +1108,62 @@ def create_app() -> Flask:
                 }), 200
                 
             except Exception as table_error:
-                # If table creation fails, log but don't fail the request
-                print(f"Warning: Could not create/update device_tokens table: {table_error}")
-                print("Device token registration skipped. Push notifications may not work.")
+                # If storing fails, log but don't fail the request
+                logger.warning(
+                    "Could not update device_tokens table: %s. "
+                    "Device token registration skipped. Push notifications may not work.", table_error
+                )
                 return jsonify({
                     'status': 'success',
                     'message': 'Device token received (storage may be unavailable)'
                 }), 200
             
         except Exception as e:
-            print(f"Error in register_device_token: {str(e)}")
+            logger.exception("Error in register_device_token: %s", e)
             return jsonify({
                 'status': 'error',
                 'message': f'Failed to register device token: {str(e)}'
             }), 500
     
+    @app.route('/api/profile', methods=['GET'])
+    def get_profile():
+        """
+        Get a customer's profile (same fields as the edit response).
+        Supports conditional requests: send the last ETag in If-None-Match
+        to get 304 Not Modified while the profile is unchanged.
+        
+        Query Parameters:
+            customerId: string (required) - Customer ID
+        
+        Returns:
+            JSON response with profile data
+        """
+        try:
+            customer_id = parse_profile_request(request.args)
+            customer = found_customer(load_customer(customer_id))
+            
+            profile = profile_data(customer)
+            etag = make_etag('profile', customer.get('updated_at'), *profile.values())
+            response = not_modified(etag)
+            if response is not None:
+                return response
+            
+            return with_etag(jsonify({
+                'status': 'success',
+                'data': profile
+            }), etag), 200
+            
+        except LoginError as e:
+            return login_error(e)
+        except Exception as e:
+            logger.exception("Error in get_profile: %s", e)
+            return jsonify({
+                'status': 'error',
+                'message': f'Failed to fetch profile: {str(e)}'
+            }), 500
+    
     @app.route('/api/profile/edit', methods=['PUT'])
+    @idempotent
     def edit_profile():
         """
         Edit customer profile endpoint.
@@ -989,24 +1200,26 @@ def create_app() -> Flask:
                     'message': 'Customer ID is required'
                 }), 400
             
-            # Check if customer exists
-            check_customer_query = """
-                SELECT customer_id, customer_name, email, contact_no, address,
-                       city, state, est_waste_qty, poc, user_type, reference,
-                       status, latitude, longitude
-                FROM b2c_customer_master 
-                WHERE customer_id = %s
-            """
-            customer_result = db.execute_query(check_customer_query, (customer_id,))
+            # Validate every field before touching the database
+            try:
+                fields = parse_profile_edit(data)
+            except ValidationError as e:
+                return jsonify({
+                    'status': 'error',
+                    'message': str(e),
+                    'errors': e.errors
+                }), 400
+            
+            # Check if customer exists; the edit merges into the current row
+            # (address parts, mobile_normalized), so read it from the database
+            customer = fetch_customer(customer_id)
             
-            if not customer_result:
+            if customer is None:
                 return jsonify({
                     'status': 'error',
                     'message': 'Customer not found'
                 }), 404
             
-            customer = customer_result[0]
-            
             # Check if customer is approved (only approved customers can edit profile)
             if customer.get('status') != 'APPROVED':
                 return jsonify({
@@ -1014,146 +1227,35 @@ def create_app() -> Flask:
                     'message': 'Your profile is under consideration. Cannot edit profile at this time.'
                 }), 403
             
-            # Build update fields dynamically based on what's provided
-            update_fields = []
-            update_values = []
-            
-            # Full Name
-            if 'fullName' in data and data.get('fullName'):
-                full_name = (data.get('fullName') or '').strip()
-                if full_name:
-                    update_fields.append("customer_name = %s")
-                    update_values.append(full_name)
-            
-            # Email
-            if 'email' in data and data.get('email'):
-                email = (data.get('email') or '').strip().lower()
-                if email:
-                    # Validate email format
-                    if '@' not in email or '.' not in email.split('@')[1]:
-                        return jsonify({
-                            'status': 'error',
-                            'message': 'Invalid email format.'
-                        }), 400
-                    update_fields.append("email = %s")
-                    update_values.append(email)
-            
             # House Number and Address
-            house_number = None
-            address = None
-            if 'houseNumber' in data or 'address' in data:
-                house_number = (data.get('houseNumber') or '').strip() if 'houseNumber' in data else ''
-                address = (data.get('address') or '').strip() if 'address' in data else ''
+            house_number = fields.pop('house_number', '')
+            address = fields.pop('address', '')
+            if house_number or address:
+                # Get existing address to split if only one field is being updated
+                existing_address = customer.get('address', '')
+                if not house_number and 'houseNumber' not in data:
+                    # User didn't provide houseNumber, try to extract from existing address
+                    if existing_address and ',' in existing_address:
+                        parts = existing_address.split(',', 1)
+                        house_number = parts[0].strip()
+                        if not address:
+                            address = parts[1].strip() if len(parts) > 1 else ''
+                    elif not address:
+                        address = existing_address
+                elif not address and 'address' not in data:
+                    # User didn't provide address, use existing address
+                    if existing_address and ',' in existing_address:
+                        address = existing_address.split(',', 1)[1].strip()
+                    else:
+                        address = existing_address
                 
-                # If either is provided, combine them (similar to signup)
-                if house_number or address:
-                    # Get existing address to split if only one field is being updated
-                    existing_address = customer.get('address', '')
-                    if not house_number and 'houseNumber' not in data:
-                        # User didn't provide houseNumber, try to extract from existing address
-                        if existing_address and ',' in existing_address:
-                            parts = existing_address.split(',', 1)
-                            house_number = parts[0].strip()
-                            if not address:
-                                address = parts[1].strip() if len(parts) > 1 else ''
-                        elif not address:
-                            address = existing_address
-                    elif not address and 'address' not in data:
-                        # User didn't provide address, use existing address
-                        if existing_address and ',' in existing_address:
-                            address = existing_address.split(',', 1)[1].strip()
-                        else:
-                            address = existing_address
-                    
-                    # Combine house number with address
-                    full_address = f"{house_number}, {address}".strip() if house_number else address
-                    update_fields.append("address = %s")
-                    update_values.append(full_address)
-            
-            # City
-            if 'city' in data and data.get('city'):
-                city = (data.get('city') or '').strip()
-                if city:
-                    update_fields.append("city = %s")
-                    update_values.append(city)
-            
-            # State
-            if 'state' in data and data.get('state'):
-                state = (data.get('state') or '').strip()
-                if state:
-                    update_fields.append("state = %s")
-                    update_values.append(state)
-            
-            # User Type
-            if 'userType' in data and data.get('userType'):
-                user_type_frontend = (data.get('userType') or '').strip()
-                # Map user_type from frontend to database enum values
-                user_type_mapping = {
-                    'Household Apartment': 'RESIDENTIAL',
-                    'School/Institution': 'INSTITUTIONAL',
-                    'Office': 'COMMERCIAL',
-                    'Shop': 'COMMERCIAL',
-                    'Other': 'OTHERS'
-                }
-                user_type = user_type_mapping.get(user_type_frontend, 'OTHERS')
-                update_fields.append("user_type = %s")
-                update_values.append(user_type)
-            
-            # Expected Waste Quantity
-            if 'expectation' in data and data.get('expectation'):
-                expectation_raw = (data.get('expectation') or '').strip()
-                if expectation_raw:
-                    # Extract numeric value from expectation (handles cases like "23kgs" or "23")
-                    expectation_numeric = re.sub(r'[^0-9.]', '', expectation_raw)
-                    expectation = float(expectation_numeric) if expectation_numeric else None
-                    
-                    if expectation is None or expectation <= 0:
-                        return jsonify({
-                            'status': 'error',
-                            'message': 'Please enter a valid waste quantity (must be greater than 0).'
-                        }), 400
-                    
-                    update_fields.append("est_waste_qty = %s")
-                    update_values.append(expectation)
-            
-            # Alternate Contact (POC)
-            if 'alternateContact' in data:
-                alternate_contact = (data.get('alternateContact') or '').strip() if data.get('alternateContact') else ''
-                if alternate_contact:
-                    # Validate alternate contact if provided
-                    if not alternate_contact.isdigit() or len(alternate_contact) != 10:
-                        return jsonify({
-                            'status': 'error',
-                            'message': 'Invalid alternate contact number. Must be 10 digits.'
-                        }), 400
-                    poc = f"+91{alternate_contact}"
-                    update_fields.append("poc = %s")
-                    update_values.append(poc)
-                else:
-                    # If empty string provided, clear the POC
-                    update_fields.append("poc = %s")
-                    update_values.append(None)
-            
-            # Know About Us (Reference)
-            if 'knowAboutUs' in data and data.get('knowAboutUs'):
-                know_about_us = (data.get('knowAboutUs') or '').strip()
-                if know_about_us:
-                    update_fields.append("reference = %s")
-                    update_values.append(know_about_us)
-            
-            # Latitude
-            if 'latitude' in data:
-                latitude = data.get('latitude')
-                latitude = float(latitude) if latitude is not None else None
-                update_fields.append("latitude = %s")
-                update_values.append(latitude)
-            
-            # Longitude
-            if 'longitude' in data:
-                longitude = data.get('longitude')
-                longitude = float(longitude) if longitude is not None else None
-                update_fields.append("longitude = %s")
-                update_values.append(longitude)
+                # Combine house number with address (similar to signup)
+                fields['address'] = f"{house_number}, {address}".strip() if house_number else address
+            
+            # Build update fields from what's provided; an empty alternateContact,
+            # latitude or longitude clears the column
+            update_fields = [f"{column} = %s" for column in fields]
+            update_values = list(fields.values())
             
             # If no fields to update
             if not update_fields:
@@ -1162,6 +1264,12 @@ def create_app() -> Flask:
                     'message': 'No fields provided for update'
                 }), 400
             
+            # Keep the login lookup column in sync for rows created outside the app
+            mobile_normalized = normalize_mobile(customer.get('contact_no'))
+            if mobile_normalized and mobile_normalized != customer.get('mobile_normalized'):
+                update_fields.append("mobile_normalized = %s")
+                update_values.append(mobile_normalized)
+            
             # Add updated_at and updated_by
             current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             update_fields.append("updated_at = %s")
@@ -1179,57 +1287,31 @@ def create_app() -> Flask:
                 WHERE customer_id = %s
             """
             
-            # Execute update
-            db.execute_query(update_query, tuple(update_values), fetch=False)
-            
-            # Get updated customer data
-            updated_customer_result = db.execute_query(check_customer_query, (customer_id,))
-            updated_customer = updated_customer_result[0] if updated_customer_result else customer
-            
-            # Extract mobile number from contact_no (remove +91 prefix)
-            contact_no = updated_customer.get('contact_no', '')
-            mobile_number = contact_no.replace('+91', '').replace('+91/', '').replace('/', '') if contact_no else ''
-            
-            # Split address into houseNumber and address if it contains comma
-            full_address_str = updated_customer.get('address', '') or ''
-            address_parts = full_address_str.split(',', 1) if ',' in full_address_str else ['', full_address_str]
-            house_number_resp = address_parts[0].strip() if address_parts[0] else ''
-            address_resp = address_parts[1].strip() if len(address_parts) > 1 and address_parts[1] else full_address_str
-            
-            # Map user_type back to frontend format
-            user_type_db = updated_customer.get('user_type', '')
-            user_type_mapping_reverse = {
-                'RESIDENTIAL': 'Household Apartment',
-                'INSTITUTIONAL': 'School/Institution',
-                'COMMERCIAL': 'Office',
-                'OTHERS': 'Other'
-            }
-            user_type_frontend_resp = user_type_mapping_reverse.get(user_type_db, 'Other')
-            
-            # Extract POC (alternateContact) - remove +91 prefix
-            poc = updated_customer.get('poc', '') or ''
-            alternate_contact_resp = poc.replace('+91', '').replace('+91/', '').replace('/', '') if poc else ''
+            # Execute update and read back the row in one transaction
+            with db.transaction():
+                db.execute_query(update_query, tuple(update_values), fetch=False)
+                
+                # Get updated customer data
+                updated_customer = fetch_customer(customer_id)
+                
+                # Re-publish notifications built from the edited fields
+                if updated_customer is not None:
+                    changed_keys = [
+                        key for key, column in ((notifications.IMPACT, 'est_waste_qty'), (notifications.SERVICE, 'city'))
+                        if updated_customer.get(column) != customer.get(column)
+                    ]
+                    if changed_keys:
+                        notifications.refresh(updated_customer, changed_keys)
+            customer_cache.invalidate(customer_id)
+            if updated_customer is None:
+                updated_customer = customer
+            else:
+                customer_cache.put(customer_id, updated_customer)
             
             return jsonify({
                 'status': 'success',
                 'message': 'Profile updated successfully',
-                'data': {
-                    'customerId': updated_customer.get('customer_id'),
-                    'customerName': updated_customer.get('customer_name'),
-                    'email': updated_customer.get('email'),
-                    'mobileNumber': mobile_number,
-                    'houseNumber': house_number_resp,
-                    'address': address_resp,
-                    'city': updated_customer.get('city'),
-                    'state': updated_customer.get('state'),
-                    'userType': user_type_frontend_resp,
-                    'expectation': str(updated_customer.get('est_waste_qty', '')) if updated_customer.get('est_waste_qty') else '',
-                    'alternateContact': alternate_contact_resp,
-                    'knowAboutUs': updated_customer.get('reference', ''),
-                    'latitude': updated_customer.get('latitude'),
-                    'longitude': updated_customer.get('longitude'),
-                    'status': updated_customer.get('status')
-                }
+                'data': profile_data(updated_customer)
             }), 200
             
         except Exception as e:
@@ -1244,7 +1326,7 @@ def create_app() -> Flask:
                     }), 409
             
             # Handle other errors
-            print(f"Error in edit_profile: {str(e)}")
+            logger.exception("Error in edit_profile: %s", e)
             return jsonify({
                 'status': 'error',
                 'message': f'Failed to update profile: {str(e)}'
@@ -1282,7 +1364,7 @@ def create_app() -> Flask:
                 # except:
                 #     pass  # Ignore if table doesn't exist or query fails
                 
-                print(f"User {customer_id} logged out")
+                logger.info("User logged out", extra={'customer_id': customer_id})
             
             # Clear any OTP data for this customer (if mobile number was provided)
             # Note: OTPs expire automatically after 5 minutes, but we can clear them on logout
@@ -1293,7 +1375,7 @@ def create_app() -> Flask:
             }), 200
             
         except Exception as e:
-            print(f"Error in logout: {str(e)}")
+            logger.exception("Error in logout: %s", e)
             # Even if there's an error, return success to allow frontend to proceed with logout
             return jsonify({
                 'status': 'success',
@@ -1307,6 +1389,7 @@ if __name__ == '__main__':
     app = create_app()
     config = Config()
     
+    # Development server only; use serve.py (gunicorn) in production
     print(f"Starting Flask server on port {config.FLASK_PORT}")
     print(f"Database: {config.DB_NAME} @ {config.DB_HOST}")
     
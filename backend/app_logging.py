@@ -0,0 +1,335 @@
+"""
+Application logging module.
+Structured log records written off the request path through a bounded
+queue, with per-endpoint sampling and redaction of OTPs and phone numbers.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import traceback
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+# Fields whose value is secret and dropped entirely
+SECRET_FIELDS = {'otp', 'templateparams', 'password', 'apikey', 'api_key', 'token', 'device_token'}
+# Fields holding a phone number; all but the last 4 digits are masked
+PHONE_FIELDS = {'mobile', 'mobile_number', 'mobilenumber', 'mobileno', 'contact_no', 'contactno', 'mobile_normalized'}
+
+# Third-party loggers limited to warnings unless LOG_LEVEL is DEBUG
+QUIET_LOGGERS = ('mysql.connector', 'urllib3')
+
+REDACTED = '[REDACTED]'
+# "OTP 123456", "otp=123456", "OTP: 123456"
+_OTP_TEXT = re.compile(r'(?i)(otp\W{0,3})\d{4,8}')
+# 10-digit mobile numbers with an optional +91 / 91 / 0 prefix
+_PHONE_TEXT = re.compile(r'(?<!\d)(?:\+?91[/ -]?|0)?(\d{6})(\d{4})(?!\d)')
+
+# Endpoint of the request being handled, for sampling and as a log field
+_log_context: ContextVar[Optional[dict]] = ContextVar('log_context', default=None)
+
+
+def mask_phone(value) -> str:
+    """Keep the last 4 digits of a phone number."""
+    digits = re.sub(r'[^0-9]', '', str(value))
+    if len(digits) < 4:
+        return REDACTED
+    return '******' + digits[-4:]
+
+
+def redact_text(text: str) -> str:
+    """
+    Remove OTPs and phone numbers from free text.
+
+    Args:
+        text (str): Log message
+
+    Returns:
+        str: Message with OTPs replaced and phone numbers masked
+    """
+    text = _OTP_TEXT.sub(lambda match: match.group(1) + REDACTED, text)
+    return _PHONE_TEXT.sub(lambda match: '******' + match.group(2), text)
+
+
+def redact_value(name: str, value):
+    """Redact one structured field by name (recursing into dicts and lists)."""
+    key = name.lower()
+    if key in SECRET_FIELDS:
+        return REDACTED
+    if key in PHONE_FIELDS and value is not None:
+        return mask_phone(value)
+    if isinstance(value, dict):
+        return {k: redact_value(str(k), v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact_value(name, v) for v in value]
+    if isinstance(value, str):
+        return redact_text(value)
+    return value
+
+
+def bind_request(endpoint: Optional[str], **fields):
+    """
+    Attach the current request's endpoint (and any extra fields) to log records.
+
+    Args:
+        endpoint (Optional[str]): Endpoint name (e.g. ``generate_otp``)
+        **fields: Additional fields added to every record of the request
+
+    Returns:
+        Token to pass to ``unbind_request``
+    """
+    return _log_context.set({'endpoint': endpoint, **fields})
+
+
+def unbind_request(token) -> None:
+    """
+    Detach the request context set by ``bind_request``.
+
+    Args:
+        token: Value returned by ``bind_request``
+    """
+    _log_context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copy the request context onto each record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _log_context.get()
+        if context:
+            for name, value in context.items():
+                if not hasattr(record, name):
+                    setattr(record, name, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a fraction of the records logged for busy endpoints.
+
+    Warnings and errors are always kept; records outside a request are
+    never sampled.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, 'endpoint', None))
+        return rate is None or random.random() < rate
+
+
+def _render_exception(record: logging.LogRecord) -> None:
+    """Format ``exc_info`` into ``exc_text`` (the traceback is not kept)."""
+    if record.exc_info:
+        record.exc_text = ''.join(traceback.format_exception(*record.exc_info)).rstrip()
+        record.exc_info = None
+
+
+class RedactingFilter(logging.Filter):
+    """
+    Strip OTPs and mask phone numbers in the message, the traceback and
+    structured fields.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.msg = redact_text(record.getMessage())
+        record.args = None
+        # Exception messages repeat their arguments (e.g. a failed query's
+        # parameters), so the traceback is rendered here and redacted
+        _render_exception(record)
+        if record.exc_text:
+            record.exc_text = redact_text(record.exc_text)
+        if record.stack_info:
+            record.stack_info = redact_text(record.stack_info)
+        for name, value in list(vars(record).items()):
+            if name not in _RECORD_ATTRIBUTES:
+                setattr(record, name, redact_value(name, value))
+        return True
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {
+        name: value for name, value in vars(record).items()
+        if name not in _RECORD_ATTRIBUTES and not name.startswith('_')
+    }
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with extra fields appended as key=value."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += ' ' + ' '.join(f'{name}={value}' for name, value in fields.items())
+        return line
+
+
+class QueueLogHandler(logging.Handler):
+    """
+    Hand records to a background thread that writes them to ``target``.
+
+    ``emit`` never blocks: when the queue is full the record is dropped and
+    counted. The writer thread starts lazily in the process that first logs,
+    so the handler is safe to configure before a prefork server forks.
+    """
+
+    def __init__(self, target: logging.Handler, max_queue: int = 10000):
+        """
+        Initialize the handler.
+
+        Args:
+            target (logging.Handler): Handler doing the actual (blocking) write
+            max_queue (int): Records buffered before new ones are dropped
+        """
+        super().__init__()
+        self.target = target
+        self.max_queue = max_queue
+        self.dropped = 0
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            # The lock may have been held by another thread at fork time
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self) -> None:
+        self._start_lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_started(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # A queue inherited through fork() may hold a locked mutex
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._thread = threading.Thread(target=self._write, name='log-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self._ensure_started()
+            # Render now: args may change after the caller returns
+            record.msg = record.getMessage()
+            record.args = None
+            _render_exception(record)
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def _write(self) -> None:
+        while True:
+            record = self._queue.get()
+            if record is None:
+                return
+            try:
+                self.target.handle(record)
+            except Exception:
+                self.target.handleError(record)
+
+    def close(self) -> None:
+        """Write out queued records, then stop the writer thread."""
+        if self._pid == os.getpid() and self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(5.0)
+            self._pid = None
+        self.target.close()
+        super().close()
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """
+    Parse ``LOG_SAMPLE_RATES`` (``endpoint=rate`` pairs separated by commas).
+
+    Args:
+        spec (str): e.g. ``'generate_otp=0.1,get_profile=0.01'``
+
+    Returns:
+        Dict[str, float]: Sampling rate per endpoint
+    """
+    rates = {}
+    for item in spec.split(','):
+        name, _, rate = item.partition('=')
+        if name.strip() and rate.strip():
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def configure_logging(config) -> Optional[QueueLogHandler]:
+    """
+    Route all logging through the queue handler (once per process).
+
+    Args:
+        config: Config object (LOG_* settings)
+
+    Returns:
+        Optional[QueueLogHandler]: The installed handler (None if already configured)
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return None
+        _configured = True
+
+    target = logging.StreamHandler(sys.stdout)
+    target.setFormatter(JsonFormatter() if config.LOG_FORMAT == 'json' else TextFormatter())
+
+    handler = QueueLogHandler(target, max_queue=config.LOG_QUEUE_SIZE)
+    handler.addFilter(ContextFilter())
+    handler.addFilter(SamplingFilter(parse_sample_rates(config.LOG_SAMPLE_RATES)))
+    if config.LOG_REDACT:
+        handler.addFilter(RedactingFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(config.LOG_LEVEL.upper())
+    if root.level > logging.DEBUG:
+        # The MySQL driver logs every authentication at INFO
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+    return handler
@@ -0,0 +1,532 @@
+"""
+ASGI application.
+Async serving mode for the B2C Customer App API.
+
+The login and profile endpoints (generate-otp, otp-status, verify-otp,
+GET /api/profile) run as coroutines on an async MySQL pool and an async SMS
+client, so one process holds thousands of in-flight requests without a
+thread per request; their validation and responses come from login.py,
+as for the Flask routes. Every other endpoint is served by the regular Flask app
+(``create_app``) on a bounded thread pool, with streaming request and
+response bodies, so both modes expose exactly the same API and share the
+OTP store and customer cache.
+
+Usage:
+    uvicorn --factory asgi:create_asgi_app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import io
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional
+from urllib.parse import parse_qsl
+
+from flask import Flask
+
+from app import create_app
+from app_logging import bind_request, unbind_request
+from async_database import AsyncDatabase
+from async_sms import AsyncSMSDispatcher, AsyncSMSGatewayClient
+from config import Config
+from customers import profile_data
+from http_cache import etag_headers, etag_matches, make_etag
+from login import (
+    LoginError, approved_customer, check_otp, consumed_customer_id, found_customer, generate_response, new_otp,
+    otp_expired, otp_record, parse_generate_request, parse_profile_request, parse_status_request,
+    parse_verify_request, status_response, too_many_requests, verify_response
+)
+import metrics
+from mobile_numbers import legacy_contact_formats
+from otp_store import InMemoryOTPStore
+from rate_limit import InMemoryRateLimiter, check_limits, client_address
+from response_encoding import (
+    MSGPACK_MIMETYPE, compress_response_body, encoded_etag, negotiate_mimetype, offered_mimetypes, pack_msgpack,
+    representation_etag
+)
+from queries import CUSTOMER_BY_ID, CUSTOMER_BY_MOBILE, CUSTOMER_BY_MOBILE_LEGACY
+from sms_dispatch import STATUS_FAILED, STATUS_SENT, STATUS_TIMEOUT
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsgiRequest:
+    """The parts of an HTTP request the async handlers use."""
+
+    def __init__(self, scope: dict, body: bytes):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.client = str((scope.get('client') or ('', 0))[0])
+        self.args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        self.headers = {}
+        for name, value in scope.get('headers', ()):
+            name = name.decode('latin-1').lower()
+            value = value.decode('latin-1')
+            self.headers[name] = f"{self.headers[name]}, {value}" if name in self.headers else value
+        self.body = body
+
+    def get_json(self) -> Optional[dict]:
+        """Parsed JSON object body, or None if the body is not a JSON object."""
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+
+class _RequestBody(io.RawIOBase):
+    """WSGI input stream fed from ASGI ``http.request`` messages as the app reads it."""
+
+    def __init__(self, receive: Callable[[], Awaitable[dict]], loop: asyncio.AbstractEventLoop):
+        self._receive = receive
+        self._loop = loop
+        self._pending = b''
+        self._done = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending and not self._done:
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message['type'] != 'http.request':
+                self._done = True
+                break
+            self._pending = message.get('body', b'')
+            self._done = not message.get('more_body', False)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+class AsgiApp:
+    """
+    ASGI callable combining async handlers with the Flask app.
+
+    ``flask_app`` supplies the shared OTP store and customer cache
+    (``app.extensions``) and serves every route without an async handler.
+    """
+
+    def __init__(self, flask_app: Flask, config=None):
+        """
+        Initialize the application.
+
+        Args:
+            flask_app (Flask): App from ``create_app()``
+            config: Config object (default: Config())
+        """
+        config = config or Config()
+        self.config = config
+        self.flask_app = flask_app
+        self.otp_storage = flask_app.extensions['otp_storage']
+        self.customer_cache = flask_app.extensions['customer_cache']
+        self.rate_limiters = flask_app.extensions['rate_limiters']
+        self.db = AsyncDatabase(config)
+        self.sms_gateway = AsyncSMSGatewayClient.from_config(config)
+        self.sms_dispatcher = AsyncSMSDispatcher(
+            self.sms_gateway.send_otp,
+            concurrency=config.PRP_POOL_MAXSIZE,
+            max_queue=config.SMS_DISPATCH_QUEUE_SIZE,
+            max_attempts=config.SMS_DISPATCH_MAX_ATTEMPTS,
+            backoff_seconds=config.SMS_DISPATCH_BACKOFF_SECONDS,
+            on_status=self._record_sms_status
+        )
+        # Flask routes and blocking OTP store backends (sqlite, redis) run here
+        self.executor = ThreadPoolExecutor(
+            max_workers=config.ASGI_SYNC_THREADS,
+            thread_name_prefix='asgi-sync'
+        )
+        # The in-memory store only takes a lock, so it is called inline
+        self._otp_store_inline = isinstance(self.otp_storage, InMemoryOTPStore)
+        self._rate_limits_inline = all(
+            limiter is None or isinstance(limiter, InMemoryRateLimiter) for limiter in self.rate_limiters.values()
+        )
+        self.in_flight = 0
+        if config.METRICS_ENABLED:
+            metrics.registry.register_collector('db_async_pool', metrics.stats_collector(
+                'db_async_pool', self.db.pool_stats, counters=('checkouts', 'timeouts')
+            ))
+            metrics.registry.register_collector('sms_async_dispatch', metrics.stats_collector(
+                'sms_async_dispatch', self.sms_dispatcher.stats,
+                counters=('submitted', 'dropped', 'attempts', 'retries', STATUS_SENT, STATUS_FAILED, STATUS_TIMEOUT)
+            ))
+            metrics.registry.register_collector('sms_async_gateway', metrics.stats_collector(
+                'sms_async_gateway', self.sms_gateway.stats,
+                counters=('sends', 'timeouts', 'errors', 'connections_opened', 'requests')
+            ))
+        self.routes = {
+            ('GET', '/health'): self.health_check,
+            ('GET', '/health/async'): self.async_stats,
+            ('POST', '/api/login/generate-otp'): self.generate_otp,
+            ('GET', '/api/login/otp-status'): self.otp_status,
+            ('POST', '/api/login/verify-otp'): self.verify_otp,
+            ('GET', '/api/profile'): self.get_profile,
+        }
+
+    async def __call__(self, scope: dict, receive, send) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        self.in_flight += 1
+        try:
+            handler = self.routes.get((scope['method'], scope['path']))
+            if handler is None:
+                await self._call_flask(scope, receive, send)
+                return
+            endpoint = handler.__name__
+            log_token = bind_request(endpoint)
+            # Same metrics as the request hooks in create_app record for Flask routes
+            in_flight_gauge = metrics.HTTP_IN_FLIGHT.labels(endpoint) if self.config.METRICS_ENABLED else None
+            if in_flight_gauge is not None:
+                in_flight_gauge.inc()
+            started = time.perf_counter()
+            try:
+                request = AsgiRequest(scope, await self._read_body(receive))
+                status, payload, headers = await handler(request)
+                await self._send_json(send, request, status, payload, headers)
+                if in_flight_gauge is not None:
+                    metrics.observe_request(endpoint, scope['method'], status, time.perf_counter() - started)
+            finally:
+                if in_flight_gauge is not None:
+                    in_flight_gauge.dec()
+                unbind_request(log_token)
+        finally:
+            self.in_flight -= 1
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def close(self) -> None:
+        """Finish queued SMS, then close connections and the thread pool."""
+        await self.sms_dispatcher.stop()
+        await self.sms_gateway.close()
+        await self.db.close()
+        self.executor.shutdown(wait=False)
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] != 'http.request':
+                break
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        return b''.join(chunks)
+
+    def _mimetype(self, request: AsgiRequest) -> str:
+        """Body format for a request (same negotiation as FastJSONProvider)."""
+        return negotiate_mimetype(request.headers.get('accept'), offered_mimetypes(self.config.RESPONSE_MSGPACK))
+
+    async def _send_json(self, send, request: AsgiRequest, status: int, payload, headers: Optional[dict]) -> None:
+        # ETags in ``headers`` are already per representation (see get_profile)
+        response_headers = []
+        headers = dict(headers or {})
+        # Same negotiation as FastJSONProvider and compress_response in create_app
+        offered = offered_mimetypes(self.config.RESPONSE_MSGPACK)
+        vary = ['Accept'] if len(offered) > 1 else []
+        if status == 304:
+            body = b''
+        else:
+            mimetype = negotiate_mimetype(request.headers.get('accept'), offered)
+            if mimetype == MSGPACK_MIMETYPE:
+                body = pack_msgpack(payload, self.flask_app.json.default)
+            else:
+                body = self.flask_app.json.dumps_bytes(payload) + b'\n'
+            if self.config.RESPONSE_COMPRESSION:
+                vary.append('Accept-Encoding')
+                body, coding = compress_response_body(body, mimetype, request.headers.get('accept-encoding'), self.config)
+                if coding is not None:
+                    response_headers.append((b'content-encoding', coding.encode('latin-1')))
+                    if 'ETag' in headers:
+                        headers['ETag'] = encoded_etag(headers['ETag'], coding)
+            response_headers.append((b'content-type', mimetype.encode('latin-1')))
+            response_headers.append((b'content-length', str(len(body)).encode('latin-1')))
+        if vary:
+            response_headers.append((b'vary', ', '.join(vary).encode('latin-1')))
+        if 'origin' in request.headers:
+            # Same policy as flask_cors in create_app (all origins)
+            response_headers.append((b'access-control-allow-origin', b'*'))
+        for name, value in headers.items():
+            response_headers.append((name.lower().encode('latin-1'), value.encode('latin-1')))
+        await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _blocking(self, function, *args):
+        """Call a blocking function off the event loop (inline for cheap in-memory calls)."""
+        if self._otp_store_inline:
+            return function(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    def _record_sms_status(self, job) -> None:
+        """Write the delivery status back to the OTP record it belongs to."""
+        # Skipped by the store if the OTP has since been replaced or consumed
+        args = (job.mobile_number, job.otp, {'sms_status': job.status})
+        if self._otp_store_inline:
+            self.otp_storage.update(*args)
+        else:
+            self.executor.submit(self.otp_storage.update, *args)
+
+    async def _call_flask(self, scope: dict, receive, send) -> None:
+        """Serve the request with the Flask app on the thread pool."""
+        loop = asyncio.get_running_loop()
+        environ = self._wsgi_environ(scope, receive, loop)
+        response_started = []
+
+        def send_sync(message: dict) -> None:
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def run() -> None:
+            start = {}
+
+            def start_response(status, headers, exc_info=None):
+                if exc_info and response_started:
+                    raise exc_info[1].with_traceback(exc_info[2])
+                start['status'] = int(status.split(' ', 1)[0])
+                start['headers'] = [
+                    (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+                ]
+                return lambda data: send_chunk(data)
+
+            def send_chunk(data: bytes) -> None:
+                if not response_started:
+                    send_sync({'type': 'http.response.start', **start})
+                    response_started.append(True)
+                if data:
+                    send_sync({'type': 'http.response.body', 'body': data, 'more_body': True})
+
+            result = self.flask_app.wsgi_app(environ, start_response)
+            try:
+                for data in result:
+                    send_chunk(data)
+                send_chunk(b'')
+                send_sync({'type': 'http.response.body', 'body': b''})
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+
+        try:
+            await loop.run_in_executor(self.executor, run)
+        except Exception as e:
+            logger.exception("Error serving %s %s: %s", scope['method'], scope['path'], e)
+            if not response_started:
+                body = b'{"message":"Internal server error","status":"error"}\n'
+                await send({'type': 'http.response.start', 'status': 500, 'headers': [
+                    (b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode('latin-1')),
+                ]})
+                await send({'type': 'http.response.body', 'body': body})
+
+    @staticmethod
+    def _wsgi_environ(scope: dict, receive, loop: asyncio.AbstractEventLoop) -> dict:
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': str(server[0]),
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': str(client[0]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BufferedReader(_RequestBody(receive, loop)),
+            # Read until the body ends even without a Content-Length (chunked uploads)
+            'wsgi.input_terminated': True,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', ()):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+                key = name
+            else:
+                key = f'HTTP_{name}'
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    async def health_check(self, request: AsgiRequest) -> tuple:
+        return 200, {
+            'status': 'healthy',
+            'message': 'Flask backend is running'
+        }, None
+
+    async def async_stats(self, request: AsgiRequest) -> tuple:
+        return 200, {
+            'status': 'success',
+            'data': {
+                'inFlightRequests': self.in_flight,
+                'dbPool': self.db.pool_stats(),
+                'smsDispatch': self.sms_dispatcher.stats(),
+                'smsGateway': self.sms_gateway.stats(),
+            }
+        }, None
+
+    async def otp_rate_limited(self, request: AsgiRequest, mobile_number: str) -> None:
+        """Async counterpart of otp_rate_limited in create_app (raises the 429 LoginError)."""
+        client = client_address(
+            request.client, request.headers.get('x-forwarded-for'), self.config.RATE_LIMIT_TRUSTED_PROXIES
+        )
+        checks = (
+            (self.rate_limiters['otp_client'], client),
+            (self.rate_limiters['otp_mobile'], mobile_number),
+        )
+        if self._rate_limits_inline:
+            limit, retry_after = check_limits(checks)
+        else:
+            limit, retry_after = await asyncio.get_running_loop().run_in_executor(self.executor, check_limits, checks)
+        if limit is None:
+            return
+        if self.config.METRICS_ENABLED:
+            metrics.RATE_LIMITED.labels(limit).inc()
+        raise too_many_requests(retry_after)
+
+    async def fetch_customer(self, customer_id):
+        """Read one customer row from the database (None if not found)."""
+        result = await self.db.execute_named(CUSTOMER_BY_ID, (customer_id,))
+        return result[0] if result else None
+
+    async def generate_otp(self, request: AsgiRequest) -> tuple:
+        """Async counterpart of the /api/login/generate-otp route."""
+        try:
+            mobile_number = parse_generate_request(request.get_json())
+            await self.otp_rate_limited(request, mobile_number)
+
+            customer_result = await self.db.execute_named(CUSTOMER_BY_MOBILE, (mobile_number,))
+            if not customer_result and self.config.MOBILE_LOOKUP_FALLBACK:
+                customer_result = await self.db.execute_query(
+                    CUSTOMER_BY_MOBILE_LEGACY.sql,
+                    legacy_contact_formats(mobile_number),
+                    read_only=True
+                )
+
+            customer = approved_customer(customer_result)
+            otp = new_otp()
+
+            # The OTP itself is never logged
+            logger.info("OTP generated", extra={
+                'mobile': mobile_number,
+                'customer_id': customer.get('customer_id')
+            })
+
+            expires_at = await self._blocking(self.otp_storage.set, mobile_number, otp_record(otp, customer))
+            job = self.sms_dispatcher.submit(mobile_number, otp, expires_at.timestamp())
+            return 200, generate_response(mobile_number, otp, job.status, self.config.FLASK_DEBUG), None
+
+        except LoginError as e:
+            return e.status, e.payload, e.headers
+        except Exception as e:
+            logger.exception("Error in generate_otp: %s", e)
+            return 500, {
+                'status': 'error',
+                'message': f'Failed to generate OTP: {str(e)}'
+            }, None
+
+    async def otp_status(self, request: AsgiRequest) -> tuple:
+        """Async counterpart of the /api/login/otp-status route."""
+        try:
+            mobile_number = parse_status_request(request.args)
+            record = await self._blocking(self.otp_storage.get, mobile_number)
+            return 200, status_response(mobile_number, record), None
+
+        except LoginError as e:
+            return e.status, e.payload, e.headers
+        except Exception as e:
+            logger.exception("Error in otp_status: %s", e)
+            return 500, {
+                'status': 'error',
+                'message': f'Failed to fetch OTP status: {str(e)}'
+            }, None
+
+    async def verify_otp(self, request: AsgiRequest) -> tuple:
+        """Async counterpart of the /api/login/verify-otp route."""
+        try:
+            mobile_number, otp = parse_verify_request(request.get_json())
+
+            stored_otp_data = await self._blocking(self.otp_storage.get, mobile_number)
+            if otp_expired(stored_otp_data):
+                await self._blocking(self.otp_storage.delete, mobile_number)
+            check_otp(stored_otp_data, otp)
+
+            # Consumed atomically so a concurrent request cannot reuse the OTP
+            customer_id = consumed_customer_id(
+                await self._blocking(self.otp_storage.consume, mobile_number, otp)
+            )
+
+            # Login always reads the current row and primes the cache
+            customer = await self.fetch_customer(customer_id)
+            response_body = verify_response(mobile_number, customer)
+            self.customer_cache.put(customer_id, customer)
+            return 200, response_body, None
+
+        except LoginError as e:
+            return e.status, e.payload, e.headers
+        except Exception as e:
+            logger.exception("Error in verify_otp: %s", e)
+            return 500, {
+                'status': 'error',
+                'message': f'Failed to verify OTP: {str(e)}'
+            }, None
+
+    async def get_profile(self, request: AsgiRequest) -> tuple:
+        """Async counterpart of the GET /api/profile route (with ETag support)."""
+        try:
+            customer_id = parse_profile_request(request.args)
+            customer = found_customer(await self.customer_cache.get_async(
+                customer_id, lambda: self.fetch_customer(customer_id)
+            ))
+
+            profile = profile_data(customer)
+            etag = representation_etag(
+                make_etag('profile', customer.get('updated_at'), *profile.values()), self._mimetype(request)
+            )
+            if etag_matches(etag, request.headers.get('if-none-match')):
+                return 304, None, etag_headers(etag)
+
+            return 200, {
+                'status': 'success',
+                'data': profile
+            }, etag_headers(etag)
+
+        except LoginError as e:
+            return e.status, e.payload, e.headers
+        except Exception as e:
+            logger.exception("Error in get_profile: %s", e)
+            return 500, {
+                'status': 'error',
+                'message': f'Failed to fetch profile: {str(e)}'
+            }, None
+
+
+def create_asgi_app(flask_app: Optional[Flask] = None) -> AsgiApp:
+    """
+    Create the ASGI application.
+
+    Args:
+        flask_app (Optional[Flask]): Flask app serving the remaining routes
+            (default: ``create_app()``)
+
+    Returns:
+        AsgiApp: ASGI callable
+    """
+    return AsgiApp(flask_app or create_app())
@@ -0,0 +1,320 @@
+"""
+Async database module.
+Non-blocking MySQL access for the ASGI app over mysql.connector.aio.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Optional, Union
+
+import mysql.connector.aio
+from mysql.connector import Error
+
+from config import Config
+from connection_pool import PoolTimeoutError
+from database import ADHOC_QUERY
+from metrics import DB_QUERY_ERRORS, DB_QUERY_LATENCY
+from query_stats import query_stats
+from queries import NamedQuery
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncConnectionPool:
+    """
+    Bounded pool of ``mysql.connector.aio`` connections.
+
+    Keeps up to ``pool_size`` idle connections and opens up to
+    ``max_overflow`` more under load. A coroutine that finds every
+    connection in use waits (without blocking the event loop) for up to
+    ``timeout`` seconds and then gets ``PoolTimeoutError``. Must be used
+    from a single event loop.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable],
+        pool_size: int = 10,
+        max_overflow: int = 20,
+        timeout: float = 5.0,
+        recycle: float = 3600.0,
+        reset_session: bool = True
+    ):
+        """
+        Initialize the pool (connections are opened on demand).
+
+        Args:
+            connect (Callable[[], Awaitable]): Opens one new connection
+            pool_size (int): Connections kept open when idle
+            max_overflow (int): Extra connections allowed under load
+            timeout (float): Seconds to wait for a free connection
+            recycle (float): Replace connections older than this many seconds (0 disables)
+            reset_session (bool): Reset session state of connections that ran writes
+        """
+        self._connect = connect
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.reset_session = reset_session
+        self._idle = deque()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._opened = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._waiting = 0
+
+    async def _acquire(self) -> tuple:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size + self.max_overflow)
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise PoolTimeoutError(
+                f"No database connection available within {self.timeout}s "
+                f"(pool_size={self.pool_size}, max_overflow={self.max_overflow})"
+            )
+        finally:
+            self._waiting -= 1
+
+        try:
+            while self._idle:
+                raw, created_at = self._idle.pop()
+                if self.recycle and time.time() - created_at > self.recycle:
+                    await self._discard(raw)
+                    continue
+                self._checkouts += 1
+                return raw, created_at
+            raw = await self._connect()
+            self._opened += 1
+            self._checkouts += 1
+            return raw, time.time()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def _discard(self, raw) -> None:
+        self._opened -= 1
+        try:
+            await raw.close()
+        except Exception:
+            pass
+
+    async def _release(self, raw, created_at: float, dirty: bool, broken: bool) -> None:
+        try:
+            if broken:
+                await self._discard(raw)
+                return
+            try:
+                # Never hand out a connection with an open transaction
+                if raw.in_transaction:
+                    await raw.rollback()
+                    dirty = True
+                if self.reset_session and dirty:
+                    await raw.reset_session()
+            except Error:
+                await self._discard(raw)
+                return
+            if len(self._idle) >= self.pool_size:
+                await self._discard(raw)
+            else:
+                self._idle.append((raw, created_at))
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def connection(self, read_only: bool = False) -> AsyncIterator:
+        """
+        Check out a connection for the duration of the block.
+
+        Args:
+            read_only (bool): The block does not change data or session state,
+                so the connection can skip the session reset when returned
+
+        Yields:
+            The raw ``mysql.connector.aio`` connection
+        """
+        raw, created_at = await self._acquire()
+        broken = False
+        try:
+            yield raw
+        except Error as e:
+            # Connection-level failures (lost server, protocol errors) leave
+            # the connection unusable; SQL errors do not
+            broken = e.errno is None or e.errno >= 2000
+            raise
+        except BaseException:
+            # Cancelled mid-statement: the protocol state is unknown
+            broken = True
+            raise
+        finally:
+            await self._release(raw, created_at, not read_only, broken)
+
+    def stats(self) -> dict:
+        """
+        Get live pool statistics.
+
+        Returns:
+            dict: Pool sizing, open/idle/in-use counts and wait counters
+        """
+        idle = len(self._idle)
+        return {
+            'pool_size': self.pool_size,
+            'max_overflow': self.max_overflow,
+            'open': self._opened,
+            'idle': idle,
+            'in_use': self._opened - idle,
+            'waiters': self._waiting,
+            'checkouts': self._checkouts,
+            'timeouts': self._timeouts,
+        }
+
+    async def close(self) -> None:
+        """Close idle connections."""
+        while self._idle:
+            raw, _ = self._idle.pop()
+            await self._discard(raw)
+
+
+class AsyncDatabase:
+    """
+    Async counterpart of ``Database`` for the ASGI app.
+
+    Statements run on a connection checked out for that statement only;
+    every statement commits on its own (autocommit). Create one instance per
+    event loop.
+    """
+
+    def __init__(self, config=None):
+        """
+        Initialize the manager (the pool is created on first use).
+
+        Args:
+            config: Config object (default: Config())
+        """
+        self._config = config or Config()
+        self._pool: Optional[AsyncConnectionPool] = None
+
+    async def _open_connection(self):
+        return await mysql.connector.aio.connect(
+            host=self._config.DB_HOST,
+            port=self._config.DB_PORT,
+            user=self._config.DB_USER,
+            password=self._config.DB_PASSWORD,
+            database=self._config.DB_NAME,
+            charset='utf8mb4',
+            collation='utf8mb4_unicode_ci',
+            autocommit=True,
+            ssl_disabled=self._config.DB_SSL_DISABLED
+        )
+
+    @property
+    def pool(self) -> AsyncConnectionPool:
+        if self._pool is None:
+            self._pool = AsyncConnectionPool(
+                self._open_connection,
+                pool_size=self._config.DB_ASYNC_POOL_SIZE,
+                max_overflow=self._config.DB_ASYNC_POOL_MAX_OVERFLOW,
+                timeout=self._config.DB_POOL_TIMEOUT,
+                recycle=self._config.DB_POOL_RECYCLE,
+                reset_session=self._config.DB_POOL_RESET_SESSION
+            )
+            logger.info(
+                "Async database connection pool created (size=%s, overflow=%s)",
+                self._config.DB_ASYNC_POOL_SIZE, self._config.DB_ASYNC_POOL_MAX_OVERFLOW
+            )
+        return self._pool
+
+    def pool_stats(self) -> dict:
+        """
+        Get live connection pool statistics.
+
+        Returns:
+            dict: Pool statistics (empty if the pool has not been created yet)
+        """
+        if self._pool is None:
+            return {}
+        return self._pool.stats()
+
+    async def execute_query(
+        self,
+        query: str,
+        params: Optional[tuple] = None,
+        fetch: bool = True,
+        read_only: bool = False
+    ) -> Union[list, int]:
+        """
+        Execute a database query.
+
+        Args:
+            query (str): SQL query to execute
+            params (Optional[tuple]): Query parameters for parameterized queries
+            fetch (bool): Whether to fetch results (for SELECT queries)
+            read_only (bool): Statement does not change data or session state
+
+        Returns:
+            Union[list, int]: Query results if fetch=True, otherwise the
+                number of affected rows
+        """
+        return await self._execute(query, params, fetch, read_only, ADHOC_QUERY)
+
+    async def _execute(
+        self,
+        query: str,
+        params: Optional[tuple],
+        fetch: bool,
+        read_only: bool,
+        name: str
+    ) -> Union[list, int]:
+        """Run one statement, timed under ``name``."""
+        try:
+            async with self.pool.connection(read_only=read_only) as connection:
+                cursor = await connection.cursor(dictionary=True)
+                started = time.perf_counter()
+                failed = True
+                try:
+                    await cursor.execute(query, params or ())
+                    result = await cursor.fetchall() if fetch else cursor.rowcount
+                    failed = False
+                    return result
+                finally:
+                    seconds = time.perf_counter() - started
+                    DB_QUERY_LATENCY.labels(name).observe(seconds)
+                    if self._config.DB_QUERY_STATS_ENABLED:
+                        # No EXPLAIN here: it would hold the connection longer
+                        query_stats.record(query, name, seconds, error=failed)
+                    await cursor.close()
+        except Error as e:
+            DB_QUERY_ERRORS.labels(name).inc()
+            logger.error("Error executing query: %s", e)
+            raise
+
+    async def execute_named(
+        self,
+        query: NamedQuery,
+        params: Optional[tuple] = None,
+        fetch: bool = True
+    ) -> Union[list, int]:
+        """
+        Execute a registered query (see queries.py).
+
+        Args:
+            query (NamedQuery): Registered query
+            params (Optional[tuple]): Query parameters
+            fetch (bool): Whether to fetch results (for SELECT queries)
+
+        Returns:
+            Union[list, int]: Query results if fetch=True, otherwise the
+                number of affected rows
+        """
+        return await self._execute(query.sql, params, fetch, query.read_only, query.name)
+
+    async def close(self) -> None:
+        """Close pooled connections."""
+        if self._pool is not None:
+            await self._pool.close()
@@ -0,0 +1,348 @@
+"""
+Async SMS module.
+Non-blocking PRP gateway client and OTP SMS dispatcher for the ASGI app.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from sms_dispatch import (
+    SMSJob, SMSRetryableError, STATUS_DROPPED, STATUS_FAILED, STATUS_RETRYING,
+    STATUS_SENDING, STATUS_SENT, STATUS_TIMEOUT
+)
+from metrics import SMS_SEND_LATENCY
+from sms_gateway import SEND_ERROR, delivery_status, otp_payload
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSMSGatewayClient:
+    """
+    asyncio client for the PRP ``SendSmsTemplateName`` endpoint.
+
+    Wraps an ``httpx.AsyncClient`` keeping up to ``pool_maxsize`` keep-alive
+    connections; callers beyond that wait for a free connection without
+    holding a thread. Must be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        sender_id: str,
+        template_name: str,
+        pool_maxsize: int = 10,
+        connect_timeout: float = 2.0,
+        read_timeout: float = 3.0
+    ):
+        """
+        Initialize the client.
+
+        Args:
+            api_key (str): PRP API key
+            base_url (str): PRP API base URL
+            sender_id (str): Registered sender ID
+            template_name (str): Registered OTP template name
+            pool_maxsize (int): Keep-alive connections kept to the gateway
+            connect_timeout (float): TCP/TLS connect timeout in seconds
+            read_timeout (float): Response read timeout in seconds
+        """
+        self.url = f"{base_url.rstrip('/')}/SendSmsTemplateName"
+        self.api_key = api_key
+        self.sender_id = sender_id
+        self.template_name = template_name
+        self.pool_maxsize = pool_maxsize
+        # No pool timeout: waiting for a free connection is bounded by the
+        # dispatcher's concurrency, not failed
+        self.timeout = httpx.Timeout(connect=connect_timeout, read=read_timeout, write=read_timeout, pool=None)
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sends = 0
+        self._timeouts = 0
+        self._errors = 0
+        self._connections_opened = 0
+        self._requests = 0
+
+    @classmethod
+    def from_config(cls, config) -> 'AsyncSMSGatewayClient':
+        """
+        Build a client from the PRP_* settings.
+
+        Args:
+            config: Config object
+
+        Returns:
+            AsyncSMSGatewayClient: Configured client
+        """
+        return cls(
+            api_key=config.PRP_API_KEY,
+            base_url=config.PRP_API_BASE_URL,
+            sender_id=config.PRP_SENDER_ID,
+            template_name=config.PRP_TEMPLATE_NAME,
+            pool_maxsize=config.PRP_POOL_MAXSIZE,
+            connect_timeout=config.PRP_CONNECT_TIMEOUT,
+            read_timeout=config.PRP_READ_TIMEOUT
+        )
+
+    def _session(self) -> httpx.AsyncClient:
+        """Return the client, creating it on the running loop on first use."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.pool_maxsize,
+                    max_keepalive_connections=self.pool_maxsize
+                ),
+                # PRP expects the key in a lowercase 'apikey' header
+                headers={'apikey': self.api_key}
+            )
+        return self._client
+
+    async def _trace(self, event: str, info: dict) -> None:
+        """httpcore trace hook counting connections opened and requests sent on them."""
+        if event == 'connection.connect_tcp.complete':
+            self._connections_opened += 1
+        elif event == 'http11.send_request_headers.started':
+            self._requests += 1
+
+    async def send_otp(self, mobile_number: str, otp: str) -> str:
+        """
+        Send one OTP SMS.
+
+        Args:
+            mobile_number (str): 10-digit mobile number
+            otp (str): OTP to deliver
+
+        Returns:
+            str: Final delivery status ('sent', 'failed' or 'timeout')
+
+        Raises:
+            SMSRetryableError: If the gateway cannot be reached (the request
+                was never sent) or returns a 5xx
+        """
+        payload = otp_payload(self.sender_id, self.template_name, mobile_number, otp)
+
+        self._sends += 1
+        started = time.perf_counter()
+        result = SEND_ERROR
+        try:
+            try:
+                response = await self._session().post(
+                    self.url, json=payload, extensions={'trace': self._trace}
+                )
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # Nothing reached the gateway, so retrying cannot double-send
+                self._errors += 1
+                raise SMSRetryableError(f"Could not connect to PRP API: {e!r}")
+            except httpx.TimeoutException:
+                self._timeouts += 1
+                logger.warning("PRP API timeout - SMS may still be delivered", extra={'mobile': mobile_number})
+                result = STATUS_TIMEOUT
+                return result
+            except httpx.TransportError:
+                # Reset or closed after the request went out: like a read
+                # timeout, the gateway may already have sent the SMS
+                self._errors += 1
+                logger.warning("PRP API connection lost - SMS may still be delivered", extra={'mobile': mobile_number})
+                result = STATUS_TIMEOUT
+                return result
+
+            logger.debug("PRP API response", extra={'status_code': response.status_code, 'response_body': response.text})
+            result = delivery_status(response.status_code, response.text)
+            return result
+        finally:
+            SMS_SEND_LATENCY.labels(result).observe(time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        """
+        Connection reuse metrics.
+
+        Returns:
+            dict: Same keys as SMSGatewayClient.stats()
+        """
+        return {
+            'sends': self._sends,
+            'timeouts': self._timeouts,
+            'errors': self._errors,
+            'connections_opened': self._connections_opened,
+            'requests': self._requests,
+            'reuse_ratio': (
+                (self._requests - self._connections_opened) / self._requests if self._requests else 0.0
+            ),
+        }
+
+    async def close(self) -> None:
+        """Close all pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class AsyncSMSDispatcher:
+    """
+    Background OTP SMS delivery on the event loop.
+
+    Same contract as ``SMSDispatcher`` (bounded backlog, ``max_attempts``
+    with exponential backoff, timeouts not retried, ``on_status`` callback),
+    but every job is a task instead of an entry in a thread pool's queue, so
+    thousands of slow sends cost memory rather than threads. ``concurrency``
+    caps the sends in flight at once.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, str], Awaitable[str]],
+        concurrency: int = 10,
+        max_queue: int = 1000,
+        max_attempts: int = 3,
+        backoff_seconds: float = 0.5,
+        backoff_max_seconds: float = 8.0,
+        on_status: Optional[Callable[[SMSJob], None]] = None
+    ):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            send (Callable): Coroutine function performing one delivery attempt
+            concurrency (int): Sends in flight at once
+            max_queue (int): Maximum number of jobs waiting to be sent
+            max_attempts (int): Delivery attempts per job, including the first
+            backoff_seconds (float): Delay before the first retry (doubles per retry)
+            backoff_max_seconds (float): Upper bound on the retry delay
+            on_status (Optional[Callable]): Called with the job on every status change
+        """
+        self._send = send
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self._on_status = on_status
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks = set()
+        self._waiting = 0
+        self._retrying = 0
+        self.counters = {
+            'submitted': 0,
+            'dropped': 0,
+            'attempts': 0,
+            'retries': 0,
+            STATUS_SENT: 0,
+            STATUS_FAILED: 0,
+            STATUS_TIMEOUT: 0,
+        }
+
+    def submit(self, mobile_number: str, otp: str, deadline: float) -> SMSJob:
+        """
+        Schedule an OTP SMS without waiting for it (call from the event loop).
+
+        Args:
+            mobile_number (str): 10-digit mobile number
+            otp (str): OTP to deliver
+            deadline (float): Epoch time after which delivery is pointless (OTP expiry)
+
+        Returns:
+            SMSJob: The scheduled job (status ``'dropped'`` if the backlog is full)
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        job = SMSJob(mobile_number, otp, deadline)
+        self.counters['submitted'] += 1
+        if self._waiting >= self.max_queue:
+            self.counters['dropped'] += 1
+            self._set_status(job, STATUS_DROPPED, 'Dispatch queue full')
+            return job
+        self._waiting += 1
+        task = asyncio.get_running_loop().create_task(self._deliver(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def _set_status(self, job: SMSJob, status: str, detail: Optional[str] = None) -> None:
+        job.status = status
+        job.detail = detail
+        if self._on_status:
+            try:
+                self._on_status(job)
+            except Exception as e:
+                logger.warning("SMS status callback failed: %s", e)
+
+    async def _deliver(self, job: SMSJob) -> None:
+        try:
+            while True:
+                async with self._slots:
+                    self._waiting -= 1
+                    delay = await self._attempt(job)
+                if delay is None:
+                    return
+                self._retrying += 1
+                try:
+                    await asyncio.sleep(delay)
+                finally:
+                    self._retrying -= 1
+                self._waiting += 1
+        except asyncio.CancelledError:
+            self._set_status(job, STATUS_DROPPED, 'Dispatcher stopped')
+            raise
+
+    async def _attempt(self, job: SMSJob) -> Optional[float]:
+        """Make one delivery attempt; returns the retry delay, or None when done."""
+        if time.time() >= job.deadline:
+            self.counters[STATUS_FAILED] += 1
+            self._set_status(job, STATUS_FAILED, 'OTP expired before delivery')
+            return None
+
+        job.attempts += 1
+        self.counters['attempts'] += 1
+        self._set_status(job, STATUS_SENDING)
+        try:
+            status = await self._send(job.mobile_number, job.otp)
+        except SMSRetryableError as e:
+            if job.attempts >= self.max_attempts:
+                self.counters[STATUS_FAILED] += 1
+                self._set_status(job, STATUS_FAILED, str(e))
+                return None
+            self.counters['retries'] += 1
+            self._set_status(job, STATUS_RETRYING, str(e))
+            return min(self.backoff_seconds * (2 ** (job.attempts - 1)), self.backoff_max_seconds)
+        except Exception as e:
+            status, error = STATUS_FAILED, str(e)
+        else:
+            error = None
+
+        if status not in (STATUS_SENT, STATUS_FAILED, STATUS_TIMEOUT):
+            status = STATUS_FAILED
+        self.counters[status] += 1
+        self._set_status(job, status, error)
+        return None
+
+    def stats(self) -> dict:
+        """
+        Snapshot of dispatcher counters and backlog.
+
+        Returns:
+            dict: Counters plus ``queued`` and ``pending_retries``
+        """
+        snapshot = dict(self.counters)
+        snapshot['queued'] = self._waiting
+        snapshot['pending_retries'] = self._retrying
+        return snapshot
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """
+        Wait for scheduled jobs, cancelling whatever is left after ``timeout``.
+
+        Args:
+            timeout (float): Seconds to wait
+        """
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
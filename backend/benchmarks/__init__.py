@@ -0,0 +1,4 @@
+"""
+Offline benchmarks for the backend.
+Run from the backend directory, e.g. ``python -m benchmarks.sms_gateway_bench``.
+"""
@@ -0,0 +1,191 @@
+"""
+Sync (Flask/WSGI) vs async (ASGI) serving benchmark.
+Runs the login flow (generate-otp + verify-otp) and profile reads against
+local MySQL and SendSmsTemplateName stand-ins with simulated latency.
+
+The sync app is driven from a fixed pool of threads, one request per
+thread, as a threaded WSGI server would; the async app runs every request
+as a task on one event loop, so its concurrency is bounded only by
+``--concurrency`` and the async connection pool. Prepared statements are
+off in both modes because the MySQL stand-in speaks the text protocol only.
+
+Usage:
+    python -m benchmarks.asgi_bench --requests 2000 --threads 16 --concurrency 1000 --db-latency-ms 5
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from standins import MySQLStandIn, SMSGatewayStandIn
+
+
+def _report(label: str, elapsed: float, samples: list, errors: int) -> None:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{label:<14} {len(samples) / elapsed:9.1f} req/s   "
+          f"p50 {statistics.median(samples) * 1000:8.2f} ms   p99 {p99 * 1000:8.2f} ms   errors {errors}")
+
+
+def _customers(count: int) -> list:
+    return [
+        {
+            'customer_id': str(1001 + i),
+            'customer_name': f'Bench Customer {i}',
+            'email': f'bench{i}@example.com',
+            'contact_no': f'+91{9000000000 + i}',
+            'mobile_normalized': str(9000000000 + i),
+            'address': 'MG Road',
+            'city': 'Bengaluru',
+            'state': 'Karnataka',
+            'est_waste_qty': '10',
+            'poc': None,
+            'user_type': 'Household',
+            'reference': None,
+            'status': 'APPROVED',
+            'latitude': None,
+            'longitude': None,
+            'created_at': None,
+            'updated_at': None,
+        }
+        for i in range(count)
+    ]
+
+
+def run_sync(flask_app, scenario: str, requests: int, threads: int, customers: int) -> tuple:
+    otp_storage = flask_app.extensions['otp_storage']
+
+    def one(i: int) -> tuple:
+        client = flask_app.test_client()
+        started = time.perf_counter()
+        if scenario == 'profile':
+            ok = client.get(f'/api/profile?customerId={1001 + i % customers}').status_code == 200
+        else:
+            mobile_number = str(9000000000 + i % customers)
+            ok = client.post('/api/login/generate-otp', json={'mobileNumber': mobile_number}).status_code == 200
+            record = otp_storage.get(mobile_number)
+            if ok and record is not None:
+                response = client.post('/api/login/verify-otp', json={
+                    'mobileNumber': mobile_number, 'otp': record['otp']
+                })
+                ok = response.status_code == 200
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+    return elapsed, [sample for sample, _ in results], sum(1 for _, ok in results if not ok)
+
+
+async def _asgi_request(app, method: str, path: str, body: dict = None) -> tuple:
+    path, _, query = path.partition('?')
+    payload = json.dumps(body).encode('utf-8') if body is not None else b''
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': query.encode('latin-1'),
+        'headers': [(b'content-type', b'application/json')], 'http_version': '1.1', 'scheme': 'http',
+    }
+    messages = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop() if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    status = sent[0]['status']
+    return status, b''.join(message.get('body', b'') for message in sent[1:])
+
+
+async def run_async(asgi_app, scenario: str, requests: int, concurrency: int, customers: int) -> tuple:
+    otp_storage = asgi_app.otp_storage
+    limit = asyncio.Semaphore(concurrency)
+    peak = 0
+
+    async def one(i: int) -> tuple:
+        nonlocal peak
+        async with limit:
+            started = time.perf_counter()
+            if scenario == 'profile':
+                status, _ = await _asgi_request(asgi_app, 'GET', f'/api/profile?customerId={1001 + i % customers}')
+                ok = status == 200
+            else:
+                mobile_number = str(9000000000 + i % customers)
+                status, _ = await _asgi_request(asgi_app, 'POST', '/api/login/generate-otp', {'mobileNumber': mobile_number})
+                peak = max(peak, asgi_app.in_flight)
+                record = otp_storage.get(mobile_number)
+                ok = status == 200 and record is not None
+                if ok:
+                    status, _ = await _asgi_request(asgi_app, 'POST', '/api/login/verify-otp', {
+                        'mobileNumber': mobile_number, 'otp': record['otp']
+                    })
+                    ok = status == 200
+            peak = max(peak, asgi_app.in_flight)
+            return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    await asgi_app.close()
+    return elapsed, [sample for sample, _ in results], sum(1 for _, ok in results if not ok), peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=16, help='Sync mode worker threads')
+    parser.add_argument('--concurrency', type=int, default=1000, help='Async mode requests in flight')
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--db-latency-ms', type=float, default=5.0, help='Simulated MySQL latency per statement')
+    parser.add_argument('--sms-latency-ms', type=float, default=50.0, help='Simulated gateway latency')
+    parser.add_argument('--scenario', choices=('login', 'profile', 'both'), default='both')
+    args = parser.parse_args()
+
+    mysql_server = MySQLStandIn(latency=args.db_latency_ms / 1000.0, customers=_customers(args.customers)).start()
+    sms_server = SMSGatewayStandIn(latency=args.sms_latency_ms / 1000.0).start()
+    host, port = mysql_server.address
+    Config.DB_HOST = host
+    Config.DB_PORT = port
+    Config.DB_SSL_DISABLED = True
+    Config.DB_PREPARED_STATEMENTS = False
+    Config.DB_MIGRATE_ON_STARTUP = False
+    Config.PRP_API_BASE_URL = sms_server.base_url
+    # Every profile read goes to the database
+    Config.CUSTOMER_CACHE_TTL_SECONDS = 0
+    Config.SMS_DISPATCH_QUEUE_SIZE = max(Config.SMS_DISPATCH_QUEUE_SIZE, args.requests)
+    # Silence per-request log records from the handlers
+    Config.LOG_LEVEL = 'WARNING'
+    # Every virtual user shares one client address
+    Config.RATE_LIMIT_ENABLED = False
+
+    # Imported after the settings above are in place
+    from app import create_app
+    from asgi import create_asgi_app
+
+    scenarios = ('login', 'profile') if args.scenario == 'both' else (args.scenario,)
+    print(f"Requests: {args.requests}  Sync threads: {args.threads}  Async concurrency: {args.concurrency}  "
+          f"DB latency: {args.db_latency_ms}ms  SMS latency: {args.sms_latency_ms}ms")
+    for scenario in scenarios:
+        flask_app = create_app()
+        sync_result = run_sync(flask_app, scenario, args.requests, args.threads, args.customers)
+        flask_app.extensions['sms_dispatcher'].stop()
+        asgi_app = create_asgi_app(create_app())
+        async_result = asyncio.run(
+            run_async(asgi_app, scenario, args.requests, args.concurrency, args.customers)
+        )
+        print(f"[{scenario}]")
+        _report('sync (WSGI)', *sync_result)
+        _report('async (ASGI)', *async_result[:3])
+        print(f"{'':<14} peak in-flight requests: {async_result[3]}")
+
+    mysql_server.shutdown()
+    sms_server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
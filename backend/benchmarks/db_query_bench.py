@@ -0,0 +1,89 @@
+"""
+Customer lookup benchmark: legacy execute_query path vs prepared read-only path.
+
+"before" replays what every customer read used to cost: text-protocol query,
+COMMIT after the SELECT and a session reset when the connection went back to
+the pool. "after" runs the registered CUSTOMER_BY_ID statement through
+``db.execute_named`` inside a request session, as the endpoints now do.
+
+Needs a reachable MySQL configured through the usual DB_* settings.
+
+Usage:
+    python -m benchmarks.db_query_bench --customer-id 1001 --iterations 2000
+"""
+import argparse
+import statistics
+import time
+
+import mysql.connector
+
+from config import Config
+from database import db
+from queries import CUSTOMER_BY_ID
+
+
+def _report(label: str, samples: list) -> None:
+    samples = sorted(samples)
+    total = sum(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{label:<8} {len(samples) / total:10.1f} lookups/s   "
+          f"p50 {statistics.median(samples) * 1000:7.3f} ms   p99 {p99 * 1000:7.3f} ms")
+
+
+def run_before(customer_id: str, iterations: int) -> list:
+    connection = mysql.connector.connect(
+        host=Config.DB_HOST,
+        port=Config.DB_PORT,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        database=Config.DB_NAME,
+        charset='utf8mb4',
+        collation='utf8mb4_unicode_ci',
+        autocommit=False
+    )
+    samples = []
+    try:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(CUSTOMER_BY_ID.sql, (customer_id,))
+            cursor.fetchall()
+            connection.commit()
+            cursor.close()
+            connection.reset_session()
+            samples.append(time.perf_counter() - started)
+    finally:
+        connection.close()
+    return samples
+
+
+def run_after(customer_id: str, iterations: int) -> list:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        token = db.begin_request()
+        try:
+            db.execute_named(CUSTOMER_BY_ID, (customer_id,))
+        finally:
+            db.end_request(token)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark customer-by-id lookups')
+    parser.add_argument('--customer-id', default='1001')
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    # Warm up both paths (connection setup, statement preparation)
+    run_before(args.customer_id, 10)
+    run_after(args.customer_id, 10)
+
+    print(f"CUSTOMER_BY_ID x {args.iterations} against {Config.DB_HOST}/{Config.DB_NAME}")
+    _report('before', run_before(args.customer_id, args.iterations))
+    _report('after', run_after(args.customer_id, args.iterations))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+"""
+End-to-end load test.
+Boots create_app() behind a threaded WSGI server against local MySQL and
+SendSmsTemplateName stand-ins and drives it over HTTP with virtual users
+running a weighted mix of journeys:
+
+    signup   POST /api/signup
+    login    POST /api/login/generate-otp, GET /api/login/otp-status
+             (until the SMS is sent), POST /api/login/verify-otp
+    browse   GET /api/notifications, GET /api/profile, PUT /api/profile/edit
+
+Per-endpoint p50/p95/p99 latency, throughput and error rate are printed
+and written as JSON so runs of two builds can be compared; ``--baseline``
+prints the change against an earlier result file. Prepared statements are
+off because the MySQL stand-in speaks the text protocol only.
+
+Usage:
+    python -m benchmarks.load_test --concurrency 32 --duration 30 --mix signup=1,login=3,browse=6 \\
+        --output load.json --baseline load-main.json
+"""
+import argparse
+import itertools
+import json
+import logging
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+from werkzeug.serving import make_server
+
+from benchmarks.asgi_bench import _customers
+from config import Config
+from sms_dispatch import STATUS_QUEUED, STATUS_RETRYING, STATUS_SENDING
+from standins import MySQLStandIn, SMSGatewayStandIn
+
+
+JOURNEYS = ('signup', 'login', 'browse')
+PERCENTILES = (50, 95, 99)
+
+
+def parse_mix(spec: str) -> dict:
+    """
+    Parse ``signup=1,login=3,browse=6`` into journey weights.
+
+    Args:
+        spec (str): Comma-separated ``journey=weight`` pairs
+
+    Returns:
+        dict: Weight per journey (journeys left out get 0)
+    """
+    weights = dict.fromkeys(JOURNEYS, 0.0)
+    for part in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, weight = part.partition('=')
+        if name not in weights:
+            raise argparse.ArgumentTypeError(f"Unknown journey '{name}' (expected one of {', '.join(JOURNEYS)})")
+        weights[name] = float(weight or 1)
+    if not any(weights.values()):
+        raise argparse.ArgumentTypeError('The mix needs at least one journey with a positive weight')
+    return weights
+
+
+class Recorder:
+    """Latency samples and failures per endpoint, shared by all virtual users."""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.recording = False
+        self._lock = threading.Lock()
+
+    def add(self, endpoint: str, seconds: float, ok: bool) -> None:
+        if not self.recording:
+            return
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        """Statistics per endpoint plus an ``all`` total (times in milliseconds)."""
+        with self._lock:
+            groups = {endpoint: list(samples) for endpoint, samples in self.samples.items()}
+            errors = dict(self.errors)
+        groups['all'] = [sample for samples in groups.values() for sample in samples]
+        errors['all'] = sum(errors.values())
+        return {endpoint: _stats(samples, errors.get(endpoint, 0), elapsed) for endpoint, samples in sorted(groups.items())}
+
+
+def _stats(samples: list, errors: int, elapsed: float) -> dict:
+    ordered = sorted(samples)
+    count = len(ordered)
+    stats = {
+        'count': count,
+        'errors': errors,
+        'error_rate': round(errors / count, 4) if count else 0.0,
+        'throughput_rps': round(count / elapsed, 2) if elapsed else 0.0,
+    }
+    for percentile in PERCENTILES:
+        value = ordered[min(count - 1, int(count * percentile / 100))] if count else 0.0
+        stats[f'p{percentile}_ms'] = round(value * 1000, 3)
+    return stats
+
+
+class VirtualUser:
+    """One simulated app user with its own HTTP connection."""
+
+    def __init__(self, base_url: str, recorder: Recorder, sms_server: SMSGatewayStandIn, customers: int,
+                 mobiles: itertools.count, otp_timeout: float):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.sms_server = sms_server
+        self.customers = customers
+        self.mobiles = mobiles
+        self.otp_timeout = otp_timeout
+        self.session = requests.Session()
+
+    def _call(self, endpoint: str, method: str, path: str, **kwargs) -> requests.Response:
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=30, **kwargs)
+        except requests.RequestException:
+            self.recorder.add(endpoint, time.perf_counter() - started, False)
+            return None
+        self.recorder.add(endpoint, time.perf_counter() - started, response.status_code < 400)
+        return response
+
+    def signup(self) -> None:
+        mobile_number = str(next(self.mobiles))
+        self._call('signup', 'POST', '/api/signup', json={
+            'fullName': f'Load Test {mobile_number}',
+            'email': f'load{mobile_number}@example.com',
+            'mobileNumber': mobile_number,
+            'houseNumber': '12',
+            'address': 'MG Road',
+            'city': 'Bengaluru',
+            'state': 'Karnataka',
+            'userType': 'Household',
+            'knowAboutUs': 'Friend',
+            'expectation': '15kgs',
+        })
+
+    def login(self) -> None:
+        mobile_number = str(9000000000 + random.randrange(self.customers))
+        response = self._call('generate_otp', 'POST', '/api/login/generate-otp', json={'mobileNumber': mobile_number})
+        if response is None or response.status_code != 200:
+            return
+        # Wait for the background dispatcher like the app does
+        deadline = time.monotonic() + self.otp_timeout
+        while True:
+            response = self._call('otp_status', 'GET', '/api/login/otp-status', params={'mobileNumber': mobile_number})
+            if response is None or response.status_code != 200:
+                return
+            if response.json()['data']['smsStatus'] not in (STATUS_QUEUED, STATUS_SENDING, STATUS_RETRYING):
+                break
+            if time.monotonic() > deadline:
+                self.recorder.add('otp_status', 0.0, False)
+                return
+            time.sleep(0.05)
+        otp = self.sms_server.last_otp(mobile_number)
+        self._call('verify_otp', 'POST', '/api/login/verify-otp', json={'mobileNumber': mobile_number, 'otp': otp})
+
+    def browse(self) -> None:
+        customer_id = str(1001 + random.randrange(self.customers))
+        self._call('notifications', 'GET', '/api/notifications', params={'customerId': customer_id})
+        self._call('get_profile', 'GET', '/api/profile', params={'customerId': customer_id})
+        self._call('edit_profile', 'PUT', '/api/profile/edit', json={
+            'customerId': customer_id,
+            'fullName': f'Load Test {customer_id}',
+            'city': random.choice(('Bengaluru', 'Mysuru', 'Chennai')),
+            'expectation': str(random.randint(5, 50)),
+        })
+
+    def run(self, weights: dict, stop: threading.Event) -> None:
+        names = [name for name in JOURNEYS if weights[name] > 0]
+        cumulative = list(itertools.accumulate(weights[name] for name in names))
+        while not stop.is_set():
+            getattr(self, random.choices(names, cum_weights=cumulative)[0])()
+        self.session.close()
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _print_table(endpoints: dict, baseline: dict = None) -> None:
+    print(f"{'endpoint':<16}{'count':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    for endpoint, stats in endpoints.items():
+        print(f"{endpoint:<16}{stats['count']:>8}{stats['throughput_rps']:>10.1f}{stats['p50_ms']:>10.2f}"
+              f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['error_rate']:>8.2%}")
+        previous = (baseline or {}).get(endpoint)
+        if previous:
+            deltas = []
+            for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+                if previous.get(key):
+                    deltas.append(f"{key} {(stats[key] - previous[key]) / previous[key]:+.1%}")
+            deltas.append(f"error_rate {stats['error_rate'] - previous.get('error_rate', 0.0):+.2%}")
+            print(f"{'':<16}vs baseline: {', '.join(deltas)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=16, help='Virtual users')
+    parser.add_argument('--duration', type=float, default=30.0, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=5.0, help='Seconds run before measuring')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('signup=1,login=3,browse=6'),
+                        help='Journey weights, e.g. signup=1,login=3,browse=6')
+    parser.add_argument('--customers', type=int, default=1000, help='Seeded approved customers')
+    parser.add_argument('--db-latency-ms', type=float, default=2.0, help='Simulated MySQL latency per statement')
+    parser.add_argument('--sms-latency-ms', type=float, default=50.0, help='Simulated gateway latency')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for the journey mix')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', help='Earlier --output file to compare against')
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    mysql_server = MySQLStandIn(latency=args.db_latency_ms / 1000.0, customers=_customers(args.customers)).start()
+    sms_server = SMSGatewayStandIn(latency=args.sms_latency_ms / 1000.0).start()
+    host, port = mysql_server.address
+    Config.DB_HOST = host
+    Config.DB_PORT = port
+    Config.DB_SSL_DISABLED = True
+    Config.DB_PREPARED_STATEMENTS = False
+    Config.DB_MIGRATE_ON_STARTUP = False
+    Config.PRP_API_BASE_URL = sms_server.base_url
+    Config.FLASK_DEBUG = False
+    Config.DB_POOL_SIZE = max(Config.DB_POOL_SIZE, args.concurrency)
+    # Every virtual user connects from 127.0.0.1 and logins reuse the seeded
+    # numbers, so the OTP rate limits would turn most logins into 429s
+    Config.RATE_LIMIT_ENABLED = False
+    # Silence per-request log records from the handlers
+    Config.LOG_LEVEL = 'WARNING'
+
+    # Imported after the settings above are in place
+    from app import create_app
+
+    flask_app = create_app()
+    # Access log lines would dominate the run's output
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    recorder = Recorder()
+    stop = threading.Event()
+    # Fresh numbers for signups, clear of the seeded 9000000000 range
+    mobiles = itertools.count(8000000000 + int(time.time()) % 100000 * 1000)
+    users = [
+        VirtualUser(base_url, recorder, sms_server, args.customers, mobiles, otp_timeout=10.0)
+        for _ in range(args.concurrency)
+    ]
+    threads = [threading.Thread(target=user.run, args=(args.mix, stop), daemon=True) for user in users]
+
+    print(f"Virtual users: {args.concurrency}  Duration: {args.duration}s (+{args.warmup}s warmup)  "
+          f"Mix: {', '.join(f'{name}={weight:g}' for name, weight in args.mix.items())}  "
+          f"DB latency: {args.db_latency_ms}ms  SMS latency: {args.sms_latency_ms}ms")
+    for thread in threads:
+        thread.start()
+    time.sleep(args.warmup)
+    recorder.recording = True
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    recorder.recording = False
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    result = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'settings': {
+            'concurrency': args.concurrency,
+            'duration_seconds': args.duration,
+            'warmup_seconds': args.warmup,
+            'mix': args.mix,
+            'customers': args.customers,
+            'db_latency_ms': args.db_latency_ms,
+            'sms_latency_ms': args.sms_latency_ms,
+        },
+        'elapsed_seconds': round(elapsed, 3),
+        'endpoints': recorder.summary(elapsed),
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle).get('endpoints')
+    _print_table(result['endpoints'], baseline)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(result, handle, indent=2)
+        print(f"Results written to {args.output}")
+
+    server.shutdown()
+    flask_app.extensions['sms_dispatcher'].stop()
+    mysql_server.shutdown()
+    sms_server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
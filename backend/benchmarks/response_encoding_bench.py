@@ -0,0 +1,111 @@
+"""
+Response encoding benchmark.
+Bytes on the wire and CPU time per response for the profile edit response
+and a 20-item notification page, comparing the previous encoding (the
+standard json provider, indented in debug mode) with the negotiated
+encodings in response_encoding.py.
+
+Usage:
+    python -m benchmarks.response_encoding_bench --iterations 2000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from config import Config
+from customers import profile_data
+import notifications
+import response_encoding
+from response_encoding import FastJSONProvider, compress, pack_msgpack
+
+
+def _customer(i: int) -> dict:
+    created_at = datetime(2026, 1, 1) + timedelta(days=i)
+    return {
+        'customer_id': str(1001 + i),
+        'customer_name': f'Bench Customer {i}',
+        'email': f'bench{i}@example.com',
+        'contact_no': f'+91{9000000000 + i}',
+        'poc': f'+91{8000000000 + i}',
+        'address': f'{i}, MG Road, Indiranagar',
+        'city': 'Bengaluru',
+        'state': 'Karnataka',
+        'pincode': '560038',
+        'est_waste_qty': Decimal(str(12.5 + i)),
+        'user_type': 'Household',
+        'reference': 'Friend',
+        'status': 'APPROVED',
+        'created_at': created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'updated_at': created_at.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def payloads() -> dict:
+    customer = _customer(0)
+    profile = {
+        'status': 'success',
+        'message': 'Profile updated successfully',
+        'data': profile_data(customer)
+    }
+    now = datetime(2026, 3, 1)
+    items = [item for batch in notifications.evaluate_batch([_customer(i) for i in range(5)], now) for item in batch]
+    page = {
+        'status': 'success',
+        'data': {
+            'notifications': items[:20],
+            'unreadCount': 12,
+            'nextCursor': 4711
+        }
+    }
+    return {'edit_profile': profile, 'notifications': page}
+
+
+def _time(function, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - started) / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    standard = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    gzip_level, brotli_quality = Config.RESPONSE_GZIP_LEVEL, Config.RESPONSE_BROTLI_QUALITY
+
+    encodings = [
+        ('json indented (before, debug)', lambda payload: f"{standard.dumps(payload, indent=2)}\n".encode('utf-8')),
+        ('json compact (before)', lambda payload: f"{standard.dumps(payload, separators=(',', ':'))}\n".encode('utf-8')),
+        ('json ' + ('orjson' if response_encoding.orjson else 'stdlib'), lambda payload: fast.dumps_bytes(payload) + b'\n'),
+    ]
+    if response_encoding.msgpack is not None:
+        encodings.append(('msgpack', lambda payload: pack_msgpack(payload, fast.default)))
+    codings = ['gzip'] + (['br'] if response_encoding.brotli is not None else [])
+
+    print(f"{'payload':<15}{'encoding':<32}{'bytes':>8}{'us/resp':>10}")
+    for name, payload in payloads().items():
+        for label, encode in encodings:
+            body = encode(payload)
+            seconds = _time(lambda: encode(payload), args.iterations)
+            print(f"{name:<15}{label:<32}{len(body):>8}{seconds * 1e6:>10.1f}")
+            if label.startswith('json indented'):
+                continue
+            for coding in codings:
+                compressed = compress(body, coding, gzip_level, brotli_quality)
+                seconds = _time(lambda: compress(encode(payload), coding, gzip_level, brotli_quality), args.iterations)
+                print(f"{'':<15}{'  + ' + coding:<32}{len(compressed):>8}{seconds * 1e6:>10.1f}")
+    missing = [module for module in ('orjson', 'msgpack', 'brotli') if getattr(response_encoding, module) is None]
+    if missing:
+        print(f"Not installed (skipped): {', '.join(missing)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+SMS gateway client benchmark.
+Compares per-request ``requests.post`` with the pooled SMSGatewayClient
+against the local SendSmsTemplateName stand-in.
+
+Usage:
+    python -m benchmarks.sms_gateway_bench --sends 2000 --threads 8
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from sms_gateway import SMSGatewayClient
+from standins import SMSGatewayStandIn
+
+
+def _run(send, sends: int, threads: int) -> float:
+    """Run ``sends`` calls of ``send`` on ``threads`` threads and return the elapsed seconds."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda i: send(f'9{i % 1000000000:09d}', '123456'), range(sends)))
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sends', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Simulated gateway latency')
+    args = parser.parse_args()
+
+    server = SMSGatewayStandIn(latency=args.latency_ms / 1000.0).start()
+    url = f'{server.base_url}/SendSmsTemplateName'
+
+    def bare_send(mobile_number: str, otp: str) -> None:
+        payload = {
+            'sender': 'OSGRCY',
+            'templateName': 'OSG_SMS_OTP',
+            'smsReciever': [{'mobileNo': f'91{mobile_number}', 'templateParams': otp}]
+        }
+        requests.post(url, json=payload, headers={'apikey': 'bench'}, timeout=3)
+
+    client = SMSGatewayClient(
+        api_key='bench',
+        base_url=server.base_url,
+        sender_id='OSGRCY',
+        template_name='OSG_SMS_OTP',
+        pool_maxsize=args.threads
+    )
+
+    bare_elapsed = _run(bare_send, args.sends, args.threads)
+    pooled_elapsed = _run(client.send_otp, args.sends, args.threads)
+
+    stats = client.stats()
+    print(f"Sends: {args.sends}  Threads: {args.threads}  Gateway latency: {args.latency_ms}ms")
+    print(f"requests.post (new connection): {args.sends / bare_elapsed:10.1f} sends/s")
+    print(f"SMSGatewayClient (pooled):      {args.sends / pooled_elapsed:10.1f} sends/s")
+    print(f"Connections opened: {stats['connections_opened']}  "
+          f"Requests: {stats['requests']}  Reuse ratio: {stats['reuse_ratio']:.3f}")
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Request validation benchmark.
+CPU time per payload for the signup and profile edit validation in
+customers.py, for a valid payload and for payloads failing one or every
+rule.
+
+Usage:
+    python -m benchmarks.validation_bench --iterations 100000
+"""
+import argparse
+import time
+
+from customers import ValidationError, parse_profile_edit, parse_signup
+
+
+SIGNUP = {
+    'fullName': 'Bench Customer',
+    'email': 'Bench@Example.com',
+    'mobileNumber': '9876543210',
+    'houseNumber': '12',
+    'address': 'MG Road, Indiranagar',
+    'city': 'Bengaluru',
+    'state': 'Karnataka',
+    'userType': 'Household Apartment',
+    'knowAboutUs': 'Friend',
+    'expectation': '23kgs',
+    'alternateContact': '9123456780',
+    'latitude': 12.9716,
+    'longitude': 77.5946,
+}
+
+PROFILE_EDIT = {
+    'customerId': '1001',
+    'fullName': 'Bench Customer',
+    'email': 'bench@example.com',
+    'city': 'Bengaluru',
+    'expectation': '30',
+    'alternateContact': '',
+    'latitude': '12.9716',
+}
+
+
+def cases() -> list:
+    invalid_mobile = dict(SIGNUP, mobileNumber='98765')
+    all_invalid = dict(
+        SIGNUP, fullName='', mobileNumber='98765', email='bench', expectation='none',
+        alternateContact='123', latitude='north'
+    )
+    return [
+        ('signup valid', parse_signup, SIGNUP),
+        ('signup invalid mobile', parse_signup, invalid_mobile),
+        ('signup all invalid', parse_signup, all_invalid),
+        ('profile edit valid', parse_profile_edit, PROFILE_EDIT),
+    ]
+
+
+def _time(function, payload: dict, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        try:
+            function(payload)
+        except ValidationError:
+            pass
+    return (time.perf_counter() - started) / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"{'payload':<25}{'us/payload':>12}")
+    for label, function, payload in cases():
+        seconds = _time(function, payload, args.iterations)
+        print(f"{label:<25}{seconds * 1e6:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+"""
+Bulk customer import module.
+Streams CSV / NDJSON rows through the signup rules and inserts them in
+batched multi-row statements, one transaction per chunk.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterable, Iterator, List, Tuple
+
+from mysql.connector import Error, errorcode
+
+from customers import ValidationError, parse_signup, insert_params, insert_query
+from database import db
+from id_allocator import IdAllocator
+
+
+CONTENT_TYPE_CSV = 'text/csv'
+CONTENT_TYPE_NDJSON = 'application/x-ndjson'
+SUPPORTED_CONTENT_TYPES = (CONTENT_TYPE_CSV, CONTENT_TYPE_NDJSON)
+
+
+def iter_rows(stream, content_type: str, encoding: str = 'utf-8-sig') -> Iterator[Tuple[int, object]]:
+    """
+    Read records one at a time from a binary stream.
+
+    CSV files need a header row with the signup field names (fullName,
+    email, mobileNumber, ...). NDJSON files carry one signup JSON object per
+    line; blank lines are skipped.
+
+    Args:
+        stream: Binary file-like object (e.g. ``request.stream``)
+        content_type (str): One of ``SUPPORTED_CONTENT_TYPES``
+        encoding (str): Text encoding of the upload
+
+    Yields:
+        Tuple[int, object]: Row number (1-based, data rows only) and either
+        the record dict or a ``ValidationError`` for an unreadable row
+    """
+    text = io.TextIOWrapper(stream, encoding=encoding, newline='')
+
+    if content_type == CONTENT_TYPE_CSV:
+        for row_number, record in enumerate(csv.DictReader(text), start=1):
+            yield row_number, record
+        return
+
+    row_number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            yield row_number, json.loads(line)
+        except ValueError:
+            yield row_number, ValidationError('Invalid JSON.')
+
+
+def _duplicate_message(error: Error) -> str:
+    """Same wording as the signup endpoint's 409 responses."""
+    error_msg = str(error).lower()
+    if 'email' in error_msg:
+        return 'An account with this email already exists.'
+    if 'mobile' in error_msg or 'phone' in error_msg:
+        return 'An account with this mobile number already exists.'
+    return 'Account already exists with these details.'
+
+
+class CustomerImporter:
+    """
+    Import customers from an iterable of records.
+
+    Rows are validated with ``parse_signup`` as they arrive and buffered up
+    to ``batch_size``; each full buffer is checked against existing customers
+    and written with one multi-row INSERT inside its own transaction. Only
+    the current buffer and the set of mobile numbers / emails already seen in
+    the file are kept in memory.
+    """
+
+    def __init__(
+        self,
+        allocator: IdAllocator,
+        batch_size: int = 500,
+        max_errors: int = 1000,
+        created_by: str = 'BULK_IMPORT'
+    ):
+        """
+        Initialize the importer.
+
+        Args:
+            allocator (IdAllocator): customer_id allocator
+            batch_size (int): Rows per INSERT statement and transaction
+            max_errors (int): Per-row errors kept for the report (all are counted)
+            created_by (str): Audit value for created_by / updated_by
+        """
+        self.allocator = allocator
+        self.batch_size = max(1, batch_size)
+        self.max_errors = max_errors
+        self.created_by = created_by
+
+        self.received = 0
+        self.imported = 0
+        self.failed = 0
+        self.batches = 0
+        self.errors: List[dict] = []
+        self._seen_mobiles = set()
+        self._seen_emails = set()
+        self._pending: List[Tuple[int, dict]] = []
+
+    def _error(self, row_number: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row_number, 'message': message})
+
+    def add(self, row_number: int, record) -> None:
+        """
+        Validate one record and queue it for insertion.
+
+        Args:
+            row_number (int): Position in the upload, used in error reports
+            record: Record dict, or a ``ValidationError`` from the reader
+        """
+        self.received += 1
+        try:
+            if isinstance(record, ValidationError):
+                raise record
+            customer = parse_signup(record)
+        except ValidationError as e:
+            self._error(row_number, str(e))
+            return
+
+        # Duplicates inside the upload never reach the database
+        if customer['mobile_normalized'] in self._seen_mobiles:
+            self._error(row_number, 'Mobile number appears more than once in this file.')
+            return
+        if customer['email'] in self._seen_emails:
+            self._error(row_number, 'Email appears more than once in this file.')
+            return
+        self._seen_mobiles.add(customer['mobile_normalized'])
+        self._seen_emails.add(customer['email'])
+
+        self._pending.append((row_number, customer))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def _existing(self, batch: List[Tuple[int, dict]]) -> Tuple[set, set]:
+        """Mobile numbers and emails in ``batch`` that already belong to a customer."""
+        mobiles = [customer['mobile_normalized'] for _, customer in batch]
+        emails = [customer['email'] for _, customer in batch]
+        rows = db.execute_query(
+            "SELECT mobile_normalized, email FROM b2c_customer_master "
+            f"WHERE mobile_normalized IN ({', '.join(['%s'] * len(mobiles))}) "
+            f"OR email IN ({', '.join(['%s'] * len(emails))})",
+            tuple(mobiles + emails),
+            read_only=True
+        ) or []
+        return (
+            {row['mobile_normalized'] for row in rows},
+            {(row['email'] or '').lower() for row in rows}
+        )
+
+    def flush(self) -> None:
+        """Write the buffered rows (one multi-row INSERT in one transaction)."""
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.batches += 1
+
+        existing_mobiles, existing_emails = self._existing(batch)
+        rows = []
+        for row_number, customer in batch:
+            if customer['mobile_normalized'] in existing_mobiles:
+                self._error(row_number, 'An account with this mobile number already exists.')
+            elif customer['email'] in existing_emails:
+                self._error(row_number, 'An account with this email already exists.')
+            else:
+                rows.append((row_number, customer))
+        if not rows:
+            return
+
+        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        customer_ids = self.allocator.next_ids(len(rows))
+        params = [
+            insert_params(customer, str(customer_id), self.created_by, current_time)
+            for (_, customer), customer_id in zip(rows, customer_ids)
+        ]
+
+        try:
+            with db.transaction():
+                db.execute_query(
+                    insert_query(len(params)),
+                    tuple(value for row in params for value in row),
+                    fetch=False
+                )
+            self.imported += len(params)
+            return
+        except Error:
+            # Retried below so the failure is pinned to the offending rows
+            pass
+
+        # Typically a concurrent signup took one of the numbers/emails since
+        # the check, or one row has a value the column rejects; insert row by
+        # row so only those rows fail
+        for (row_number, _), row in zip(rows, params):
+            try:
+                db.execute_query(insert_query(), row, fetch=False)
+                self.imported += 1
+            except Error as e:
+                if e.errno == errorcode.ER_DUP_ENTRY:
+                    self._error(row_number, _duplicate_message(e))
+                else:
+                    self._error(row_number, f'Failed to create account: {str(e)}')
+
+    def run(self, records: Iterable[Tuple[int, object]]) -> dict:
+        """
+        Import every record and return the summary.
+
+        Args:
+            records (Iterable[Tuple[int, object]]): Output of ``iter_rows``
+
+        Returns:
+            dict: Summary (see ``summary``)
+        """
+        for row_number, record in records:
+            self.add(row_number, record)
+        self.flush()
+        return self.summary()
+
+    def summary(self) -> dict:
+        """
+        Get the import report.
+
+        Returns:
+            dict: Counters and the first ``max_errors`` per-row errors
+        """
+        return {
+            'received': self.received,
+            'imported': self.imported,
+            'failed': self.failed,
+            'batches': self.batches,
+            'errors': self.errors,
+            'errorsTruncated': self.failed > len(self.errors)
+        }
@@ -17,6 +17,25 @@ class Config:
     FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
     FLASK_PORT = int(os.getenv('FLASK_PORT', 5000))
     
+    # Production server (serve.py)
+    # Workers: 0 sizes the pool from the CPU count (2 x CPUs + 1, capped by SERVER_MAX_WORKERS)
+    SERVER_BIND = os.getenv('SERVER_BIND', f"0.0.0.0:{FLASK_PORT}")
+    SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', 0))
+    SERVER_MAX_WORKERS = int(os.getenv('SERVER_MAX_WORKERS', 16))
+    SERVER_THREADS = int(os.getenv('SERVER_THREADS', 4))
+    # Recycle a worker after this many requests (0 disables); the jitter
+    # keeps workers from restarting at the same moment
+    SERVER_MAX_REQUESTS = int(os.getenv('SERVER_MAX_REQUESTS', 1000))
+    SERVER_MAX_REQUESTS_JITTER = int(os.getenv('SERVER_MAX_REQUESTS_JITTER', 100))
+    SERVER_TIMEOUT = int(os.getenv('SERVER_TIMEOUT', 30))
+    SERVER_GRACEFUL_TIMEOUT = int(os.getenv('SERVER_GRACEFUL_TIMEOUT', 30))
+    # Seconds an exiting worker spends finishing queued SMS and handing back
+    # its running push job (keep below SERVER_GRACEFUL_TIMEOUT)
+    SERVER_DRAIN_SECONDS = float(os.getenv('SERVER_DRAIN_SECONDS', 10))
+    SERVER_KEEPALIVE = int(os.getenv('SERVER_KEEPALIVE', 5))
+    # Serve asgi.py through uvicorn workers instead of WSGI threads
+    SERVER_ASGI = os.getenv('SERVER_ASGI', 'False').lower() == 'true'
+    
     # MySQL Database configuration
     DB_HOST = os.getenv('DB_HOST', 'localhost')
     DB_PORT = int(os.getenv('DB_PORT', 3306))
@@ -24,12 +43,166 @@ class Config:
     DB_PASSWORD = os.getenv('DB_PASSWORD', '')
     DB_NAME = os.getenv('DB_NAME', 'customer_app_db')
     
+    # Database connection pool configuration
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+    DB_POOL_RECYCLE = float(os.getenv('DB_POOL_RECYCLE', 3600))
+    DB_POOL_IDLE_TIMEOUT = float(os.getenv('DB_POOL_IDLE_TIMEOUT', 300))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'True').lower() == 'true'
+    DB_POOL_RESET_SESSION = os.getenv('DB_POOL_RESET_SESSION', 'True').lower() == 'true'
+    # Connect without TLS (local servers that do not offer it)
+    DB_SSL_DISABLED = os.getenv('DB_SSL_DISABLED', 'False').lower() == 'true'
+    # Async pool used by the ASGI app (asgi.py); one event loop multiplexes
+    # all requests over these connections
+    DB_ASYNC_POOL_SIZE = int(os.getenv('DB_ASYNC_POOL_SIZE', 20))
+    DB_ASYNC_POOL_MAX_OVERFLOW = int(os.getenv('DB_ASYNC_POOL_MAX_OVERFLOW', 30))
+    # Apply pending schema migrations (migrations.py) when the app starts;
+    # turn off when python -m tools.migrate runs as a deploy step instead
+    DB_MIGRATE_ON_STARTUP = os.getenv('DB_MIGRATE_ON_STARTUP', 'True').lower() == 'true'
+    # Run registered hot queries (queries.py) as cached prepared statements
+    DB_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', 'True').lower() == 'true'
+    
     # PRP SMS OTP Service Configuration
     PRP_API_KEY = os.getenv('PRP_API_KEY', '9n5ZIuuNKTkIGyJ')
     PRP_API_BASE_URL = os.getenv('PRP_API_BASE_URL', 'https://api.bulksmsadmin.com/BulkSMSapi/keyApiSendSMS')
     PRP_SENDER_ID = os.getenv('PRP_SENDER_ID', 'PRP***')
     PRP_TEMPLATE_NAME = os.getenv('PRP_TEMPLATE_NAME', 'OSG_SMS_OTP')
+    PRP_POOL_MAXSIZE = int(os.getenv('PRP_POOL_MAXSIZE', 10))
+    PRP_CONNECT_TIMEOUT = float(os.getenv('PRP_CONNECT_TIMEOUT', 2))
+    PRP_READ_TIMEOUT = float(os.getenv('PRP_READ_TIMEOUT', 3))
+    
+    # Fall back to the legacy contact_no scan when the indexed
+    # mobile_normalized lookup misses. Migration 6 fills the column for
+    # existing rows; this is for rows other systems insert without it
+    MOBILE_LOOKUP_FALLBACK = os.getenv('MOBILE_LOOKUP_FALLBACK', 'False').lower() == 'true'
+    
+    # customer_id values reserved per id_sequences round trip
+    CUSTOMER_ID_BLOCK_SIZE = int(os.getenv('CUSTOMER_ID_BLOCK_SIZE', 20))
+    
+    # Customer record cache (per worker process); edits made by another
+    # worker or outside the app show up after at most the TTL
+    CUSTOMER_CACHE_TTL_SECONDS = float(os.getenv('CUSTOMER_CACHE_TTL_SECONDS', 30))
+    CUSTOMER_CACHE_MAX_ENTRIES = int(os.getenv('CUSTOMER_CACHE_MAX_ENTRIES', 10000))
+    
+    # Notification feed pagination (/api/notifications)
+    NOTIFICATION_PAGE_SIZE = int(os.getenv('NOTIFICATION_PAGE_SIZE', 20))
+    NOTIFICATION_MAX_PAGE_SIZE = int(os.getenv('NOTIFICATION_MAX_PAGE_SIZE', 50))
+    # Customers loaded per IN (...) query by /api/notifications/batch
+    NOTIFICATION_BATCH_CHUNK_SIZE = int(os.getenv('NOTIFICATION_BATCH_CHUNK_SIZE', 500))
+    
+    # Push notification fan-out
+    # Provider: 'stub' (local, logs deliveries) until FCM/APNS credentials are wired in
+    PUSH_PROVIDER = os.getenv('PUSH_PROVIDER', 'stub')
+    PUSH_BATCH_SIZE = int(os.getenv('PUSH_BATCH_SIZE', 500))
+    PUSH_CONCURRENCY = int(os.getenv('PUSH_CONCURRENCY', 8))
+    PUSH_PAGE_SIZE = int(os.getenv('PUSH_PAGE_SIZE', 1000))
+    # Jobs are stored in push_jobs; queued jobs beyond this are refused (503)
+    PUSH_MAX_QUEUED = int(os.getenv('PUSH_MAX_QUEUED', 20))
+    # A running job not checkpointed for this long is taken over by another worker
+    PUSH_LEASE_SECONDS = float(os.getenv('PUSH_LEASE_SECONDS', 120))
+    PUSH_POLL_SECONDS = float(os.getenv('PUSH_POLL_SECONDS', 5))
+    PUSH_JOB_RETENTION_DAYS = float(os.getenv('PUSH_JOB_RETENTION_DAYS', 7))
+    
+    # Bulk customer import (/api/customers/bulk-import)
+    # Shared secret sent as X-Admin-Token; the endpoint is disabled when unset
+    ADMIN_API_TOKEN = os.getenv('ADMIN_API_TOKEN', '')
+    BULK_IMPORT_BATCH_SIZE = int(os.getenv('BULK_IMPORT_BATCH_SIZE', 500))
+    BULK_IMPORT_MAX_ERRORS = int(os.getenv('BULK_IMPORT_MAX_ERRORS', 1000))
+    
+    # OTP storage configuration
+    # Backend: 'memory' (single process), 'sqlite' (shared file) or 'redis'
+    # (serve.py with several workers defaults to 'sqlite')
+    OTP_STORE_BACKEND = os.getenv('OTP_STORE_BACKEND', 'memory')
+    OTP_STORE_PATH = os.getenv('OTP_STORE_PATH', '/dev/shm/customer_app_otp.sqlite3')
+    OTP_REDIS_URL = os.getenv('OTP_REDIS_URL', 'redis://localhost:6379/0')
+    OTP_STORE_MAX_ENTRIES = int(os.getenv('OTP_STORE_MAX_ENTRIES', 100000))
+    OTP_TTL_SECONDS = int(os.getenv('OTP_TTL_SECONDS', 300))
     
+    # Rate limits on OTP generation (/api/login/generate-otp, /api/test-otp),
+    # applied before any database or SMS work; written as requests/seconds
+    # (e.g. '5/600' = bursts of 5, then one every 2 minutes), '0' disables
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+    RATE_LIMIT_OTP_PER_MOBILE = os.getenv('RATE_LIMIT_OTP_PER_MOBILE', '5/600')
+    RATE_LIMIT_OTP_PER_CLIENT = os.getenv('RATE_LIMIT_OTP_PER_CLIENT', '30/60')
+    # Backend: 'memory' (per process), 'sqlite' (shared file) or 'redis'
+    # (serve.py with several workers defaults to 'sqlite')
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_STORE_PATH = os.getenv('RATE_LIMIT_STORE_PATH', '/dev/shm/customer_app_rate_limits.sqlite3')
+    RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL', OTP_REDIS_URL)
+    RATE_LIMIT_MAX_ENTRIES = int(os.getenv('RATE_LIMIT_MAX_ENTRIES', 100000))
+    # Proxies in front of the app that append to X-Forwarded-For; the client
+    # address is taken that many entries from the end (0 uses the peer address)
+    RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv('RATE_LIMIT_TRUSTED_PROXIES', 0))
+    
+    # Idempotency-Key support on /api/signup and /api/profile/edit:
+    # successful responses are replayed to retries with the same key for the
+    # TTL; 0 disables it. A retry arriving while the original still runs
+    # waits up to IDEMPOTENCY_WAIT_SECONDS for it
+    IDEMPOTENCY_TTL_SECONDS = float(os.getenv('IDEMPOTENCY_TTL_SECONDS', 86400))
+    IDEMPOTENCY_MAX_ENTRIES = int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', 10000))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.getenv('IDEMPOTENCY_WAIT_SECONDS', 10))
+    # Backend: 'memory' (per process), 'sqlite' (shared file) or 'redis'
+    # (serve.py with several workers defaults to 'sqlite')
+    IDEMPOTENCY_BACKEND = os.getenv('IDEMPOTENCY_BACKEND', 'memory')
+    IDEMPOTENCY_STORE_PATH = os.getenv('IDEMPOTENCY_STORE_PATH', '/dev/shm/customer_app_idempotency.sqlite3')
+    IDEMPOTENCY_REDIS_URL = os.getenv('IDEMPOTENCY_REDIS_URL', OTP_REDIS_URL)
+    # A shared claim whose worker died is released after this long
+    IDEMPOTENCY_LOCK_SECONDS = float(os.getenv('IDEMPOTENCY_LOCK_SECONDS', 60))
+    
+    # Background SMS dispatch configuration
+    SMS_DISPATCH_WORKERS = int(os.getenv('SMS_DISPATCH_WORKERS', 4))
+    SMS_DISPATCH_QUEUE_SIZE = int(os.getenv('SMS_DISPATCH_QUEUE_SIZE', 1000))
+    SMS_DISPATCH_MAX_ATTEMPTS = int(os.getenv('SMS_DISPATCH_MAX_ATTEMPTS', 3))
+    SMS_DISPATCH_BACKOFF_SECONDS = float(os.getenv('SMS_DISPATCH_BACKOFF_SECONDS', 0.5))
+    
+    # ASGI serving mode (asgi.py): endpoints without an async handler run on
+    # the Flask app in this many threads
+    ASGI_SYNC_THREADS = int(os.getenv('ASGI_SYNC_THREADS', 16))
+
+    # Logging (app_logging.py): records are written to stdout by a
+    # background thread; when LOG_QUEUE_SIZE records are waiting, new ones
+    # are dropped instead of blocking the request
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    # 'json' (one object per line) or 'text'
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    # Fraction of INFO/DEBUG records kept per endpoint, e.g.
+    # 'generate_otp=0.1,get_profile=0.01' (warnings and errors are always kept)
+    LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', '')
+    # Strip OTPs and mask phone numbers (last 4 digits kept)
+    LOG_REDACT = os.getenv('LOG_REDACT', 'True').lower() == 'true'
+
+    # Response encoding (response_encoding.py): bodies of at least
+    # RESPONSE_COMPRESSION_MIN_BYTES are brotli- or gzip-compressed for
+    # clients that send Accept-Encoding
+    RESPONSE_COMPRESSION = os.getenv('RESPONSE_COMPRESSION', 'True').lower() == 'true'
+    RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESSION_MIN_BYTES', 1024))
+    RESPONSE_GZIP_LEVEL = int(os.getenv('RESPONSE_GZIP_LEVEL', 6))
+    RESPONSE_BROTLI_QUALITY = int(os.getenv('RESPONSE_BROTLI_QUALITY', 4))
+    # Answer 'Accept: application/msgpack' with MessagePack (needs msgpack installed)
+    RESPONSE_MSGPACK = os.getenv('RESPONSE_MSGPACK', 'True').lower() == 'true'
+
+    # Request, database and SMS metrics served at /metrics
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    # Backend: 'memory' (the process serving the scrape) or 'sqlite' (summed
+    # over the workers on one host through a shared file)
+    # (serve.py with several workers defaults to 'sqlite')
+    METRICS_BACKEND = os.getenv('METRICS_BACKEND', 'memory')
+    METRICS_STORE_PATH = os.getenv('METRICS_STORE_PATH', '/dev/shm/customer_app_metrics.sqlite3')
+    # Seconds between each worker's snapshots to the shared file
+    METRICS_PUBLISH_SECONDS = float(os.getenv('METRICS_PUBLISH_SECONDS', 5))
+
+    # Per-statement statistics (/api/admin/query-stats) and slow-query log
+    DB_QUERY_STATS_ENABLED = os.getenv('DB_QUERY_STATS_ENABLED', 'True').lower() == 'true'
+    # Recent executions per statement used for p50/p99
+    DB_QUERY_STATS_WINDOW = int(os.getenv('DB_QUERY_STATS_WINDOW', 1000))
+    DB_QUERY_STATS_MAX_FINGERPRINTS = int(os.getenv('DB_QUERY_STATS_MAX_FINGERPRINTS', 1000))
+    # Statements slower than this are logged (logger 'slow_query'); 0 disables
+    DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 200))
+    # Add EXPLAIN output to slow SELECTs (at most once a minute per statement)
+    DB_SLOW_QUERY_EXPLAIN = os.getenv('DB_SLOW_QUERY_EXPLAIN', 'False').lower() == 'true'
+
     @property
     def database_url(self) -> str:
         """
@@ -0,0 +1,283 @@
+"""
+Database connection pool module.
+Bounded MySQL connection pool with overflow, checkout wait timeouts,
+connection recycling, liveness pre-ping and live statistics.
+"""
+import bisect
+import threading
+import time
+from typing import Callable
+
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+
+# Upper bounds (milliseconds) of the checkout wait-time histogram buckets
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolTimeoutError(PoolError):
+    """Raised when no connection became available within the checkout timeout."""
+
+
+class PooledConnection:
+    """
+    Checked-out pool connection.
+
+    Proxies every attribute to the underlying MySQL connection; ``close()``
+    hands the connection back to the pool instead of closing it.
+
+    ``statements`` caches prepared-statement cursors by name for the life of
+    the server session. Set ``dirty`` after anything that may change session
+    state (writes, transactions); clean connections skip the session reset.
+    """
+
+    def __init__(self, pool: 'ConnectionPool', raw, created_at: float, statements: dict):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._returned = False
+        self.statements = statements
+        self.dirty = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self) -> None:
+        """Return the connection to the pool (idempotent)."""
+        if not self._returned:
+            self._returned = True
+            self._pool._release(self._raw, self._created_at, self.statements, self.dirty)
+
+
+class ConnectionPool:
+    """
+    Thread-safe connection pool.
+
+    Keeps up to ``pool_size`` idle connections and opens at most
+    ``max_overflow`` extra ones under bursts (closed again when returned).
+    When every connection is in use, callers wait up to ``timeout`` seconds
+    for one to be returned before ``PoolTimeoutError`` is raised.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], object],
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        timeout: float = 5.0,
+        recycle: float = 3600.0,
+        idle_timeout: float = 300.0,
+        pre_ping: bool = True,
+        reset_session: bool = True
+    ):
+        """
+        Initialize the pool (connections are opened on demand).
+
+        Args:
+            connect (Callable): Opens a new MySQL connection
+            pool_size (int): Connections kept open when idle
+            max_overflow (int): Extra connections allowed under load
+            timeout (float): Seconds to wait for a free connection
+            recycle (float): Close connections older than this many seconds (0 disables)
+            idle_timeout (float): Close connections idle longer than this many seconds (0 disables)
+            pre_ping (bool): Check liveness of connections idle longer than a second
+            reset_session (bool): Reset session state when a dirty connection is returned
+        """
+        self._connect = connect
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.idle_timeout = idle_timeout
+        self.pre_ping = pre_ping
+        self.reset_session = reset_session
+
+        # Idle connections as (raw, created_at, idle_since, statements), most recent last
+        self._idle = []
+        self._opened = 0
+        self._waiters = 0
+        self._cond = threading.Condition()
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self._ping_failures = 0
+        self._wait_counts = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._wait_total = 0.0
+
+    def get_connection(self) -> PooledConnection:
+        """
+        Check out a connection, waiting up to ``timeout`` if the pool is exhausted.
+
+        Returns:
+            PooledConnection: Connection to return with ``close()``
+
+        Raises:
+            PoolTimeoutError: If no connection became available in time
+            Error: If opening a new connection fails
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            raw = None
+            with self._cond:
+                while True:
+                    if self._idle:
+                        raw, created_at, idle_since, statements = self._idle.pop()
+                        break
+                    if self._opened < self.pool_size + self.max_overflow:
+                        self._opened += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        self._record_wait(time.monotonic() - started)
+                        raise PoolTimeoutError(
+                            f"No database connection available within {self.timeout}s "
+                            f"({self._opened} open, {self._waiters} waiting)"
+                        )
+                    self._waiters += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiters -= 1
+
+            if raw is None:
+                try:
+                    raw, created_at, statements = self._connect(), time.time(), {}
+                except Exception:
+                    self._discard(None)
+                    raise
+            elif not self._usable(raw, created_at, idle_since):
+                self._discard(raw)
+                continue
+
+            with self._cond:
+                self._checkouts += 1
+                self._record_wait(time.monotonic() - started)
+            return PooledConnection(self, raw, created_at, statements)
+
+    def _usable(self, raw, created_at: float, idle_since: float) -> bool:
+        """Recycle stale connections and pre-ping ones that sat idle."""
+        now = time.time()
+        if (self.recycle and now - created_at > self.recycle) or (
+            self.idle_timeout and now - idle_since > self.idle_timeout
+        ):
+            with self._cond:
+                self._recycled += 1
+            return False
+        if self.pre_ping and now - idle_since > 1.0:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                with self._cond:
+                    self._ping_failures += 1
+                return False
+        return True
+
+    def _record_wait(self, seconds: float) -> None:
+        """Add one checkout to the wait-time histogram (lock held)."""
+        self._wait_total += seconds
+        self._wait_counts[bisect.bisect_left(WAIT_BUCKETS_MS, seconds * 1000.0)] += 1
+
+    def _discard(self, raw) -> None:
+        """Close a connection and free its slot."""
+        if raw is not None:
+            try:
+                raw.close()
+            except Exception:
+                pass
+        with self._cond:
+            self._opened -= 1
+            self._cond.notify()
+
+    def _release(self, raw, created_at: float, statements: dict, dirty: bool) -> None:
+        """Take a connection back from a caller."""
+        try:
+            # Never hand out a connection with an open transaction
+            if raw.in_transaction:
+                raw.rollback()
+                dirty = True
+            if self.reset_session and dirty:
+                raw.reset_session()
+                # The reset deallocates the session's prepared statements
+                statements = {}
+        except Error:
+            self._discard(raw)
+            return
+
+        with self._cond:
+            if len(self._idle) >= self.pool_size:
+                overflow = True
+            else:
+                overflow = False
+                self._idle.append((raw, created_at, time.time(), statements))
+                self._cond.notify()
+        if overflow:
+            self._discard(raw)
+
+    def stats(self) -> dict:
+        """
+        Live pool statistics.
+
+        Returns:
+            dict: Connection counts, waiters, counters and the checkout
+            wait-time histogram (cumulative counts per ``le`` bucket in ms)
+        """
+        with self._cond:
+            idle = len(self._idle)
+            histogram = {}
+            cumulative = 0
+            for bound, count in zip(WAIT_BUCKETS_MS + ('+Inf',), self._wait_counts):
+                cumulative += count
+                histogram[str(bound)] = cumulative
+            return {
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'open': self._opened,
+                'in_use': self._opened - idle,
+                'idle': idle,
+                'waiters': self._waiters,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'recycled': self._recycled,
+                'ping_failures': self._ping_failures,
+                'wait_seconds_total': round(self._wait_total, 6),
+                'wait_ms_histogram': histogram,
+            }
+
+    def warm(self, count: int) -> int:
+        """
+        Open idle connections ahead of the first requests.
+
+        Args:
+            count (int): Idle connections wanted (capped at ``pool_size``)
+
+        Returns:
+            int: Number of connections opened
+        """
+        count = min(count, self.pool_size)
+        opened = 0
+        while True:
+            with self._cond:
+                if len(self._idle) >= count or self._opened >= self.pool_size + self.max_overflow:
+                    return opened
+                self._opened += 1
+            try:
+                raw = self._connect()
+            except Exception:
+                self._discard(None)
+                raise
+            now = time.time()
+            with self._cond:
+                self._idle.append((raw, now, now, {}))
+                self._cond.notify()
+            opened += 1
+
+    def close_idle(self) -> None:
+        """Close every idle connection (e.g. after fork or on shutdown)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for raw, _, _, _ in idle:
+            self._discard(raw)
@@ -0,0 +1,166 @@
+"""
+Customer record cache module.
+Process-local read-through cache of b2c_customer_master rows keyed by
+customer_id, with TTL expiry and LRU eviction.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+
+class CustomerCache:
+    """
+    Read-through cache for customer rows.
+
+    Entries expire ``ttl_seconds`` after they were loaded and the least
+    recently used entry is evicted once ``max_entries`` is reached. Writers
+    call ``invalidate`` (or ``put`` with the fresh row) after changing a
+    customer. Each worker process has its own cache, so a change made
+    through another process (or directly in MySQL) is visible here at most
+    ``ttl_seconds`` later.
+    """
+
+    def __init__(self, ttl_seconds: float = 30, max_entries: int = 10000):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl_seconds (float): Lifetime of an entry; 0 disables caching
+            max_entries (int): Maximum number of cached customers
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation so a load that raced with a write
+        # does not put the old row back
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def _store(self, key: str, row: dict) -> None:
+        """Insert or refresh an entry (lock held)."""
+        self._entries[key] = (dict(row), time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, customer_id, loader: Callable[[], Optional[dict]]) -> Optional[dict]:
+        """
+        Return the customer row, loading it on a miss.
+
+        Args:
+            customer_id: Customer ID (normalized to str)
+            loader (Callable[[], Optional[dict]]): Fetches the row from the
+                database; ``None`` (customer not found) is not cached
+
+        Returns:
+            Optional[dict]: A copy of the customer row, or None
+        """
+        key = str(customer_id)
+        row, generation = self._lookup(key)
+        if generation is None:
+            return row
+        row = loader()
+        self._fill(key, row, generation)
+        return row
+
+    async def get_async(self, customer_id, loader: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        """
+        ``get`` for a coroutine loader (used by the ASGI app).
+
+        Args:
+            customer_id: Customer ID (normalized to str)
+            loader (Callable[[], Awaitable[Optional[dict]]]): Fetches the row
+
+        Returns:
+            Optional[dict]: A copy of the customer row, or None
+        """
+        key = str(customer_id)
+        row, generation = self._lookup(key)
+        if generation is None:
+            return row
+        row = await loader()
+        self._fill(key, row, generation)
+        return row
+
+    def _lookup(self, key: str) -> tuple:
+        """Return (row copy, None) on a hit, or (None, generation) on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                row, expires_at = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(row), None
+                del self._entries[key]
+            self.misses += 1
+            return None, self._generation
+
+    def _fill(self, key: str, row: Optional[dict], generation: int) -> None:
+        """Cache a loaded row unless an invalidation happened while loading."""
+        if row is not None and self.enabled:
+            with self._lock:
+                if generation == self._generation:
+                    self._store(key, row)
+
+    def put(self, customer_id, row: dict) -> None:
+        """
+        Cache a row that was just read from the database.
+
+        Args:
+            customer_id: Customer ID
+            row (dict): Current customer row
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._store(str(customer_id), row)
+
+    def invalidate(self, customer_id) -> None:
+        """
+        Drop a customer after it was written.
+
+        Args:
+            customer_id: Customer ID
+        """
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._entries.pop(str(customer_id), None)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Get cache statistics.
+
+        Returns:
+            dict: Hit/miss counters, hit ratio and current size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
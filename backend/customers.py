@@ -0,0 +1,206 @@
+"""
+Customer signup rules module.
+Validation, normalization and insert statements shared by the signup and
+bulk import endpoints, and the profile shape returned to the app.
+"""
+from validation import (
+    EMPTY_NULL, Field, Schema, ValidationError, choice, digits, email, lower, number, prefix, quantity
+)
+
+
+# Map user_type from frontend to database enum values
+USER_TYPE_MAPPING = {
+    'Household Apartment': 'RESIDENTIAL',
+    'School/Institution': 'INSTITUTIONAL',
+    'Office': 'COMMERCIAL',
+    'Shop': 'COMMERCIAL',
+    'Other': 'OTHERS'
+}
+
+# Map user_type back to frontend format
+USER_TYPE_MAPPING_REVERSE = {
+    'RESIDENTIAL': 'Household Apartment',
+    'INSTITUTIONAL': 'School/Institution',
+    'COMMERCIAL': 'Office',
+    'OTHERS': 'Other'
+}
+
+# Columns written for a new customer, in insert order
+# area_id is NOT NULL with no default (0); created_by / updated_by are
+# NOT NULL varchar(50) with no default
+CUSTOMER_INSERT_COLUMNS = (
+    'customer_id', 'customer_name', 'contact_no', 'mobile_normalized', 'email', 'address',
+    'city', 'state', 'est_waste_qty', 'poc', 'user_type', 'reference',
+    'status', 'area_id', 'latitude', 'longitude', 'created_by', 'updated_by', 'created_at', 'updated_at'
+)
+
+_ROW_PLACEHOLDERS = '(' + ', '.join(['%s'] * len(CUSTOMER_INSERT_COLUMNS)) + ')'
+
+
+_MOBILE_MESSAGE = 'Invalid mobile number. Must be 10 digits.'
+_ALTERNATE_CONTACT_MESSAGE = 'Invalid alternate contact number. Must be 10 digits.'
+_EMAIL_MESSAGE = 'Invalid email format.'
+_QUANTITY_MESSAGE = 'Please enter a valid waste quantity (must be greater than 0).'
+
+
+def _customer_fields(required: bool, mobile: bool) -> tuple:
+    """Fields shared by signup and profile edits, in message order."""
+    mobile_fields = (
+        Field('mobileNumber', 'mobile_number', required=required, rules=(digits(10, _MOBILE_MESSAGE),)),
+    ) if mobile else ()
+    return (
+        Field('fullName', 'customer_name', required=required),
+        Field('email', 'email', required=required, rules=(lower, email(_EMAIL_MESSAGE))),
+    ) + mobile_fields + (
+        Field('houseNumber', 'house_number', required=required),
+        Field('address', 'address', required=required),
+        Field('city', 'city', required=required),
+        Field('state', 'state', required=required),
+        Field('userType', 'user_type', required=required, rules=(choice(USER_TYPE_MAPPING, 'OTHERS'),)),
+        Field('knowAboutUs', 'reference', required=required),
+        Field('expectation', 'est_waste_qty', required=required, rules=(quantity(_QUANTITY_MESSAGE),)),
+        Field(
+            'alternateContact', 'poc', empty=EMPTY_NULL,
+            rules=(digits(10, _ALTERNATE_CONTACT_MESSAGE), prefix('+91'))
+        ),
+        Field('latitude', 'latitude', text=False, empty=EMPTY_NULL, rules=(number('Invalid latitude.'),)),
+        Field('longitude', 'longitude', text=False, empty=EMPTY_NULL, rules=(number('Invalid longitude.'),)),
+    )
+
+
+# Compiled once at import; shared by the signup and bulk import endpoints
+SIGNUP_SCHEMA = Schema(_customer_fields(required=True, mobile=True))
+
+# The mobile number is the login and cannot be edited; customerId is
+# checked by the endpoint
+PROFILE_EDIT_SCHEMA = Schema(_customer_fields(required=False, mobile=False), partial=True)
+
+
+def parse_signup(data: dict) -> dict:
+    """
+    Validate and normalize a signup payload.
+
+    Args:
+        data (dict): Signup fields as sent by the app (camelCase)
+
+    Returns:
+        dict: Normalized values keyed by database column (without customer_id
+        and audit columns) plus ``mobile_number``
+
+    Raises:
+        ValidationError: Listing every missing or invalid field
+    """
+    customer = SIGNUP_SCHEMA.validate(data)
+    mobile_number = customer['mobile_number']
+    house_number = customer.pop('house_number')
+    # Mobile numbers with country code (format: +919876543210 - without slash)
+    customer['contact_no'] = f"+91{mobile_number}"
+    customer['mobile_normalized'] = mobile_number
+    # Combine house number with address if house number exists
+    if house_number:
+        customer['address'] = f"{house_number}, {customer['address']}".strip()
+    return customer
+
+
+def parse_profile_edit(data: dict) -> dict:
+    """
+    Validate and normalize the fields of a profile edit.
+
+    Args:
+        data (dict): Edit fields as sent by the app (camelCase)
+
+    Returns:
+        dict: Normalized values keyed by column for the fields the request
+        sets; ``house_number`` and ``address`` are merged with the stored
+        address by the endpoint
+
+    Raises:
+        ValidationError: Listing every invalid field
+    """
+    return PROFILE_EDIT_SCHEMA.validate(data)
+
+
+def profile_data(customer: dict) -> dict:
+    """
+    Shape a customer row as the app's profile (the edit form's fields).
+
+    Args:
+        customer (dict): Customer row
+
+    Returns:
+        dict: Profile fields (camelCase)
+    """
+    # Extract mobile number from contact_no (remove +91 prefix)
+    contact_no = customer.get('contact_no', '')
+    mobile_number = contact_no.replace('+91', '').replace('+91/', '').replace('/', '') if contact_no else ''
+
+    # Split address into houseNumber and address if it contains comma
+    full_address_str = customer.get('address', '') or ''
+    address_parts = full_address_str.split(',', 1) if ',' in full_address_str else ['', full_address_str]
+    house_number = address_parts[0].strip() if address_parts[0] else ''
+    address = address_parts[1].strip() if len(address_parts) > 1 and address_parts[1] else full_address_str
+
+    # Extract POC (alternateContact) - remove +91 prefix
+    poc = customer.get('poc', '') or ''
+    alternate_contact = poc.replace('+91', '').replace('+91/', '').replace('/', '') if poc else ''
+
+    return {
+        'customerId': customer.get('customer_id'),
+        'customerName': customer.get('customer_name'),
+        'email': customer.get('email'),
+        'mobileNumber': mobile_number,
+        'houseNumber': house_number,
+        'address': address,
+        'city': customer.get('city'),
+        'state': customer.get('state'),
+        # Map user_type back to frontend format
+        'userType': USER_TYPE_MAPPING_REVERSE.get(customer.get('user_type', ''), 'Other'),
+        'expectation': str(customer.get('est_waste_qty', '')) if customer.get('est_waste_qty') else '',
+        'alternateContact': alternate_contact,
+        'knowAboutUs': customer.get('reference', ''),
+        'latitude': customer.get('latitude'),
+        'longitude': customer.get('longitude'),
+        'status': customer.get('status')
+    }
+
+
+def insert_params(customer: dict, customer_id: str, created_by: str, current_time: str) -> tuple:
+    """
+    Build one row of insert parameters for a parsed customer.
+
+    Args:
+        customer (dict): Result of ``parse_signup``
+        customer_id (str): Allocated customer ID
+        created_by (str): Audit value for created_by / updated_by
+        current_time (str): Timestamp for created_at / updated_at
+
+    Returns:
+        tuple: Values in ``CUSTOMER_INSERT_COLUMNS`` order
+    """
+    row = dict(customer)
+    row.update({
+        'customer_id': customer_id,
+        'status': 'PENDING',
+        'area_id': 0,
+        'created_by': created_by,
+        'updated_by': created_by,
+        'created_at': current_time,
+        'updated_at': current_time,
+    })
+    return tuple(row[column] for column in CUSTOMER_INSERT_COLUMNS)
+
+
+def insert_query(row_count: int = 1) -> str:
+    """
+    INSERT statement for ``row_count`` customers in one multi-row statement.
+
+    Args:
+        row_count (int): Number of VALUES tuples
+
+    Returns:
+        str: Parameterized INSERT statement
+    """
+    return (
+        f"INSERT INTO b2c_customer_master ({', '.join(CUSTOMER_INSERT_COLUMNS)}) "
+        f"VALUES {', '.join([_ROW_PLACEHOLDERS] * row_count)}"
+    )
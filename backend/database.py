@@ -2,17 +2,69 @@
 Database connection module.
 Handles MySQL database connections and operations.
 """
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 import mysql.connector
-from mysql.connector import Error, pooling
-from typing import Optional
+from mysql.connector import Error
+from typing import Iterator, Optional, Union
 from config import Config
+from connection_pool import ConnectionPool
+from metrics import DB_QUERY_ERRORS, DB_QUERY_LATENCY
+from query_stats import query_stats
+from queries import NamedQuery
+
+
+logger = logging.getLogger(__name__)
+
+# Metrics label for statements run through execute_query (not registered in queries.py)
+ADHOC_QUERY = 'adhoc'
+
+
+class Session:
+    """
+    Unit of work holding one pooled connection.
+    
+    The connection is checked out on the first statement and kept until the
+    session is closed, so every statement in a request shares it.
+    """
+    
+    def __init__(self, database: 'Database'):
+        self._database = database
+        self.connection = None
+        self.transaction_depth = 0
+    
+    def get_connection(self):
+        """Return the session's connection, checking one out on first use."""
+        if self.connection is None:
+            self.connection = self._database.get_connection()
+        if self.transaction_depth and not self.connection.in_transaction:
+            self.connection.start_transaction()
+            self.connection.dirty = True
+        return self.connection
+    
+    def close(self) -> None:
+        """Return the connection to the pool (which rolls back anything uncommitted)."""
+        connection, self.connection = self.connection, None
+        if connection is not None:
+            connection.close()
+
+
+# Session bound to the current request (or explicit unit of work)
+_current_session: ContextVar[Optional[Session]] = ContextVar('db_session', default=None)
 
 
 class Database:
     """Database connection manager for MySQL."""
     
     _instance: Optional['Database'] = None
-    _connection_pool: Optional[pooling.MySQLConnectionPool] = None
+    _connection_pool: Optional[ConnectionPool] = None
+    _pool_pid: Optional[int] = None
+    _inherited_pools: list = []
+    _pool_lock = threading.Lock()
     _config = Config()
     
     def __new__(cls):
@@ -40,20 +92,20 @@ class Database:
                     host=self._config.DB_HOST,
                     port=self._config.DB_PORT,
                     user=self._config.DB_USER,
-                    password=self._config.DB_PASSWORD
+                    password=self._config.DB_PASSWORD,
+                    ssl_disabled=self._config.DB_SSL_DISABLED
                 )
                 if test_conn.is_connected():
-                    print(f"Successfully connected to MySQL server at {self._config.DB_HOST}")
+                    logger.info("Successfully connected to MySQL server at %s", self._config.DB_HOST)
                     test_conn.close()
             except Error as e:
-                print(f"Warning: Could not connect to MySQL server: {e}")
-                print("Please check your database configuration in .env file")
+                logger.warning(
+                    "Could not connect to MySQL server: %s. "
+                    "Please check your database configuration in .env file", e
+                )
             
             # Now create pool with database
-            pool_config = {
-                'pool_name': 'customer_app_pool',
-                'pool_size': 5,
-                'pool_reset_session': True,
+            connection_config = {
                 'host': self._config.DB_HOST,
                 'port': self._config.DB_PORT,
                 'user': self._config.DB_USER,
@@ -61,41 +113,179 @@ class Database:
                 'database': self._config.DB_NAME,
                 'charset': 'utf8mb4',
                 'collation': 'utf8mb4_unicode_ci',
-                'autocommit': False,
+                'ssl_disabled': self._config.DB_SSL_DISABLED,
+                # Single statements commit on their own; db.transaction()
+                # opens an explicit transaction when statements must be grouped
+                'autocommit': True,
             }
             
-            self._connection_pool = pooling.MySQLConnectionPool(**pool_config)
-            print("Database connection pool created successfully")
+            # Open one connection up front so configuration errors surface here
+            mysql.connector.connect(**connection_config).close()
+            
+            self._connection_pool = ConnectionPool(
+                lambda: mysql.connector.connect(**connection_config),
+                pool_size=self._config.DB_POOL_SIZE,
+                max_overflow=self._config.DB_POOL_MAX_OVERFLOW,
+                timeout=self._config.DB_POOL_TIMEOUT,
+                recycle=self._config.DB_POOL_RECYCLE,
+                idle_timeout=self._config.DB_POOL_IDLE_TIMEOUT,
+                pre_ping=self._config.DB_POOL_PRE_PING,
+                reset_session=self._config.DB_POOL_RESET_SESSION
+            )
+            logger.info(
+                "Database connection pool created successfully (size=%s, overflow=%s)",
+                self._config.DB_POOL_SIZE, self._config.DB_POOL_MAX_OVERFLOW
+            )
             
         except Error as e:
             if "Unknown database" in str(e):
-                print(f"Error: Database '{self._config.DB_NAME}' does not exist.")
-                print(f"Please create it using: CREATE DATABASE {self._config.DB_NAME} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;")
+                logger.error(
+                    "Database '%s' does not exist. Please create it using: "
+                    "CREATE DATABASE %s CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;",
+                    self._config.DB_NAME, self._config.DB_NAME
+                )
             else:
-                print(f"Error creating connection pool: {e}")
+                logger.error("Error creating connection pool: %s", e)
             raise
     
+    def _pool(self) -> ConnectionPool:
+        """
+        Return this process's pool, creating it on first use.
+        
+        A pool inherited through fork() is abandoned without closing its
+        connections, since their sockets are shared with the parent. It is
+        kept referenced because the driver shuts a socket down when its
+        connection object is garbage collected, which would also cut off
+        the parent.
+        """
+        if self._connection_pool is None or self._pool_pid != os.getpid():
+            with self._pool_lock:
+                if self._connection_pool is None or self._pool_pid != os.getpid():
+                    if self._connection_pool is not None:
+                        self._inherited_pools.append(self._connection_pool)
+                    self._connection_pool = None
+                    self._create_connection_pool()
+                    self._pool_pid = os.getpid()
+        return self._connection_pool
+    
     def get_connection(self) -> Optional[mysql.connector.MySQLConnection]:
         """
         Get a connection from the connection pool.
+        Waits up to DB_POOL_TIMEOUT seconds when every connection is in use.
         
         Returns:
             Optional[mysql.connector.MySQLConnection]: Database connection object
+                (``close()`` returns it to the pool)
         """
         try:
-            if self._connection_pool is None:
-                self._create_connection_pool()
-            
-            connection = self._connection_pool.get_connection()
+            connection = self._pool().get_connection()
             return connection
             
         except Error as e:
-            print(f"Error getting connection from pool: {e}")
+            logger.error("Error getting connection from pool: %s", e)
             raise
         except Exception as e:
-            print(f"Unexpected error getting connection: {e}")
+            logger.exception("Unexpected error getting connection: %s", e)
             raise
     
+    def warm_pool(self, count: Optional[int] = None) -> int:
+        """
+        Open pooled connections before the first request needs them.
+        
+        Args:
+            count (Optional[int]): Connections to open (default: DB_POOL_SIZE)
+        
+        Returns:
+            int: Number of connections opened
+        """
+        return self._pool().warm(count if count is not None else self._config.DB_POOL_SIZE)
+    
+    def dispose(self) -> None:
+        """
+        Close idle connections and drop the pool; the next use creates a new one.
+        
+        Call before forking workers so no connection is inherited.
+        """
+        with self._pool_lock:
+            pool, self._connection_pool = self._connection_pool, None
+            pool_pid, self._pool_pid = self._pool_pid, None
+        if pool is not None and pool_pid == os.getpid():
+            pool.close_idle()
+    
+    def pool_stats(self) -> dict:
+        """
+        Get live connection pool statistics.
+        
+        Returns:
+            dict: Pool statistics (empty if the pool has not been created yet)
+        """
+        if self._connection_pool is None or self._pool_pid != os.getpid():
+            return {}
+        return self._connection_pool.stats()
+    
+    def begin_request(self):
+        """
+        Bind a new session to the current request.
+        
+        Returns:
+            Token to pass to ``end_request``
+        """
+        return _current_session.set(Session(self))
+    
+    def end_request(self, token) -> None:
+        """
+        Release the current request's session and its connection.
+        
+        Args:
+            token: Value returned by ``begin_request``
+        """
+        session = _current_session.get()
+        _current_session.reset(token)
+        if session is not None:
+            session.close()
+    
+    @contextmanager
+    def transaction(self) -> Iterator[Session]:
+        """
+        Group statements into one transaction on the current session.
+        
+        Commits when the block exits normally and rolls back on an exception.
+        Nested blocks join the outermost transaction. Outside a request a
+        temporary session is used for the duration of the block.
+        
+        Yields:
+            Session: The session the statements run on
+        """
+        session = _current_session.get()
+        token = None
+        if session is None:
+            session = Session(self)
+            token = _current_session.set(session)
+        
+        session.transaction_depth += 1
+        if session.transaction_depth == 1 and session.connection is not None:
+            # Otherwise started lazily by the first statement
+            session.get_connection()
+        try:
+            yield session
+        except BaseException:
+            session.transaction_depth -= 1
+            if session.transaction_depth == 0 and session.connection is not None:
+                session.connection.rollback()
+            raise
+        else:
+            session.transaction_depth -= 1
+            if session.transaction_depth == 0 and session.connection is not None:
+                try:
+                    session.connection.commit()
+                except Error:
+                    session.connection.rollback()
+                    raise
+        finally:
+            if token is not None:
+                _current_session.reset(token)
+                session.close()
+    
     def test_connection(self) -> bool:
         """
         Test database connection.
@@ -108,63 +298,163 @@ class Database:
             connection = self.get_connection()
             if connection and connection.is_connected():
                 db_info = connection.get_server_info()
-                print(f"Connected to MySQL Server version {db_info}")
+                logger.info("Connected to MySQL Server version %s", db_info)
                 return True
             return False
             
         except Error as e:
-            print(f"Error testing connection: {e}")
+            logger.error("Error testing connection: %s", e)
             return False
             
         finally:
-            if connection and connection.is_connected():
+            if connection:
                 connection.close()
     
+    def _observe(self, sql: str, params: Optional[tuple], name: str, seconds: float, failed: bool, connection) -> None:
+        """Record one statement in the metrics, the query statistics and the slow-query log."""
+        DB_QUERY_LATENCY.labels(name).observe(seconds)
+        if self._config.DB_QUERY_STATS_ENABLED:
+            query_stats.record(
+                sql, name, seconds, error=failed,
+                explain=lambda: self._explain(connection, sql, params)
+            )
+    
+    @staticmethod
+    def _explain(connection, sql: str, params: Optional[tuple]) -> list:
+        """EXPLAIN a statement on the connection that just ran it."""
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(f"EXPLAIN {sql}", params or ())
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+    
     def execute_query(
         self, 
         query: str, 
         params: Optional[tuple] = None,
-        fetch: bool = True
-    ) -> Optional[list]:
+        fetch: bool = True,
+        read_only: bool = False
+    ) -> Union[list, int]:
         """
         Execute a database query.
         
+        Runs on the current request's session connection when there is one;
+        otherwise a connection is checked out for this statement only.
+        Statements commit on their own (autocommit) unless inside ``transaction()``.
+        
         Args:
             query (str): SQL query to execute
             params (Optional[tuple]): Query parameters for parameterized queries
             fetch (bool): Whether to fetch results (for SELECT queries)
+            read_only (bool): Statement does not change data or session state,
+                so the connection can skip the session reset when returned
         
         Returns:
-            Optional[list]: Query results if fetch=True, None otherwise
+            Union[list, int]: Query results if fetch=True, otherwise the
+                number of affected rows
         """
+        return self._execute_text(query, params, fetch, read_only, ADHOC_QUERY)
+    
+    def _execute_text(
+        self,
+        query: str,
+        params: Optional[tuple],
+        fetch: bool,
+        read_only: bool,
+        name: str
+    ) -> Union[list, int]:
+        """Run one statement over the text protocol, timed under ``name``."""
+        session = _current_session.get()
         connection = None
         cursor = None
+        started = None
+        failed = False
         try:
-            connection = self.get_connection()
+            connection = session.get_connection() if session else self.get_connection()
             if connection is None:
                 raise Error("Failed to get database connection")
+            if not read_only:
+                connection.dirty = True
             
             cursor = connection.cursor(dictionary=True)
+            started = time.perf_counter()
             cursor.execute(query, params or ())
             
-            if fetch:
-                result = cursor.fetchall()
-                connection.commit()
-                return result
-            else:
-                connection.commit()
-                return None
+            return cursor.fetchall() if fetch else cursor.rowcount
                 
         except Error as e:
-            if connection:
-                connection.rollback()
-            print(f"Error executing query: {e}")
+            # A failed autocommit statement is rolled back by the server;
+            # inside a transaction the rollback is left to transaction()
+            DB_QUERY_ERRORS.labels(name).inc()
+            failed = True
+            logger.error("Error executing query: %s", e)
             raise
             
         finally:
+            if started is not None:
+                self._observe(query, params, name, time.perf_counter() - started, failed, connection)
             if cursor:
                 cursor.close()
-            if connection and connection.is_connected():
+            if connection and session is None:
+                connection.close()
+    
+    def execute_named(
+        self,
+        query: NamedQuery,
+        params: Optional[tuple] = None,
+        fetch: bool = True
+    ) -> Union[list, int]:
+        """
+        Execute a registered query as a server-side prepared statement.
+        
+        The statement is prepared once per connection and its cursor cached
+        under the query name, so later executions skip parsing on the server.
+        
+        Args:
+            query (NamedQuery): Registered query (see queries.py)
+            params (Optional[tuple]): Query parameters
+            fetch (bool): Whether to fetch results (for SELECT queries)
+        
+        Returns:
+            Union[list, int]: Query results if fetch=True, otherwise the
+                number of affected rows
+        """
+        if not self._config.DB_PREPARED_STATEMENTS:
+            return self._execute_text(query.sql, params, fetch, query.read_only, query.name)
+        
+        session = _current_session.get()
+        connection = None
+        started = None
+        failed = False
+        try:
+            connection = session.get_connection() if session else self.get_connection()
+            if not query.read_only:
+                connection.dirty = True
+            
+            cursor = connection.statements.get(query.name)
+            if cursor is None:
+                cursor = connection.cursor(prepared=True, dictionary=True)
+                connection.statements[query.name] = cursor
+            started = time.perf_counter()
+            try:
+                cursor.execute(query.sql, params or ())
+                return cursor.fetchall() if fetch else cursor.rowcount
+            except Error:
+                # Drop the cursor; it is re-prepared on next use
+                connection.statements.pop(query.name, None)
+                raise
+                
+        except Error as e:
+            DB_QUERY_ERRORS.labels(query.name).inc()
+            failed = True
+            logger.error("Error executing query %s: %s", query.name, e)
+            raise
+            
+        finally:
+            if started is not None:
+                self._observe(query.sql, params, query.name, time.perf_counter() - started, failed, connection)
+            if connection and session is None:
                 connection.close()
 
 
@@ -0,0 +1,102 @@
+"""
+HTTP caching helpers.
+Strong ETags and If-None-Match handling for polled GET endpoints.
+"""
+import hashlib
+from typing import Optional
+
+from flask import Response, current_app, request
+from werkzeug.http import parse_etags, quote_etag
+
+from response_encoding import representation_etag, request_mimetype
+
+
+# Content codings whose representations get their own entity tag
+ENCODED_ETAG_SUFFIXES = ('br', 'gzip')
+
+
+def make_etag(*parts) -> str:
+    """
+    Build a strong entity tag from the values a response is rendered from.
+
+    Args:
+        *parts: Values that fully determine the response body
+
+    Returns:
+        str: Entity tag (unquoted)
+    """
+    digest = hashlib.sha1('\x1f'.join(str(part) for part in parts).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def not_modified(etag: str) -> Optional[Response]:
+    """
+    Answer a conditional GET whose validator still matches.
+
+    The tag is compared in the body format the request negotiates, so a
+    cached JSON body never validates a MessagePack request or the reverse.
+
+    Args:
+        etag (str): Current entity tag of the resource
+
+    Returns:
+        Optional[Response]: 304 response, or None if the body must be sent
+    """
+    mimetype, offered = request_mimetype(current_app.config)
+    if not etag_matches(representation_etag(etag, mimetype), request.headers.get('If-None-Match')):
+        return None
+    response = current_app.response_class(status=304, mimetype=mimetype)
+    if len(offered) > 1:
+        response.vary.add('Accept')
+    return with_etag(response, etag)
+
+
+def with_etag(response: Response, etag: str) -> Response:
+    """
+    Attach the entity tag; clients cache privately and revalidate each time.
+
+    Args:
+        response (Response): Outgoing response (its mimetype picks the
+            representation suffix)
+        etag (str): Entity tag
+
+    Returns:
+        Response: The same response
+    """
+    response.headers.update(etag_headers(representation_etag(etag, response.mimetype)))
+    return response
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """
+    Check an If-None-Match header value against the current entity tag.
+
+    Args:
+        etag (str): Current entity tag of the representation being sent
+        if_none_match (Optional[str]): Raw If-None-Match header
+
+    Returns:
+        bool: True if the client's copy is current
+    """
+    client_etags = parse_etags(if_none_match)
+    if etag in client_etags:
+        return True
+    # Compressed responses carry the tag with the coding appended
+    # (see response_encoding.encoded_etag)
+    return any(f'{etag}-{coding}' in client_etags for coding in ENCODED_ETAG_SUFFIXES)
+
+
+def etag_headers(etag: str) -> dict:
+    """
+    Response headers carrying the entity tag and revalidation policy.
+
+    Args:
+        etag (str): Entity tag
+
+    Returns:
+        dict: ETag and Cache-Control headers
+    """
+    return {
+        'ETag': quote_etag(etag),
+        'Cache-Control': 'private, no-cache'
+    }
@@ -0,0 +1,102 @@
+"""
+ID allocation module.
+Hands out numeric IDs from blocks reserved on a sequence row (hi/lo).
+"""
+import os
+import threading
+from typing import Optional
+
+from database import db
+
+
+class IdAllocator:
+    """
+    Allocate unique, increasing numeric IDs without scanning the target table.
+
+    Each process reserves ``block_size`` IDs at a time with a single atomic
+    ``UPDATE`` on its row in ``id_sequences`` and serves them from memory.
+    Reserved IDs are never handed out twice: a restart (or a fork) simply
+    abandons the rest of the block, leaving a gap.
+    """
+
+    def __init__(self, sequence_name: str, block_size: int = 20):
+        """
+        Initialize the allocator.
+
+        Args:
+            sequence_name (str): Row name in ``id_sequences``
+            block_size (int): IDs reserved per database round trip
+        """
+        self.sequence_name = sequence_name
+        self.block_size = block_size
+        self._next: Optional[int] = None
+        self._limit: Optional[int] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _reserve(self, count: int) -> int:
+        """
+        Reserve ``count`` IDs on the sequence row.
+
+        Returns:
+            int: One past the last reserved ID
+        """
+        connection = db.get_connection()
+        cursor = connection.cursor()
+        try:
+            # Single autocommit statement; LAST_INSERT_ID(expr) makes the new
+            # value readable on this connection without a second locking read
+            cursor.execute(
+                "UPDATE id_sequences SET next_value = LAST_INSERT_ID(next_value + %s) "
+                "WHERE name = %s",
+                (count, self.sequence_name)
+            )
+            if cursor.rowcount != 1:
+                raise RuntimeError(
+                    f"ID sequence '{self.sequence_name}' is missing; "
+                    "run python -m tools.migrate"
+                )
+            cursor.execute("SELECT LAST_INSERT_ID()")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+            connection.close()
+
+    def _reserve_block(self) -> None:
+        """Reserve the next block of IDs (lock held)."""
+        limit = self._reserve(self.block_size)
+        self._next = limit - self.block_size
+        self._limit = limit
+        self._pid = os.getpid()
+
+    def next_id(self) -> int:
+        """
+        Return the next unused ID.
+
+        Returns:
+            int: Unique ID
+        """
+        with self._lock:
+            if self._pid != os.getpid() or self._next is None or self._next >= self._limit:
+                self._reserve_block()
+            value = self._next
+            self._next += 1
+            return value
+
+    def next_ids(self, count: int) -> range:
+        """
+        Reserve ``count`` consecutive IDs in one round trip.
+
+        Used for batch inserts; the range is reserved on its own and does not
+        touch the block ``next_id`` is serving from.
+
+        Args:
+            count (int): Number of IDs needed
+
+        Returns:
+            range: The reserved IDs
+        """
+        if count <= 0:
+            return range(0)
+        limit = self._reserve(count)
+        return range(limit - count, limit)
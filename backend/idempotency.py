@@ -0,0 +1,590 @@
+"""
+Idempotency module.
+Responses to mutating requests (signup, profile edit) keyed by the
+client's ``Idempotency-Key`` header, so a retried request is answered with
+the original response instead of running again.
+
+Backends:
+    memory - per-process cache (single worker / development)
+    sqlite - SQLite file shared by every worker on the same host
+    redis  - any server speaking the Redis protocol (multi-host)
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from otp_store import RedisScript, RespClient
+
+
+logger = logging.getLogger(__name__)
+
+
+# Longest Idempotency-Key accepted (UUIDs and similar random tokens)
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(method: str, path: str, body: bytes) -> bytes:
+    """
+    Digest identifying a request, compared when a key is reused.
+
+    Args:
+        method (str): HTTP method
+        path (str): Request path
+        body (bytes): Raw request body
+
+    Returns:
+        bytes: SHA-256 digest
+    """
+    digest = hashlib.sha256(f'{method} {path}\n'.encode('utf-8'))
+    digest.update(body)
+    return digest.digest()
+
+
+class StoredResponse:
+    """Status, headers and body of a completed response."""
+
+    __slots__ = ('status', 'headers', 'body')
+
+    def __init__(self, status: int, headers: List[Tuple[str, str]], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class IdempotencyEntry:
+    """
+    One key's request: in flight until ``done`` is set, then holding the
+    response to replay (None if the original was abandoned).
+
+    ``token`` identifies the claim in shared stores, so only the request
+    that claimed a key completes or abandons it.
+    """
+
+    __slots__ = ('fingerprint', 'expires_at', 'response', 'done', 'token')
+
+    def __init__(self, fingerprint: bytes, expires_at: float, token: Optional[str] = None):
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.response: Optional[StoredResponse] = None
+        self.done = threading.Event()
+        self.token = token
+
+
+class IdempotencyStore(ABC):
+    """
+    Base class for idempotency key stores.
+
+    The first request with a key claims it (``begin`` returns owner=True)
+    and runs; it then stores its response with ``complete`` or releases
+    the key with ``abandon``. Requests with the same key arriving meanwhile
+    ``wait`` for the owner and call ``begin`` again, which returns the
+    stored response to replay (or claims the key if it was abandoned).
+    """
+
+    def __init__(self, ttl_seconds: float = 86400, max_entries: int = 10000):
+        """
+        Initialize the store.
+
+        Args:
+            ttl_seconds (float): How long a key is remembered; 0 disables the store
+            max_entries (int): Maximum number of remembered keys
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._counters_lock = threading.Lock()
+        self.executed = 0
+        self.replayed = 0
+        self.waited = 0
+        self.abandoned = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    @abstractmethod
+    def begin(self, key: str, fingerprint: bytes) -> Tuple[IdempotencyEntry, bool]:
+        """
+        Look up a key, claiming it if it is new.
+
+        Args:
+            key (str): Idempotency key (scoped by the caller, e.g. per endpoint)
+            fingerprint (bytes): From ``request_fingerprint``
+
+        Returns:
+            Tuple[IdempotencyEntry, bool]: (entry, True if the caller owns it
+            and must ``complete`` or ``abandon`` it)
+        """
+
+    @abstractmethod
+    def wait(self, key: str, entry: IdempotencyEntry, timeout: float) -> bool:
+        """
+        Wait for the owner of an entry to complete or abandon it.
+
+        Args:
+            key (str): Key passed to ``begin``
+            entry (IdempotencyEntry): In-flight entry returned by ``begin``
+            timeout (float): Seconds to wait
+
+        Returns:
+            bool: True once the owner has finished, False on timeout
+        """
+
+    @abstractmethod
+    def complete(self, key: str, entry: IdempotencyEntry, response: StoredResponse) -> None:
+        """
+        Store the owner's response for the requests waiting on it.
+
+        Args:
+            key (str): Key passed to ``begin``
+            entry (IdempotencyEntry): Entry returned by ``begin``
+            response (StoredResponse): Response to replay for the key
+        """
+
+    @abstractmethod
+    def abandon(self, key: str, entry: IdempotencyEntry) -> None:
+        """
+        Forget a key whose request failed, so a retry runs it again.
+
+        Args:
+            key (str): Key passed to ``begin``
+            entry (IdempotencyEntry): Entry returned by ``begin``
+        """
+
+    @abstractmethod
+    def size(self) -> int:
+        """Number of remembered keys."""
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._counters_lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def record_replay(self, waited: bool) -> None:
+        """Count a request answered from the store."""
+        with self._counters_lock:
+            self.replayed += 1
+            if waited:
+                self.waited += 1
+
+    def stats(self) -> dict:
+        """
+        Get store statistics.
+
+        Returns:
+            dict: Counters (this process) and current size
+        """
+        size = self.size()
+        with self._counters_lock:
+            return {
+                'enabled': self.enabled,
+                'size': size,
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'executed': self.executed,
+                'replayed': self.replayed,
+                'waited': self.waited,
+                'abandoned': self.abandoned,
+                'evictions': self.evictions
+            }
+
+
+class IdempotencyCache(IdempotencyStore):
+    """
+    Bounded, TTL-expiring map of idempotency keys to requests in this process.
+
+    Requests waiting for the owner block on the entry's ``done`` event.
+    Every entry lives ``ttl_seconds`` from its first request, so insertion
+    order is also expiry order: expired entries are swept from the front
+    and the oldest entry is evicted once ``max_entries`` is reached.
+    """
+
+    def __init__(self, ttl_seconds: float = 86400, max_entries: int = 10000):
+        super().__init__(ttl_seconds, max_entries)
+        self._entries: 'OrderedDict[str, IdempotencyEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _sweep(self, now: float) -> None:
+        """Drop expired entries from the front (lock held)."""
+        entries = self._entries
+        while entries:
+            key, entry = next(iter(entries.items()))
+            if entry.expires_at > now:
+                break
+            del entries[key]
+
+    def begin(self, key: str, fingerprint: bytes) -> Tuple[IdempotencyEntry, bool]:
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry, False
+            while len(self._entries) >= self.max_entries:
+                self._entries.popitem(last=False)
+                self._count('evictions')
+            entry = IdempotencyEntry(fingerprint, now + self.ttl_seconds)
+            self._entries[key] = entry
+            self._count('executed')
+            return entry, True
+
+    def wait(self, key: str, entry: IdempotencyEntry, timeout: float) -> bool:
+        return entry.done.wait(timeout)
+
+    def complete(self, key: str, entry: IdempotencyEntry, response: StoredResponse) -> None:
+        entry.response = response
+        entry.done.set()
+
+    def abandon(self, key: str, entry: IdempotencyEntry) -> None:
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+            self._count('abandoned')
+        entry.done.set()
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SharedIdempotencyStore(IdempotencyStore):
+    """
+    Base class for stores shared between workers.
+
+    A claim is a record holding the fingerprint and a random claim token;
+    it expires after ``lock_seconds`` so a key whose worker died mid-request
+    can be claimed again. ``complete`` adds the response and extends the
+    record to ``ttl_seconds``. Waiting requests poll the record, backing
+    off from ``poll_interval`` to ``max_poll_interval``.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 86400,
+        max_entries: int = 10000,
+        lock_seconds: float = 60,
+        poll_interval: float = 0.01,
+        max_poll_interval: float = 0.2
+    ):
+        super().__init__(ttl_seconds, max_entries)
+        self.lock_seconds = lock_seconds
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+
+    @staticmethod
+    def _dumps(entry: IdempotencyEntry) -> str:
+        record = {'fingerprint': entry.fingerprint.hex(), 'token': entry.token}
+        if entry.response is not None:
+            response = entry.response
+            record['response'] = {
+                'status': response.status,
+                'headers': response.headers,
+                'body': base64.b64encode(response.body).decode('ascii')
+            }
+        return json.dumps(record)
+
+    @staticmethod
+    def _loads(raw, expires_at: float) -> IdempotencyEntry:
+        record = json.loads(raw)
+        entry = IdempotencyEntry(bytes.fromhex(record['fingerprint']), expires_at, record['token'])
+        response = record.get('response')
+        if response is not None:
+            entry.response = StoredResponse(
+                response['status'],
+                [tuple(header) for header in response['headers']],
+                base64.b64decode(response['body'])
+            )
+            entry.done.set()
+        return entry
+
+    def begin(self, key: str, fingerprint: bytes) -> Tuple[IdempotencyEntry, bool]:
+        entry = IdempotencyEntry(fingerprint, time.time() + self.lock_seconds, uuid.uuid4().hex)
+        while True:
+            if self._claim(key, entry):
+                self._count('executed')
+                return entry, True
+            current = self._load(key)
+            if current is not None:
+                return current, False
+            # Abandoned or expired between the two calls: claim again
+
+    def wait(self, key: str, entry: IdempotencyEntry, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        interval = self.poll_interval
+        while True:
+            current = self._load(key)
+            if current is None or current.token != entry.token or current.response is not None:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, self.max_poll_interval)
+
+    def complete(self, key: str, entry: IdempotencyEntry, response: StoredResponse) -> None:
+        entry.response = response
+        entry.expires_at = time.time() + self.ttl_seconds
+        self._store(key, entry)
+
+    def abandon(self, key: str, entry: IdempotencyEntry) -> None:
+        self._release(key, entry)
+        self._count('abandoned')
+
+    @abstractmethod
+    def _claim(self, key: str, entry: IdempotencyEntry) -> bool:
+        """Create the in-flight record unless the key exists; True if created."""
+
+    @abstractmethod
+    def _load(self, key: str) -> Optional[IdempotencyEntry]:
+        """Read the unexpired record for a key."""
+
+    @abstractmethod
+    def _store(self, key: str, entry: IdempotencyEntry) -> None:
+        """Save the completed entry if the key is still claimed by it."""
+
+    @abstractmethod
+    def _release(self, key: str, entry: IdempotencyEntry) -> None:
+        """Delete the record if the key is still claimed by the entry and incomplete."""
+
+
+class SQLiteIdempotencyStore(SharedIdempotencyStore):
+    """
+    Idempotency keys in a SQLite file shared by all workers on one host.
+
+    ``INSERT OR IGNORE`` on the key's primary key claims it for exactly one
+    worker; completion and release are conditional on the claim token.
+    Expired rows are deleted, and the rows that expire first trimmed to
+    ``max_entries``, every ``sweep_interval`` claims.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float = 86400,
+        max_entries: int = 10000,
+        lock_seconds: float = 60,
+        sweep_interval: int = 100
+    ):
+        super().__init__(ttl_seconds, max_entries, lock_seconds)
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._local = threading.local()
+        self._claims = 0
+        self._claims_lock = threading.Lock()
+
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS idempotency_keys ("
+            " key TEXT PRIMARY KEY,"
+            " token TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " complete INTEGER NOT NULL DEFAULT 0,"
+            " expires_at REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys (expires_at)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _claim(self, key: str, entry: IdempotencyEntry) -> bool:
+        connection = self._connection()
+        connection.execute(
+            "DELETE FROM idempotency_keys WHERE key = ? AND expires_at <= ?", (key, time.time())
+        )
+        cursor = connection.execute(
+            "INSERT OR IGNORE INTO idempotency_keys (key, token, payload, expires_at) VALUES (?, ?, ?, ?)",
+            (key, entry.token, self._dumps(entry), entry.expires_at)
+        )
+        with self._claims_lock:
+            self._claims += 1
+            sweep = self._claims % self.sweep_interval == 0
+        if sweep:
+            self._sweep(connection)
+        return cursor.rowcount == 1
+
+    def _sweep(self, connection: sqlite3.Connection) -> None:
+        """Delete expired rows and trim the rows that expire first beyond max_entries."""
+        connection.execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (time.time(),))
+        cursor = connection.execute(
+            "DELETE FROM idempotency_keys WHERE key IN ("
+            " SELECT key FROM idempotency_keys ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        if cursor.rowcount > 0:
+            self._count('evictions', cursor.rowcount)
+
+    def _load(self, key: str) -> Optional[IdempotencyEntry]:
+        row = self._connection().execute(
+            "SELECT payload, expires_at FROM idempotency_keys WHERE key = ? AND expires_at > ?",
+            (key, time.time())
+        ).fetchone()
+        return self._loads(row[0], row[1]) if row else None
+
+    def _store(self, key: str, entry: IdempotencyEntry) -> None:
+        self._connection().execute(
+            "UPDATE idempotency_keys SET payload = ?, complete = 1, expires_at = ? "
+            "WHERE key = ? AND token = ?",
+            (self._dumps(entry), entry.expires_at, key, entry.token)
+        )
+
+    def _release(self, key: str, entry: IdempotencyEntry) -> None:
+        self._connection().execute(
+            "DELETE FROM idempotency_keys WHERE key = ? AND token = ? AND complete = 0",
+            (key, entry.token)
+        )
+
+    def size(self) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM idempotency_keys WHERE expires_at > ?", (time.time(),)
+        ).fetchone()[0]
+
+
+# Store the response over a claim only if the record still carries the
+# claim's token. ARGV: token, record, TTL in milliseconds
+COMPLETE_SCRIPT = RedisScript("""
+local raw = redis.call('GET', KEYS[1])
+if not raw or cjson.decode(raw).token ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3])
+return 1
+""")
+
+# Drop a claim (and its index entry, KEYS[2]) only if the record still
+# carries the claim's token and has no stored response. ARGV: token
+RELEASE_SCRIPT = RedisScript("""
+local raw = redis.call('GET', KEYS[1])
+if not raw then
+    return 0
+end
+local record = cjson.decode(raw)
+if record.token ~= ARGV[1] or record.response then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], KEYS[1])
+return 1
+""")
+
+
+class RedisIdempotencyStore(SharedIdempotencyStore):
+    """
+    Idempotency keys on a Redis-protocol server, shared across hosts.
+
+    ``SET NX PX`` claims a key for exactly one worker. Completion and
+    release are Lua scripts that check the entry's claim token and write
+    in one step, so a claim that expired and was taken over by another
+    worker is never overwritten. The index of keys by expiry bounds the
+    store the same way as RedisOTPStore.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        ttl_seconds: float = 86400,
+        max_entries: int = 10000,
+        lock_seconds: float = 60,
+        key_prefix: str = 'idempotency:',
+        timeout: float = 2.0
+    ):
+        super().__init__(ttl_seconds, max_entries, lock_seconds)
+        self.key_prefix = key_prefix
+        # Keys are scoped as '<endpoint>:<key>', so the index cannot collide
+        self.index_key = f'{key_prefix}index'
+        self._client = RespClient(url, timeout)
+
+    def _index(self, name: str, expires_at: float) -> None:
+        """Record a key's expiry in the index and evict beyond max_entries."""
+        *_, size = self._client.pipeline(
+            ('ZADD', self.index_key, repr(expires_at), name),
+            ('ZREMRANGEBYSCORE', self.index_key, '-inf', repr(time.time())),
+            ('ZCARD', self.index_key),
+            retry=True
+        )
+        if size > self.max_entries:
+            popped = self._client.command('ZPOPMIN', self.index_key, str(size - self.max_entries))
+            # Reply alternates member, score
+            names = popped[0::2]
+            if names:
+                self._client.command('DEL', *names, retry=True)
+                self._count('evictions', len(names))
+
+    def _claim(self, key: str, entry: IdempotencyEntry) -> bool:
+        name = self.key_prefix + key
+        # Safe to resend: if the first SET landed, the record read back
+        # below carries this entry's token
+        created = self._client.command(
+            'SET', name, self._dumps(entry), 'NX', 'PX', str(int(self.lock_seconds * 1000)), retry=True
+        )
+        if created is None:
+            current = self._load(key)
+            if current is None or current.token != entry.token:
+                return False
+        self._index(name, entry.expires_at)
+        return True
+
+    def _load(self, key: str) -> Optional[IdempotencyEntry]:
+        name = self.key_prefix + key
+        raw, ttl_ms = self._client.pipeline(('GET', name), ('PTTL', name), retry=True)
+        if not raw:
+            return None
+        return self._loads(raw, time.time() + max(ttl_ms, 0) / 1000)
+
+    def _store(self, key: str, entry: IdempotencyEntry) -> None:
+        name = self.key_prefix + key
+        # Safe to resend: a second run finds the token it wrote and writes the same record
+        stored = self._client.eval(
+            COMPLETE_SCRIPT, (name,), (entry.token, self._dumps(entry), str(int(self.ttl_seconds * 1000))),
+            retry=True
+        )
+        if stored:
+            self._index(name, entry.expires_at)
+
+    def _release(self, key: str, entry: IdempotencyEntry) -> None:
+        name = self.key_prefix + key
+        self._client.eval(RELEASE_SCRIPT, (name, self.index_key), (entry.token,), retry=True)
+
+    def size(self) -> int:
+        return self._client.command('ZCARD', self.index_key, retry=True)
+
+
+def create_idempotency_store(config) -> IdempotencyStore:
+    """
+    Build the idempotency key store selected by configuration.
+
+    Args:
+        config: Config object (``IDEMPOTENCY_BACKEND``, ``IDEMPOTENCY_TTL_SECONDS``, ...)
+
+    Returns:
+        IdempotencyStore: Configured store
+    """
+    backend = config.IDEMPOTENCY_BACKEND.lower()
+    ttl_seconds = config.IDEMPOTENCY_TTL_SECONDS
+    max_entries = config.IDEMPOTENCY_MAX_ENTRIES
+    lock_seconds = config.IDEMPOTENCY_LOCK_SECONDS
+
+    if backend == 'sqlite':
+        return SQLiteIdempotencyStore(config.IDEMPOTENCY_STORE_PATH, ttl_seconds, max_entries, lock_seconds)
+    if backend == 'redis':
+        return RedisIdempotencyStore(config.IDEMPOTENCY_REDIS_URL, ttl_seconds, max_entries, lock_seconds)
+    if backend != 'memory':
+        logger.warning("Unknown IDEMPOTENCY_BACKEND %r, using in-memory idempotency keys", backend)
+    return IdempotencyCache(ttl_seconds, max_entries)
@@ -0,0 +1,283 @@
+"""
+OTP login rules module.
+Validation, OTP checks and response bodies shared by the Flask login and
+profile routes (app.py) and their async counterparts (asgi.py). The callers
+only do the I/O (rate limits, customer lookup, OTP store, SMS dispatch).
+"""
+import random
+import re
+from datetime import datetime
+from typing import Optional
+
+from sms_dispatch import STATUS_DROPPED, STATUS_QUEUED, STATUS_SENT
+
+
+_MOBILE_NUMBER = re.compile(r'^[0-9]{10}$')
+_OTP = re.compile(r'^[0-9]{6}$')
+
+OTP_NOT_FOUND = 'OTP not found. Please generate a new OTP.'
+OTP_ALREADY_USED = 'OTP already used. Please generate a new OTP.'
+CUSTOMER_NOT_FOUND = 'Customer not found'
+
+
+class LoginError(Exception):
+    """
+    Raised to answer a login request with an error; the message is client-facing.
+
+    ``status`` is the HTTP status, ``data`` optional extra response data and
+    ``headers`` extra response headers.
+    """
+
+    def __init__(self, status: int, message: str, data: Optional[dict] = None, headers: Optional[dict] = None):
+        super().__init__(message)
+        self.status = status
+        self.data = data
+        self.headers = headers or {}
+
+    @property
+    def payload(self) -> dict:
+        """Response body."""
+        payload = {'status': 'error', 'message': str(self)}
+        if self.data is not None:
+            payload['data'] = self.data
+        return payload
+
+
+def too_many_requests(retry_after: int) -> LoginError:
+    """429 answer for a client or number over its OTP limit."""
+    return LoginError(
+        429,
+        f'Too many OTP requests. Please try again in {retry_after} seconds.',
+        headers={'Retry-After': str(retry_after)}
+    )
+
+
+def parse_generate_request(data: Optional[dict]) -> str:
+    """
+    Validate a generate-otp body.
+
+    Returns:
+        str: 10-digit mobile number
+    """
+    mobile_number = ((data or {}).get('mobileNumber') or '').strip()
+    if not mobile_number:
+        raise LoginError(400, 'Mobile number is required')
+    if not _MOBILE_NUMBER.match(mobile_number):
+        raise LoginError(400, 'Please enter a valid 10-digit mobile number')
+    return mobile_number
+
+
+def parse_status_request(args) -> str:
+    """
+    Validate the otp-status query parameters.
+
+    Returns:
+        str: 10-digit mobile number
+    """
+    mobile_number = (args.get('mobileNumber') or '').strip()
+    if not _MOBILE_NUMBER.match(mobile_number):
+        raise LoginError(400, 'Please enter a valid 10-digit mobile number')
+    return mobile_number
+
+
+def parse_verify_request(data: Optional[dict]) -> tuple:
+    """
+    Validate a verify-otp body.
+
+    Returns:
+        tuple: (mobile_number, otp)
+    """
+    data = data or {}
+    mobile_number = (data.get('mobileNumber') or '').strip()
+    otp = (data.get('otp') or '').strip()
+    if not mobile_number:
+        raise LoginError(400, 'Mobile number is required')
+    if not otp:
+        raise LoginError(400, 'OTP is required')
+    if not _MOBILE_NUMBER.match(mobile_number):
+        raise LoginError(400, 'Invalid mobile number format')
+    if not _OTP.match(otp):
+        raise LoginError(400, 'OTP must be 6 digits')
+    return mobile_number, otp
+
+
+def parse_profile_request(args) -> str:
+    """
+    Validate the profile query parameters.
+
+    Returns:
+        str: Customer ID
+    """
+    customer_id = args.get('customerId')
+    if not customer_id:
+        raise LoginError(400, 'Customer ID is required')
+    return customer_id
+
+
+def approved_customer(rows: list) -> dict:
+    """
+    The customer a mobile number lookup found, if allowed to log in.
+
+    Args:
+        rows (list): Result of the customer lookup by mobile number
+
+    Returns:
+        dict: Customer row (status APPROVED)
+    """
+    if not rows:
+        raise LoginError(404, 'Mobile number not registered. Please sign up first.')
+    customer = rows[0]
+    # Only approved customers can log in
+    if customer.get('status') != 'APPROVED':
+        raise LoginError(403, 'Your profile is under consideration. Please wait for approval.')
+    return customer
+
+
+def new_otp() -> str:
+    """Random 6-digit OTP."""
+    return str(random.randint(100000, 999999))
+
+
+def otp_record(otp: str, customer: dict) -> dict:
+    """OTP store record for a newly generated OTP (delivery still queued)."""
+    return {
+        'otp': otp,
+        'verified': False,
+        'customer_id': customer.get('customer_id'),
+        'sms_status': STATUS_QUEUED
+    }
+
+
+def generate_response(mobile_number: str, otp: str, sms_status: str, debug: bool) -> dict:
+    """
+    Response body for a generated OTP.
+
+    Args:
+        mobile_number (str): 10-digit mobile number
+        otp (str): Generated OTP
+        sms_status (str): Status of the SMS job when it was submitted
+        debug (bool): FLASK_DEBUG (the OTP is returned for manual testing)
+
+    Returns:
+        dict: Response body
+    """
+    data = {
+        'mobileNumber': mobile_number,
+        'smsSent': sms_status == STATUS_SENT,
+        'smsStatus': sms_status
+    }
+
+    # Include OTP in response for testing/debugging (remove in production)
+    # This helps verify OTP generation when SMS delivery is problematic
+    if sms_status == STATUS_DROPPED or debug:
+        data['otp'] = otp
+        data['otpMessage'] = f'OTP: {otp} (Valid for 5 minutes) - Use this to test if SMS is not received'
+
+    if sms_status == STATUS_DROPPED:
+        message = f'OTP generated. Please check SMS on {mobile_number}'
+    else:
+        message = 'OTP is being sent to your mobile number'
+
+    return {
+        'status': 'success',
+        'message': message,
+        'data': data
+    }
+
+
+def status_response(mobile_number: str, record: Optional[dict]) -> dict:
+    """
+    Response body for otp-status.
+
+    Args:
+        mobile_number (str): 10-digit mobile number
+        record (Optional[dict]): Stored OTP record (None if there is none)
+
+    Returns:
+        dict: Response body
+    """
+    if record is None:
+        raise LoginError(404, OTP_NOT_FOUND)
+    sms_status = record.get('sms_status', STATUS_QUEUED)
+    return {
+        'status': 'success',
+        'data': {
+            'mobileNumber': mobile_number,
+            'smsSent': sms_status == STATUS_SENT,
+            'smsStatus': sms_status,
+            'expiresAt': record['expires_at'].strftime('%Y-%m-%d %H:%M:%S')
+        }
+    }
+
+
+def otp_expired(record: Optional[dict]) -> bool:
+    """True if a stored OTP record has expired (the caller deletes it)."""
+    return record is not None and datetime.now() > record['expires_at']
+
+
+def check_otp(record: Optional[dict], otp: str) -> None:
+    """
+    Check a submitted OTP against the stored record before consuming it.
+
+    Args:
+        record (Optional[dict]): Stored OTP record (None if there is none)
+        otp (str): Submitted OTP
+    """
+    if record is None:
+        raise LoginError(404, OTP_NOT_FOUND)
+    if otp_expired(record):
+        raise LoginError(400, 'OTP has expired. Please generate a new OTP.')
+    if record['verified']:
+        raise LoginError(400, OTP_ALREADY_USED)
+    if record['otp'] != otp:
+        raise LoginError(400, 'Invalid OTP. Please try again.', data={
+            'smsStatus': record.get('sms_status', STATUS_QUEUED)
+        })
+
+
+def consumed_customer_id(record: Optional[dict]) -> str:
+    """
+    customer_id of the record consume() returned.
+
+    None means a concurrent request consumed the OTP first.
+    """
+    if record is None:
+        raise LoginError(400, OTP_ALREADY_USED)
+    return record['customer_id']
+
+
+def verify_response(mobile_number: str, customer: Optional[dict]) -> dict:
+    """
+    Response body for a verified OTP.
+
+    Args:
+        mobile_number (str): 10-digit mobile number
+        customer (Optional[dict]): Current customer row (None if not found)
+
+    Returns:
+        dict: Response body
+    """
+    if customer is None:
+        raise LoginError(404, CUSTOMER_NOT_FOUND)
+    return {
+        'status': 'success',
+        'message': 'OTP verified successfully',
+        'data': {
+            'customerId': customer.get('customer_id'),
+            'customerName': customer.get('customer_name'),
+            'email': customer.get('email'),
+            'mobileNumber': mobile_number,
+            'address': customer.get('address'),
+            'city': customer.get('city'),
+            'state': customer.get('state'),
+            'userType': customer.get('user_type'),
+            'status': customer.get('status')
+        }
+    }
+
+
+def found_customer(customer: Optional[dict]) -> dict:
+    """The customer row a profile read found (404 if None)."""
+    if customer is None:
+        raise LoginError(404, CUSTOMER_NOT_FOUND)
+    return customer
@@ -0,0 +1,525 @@
+"""
+Metrics module.
+Process-local counters, gauges and latency histograms rendered in the
+Prometheus text exposition format for ``/metrics``, optionally summed over
+the worker processes of one host (``SharedMetrics``).
+"""
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; covers a cached profile read up to a slow SMS gateway call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+# A metric family: (kind, help, [(sample name, labels, value), ...])
+Family = Tuple[str, str, List[Tuple[str, Dict[str, str], float]]]
+
+
+class _Metric(ABC):
+    """Base class: a named family of samples keyed by label values."""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    @abstractmethod
+    def _new_child(self):
+        """Create the sample for a new combination of label values."""
+
+    def labels(self, *values):
+        """
+        Get the sample for one combination of label values.
+
+        Args:
+            *values: One value per label name, in order
+
+        Returns:
+            The child metric (created on first use)
+        """
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        samples = []
+        for key, child in sorted(self._children.items()):
+            samples.extend(self._child_samples(dict(zip(self.labelnames, key)), child))
+        return samples
+
+    def _child_samples(self, labels: Dict[str, str], child) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        yield self.name, labels, child.value
+
+
+class _Value:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count (``inc`` only)."""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+
+class Gauge(_Metric):
+    """Value that goes up and down (``inc``, ``dec``, ``set``)."""
+
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+
+class _HistogramValue:
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One count per bucket plus the +Inf bucket; cumulated when rendered
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (durations in seconds) over fixed buckets."""
+
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def _child_samples(self, labels: Dict[str, str], child) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            yield f'{self.name}_bucket', dict(labels, le=_format_value(bound)), cumulative
+        yield f'{self.name}_sum', labels, total
+        yield f'{self.name}_count', labels, cumulative
+
+
+class Registry:
+    """
+    Metrics of one process.
+
+    Besides the metrics updated in code, ``register_collector`` adds
+    callbacks that read counters kept elsewhere (pool and cache stats) when
+    ``/metrics`` is scraped, so those hot paths need no extra bookkeeping.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, key: str, collect: Callable) -> None:
+        """
+        Add (or replace) a scrape-time callback.
+
+        Args:
+            key (str): Identifies the collector; registering the same key again replaces it
+            collect (Callable): Returns ``(name, kind, help, labels, value)`` tuples
+        """
+        with self._lock:
+            self._collectors[key] = collect
+
+    def collect(self) -> Dict[str, Family]:
+        """
+        Current samples of every metric and collector.
+
+        Returns:
+            Dict[str, Family]: Families by metric name
+        """
+        families = {
+            metric.name: (metric.kind, metric.documentation, metric.samples())
+            for metric in list(self._metrics.values())
+        }
+        for collect in list(self._collectors.values()):
+            for name, kind, documentation, labels, value in collect():
+                family = families.setdefault(name, (kind, documentation, []))
+                family[2].append((name, labels, value))
+        return families
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text format.
+
+        Returns:
+            str: Exposition text
+        """
+        return render_families(self.collect())
+
+
+def render_families(families: Dict[str, Family]) -> str:
+    """
+    Render metric families in the Prometheus text format.
+
+    Args:
+        families (Dict[str, Family]): Families by metric name
+
+    Returns:
+        str: Exposition text
+    """
+    lines = []
+    for name, (kind, documentation, samples) in families.items():
+        lines.append(f'# HELP {name} {documentation}')
+        lines.append(f'# TYPE {name} {kind}')
+        for sample_name, labels, value in samples:
+            lines.append(f'{sample_name}{_label_text(labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def merge_families(snapshots: Iterable[Dict[str, Family]], gauges: bool = True) -> Dict[str, Family]:
+    """
+    Sum the samples of several processes' families.
+
+    Args:
+        snapshots (Iterable[Dict[str, Family]]): Families of each process
+        gauges (bool): Keep gauges (False when merging exited processes,
+            whose in-flight requests and pool sizes are gone)
+
+    Returns:
+        Dict[str, Family]: Families with samples summed by name and labels
+    """
+    merged: Dict[str, Tuple[str, str, Dict[tuple, list]]] = {}
+    for families in snapshots:
+        for name, (kind, documentation, samples) in families.items():
+            if kind == 'gauge' and not gauges:
+                continue
+            totals = merged.setdefault(name, (kind, documentation, {}))[2]
+            for sample_name, labels, value in samples:
+                key = (sample_name, tuple(labels.items()))
+                if key in totals:
+                    totals[key][2] += value
+                else:
+                    totals[key] = [sample_name, labels, value]
+    return {
+        name: (kind, documentation, [tuple(sample) for sample in totals.values()])
+        for name, (kind, documentation, totals) in merged.items()
+    }
+
+
+class SharedMetrics:
+    """
+    Metrics of all worker processes on one host, through a SQLite file.
+
+    A prefork server's workers share one listening socket, so each scrape
+    of ``/metrics`` reaches an arbitrary worker. Every worker therefore
+    writes a snapshot of its registry to the file (every
+    ``publish_seconds`` from a background thread, and when it serves a
+    scrape), and a scrape renders the sum over all snapshots. Counters and
+    histograms of exited workers are folded into one row (pid 0) so totals
+    never go backwards; their gauges are dropped.
+    """
+
+    _RETIRED = 0
+
+    def __init__(self, registry: 'Registry', path: str, publish_seconds: float = 5.0):
+        """
+        Initialize the shared view.
+
+        Args:
+            registry (Registry): This process's registry
+            path (str): SQLite file (e.g. on /dev/shm) shared by the workers
+            publish_seconds (float): Interval between background snapshots
+        """
+        self.registry = registry
+        self.path = path
+        self.publish_seconds = publish_seconds
+        self._local = threading.local()
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS worker_metrics ("
+            " pid INTEGER PRIMARY KEY,"
+            " families TEXT NOT NULL)"
+        )
+        if hasattr(os, 'register_at_fork'):
+            # The lock may have been held by another thread at fork time
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self) -> None:
+        self._start_lock = threading.Lock()
+        self._pid = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def ensure_started(self) -> None:
+        """Start this process's snapshot thread (once per process, after a fork too)."""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._publish_periodically, name='metrics-publisher', daemon=True).start()
+
+    def _publish_periodically(self) -> None:
+        while True:
+            time.sleep(self.publish_seconds)
+            try:
+                self.publish()
+            except Exception as e:
+                logger.warning("Could not publish worker metrics: %s", e)
+
+    def publish(self) -> None:
+        """Write this process's current metrics."""
+        self._connection().execute(
+            "INSERT INTO worker_metrics (pid, families) VALUES (?, ?) "
+            "ON CONFLICT (pid) DO UPDATE SET families = excluded.families",
+            (os.getpid(), json.dumps(self.registry.collect()))
+        )
+
+    def collect(self) -> Dict[str, Family]:
+        """
+        Metrics summed over the workers, after publishing this one's.
+
+        Returns:
+            Dict[str, Family]: Families by metric name
+        """
+        self.publish()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute("SELECT pid, families FROM worker_metrics").fetchall()
+            snapshots = {pid: self._loads(families) for pid, families in rows}
+            exited = [pid for pid in snapshots if pid != self._RETIRED and not _process_exists(pid)]
+            if exited:
+                retired = merge_families(
+                    [snapshots.pop(self._RETIRED, {})] + [snapshots.pop(pid) for pid in exited], gauges=False
+                )
+                snapshots[self._RETIRED] = retired
+                connection.execute(
+                    "INSERT INTO worker_metrics (pid, families) VALUES (?, ?) "
+                    "ON CONFLICT (pid) DO UPDATE SET families = excluded.families",
+                    (self._RETIRED, json.dumps(retired))
+                )
+                connection.executemany("DELETE FROM worker_metrics WHERE pid = ?", [(pid,) for pid in exited])
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return merge_families(snapshots.values())
+
+    def render(self) -> str:
+        """
+        Render the metrics of all workers in the Prometheus text format.
+
+        Returns:
+            str: Exposition text
+        """
+        return render_families(self.collect())
+
+    @staticmethod
+    def _loads(families: str) -> Dict[str, Family]:
+        return {
+            name: (kind, documentation, [tuple(sample) for sample in samples])
+            for name, (kind, documentation, samples) in json.loads(families).items()
+        }
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def create_shared_metrics(config) -> Optional[SharedMetrics]:
+    """
+    Build the cross-worker metrics view selected by configuration.
+
+    Args:
+        config: Config object (``METRICS_BACKEND``, ``METRICS_STORE_PATH``, ...)
+
+    Returns:
+        Optional[SharedMetrics]: None when /metrics serves this process only
+    """
+    backend = config.METRICS_BACKEND.lower()
+    if backend == 'sqlite':
+        return SharedMetrics(registry, config.METRICS_STORE_PATH, config.METRICS_PUBLISH_SECONDS)
+    if backend != 'memory':
+        logger.warning("Unknown METRICS_BACKEND %r, serving per-process metrics", backend)
+    return None
+
+
+registry = Registry()
+
+# HTTP (recorded by the request hooks in create_app and by asgi.py)
+HTTP_REQUESTS = registry.counter(
+    'http_requests_total', 'HTTP requests by endpoint, method and status code',
+    ('endpoint', 'method', 'status')
+)
+HTTP_LATENCY = registry.histogram(
+    'http_request_duration_seconds', 'Time to produce the response (headers) in seconds',
+    ('endpoint', 'method')
+)
+HTTP_IN_FLIGHT = registry.gauge(
+    'http_requests_in_flight', 'Requests being handled', ('endpoint',)
+)
+
+RATE_LIMITED = registry.counter(
+    'rate_limited_requests_total', 'Requests refused with 429 by rate limit', ('limit',)
+)
+
+# MySQL (recorded by Database and AsyncDatabase)
+DB_QUERY_LATENCY = registry.histogram(
+    'db_query_duration_seconds', 'Statement execution time in seconds', ('query',)
+)
+DB_QUERY_ERRORS = registry.counter(
+    'db_query_errors_total', 'Statements that raised a MySQL error', ('query',)
+)
+
+# SMS gateway (recorded by the sync and async gateway clients)
+SMS_SEND_LATENCY = registry.histogram(
+    'sms_send_duration_seconds', 'PRP gateway call time in seconds by outcome', ('result',)
+)
+
+
+def stats_collector(prefix: str, stats: Callable[[], dict], counters: Sequence[str] = ()) -> Callable:
+    """
+    Expose the numeric values of a ``stats()`` dict as metrics.
+
+    Args:
+        prefix (str): Metric name prefix (e.g. ``db_pool``)
+        stats (Callable[[], dict]): Returns the current statistics
+        counters (Sequence[str]): Keys that only ever increase (exported as
+            ``<prefix>_<key>_total`` counters); the rest are gauges
+
+    Returns:
+        Callable: Collector for ``Registry.register_collector``
+    """
+    def collect():
+        for key, value in (stats() or {}).items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if key in counters:
+                name = f'{prefix}_{key}' if key.endswith('_total') else f'{prefix}_{key}_total'
+                yield name, 'counter', f'{prefix} {key}', {}, value
+            else:
+                yield f'{prefix}_{key}', 'gauge', f'{prefix} {key}', {}, value
+    return collect
+
+
+def observe_request(endpoint: Optional[str], method: str, status: int, seconds: float) -> None:
+    """
+    Record one finished HTTP request.
+
+    Args:
+        endpoint (Optional[str]): Endpoint name (None when no route matched)
+        method (str): HTTP method
+        status (int): Response status code
+        seconds (float): Time to produce the response
+    """
+    endpoint = endpoint or 'unmatched'
+    HTTP_REQUESTS.labels(endpoint, method, status).inc()
+    HTTP_LATENCY.labels(endpoint, method).observe(seconds)
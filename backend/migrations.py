@@ -0,0 +1,327 @@
+"""
+Schema migration module.
+Versioned DDL applied once at deploy or startup and recorded in the
+schema_migrations table, so request handlers can assume the schema exists.
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Union
+
+from mysql.connector import Error, errorcode
+
+from database import db
+from mobile_numbers import MOBILE_COLUMN, MOBILE_INDEX, normalize_mobile
+import notifications
+import push
+
+
+logger = logging.getLogger(__name__)
+
+
+MIGRATIONS_TABLE = 'schema_migrations'
+
+# Named lock serializing migration runs across processes and hosts
+MIGRATION_LOCK = 'customer_app_schema_migrations'
+
+
+class Migration:
+    """
+    One schema change.
+
+    ``steps`` are SQL statements or callables taking a cursor. Steps must be
+    safe on databases where the change was already made by hand or by an
+    older tool (CREATE TABLE IF NOT EXISTS, column checks), because the
+    first run on an existing database applies every version.
+    """
+
+    def __init__(self, version: int, name: str, steps: Sequence[Union[str, Callable]]):
+        self.version = version
+        self.name = name
+        self.steps = steps
+
+    def apply(self, cursor) -> None:
+        for step in self.steps:
+            if callable(step):
+                step(cursor)
+            else:
+                cursor.execute(step)
+
+
+def _column_exists(cursor, table: str, column: str) -> bool:
+    cursor.execute(
+        "SELECT 1 FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+        (table, column)
+    )
+    return bool(cursor.fetchall())
+
+
+def _index_exists(cursor, table: str, index: str) -> bool:
+    cursor.execute(
+        "SELECT 1 FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+        (table, index)
+    )
+    return bool(cursor.fetchall())
+
+
+def _add_mobile_normalized(cursor) -> None:
+    # Filled in and indexed by migration 6
+    if not _column_exists(cursor, 'b2c_customer_master', MOBILE_COLUMN):
+        cursor.execute(f"ALTER TABLE b2c_customer_master ADD COLUMN {MOBILE_COLUMN} CHAR(10) NULL")
+
+
+def backfill_mobile_numbers(cursor, batch_size: int = 1000, pause: float = 0.0, dry_run: bool = False) -> dict:
+    """
+    Fill ``mobile_normalized`` for every customer, one keyset page at a time.
+
+    Each page is written in one transaction. If the unique index already
+    exists and a page collides with it, the page is written row by row and
+    the colliding rows are left as they are.
+
+    Args:
+        cursor: Buffered cursor on an autocommit connection
+        batch_size (int): Rows read and updated per transaction
+        pause (float): Seconds to sleep between batches to limit replica lag
+        dry_run (bool): Only count what would change
+
+    Returns:
+        dict: Counters (scanned, updated, unparseable, conflicts)
+    """
+    counters = {'scanned': 0, 'updated': 0, 'unparseable': 0, 'conflicts': 0}
+    update_query = f"UPDATE b2c_customer_master SET {MOBILE_COLUMN} = %s WHERE customer_id = %s"
+    last_id = ''
+    while True:
+        cursor.execute(
+            f"SELECT customer_id, contact_no, {MOBILE_COLUMN} FROM b2c_customer_master "
+            "WHERE customer_id > %s ORDER BY customer_id LIMIT %s",
+            (last_id, batch_size)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            return counters
+        last_id = rows[-1][0]
+        counters['scanned'] += len(rows)
+
+        updates = []
+        for customer_id, contact_no, current in rows:
+            normalized = normalize_mobile(contact_no)
+            if normalized is None:
+                counters['unparseable'] += 1
+            if normalized != current:
+                updates.append((normalized, customer_id))
+        if updates and not dry_run:
+            counters['updated'] += _write_mobile_batch(cursor, update_query, updates, counters)
+        elif updates:
+            counters['updated'] += len(updates)
+
+        logger.info("Mobile number backfill: %s rows scanned (last customer_id %s)", counters['scanned'], last_id)
+        if pause:
+            time.sleep(pause)
+
+
+def _write_mobile_batch(cursor, update_query: str, updates: list, counters: dict) -> int:
+    """Write one page in a transaction, falling back to row by row on conflicts."""
+    try:
+        cursor.execute("START TRANSACTION")
+        cursor.executemany(update_query, updates)
+        cursor.execute("COMMIT")
+        return len(updates)
+    except Error as e:
+        cursor.execute("ROLLBACK")
+        if e.errno != errorcode.ER_DUP_ENTRY:
+            raise
+
+    applied = 0
+    for normalized, customer_id in updates:
+        try:
+            cursor.execute(update_query, (normalized, customer_id))
+            applied += 1
+        except Error as e:
+            if e.errno != errorcode.ER_DUP_ENTRY:
+                raise
+            counters['conflicts'] += 1
+            logger.warning("Customer %s: %s already belongs to another customer", customer_id, normalized)
+    return applied
+
+
+def resolve_mobile_duplicates(cursor, dry_run: bool = False) -> int:
+    """
+    Keep one customer per normalized number so the unique index can be built.
+
+    The approved customer wins, then the lowest customer_id; the others are
+    left without a normalized number (they could never log in unambiguously).
+
+    Args:
+        cursor: Buffered cursor on an autocommit connection
+        dry_run (bool): Only count what would be cleared
+
+    Returns:
+        int: Number of rows cleared
+    """
+    cursor.execute(
+        f"SELECT {MOBILE_COLUMN} FROM b2c_customer_master WHERE {MOBILE_COLUMN} IS NOT NULL "
+        f"GROUP BY {MOBILE_COLUMN} HAVING COUNT(*) > 1"
+    )
+    cleared = 0
+    for (mobile,) in cursor.fetchall():
+        cursor.execute(
+            f"SELECT customer_id, status FROM b2c_customer_master WHERE {MOBILE_COLUMN} = %s",
+            (mobile,)
+        )
+        rows = sorted(cursor.fetchall(), key=lambda row: (row[1] != 'APPROVED', len(row[0]), row[0]))
+        keep = rows[0][0]
+        for customer_id, _ in rows[1:]:
+            logger.warning("%s: keeping customer %s, clearing customer %s", mobile, keep, customer_id)
+            if not dry_run:
+                cursor.execute(
+                    f"UPDATE b2c_customer_master SET {MOBILE_COLUMN} = NULL WHERE customer_id = %s",
+                    (customer_id,)
+                )
+            cleared += 1
+    return cleared
+
+
+def _backfill_mobile_normalized(cursor) -> None:
+    counters = backfill_mobile_numbers(cursor)
+    counters['cleared_duplicates'] = resolve_mobile_duplicates(cursor)
+    logger.info("Mobile number backfill done: %s", counters)
+    if not _index_exists(cursor, 'b2c_customer_master', MOBILE_INDEX):
+        cursor.execute(f"CREATE UNIQUE INDEX {MOBILE_INDEX} ON b2c_customer_master ({MOBILE_COLUMN})")
+
+
+def _add_notification_state_version(cursor) -> None:
+    if not _column_exists(cursor, notifications.STATE_TABLE, 'version'):
+        cursor.execute(
+            f"ALTER TABLE {notifications.STATE_TABLE} "
+            "ADD COLUMN version BIGINT UNSIGNED NOT NULL DEFAULT 0 AFTER last_status"
+        )
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'create_device_tokens', [
+        """
+        CREATE TABLE IF NOT EXISTS device_tokens (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            customer_id VARCHAR(50) NOT NULL,
+            device_token TEXT NOT NULL,
+            platform VARCHAR(10) NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            UNIQUE KEY unique_customer_token (customer_id, device_token(255)),
+            INDEX idx_customer_id (customer_id),
+            INDEX idx_device_token (device_token(255))
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """,
+    ]),
+    Migration(2, 'create_id_sequences', [
+        """
+        CREATE TABLE IF NOT EXISTS id_sequences (
+            name VARCHAR(64) NOT NULL PRIMARY KEY,
+            next_value BIGINT UNSIGNED NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """,
+        # Seed just above the highest existing numeric customer_id (from 1001)
+        """
+        INSERT IGNORE INTO id_sequences (name, next_value)
+        SELECT 'customer_id', GREATEST(COALESCE(MAX(CAST(customer_id AS UNSIGNED)), 0) + 1, 1001)
+        FROM b2c_customer_master WHERE customer_id REGEXP '^[0-9]+$'
+        """,
+    ]),
+    Migration(3, 'add_mobile_normalized', [_add_mobile_normalized]),
+    Migration(4, 'create_notification_tables', [
+        *notifications.SCHEMA,
+        _add_notification_state_version,
+    ]),
+    Migration(5, 'create_push_jobs', list(push.SCHEMA)),
+    Migration(6, 'backfill_mobile_normalized', [_backfill_mobile_normalized]),
+]
+
+
+def _ensure_table(cursor) -> None:
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+            version INT NOT NULL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at DATETIME NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """
+    )
+
+
+def _applied_versions(cursor) -> set:
+    cursor.execute(f"SELECT version FROM {MIGRATIONS_TABLE}")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def status() -> List[dict]:
+    """
+    List every known migration and whether it has been applied.
+
+    Returns:
+        List[dict]: version, name and applied flag per migration
+    """
+    connection = db.get_connection()
+    cursor = connection.cursor(buffered=True)
+    try:
+        connection.dirty = True
+        _ensure_table(cursor)
+        applied = _applied_versions(cursor)
+    finally:
+        cursor.close()
+        connection.close()
+    return [
+        {'version': migration.version, 'name': migration.name, 'applied': migration.version in applied}
+        for migration in MIGRATIONS
+    ]
+
+
+def migrate(target: Optional[int] = None, lock_timeout: int = 60) -> List[Migration]:
+    """
+    Apply pending migrations in version order.
+
+    Runs under a MySQL named lock, so workers starting at the same time (or
+    several hosts deploying at once) apply each migration exactly once; the
+    others wait and then find nothing to do. DDL commits implicitly in
+    MySQL, so a migration that fails part-way is not recorded and its steps
+    run again next time (they are written to be re-runnable).
+
+    Args:
+        target (Optional[int]): Stop after this version (default: latest)
+        lock_timeout (int): Seconds to wait for another process's run
+
+    Returns:
+        List[Migration]: Migrations applied by this call
+    """
+    connection = db.get_connection()
+    cursor = connection.cursor(buffered=True)
+    applied_now = []
+    try:
+        connection.dirty = True
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK, lock_timeout))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError(f"Timed out waiting for the schema migration lock '{MIGRATION_LOCK}'")
+        try:
+            _ensure_table(cursor)
+            applied = _applied_versions(cursor)
+            for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+                if target is not None and migration.version > target:
+                    break
+                if migration.version in applied:
+                    continue
+                logger.info("Applying migration %s: %s", migration.version, migration.name)
+                migration.apply(cursor)
+                cursor.execute(
+                    f"INSERT INTO {MIGRATIONS_TABLE} (version, name, applied_at) VALUES (%s, %s, %s)",
+                    (migration.version, migration.name, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                )
+                applied_now.append(migration)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+            cursor.fetchall()
+    finally:
+        cursor.close()
+        connection.close()
+    return applied_now
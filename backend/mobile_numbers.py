@@ -0,0 +1,56 @@
+"""
+Mobile number normalization module.
+Canonical form used for the indexed customer lookup at login.
+"""
+import re
+from typing import Optional, Tuple
+
+
+# Column on b2c_customer_master holding the canonical 10-digit number
+MOBILE_COLUMN = 'mobile_normalized'
+MOBILE_INDEX = 'uniq_mobile_normalized'
+
+_NON_DIGITS = re.compile(r'[^0-9]')
+
+
+def normalize_mobile(contact_no: Optional[str]) -> Optional[str]:
+    """
+    Reduce a stored or submitted mobile number to its canonical 10 digits.
+
+    Handles every format found in ``contact_no``: ``+919876543210``,
+    ``+91/9876543210``, ``919876543210``, ``09876543210`` and ``9876543210``.
+
+    Args:
+        contact_no (Optional[str]): Mobile number in any supported format
+
+    Returns:
+        Optional[str]: 10-digit number, or None if it cannot be normalized
+    """
+    if not contact_no:
+        return None
+    digits = _NON_DIGITS.sub('', str(contact_no))
+    if len(digits) < 10:
+        return None
+    # Anything before the last 10 digits must be a country code / trunk prefix
+    if len(digits) > 10 and digits[:-10] not in ('91', '0', '091', '0091'):
+        return None
+    return digits[-10:]
+
+
+def legacy_contact_formats(mobile_number: str) -> Tuple[str, ...]:
+    """
+    Parameters for the legacy contact_no scan (CUSTOMER_BY_MOBILE_LEGACY).
+
+    Args:
+        mobile_number (str): 10-digit mobile number
+
+    Returns:
+        Tuple[str, ...]: +91{mobile}, +91/{mobile}, 91{mobile}, {mobile} and a suffix pattern
+    """
+    return (
+        f"+91{mobile_number}",
+        f"+91/{mobile_number}",
+        f"91{mobile_number}",
+        mobile_number,
+        f"%{mobile_number}"
+    )
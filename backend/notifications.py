@@ -0,0 +1,579 @@
+"""
+Customer notification feed module.
+Stores notifications as they are produced by customer events and serves
+them newest first with keyset (cursor) pagination and a maintained unread
+counter.
+"""
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from database import db
+from queries import NOTIFICATION_FEED
+
+
+NOTIFICATIONS_TABLE = 'customer_notifications'
+STATE_TABLE = 'customer_notification_state'
+
+# Cursor for the first page (larger than any id)
+FIRST_PAGE_CURSOR = 2 ** 63 - 1
+
+SCHEMA = (
+    f"""
+    CREATE TABLE IF NOT EXISTS {NOTIFICATIONS_TABLE} (
+        id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+        customer_id VARCHAR(50) NOT NULL,
+        notification_key VARCHAR(32) NOT NULL,
+        type VARCHAR(20) NOT NULL,
+        title VARCHAR(255) NOT NULL,
+        message TEXT NOT NULL,
+        icon VARCHAR(16) NOT NULL,
+        priority VARCHAR(10) NOT NULL,
+        is_read TINYINT(1) NOT NULL DEFAULT 0,
+        created_at DATETIME NOT NULL,
+        read_at DATETIME NULL,
+        UNIQUE KEY uniq_customer_notification (customer_id, notification_key),
+        INDEX idx_customer_feed (customer_id, id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    # One row per customer whose feed has been seeded: the unread counter,
+    # the customer status the feed was last brought up to date with and a
+    # version bumped on every change (part of the feed's ETag)
+    f"""
+    CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+        customer_id VARCHAR(50) NOT NULL PRIMARY KEY,
+        unread_count INT NOT NULL DEFAULT 0,
+        last_status VARCHAR(20) NULL,
+        version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+        updated_at DATETIME NOT NULL
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+)
+
+# Environmental impact estimates per kg of waste
+TREES_PER_KG = 0.08
+CO2_KG_PER_KG = 6
+
+# Notification keys (one notification per key and customer)
+APPROVAL = 'approval'
+WELCOME = 'welcome'
+PENDING = 'pending'
+IMPACT = 'impact'
+SERVICE = 'service'
+
+
+def _parse_time(value) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.strptime(str(value), '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None
+
+
+def time_ago(date_obj: Optional[datetime], now: Optional[datetime] = None) -> str:
+    """
+    Format a timestamp relative to now ("2 days ago", "Just now").
+
+    Args:
+        date_obj (Optional[datetime]): Timestamp
+        now (Optional[datetime]): Reference time (defaults to now)
+
+    Returns:
+        str: Human readable age
+    """
+    if not date_obj:
+        return 'Recently'
+    diff = (now or datetime.now()) - date_obj
+
+    if diff.days > 0:
+        if diff.days == 1:
+            return '1 day ago'
+        elif diff.days < 7:
+            return f'{diff.days} days ago'
+        elif diff.days < 30:
+            weeks = diff.days // 7
+            return f'{weeks} week{"s" if weeks > 1 else ""} ago'
+        else:
+            months = diff.days // 30
+            return f'{months} month{"s" if months > 1 else ""} ago'
+    elif diff.days < 0:
+        return 'Just now'
+    elif diff.seconds >= 3600:
+        hours = diff.seconds // 3600
+        return f'{hours} hour{"s" if hours > 1 else ""} ago'
+    elif diff.seconds >= 60:
+        minutes = diff.seconds // 60
+        return f'{minutes} minute{"s" if minutes > 1 else ""} ago'
+    else:
+        return 'Just now'
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value or 0)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def _render(
+    key: str,
+    customer: dict,
+    created_at: datetime,
+    updated_at: Optional[datetime],
+    days_since_creation: int,
+    est_waste: float,
+    trees_saved: int,
+    co2_reduced: int
+) -> Optional[dict]:
+    """Notification templates; inputs are precomputed by the caller."""
+    customer_name = customer.get('customer_name') or 'Customer'
+
+    if key == APPROVAL:
+        return {
+            'notification_key': key,
+            'type': 'update', 'icon': '✅', 'priority': 'high', 'is_read': False,
+            'title': 'Account Approved',
+            'message': f'Great news, {customer_name}! Your account has been approved. You can now access all features of the app.',
+            'created_at': updated_at if updated_at and updated_at != created_at else created_at
+        }
+
+    if key == WELCOME:
+        return {
+            'notification_key': key,
+            'type': 'update', 'icon': '🌱', 'priority': 'high',
+            'is_read': days_since_creation > 1,
+            'title': 'Welcome to OneStep Greener!',
+            'message': f'Welcome {customer_name}! Thank you for joining our recycling community. Start your eco-journey today!',
+            'created_at': created_at
+        }
+
+    if key == PENDING:
+        return {
+            'notification_key': key,
+            'type': 'update', 'icon': '⏳', 'priority': 'medium', 'is_read': False,
+            'title': 'Profile Under Review',
+            'message': f'Hi {customer_name}, your profile is currently under consideration. We\'ll notify you once it\'s approved.',
+            'created_at': created_at
+        }
+
+    if key == IMPACT:
+        if est_waste <= 0:
+            return None
+        return {
+            'notification_key': key,
+            'type': 'impact', 'icon': '🌍', 'priority': 'medium', 'is_read': True,
+            'title': 'Environmental Impact',
+            'message': f'Your estimated waste quantity of {est_waste}kg could save approximately {trees_saved} trees and reduce {co2_reduced}kg of CO2 emissions!',
+            'created_at': created_at
+        }
+
+    if key == SERVICE:
+        city = customer.get('city')
+        if not city:
+            return None
+        return {
+            'notification_key': key,
+            'type': 'update', 'icon': '♻️', 'priority': 'low', 'is_read': True,
+            'title': 'Service Available',
+            'message': f'Our recycling pickup service is available in {city}. Schedule your first pickup from the dashboard!',
+            'created_at': created_at
+        }
+
+    raise ValueError(f'Unknown notification key: {key}')
+
+
+def build_notification(key: str, customer: dict, now: Optional[datetime] = None) -> Optional[dict]:
+    """
+    Render the notification ``key`` for a customer row.
+
+    Args:
+        key (str): Notification key (APPROVAL, WELCOME, ...)
+        customer (dict): Customer row (customer_name, status, est_waste_qty,
+            city, created_at, updated_at)
+        now (Optional[datetime]): Reference time for the welcome message
+
+    Returns:
+        Optional[dict]: Column values, or None if the key does not apply
+    """
+    now = now or datetime.now()
+    created_at = _parse_time(customer.get('created_at')) or now
+    est_waste = _to_float(customer.get('est_waste_qty'))
+    return _render(
+        key, customer, created_at, _parse_time(customer.get('updated_at')),
+        (now - created_at).days, est_waste,
+        int(est_waste * TREES_PER_KG), int(est_waste * CO2_KG_PER_KG)
+    )
+
+
+def initial_keys(customer: dict, now: Optional[datetime] = None) -> List[str]:
+    """
+    Notifications a customer should have for its current state, oldest first.
+
+    Args:
+        customer (dict): Customer row
+        now (Optional[datetime]): Reference time
+
+    Returns:
+        List[str]: Notification keys in insertion order
+    """
+    keys = [SERVICE, IMPACT]
+    if customer.get('status') == 'PENDING':
+        keys.append(PENDING)
+    created_at = _parse_time(customer.get('created_at'))
+    # Welcome is only worth showing to customers who joined in the last week
+    if created_at is None or ((now or datetime.now()) - created_at).days <= 7:
+        keys.append(WELCOME)
+    if customer.get('status') == 'APPROVED':
+        keys.append(APPROVAL)
+    return keys
+
+
+def notification_id(customer_id, key: str) -> str:
+    """Client-facing notification ID (e.g. ``approval_1001``)."""
+    return f'{key}_{customer_id}'
+
+
+def _touch(customer_id: str, unread_delta: int = 0) -> None:
+    """Record a feed change: bump the version and adjust the unread counter."""
+    db.execute_query(
+        f"UPDATE {STATE_TABLE} SET unread_count = GREATEST(unread_count + %s, 0), "
+        "version = version + 1, updated_at = %s WHERE customer_id = %s",
+        (unread_delta, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), customer_id),
+        fetch=False
+    )
+
+
+def _insert(
+    customer_id: str,
+    key: str,
+    customer: dict,
+    now: Optional[datetime] = None,
+    created_at: Optional[datetime] = None
+) -> int:
+    """Insert one notification unless it exists; returns the unread delta."""
+    notification = build_notification(key, customer, now)
+    if notification is None:
+        return 0
+    if created_at is not None:
+        notification['created_at'] = created_at
+    inserted = db.execute_query(
+        f"INSERT IGNORE INTO {NOTIFICATIONS_TABLE} "
+        "(customer_id, notification_key, type, title, message, icon, priority, is_read, created_at) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        (
+            customer_id, key, notification['type'], notification['title'],
+            notification['message'], notification['icon'], notification['priority'],
+            1 if notification['is_read'] else 0, notification['created_at']
+        ),
+        fetch=False
+    )
+    return 1 if inserted and not notification['is_read'] else 0
+
+
+def _delete(customer_id: str, key: str) -> int:
+    """Delete one notification; returns the unread delta."""
+    unread_removed = db.execute_query(
+        f"DELETE FROM {NOTIFICATIONS_TABLE} "
+        "WHERE customer_id = %s AND notification_key = %s AND is_read = 0",
+        (customer_id, key),
+        fetch=False
+    )
+    db.execute_query(
+        f"DELETE FROM {NOTIFICATIONS_TABLE} WHERE customer_id = %s AND notification_key = %s",
+        (customer_id, key),
+        fetch=False
+    )
+    return -unread_removed
+
+
+def seed(customer: dict) -> bool:
+    """
+    Create a customer's feed from its current state.
+
+    Called at signup, and on the first read for customers created before
+    the feed existed (or by bulk import). Does nothing if the feed exists.
+
+    Args:
+        customer (dict): Customer row
+
+    Returns:
+        bool: True if this call created the feed
+    """
+    customer_id = str(customer['customer_id'])
+    now = datetime.now()
+    with db.transaction():
+        # Claim the feed; a concurrent seed blocks here and then finds the row
+        claimed = db.execute_query(
+            f"INSERT IGNORE INTO {STATE_TABLE} (customer_id, unread_count, last_status, updated_at) "
+            "VALUES (%s, 0, %s, %s)",
+            (customer_id, customer.get('status'), now.strftime('%Y-%m-%d %H:%M:%S')),
+            fetch=False
+        )
+        if not claimed:
+            return False
+        unread = sum(_insert(customer_id, key, customer, now) for key in initial_keys(customer, now))
+        _touch(customer_id, unread)
+    return True
+
+
+def sync_status(customer: dict, last_status: Optional[str]) -> bool:
+    """
+    Apply a status change (e.g. approval by the back office) to the feed.
+
+    Args:
+        customer (dict): Current customer row
+        last_status (Optional[str]): Status the feed was last synced with
+
+    Returns:
+        bool: True if this call applied the change
+    """
+    customer_id = str(customer['customer_id'])
+    status = customer.get('status')
+    with db.transaction():
+        # Compare-and-set so concurrent readers apply the transition once
+        changed = db.execute_query(
+            f"UPDATE {STATE_TABLE} SET last_status = %s, updated_at = %s "
+            "WHERE customer_id = %s AND last_status <=> %s",
+            (status, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), customer_id, last_status),
+            fetch=False
+        )
+        if not changed:
+            return False
+        delta = 0
+        if status != 'PENDING':
+            delta += _delete(customer_id, PENDING)
+        if status == 'APPROVED':
+            delta += _insert(customer_id, APPROVAL, customer)
+        _touch(customer_id, delta)
+    return True
+
+
+def refresh(customer: dict, keys: Iterable[str]) -> None:
+    """
+    Re-publish notifications whose content depends on edited fields.
+
+    The old notification is replaced by a new one at the top of the feed.
+
+    Args:
+        customer (dict): Customer row after the edit
+        keys (Iterable[str]): Notification keys to replace (e.g. IMPACT, SERVICE)
+    """
+    customer_id = str(customer['customer_id'])
+    with db.transaction():
+        exists = db.execute_query(
+            f"SELECT 1 FROM {STATE_TABLE} WHERE customer_id = %s FOR UPDATE",
+            (customer_id,)
+        )
+        if not exists:
+            # Feed not created yet; the first read seeds it from this row
+            return
+        now = datetime.now()
+        delta = 0
+        for key in keys:
+            delta += _delete(customer_id, key)
+            delta += _insert(customer_id, key, customer, now, created_at=now)
+        _touch(customer_id, delta)
+
+
+def page(customer_id, cursor: Optional[int], limit: int) -> Tuple[Optional[dict], List[dict]]:
+    """
+    Read one page of the feed, newest first.
+
+    Args:
+        customer_id: Customer ID
+        cursor (Optional[int]): ``nextCursor`` from the previous page
+        limit (int): Page size
+
+    Returns:
+        Tuple[Optional[dict], List[dict]]: Feed state (``unread_count``,
+        ``last_status``, ``version``; None if the feed does not exist yet)
+        and up to ``limit + 1`` notification rows (the extra row signals a
+        next page)
+    """
+    rows = db.execute_named(NOTIFICATION_FEED, (
+        FIRST_PAGE_CURSOR if cursor is None else cursor, str(customer_id), limit + 1
+    ))
+    if not rows:
+        return None, []
+    state = {
+        'unread_count': rows[0]['unread_count'],
+        'last_status': rows[0]['last_status'],
+        'version': rows[0]['version']
+    }
+    return state, [row for row in rows if row['id'] is not None]
+
+
+def mark_read(customer_id, key: Optional[str] = None) -> int:
+    """
+    Mark one notification (or all of them) as read.
+
+    Args:
+        customer_id: Customer ID
+        key (Optional[str]): Notification key; None marks the whole feed
+
+    Returns:
+        int: Number of notifications that changed to read
+    """
+    customer_id = str(customer_id)
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    query = (
+        f"UPDATE {NOTIFICATIONS_TABLE} SET is_read = 1, read_at = %s "
+        "WHERE customer_id = %s AND is_read = 0"
+    )
+    params = [now, customer_id]
+    if key is not None:
+        query += " AND notification_key = %s"
+        params.append(key)
+
+    with db.transaction():
+        changed = db.execute_query(query, tuple(params), fetch=False)
+        if changed:
+            _touch(customer_id, -changed)
+    return changed
+
+
+def unread_count(customer_id) -> int:
+    """
+    Get a customer's unread counter.
+
+    Args:
+        customer_id: Customer ID
+
+    Returns:
+        int: Unread notifications (0 if the feed does not exist yet)
+    """
+    result = db.execute_query(
+        f"SELECT unread_count FROM {STATE_TABLE} WHERE customer_id = %s",
+        (str(customer_id),),
+        read_only=True
+    )
+    return result[0]['unread_count'] if result else 0
+
+
+def to_response(row: dict, customer_id, now: Optional[datetime] = None) -> dict:
+    """
+    Shape a stored notification for the API.
+
+    Args:
+        row (dict): Notification row from ``page``
+        customer_id: Customer ID
+        now (Optional[datetime]): Reference time for ``time``
+
+    Returns:
+        dict: Notification as returned by /api/notifications
+    """
+    return {
+        'id': notification_id(customer_id, row['notification_key']),
+        'title': row['title'],
+        'message': row['message'],
+        'time': time_ago(_parse_time(row['created_at']), now),
+        'type': row['type'],
+        'icon': row['icon'],
+        'isRead': bool(row['is_read']),
+        'priority': row['priority'],
+        'createdAt': row['created_at']
+    }
+
+
+# Customer columns the notification rules read
+RULE_COLUMNS = ('customer_id', 'customer_name', 'status', 'est_waste_qty', 'city', 'created_at', 'updated_at')
+
+
+def evaluate_batch(customers: List[dict], now: Optional[datetime] = None) -> List[List[dict]]:
+    """
+    Evaluate the notification rules for many customers at once.
+
+    Each rule input is computed one column at a time over the whole batch
+    (status flags, account age, waste quantity and the trees / CO2
+    estimates); only the message templates run per customer.
+
+    Args:
+        customers (List[dict]): Customer rows (at least ``RULE_COLUMNS``)
+        now (Optional[datetime]): Reference time
+
+    Returns:
+        List[List[dict]]: For each customer, its notifications newest first in
+        the /api/notifications shape
+    """
+    now = now or datetime.now()
+
+    statuses = [customer.get('status') for customer in customers]
+    created = [_parse_time(customer.get('created_at')) for customer in customers]
+    updated = [_parse_time(customer.get('updated_at')) for customer in customers]
+    ages = [(now - created_at).days if created_at else None for created_at in created]
+    waste = [_to_float(customer.get('est_waste_qty')) for customer in customers]
+    trees = [int(quantity * TREES_PER_KG) for quantity in waste]
+    co2 = [int(quantity * CO2_KG_PER_KG) for quantity in waste]
+
+    # Rule masks, in the order the single-customer endpoint lists them
+    masks = (
+        (APPROVAL, [status == 'APPROVED' for status in statuses]),
+        (WELCOME, [age is not None and age <= 7 for age in ages]),
+        (PENDING, [status == 'PENDING' for status in statuses]),
+        (IMPACT, [quantity > 0 for quantity in waste]),
+        (SERVICE, [bool(customer.get('city')) for customer in customers]),
+    )
+
+    results = []
+    for i, customer in enumerate(customers):
+        created_at = created[i] or now
+        rows = []
+        for key, mask in masks:
+            if mask[i]:
+                row = _render(
+                    key, customer, created_at, updated[i], ages[i] or 0,
+                    waste[i], trees[i], co2[i]
+                )
+                if row is not None:
+                    rows.append(row)
+        # Newest first; ties keep rule order
+        rows.sort(key=lambda row: row['created_at'], reverse=True)
+        results.append([to_response(row, customer['customer_id'], now) for row in rows])
+    return results
+
+
+def generate_for_customers(
+    customer_ids: Iterable,
+    chunk_size: int = 500,
+    now: Optional[datetime] = None
+) -> Iterator[Tuple[str, Optional[List[dict]]]]:
+    """
+    Evaluate the notification rules for many customers, one chunk at a time.
+
+    Customers are loaded with one ``IN (...)`` query per chunk and results
+    are yielded as soon as their chunk is evaluated, in input order.
+
+    Args:
+        customer_ids (Iterable): Customer IDs (any iterable, read lazily)
+        chunk_size (int): Customers loaded per query
+        now (Optional[datetime]): Reference time
+
+    Yields:
+        Tuple[str, Optional[List[dict]]]: Customer ID and its notifications
+        (None if the customer does not exist)
+    """
+    chunk = []
+    for customer_id in customer_ids:
+        chunk.append(str(customer_id))
+        if len(chunk) >= chunk_size:
+            yield from _generate_chunk(chunk, now)
+            chunk = []
+    if chunk:
+        yield from _generate_chunk(chunk, now)
+
+
+def _generate_chunk(customer_ids: List[str], now: Optional[datetime]) -> Iterator[Tuple[str, Optional[List[dict]]]]:
+    unique_ids = list(dict.fromkeys(customer_ids))
+    rows = db.execute_query(
+        f"SELECT {', '.join(RULE_COLUMNS)} FROM b2c_customer_master "
+        f"WHERE customer_id IN ({', '.join(['%s'] * len(unique_ids))})",
+        tuple(unique_ids),
+        read_only=True
+    ) or []
+    by_id = {str(row['customer_id']): row for row in rows}
+    found = [by_id[customer_id] for customer_id in unique_ids if customer_id in by_id]
+    evaluated = dict(zip((str(row['customer_id']) for row in found), evaluate_batch(found, now)))
+    for customer_id in customer_ids:
+        yield customer_id, evaluated.get(customer_id)
@@ -0,0 +1,630 @@
+"""
+OTP storage module.
+Provides pluggable OTP stores shared by the login endpoints.
+
+Backends:
+    memory - per-process store (single worker / development)
+    sqlite - SQLite file shared by every worker on the same host
+    redis  - any server speaking the Redis protocol (multi-host)
+"""
+import hashlib
+import json
+import logging
+import os
+import select
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from urllib.parse import urlparse
+
+
+logger = logging.getLogger(__name__)
+
+
+class OTPStore(ABC):
+    """
+    Base class for OTP stores.
+
+    Records are plain dicts:
+        {'otp': '123456', 'expires_at': datetime, 'verified': False, 'customer_id': '1001'}
+
+    Every record lives for the same ``ttl_seconds``, so insertion order is also
+    expiry order and the oldest entry is always the next one to expire.
+    """
+
+    def __init__(self, ttl_seconds: int = 300, max_entries: int = 100000):
+        """
+        Initialize the store.
+
+        Args:
+            ttl_seconds (int): Lifetime of each OTP record in seconds
+            max_entries (int): Upper bound on stored records
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+    def set(self, key: str, record: dict) -> datetime:
+        """
+        Store an OTP record, replacing any existing record for the key.
+
+        Args:
+            key (str): 10-digit mobile number
+            record (dict): OTP record (``expires_at`` is filled in by the store)
+
+        Returns:
+            datetime: Expiry time assigned to the record
+        """
+        expires_ts = time.time() + self.ttl_seconds
+        record = dict(record)
+        record['expires_at'] = datetime.fromtimestamp(expires_ts)
+        self._set(key, record, expires_ts)
+        return record['expires_at']
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Fetch a live OTP record.
+
+        Args:
+            key (str): 10-digit mobile number
+
+        Returns:
+            Optional[dict]: OTP record, or None if missing or expired
+        """
+
+    @abstractmethod
+    def update(self, key: str, otp: str, changes: dict) -> bool:
+        """
+        Merge ``changes`` into the live record if it still holds ``otp``.
+
+        The check and the write are one atomic step and the expiry is kept,
+        so a late writer (the SMS status callback) can neither bring back an
+        OTP that was already used nor overwrite a newer OTP requested in the
+        meantime.
+
+        Args:
+            key (str): 10-digit mobile number
+            otp (str): OTP the changes belong to
+            changes (dict): Fields to set, e.g. ``{'sms_status': 'sent'}``
+
+        Returns:
+            bool: True if the record was updated
+        """
+
+    @abstractmethod
+    def consume(self, key: str, otp: str) -> Optional[dict]:
+        """
+        Atomically remove and return the live record if it holds ``otp``.
+
+        Of several concurrent verifications of the same OTP exactly one
+        gets the record; the others get None.
+
+        Args:
+            key (str): 10-digit mobile number
+            otp (str): OTP entered by the user
+
+        Returns:
+            Optional[dict]: The consumed record, or None
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """
+        Remove an OTP record if present.
+
+        Args:
+            key (str): 10-digit mobile number
+        """
+
+    @abstractmethod
+    def _set(self, key: str, record: dict, expires_ts: float) -> None:
+        """Store a record that expires at ``expires_ts`` (epoch seconds)."""
+
+    @staticmethod
+    def _dumps(record: dict) -> str:
+        payload = dict(record)
+        payload['expires_at'] = record['expires_at'].timestamp()
+        return json.dumps(payload, separators=(',', ':'))
+
+    @staticmethod
+    def _loads(raw) -> dict:
+        record = json.loads(raw)
+        record['expires_at'] = datetime.fromtimestamp(record['expires_at'])
+        return record
+
+
+class InMemoryOTPStore(OTPStore):
+    """
+    Per-process OTP store.
+
+    Backed by an OrderedDict kept in expiry order: expired entries are swept
+    from the front on every write and the oldest entry is evicted once
+    ``max_entries`` is reached, so every operation is amortized O(1).
+    """
+
+    def __init__(self, ttl_seconds: int = 300, max_entries: int = 100000):
+        super().__init__(ttl_seconds, max_entries)
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _sweep(self, now: float) -> None:
+        """Drop expired entries from the front of the index (lock held)."""
+        entries = self._entries
+        while entries:
+            key, (expires_ts, _) = next(iter(entries.items()))
+            if expires_ts > now:
+                break
+            del entries[key]
+
+    def _set(self, key: str, record: dict, expires_ts: float) -> None:
+        with self._lock:
+            now = time.time()
+            self._sweep(now)
+            # Re-inserting moves the key to the back, keeping expiry order
+            self._entries.pop(key, None)
+            while len(self._entries) >= self.max_entries:
+                self._entries.popitem(last=False)
+            self._entries[key] = (expires_ts, record)
+
+    def update(self, key: str, otp: str, changes: dict) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time() or entry[1].get('otp') != otp:
+                return False
+            # Same expiry, so the entry keeps its position in the index
+            self._entries[key] = (entry[0], dict(entry[1], **changes))
+            return True
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_ts, record = entry
+            if expires_ts <= time.time():
+                del self._entries[key]
+                return None
+            return dict(record)
+
+    def consume(self, key: str, otp: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1].get('otp') != otp:
+                return None
+            del self._entries[key]
+            expires_ts, record = entry
+            return dict(record) if expires_ts > time.time() else None
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteOTPStore(OTPStore):
+    """
+    OTP store in a SQLite file shared by all workers on one host.
+
+    Point ``path`` at a tmpfs location (e.g. /dev/shm) to keep it in shared
+    memory. Lookups are primary-key probes. Triggers keep the row count in
+    ``otp_store_size``; every ``sweep_interval`` writes, expired rows are
+    deleted as a range on the ``expires_at`` index and, if the count is
+    over ``max_entries``, at most ``sweep_interval`` of the rows that
+    expire first.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: int = 300,
+        max_entries: int = 100000,
+        sweep_interval: int = 100
+    ):
+        super().__init__(ttl_seconds, max_entries)
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS otp_store ("
+            " mobile TEXT PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_otp_store_expires_at ON otp_store (expires_at)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS otp_store_size ("
+            " id INTEGER PRIMARY KEY CHECK (id = 0),"
+            " entries INTEGER NOT NULL)"
+        )
+        connection.execute(
+            "CREATE TRIGGER IF NOT EXISTS otp_store_inserted AFTER INSERT ON otp_store "
+            "BEGIN UPDATE otp_store_size SET entries = entries + 1; END"
+        )
+        connection.execute(
+            "CREATE TRIGGER IF NOT EXISTS otp_store_deleted AFTER DELETE ON otp_store "
+            "BEGIN UPDATE otp_store_size SET entries = entries - 1; END"
+        )
+        # Counted once, for a file written before the triggers existed
+        connection.execute(
+            "INSERT OR IGNORE INTO otp_store_size (id, entries) SELECT 0, COUNT(*) FROM otp_store"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _set(self, key: str, record: dict, expires_ts: float) -> None:
+        connection = self._connection()
+        # An upsert rather than INSERT OR REPLACE, whose implicit delete
+        # would not fire the row count trigger
+        connection.execute(
+            "INSERT INTO otp_store (mobile, payload, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (mobile) DO UPDATE SET payload = excluded.payload, expires_at = excluded.expires_at",
+            (key, self._dumps(record), expires_ts)
+        )
+        with self._writes_lock:
+            self._writes += 1
+            sweep = self._writes % self.sweep_interval == 0
+        if sweep:
+            self._sweep(connection)
+
+    def _sweep(self, connection: sqlite3.Connection) -> None:
+        """Delete expired rows, then the rows that expire first while over max_entries."""
+        connection.execute("DELETE FROM otp_store WHERE expires_at <= ?", (time.time(),))
+        excess = connection.execute("SELECT entries FROM otp_store_size").fetchone()[0] - self.max_entries
+        if excess > 0:
+            # Bounded, so one sweep costs O(sweep_interval) however large the store
+            connection.execute(
+                "DELETE FROM otp_store WHERE mobile IN ("
+                " SELECT mobile FROM otp_store ORDER BY expires_at LIMIT ?)",
+                (min(excess, self.sweep_interval),)
+            )
+
+    def get(self, key: str) -> Optional[dict]:
+        row = self._connection().execute(
+            "SELECT payload FROM otp_store WHERE mobile = ? AND expires_at > ?",
+            (key, time.time())
+        ).fetchone()
+        return self._loads(row[0]) if row else None
+
+    def update(self, key: str, otp: str, changes: dict) -> bool:
+        cursor = self._connection().execute(
+            "UPDATE otp_store SET payload = json_patch(payload, ?) "
+            "WHERE mobile = ? AND expires_at > ? AND json_extract(payload, '$.otp') = ?",
+            (json.dumps(changes), key, time.time(), otp)
+        )
+        return cursor.rowcount == 1
+
+    def consume(self, key: str, otp: str) -> Optional[dict]:
+        # A single statement, so concurrent workers cannot both delete the row
+        # (RETURNING needs SQLite 3.35+)
+        row = self._connection().execute(
+            "DELETE FROM otp_store WHERE mobile = ? AND expires_at > ? "
+            "AND json_extract(payload, '$.otp') = ? RETURNING payload",
+            (key, time.time(), otp)
+        ).fetchone()
+        return self._loads(row[0]) if row else None
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM otp_store WHERE mobile = ?", (key,))
+
+
+class RedisScript:
+    """
+    Lua script run on a Redis-protocol server with EVALSHA.
+
+    The server runs a script without interleaving other commands, which
+    makes it the compare-and-set primitive for the Redis backends.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.sha = hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+
+# Replace a value only if it is still the one that was read
+SWAP_SCRIPT = RedisScript("""
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'KEEPTTL')
+return 1
+""")
+
+
+class RespClient:
+    """
+    Minimal client for servers speaking the Redis protocol (RESP).
+
+    Talks to the server over a per-thread socket (reopened after a fork) so
+    no client library is required. Shared by the Redis OTP store, rate
+    limiter and idempotency store.
+    """
+
+    def __init__(self, url: str, timeout: float = 2.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db_index = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile('rb')
+        self._local.pid = os.getpid()
+        try:
+            if self.password:
+                self.command('AUTH', self.password, retry=True)
+            if self.db_index:
+                self.command('SELECT', str(self.db_index), retry=True)
+        except Exception:
+            self._close()
+            raise
+
+    def _close(self) -> None:
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                self._local.reader.close()
+                sock.close()
+            except OSError:
+                pass
+
+    def _socket(self) -> socket.socket:
+        """
+        Return this thread's live socket, (re)connecting if needed.
+
+        A connection that is readable while no reply is expected has been
+        closed by the server (idle timeout, restart) and is replaced before
+        anything is sent on it. Nothing has been sent yet, so opening the
+        connection is retried once.
+        """
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None and self._local.pid == os.getpid():
+            readable, _, _ = select.select([sock], [], [], 0)
+            if not readable:
+                return sock
+        self._close()
+        try:
+            self._connect()
+        except OSError:
+            self._connect()
+        return self._local.sock
+
+    def command(self, *args, retry: bool = False):
+        """
+        Send one command and read its reply.
+
+        Args:
+            *args: Command name and arguments
+            retry (bool): The command is idempotent and may be sent again if
+                the connection drops after it was sent
+
+        Returns:
+            Reply value (str, int, bytes, list or None)
+        """
+        return self.pipeline(args, retry=retry)[0]
+
+    def pipeline(self, *commands, retry: bool = False) -> list:
+        """
+        Send several commands in one write and read their replies in order.
+
+        A connection lost after the commands were written raises: the server
+        may already have run them, so they are only sent again on a fresh
+        connection when ``retry`` says that is safe.
+
+        Args:
+            *commands: Argument tuples, one per command
+            retry (bool): Every command is idempotent (GET, SET, DEL, ...)
+
+        Returns:
+            list: One reply per command
+
+        Raises:
+            RuntimeError: A command returned an error reply
+        """
+        payload = b''.join(self._encode(args) for args in commands)
+        for attempt in range(2):
+            sock = self._socket()
+            try:
+                sock.sendall(payload)
+                replies = [self._read_reply() for _ in commands]
+                break
+            except (ConnectionError, OSError):
+                self._close()
+                if attempt or not retry:
+                    raise
+        # Every reply is read first so the connection stays in step
+        for reply in replies:
+            if isinstance(reply, RuntimeError):
+                raise reply
+        return replies
+
+    def eval(self, script: RedisScript, keys: tuple, args: tuple, retry: bool = False):
+        """
+        Run a Lua script, sending its source only if the server lacks it.
+
+        Args:
+            script (RedisScript): Script to run
+            keys (tuple): Key names (KEYS)
+            args (tuple): Other arguments (ARGV)
+            retry (bool): Running the script twice is harmless
+
+        Returns:
+            Reply value of the script
+        """
+        try:
+            return self.command('EVALSHA', script.sha, len(keys), *keys, *args, retry=retry)
+        except RuntimeError as error:
+            # Script cache flushed or a fresh server after failover
+            if 'NOSCRIPT' not in str(error):
+                raise
+        return self.command('EVAL', script.source, len(keys), *keys, *args, retry=retry)
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        return b''.join(parts)
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError('Connection closed by Redis server')
+        prefix, body = line[:1], line[1:-2]
+        if prefix == b'+':
+            return body.decode('utf-8')
+        if prefix == b'-':
+            # Returned, not raised, so the rest of a pipeline is still read
+            return RuntimeError(f"Redis error: {body.decode('utf-8')}")
+        if prefix == b':':
+            return int(body)
+        if prefix == b'$':
+            length = int(body)
+            if length < 0:
+                return None
+            data = self._local.reader.read(length + 2)
+            return data[:-2]
+        if prefix == b'*':
+            return [self._read_reply() for _ in range(int(body))]
+        raise RuntimeError(f'Unexpected reply from Redis server: {line!r}')
+
+
+class RedisOTPStore(OTPStore):
+    """
+    OTP store on a Redis-protocol server.
+
+    Expiry is delegated to the server (``SET ... PX``). A sorted set of keys
+    scored by expiry time bounds the store: expired members are dropped on
+    every write, and once more than ``max_entries`` remain the keys that
+    expire first are deleted.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        ttl_seconds: int = 300,
+        max_entries: int = 100000,
+        key_prefix: str = 'otp:',
+        timeout: float = 2.0
+    ):
+        super().__init__(ttl_seconds, max_entries)
+        self.key_prefix = key_prefix
+        # Mobile numbers are digits, so the index cannot collide with a record
+        self.index_key = f'{key_prefix}index'
+        self._client = RespClient(url, timeout)
+
+    def _set(self, key: str, record: dict, expires_ts: float) -> None:
+        ttl_ms = int((expires_ts - time.time()) * 1000)
+        if ttl_ms <= 0:
+            self.delete(key)
+            return
+        name = self.key_prefix + key
+        *_, size = self._client.pipeline(
+            ('SET', name, self._dumps(record), 'PX', str(ttl_ms)),
+            ('ZADD', self.index_key, repr(expires_ts), name),
+            ('ZREMRANGEBYSCORE', self.index_key, '-inf', repr(time.time())),
+            ('ZCARD', self.index_key),
+            retry=True
+        )
+        if size > self.max_entries:
+            self._evict(size - self.max_entries)
+
+    def _evict(self, count: int) -> None:
+        """Delete the ``count`` records that expire first."""
+        popped = self._client.command('ZPOPMIN', self.index_key, str(count))
+        # Reply alternates member, score
+        names = popped[0::2]
+        if names:
+            self._client.command('DEL', *names, retry=True)
+
+    def get(self, key: str) -> Optional[dict]:
+        raw = self._client.command('GET', self.key_prefix + key, retry=True)
+        return self._loads(raw) if raw else None
+
+    def update(self, key: str, otp: str, changes: dict) -> bool:
+        name = self.key_prefix + key
+        while True:
+            raw = self._client.command('GET', name, retry=True)
+            if not raw:
+                return False
+            record = self._loads(raw)
+            if record.get('otp') != otp:
+                return False
+            record.update(changes)
+            # Written only over the value just read (KEEPTTL needs Redis 6.0+);
+            # read again if another write got in between
+            if self._client.eval(SWAP_SCRIPT, (name,), (raw, self._dumps(record)), retry=True):
+                return True
+
+    def consume(self, key: str, otp: str) -> Optional[dict]:
+        name = self.key_prefix + key
+        # GETDEL (Redis 6.2+) hands the record to exactly one caller
+        raw = self._client.command('GETDEL', name)
+        if not raw:
+            return None
+        record = self._loads(raw)
+        if record.get('otp') != otp:
+            # Replaced by a newer OTP since it was read: put that one back
+            # unless yet another OTP has been stored meanwhile
+            ttl_ms = int((record['expires_at'].timestamp() - time.time()) * 1000)
+            if ttl_ms > 0:
+                self._client.command('SET', name, raw, 'PX', str(ttl_ms), 'NX', retry=True)
+            return None
+        self._client.command('ZREM', self.index_key, name, retry=True)
+        return record
+
+    def delete(self, key: str) -> None:
+        name = self.key_prefix + key
+        self._client.pipeline(('DEL', name), ('ZREM', self.index_key, name), retry=True)
+
+
+def create_otp_store(config) -> OTPStore:
+    """
+    Build the OTP store selected by configuration.
+
+    Args:
+        config: Config object (``OTP_STORE_BACKEND``, ``OTP_TTL_SECONDS``, ...)
+
+    Returns:
+        OTPStore: Configured OTP store
+    """
+    backend = config.OTP_STORE_BACKEND.lower()
+    ttl_seconds = config.OTP_TTL_SECONDS
+    max_entries = config.OTP_STORE_MAX_ENTRIES
+
+    if backend == 'sqlite':
+        return SQLiteOTPStore(config.OTP_STORE_PATH, ttl_seconds, max_entries)
+    if backend == 'redis':
+        return RedisOTPStore(config.OTP_REDIS_URL, ttl_seconds, max_entries)
+    if backend != 'memory':
+        logger.warning("Unknown OTP_STORE_BACKEND %r, using in-memory store", backend)
+    return InMemoryOTPStore(ttl_seconds, max_entries)
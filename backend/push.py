@@ -0,0 +1,737 @@
+"""
+Push notification fan-out module.
+Resolves a target audience to device tokens in keyset-paginated batches and
+delivers a message through per-platform providers in the background. Jobs
+and their progress live in the push_jobs table, so any worker can report
+on a job and a job interrupted by a worker restart resumes where it
+stopped.
+"""
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from database import db
+
+
+logger = logging.getLogger(__name__)
+
+
+# Job states
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+JOBS_TABLE = 'push_jobs'
+
+# Applied by migrations.py. Timestamps are epoch seconds from the workers'
+# clocks, the same clock the lease expiry is checked against
+SCHEMA = (
+    f"""
+    CREATE TABLE IF NOT EXISTS {JOBS_TABLE} (
+        id CHAR(32) NOT NULL PRIMARY KEY,
+        state VARCHAR(10) NOT NULL,
+        target TEXT NOT NULL,
+        message TEXT NOT NULL,
+        counters TEXT NOT NULL,
+        error TEXT NULL,
+        cursor_offset INT NOT NULL DEFAULT 0,
+        cursor_token_id INT NOT NULL DEFAULT 0,
+        owner VARCHAR(100) NULL,
+        heartbeat_at DOUBLE NULL,
+        created_at DOUBLE NOT NULL,
+        started_at DOUBLE NULL,
+        finished_at DOUBLE NULL,
+        INDEX idx_state_created (state, created_at)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+)
+
+
+class PushMessage:
+    """Notification payload sent to every device of the audience."""
+
+    __slots__ = ('title', 'body', 'data')
+
+    def __init__(self, title: str, body: str, data: Optional[dict] = None):
+        self.title = title
+        self.body = body
+        self.data = data or {}
+
+    def to_dict(self) -> dict:
+        return {'title': self.title, 'body': self.body, 'data': self.data}
+
+    @classmethod
+    def from_dict(cls, values: dict) -> 'PushMessage':
+        return cls(values['title'], values['body'], values.get('data'))
+
+
+class PushResult:
+    """Outcome of one provider batch."""
+
+    __slots__ = ('sent', 'failed', 'invalid_tokens')
+
+    def __init__(self, sent: int = 0, failed: int = 0, invalid_tokens: Optional[List[str]] = None):
+        self.sent = sent
+        self.failed = failed
+        # Tokens the provider reports as unregistered; they are pruned
+        self.invalid_tokens = invalid_tokens or []
+
+
+class PushProvider(ABC):
+    """
+    Delivery backend for one platform (FCM, APNS, ...).
+
+    Subclasses implement ``send`` for up to ``batch_size`` tokens per call
+    (the provider's multicast limit). ``send`` may be called from several
+    threads at once.
+    """
+
+    name = 'base'
+    batch_size = 500
+
+    @abstractmethod
+    def send(self, tokens: List[str], message: PushMessage) -> PushResult:
+        """
+        Deliver ``message`` to ``tokens``.
+
+        Args:
+            tokens (List[str]): Device tokens (at most ``batch_size``)
+            message (PushMessage): Payload
+
+        Returns:
+            PushResult: Per-batch counts and invalid tokens
+        """
+
+
+class StubPushProvider(PushProvider):
+    """
+    Local provider that accepts every token except those starting with
+    ``invalid_prefix`` (reported as unregistered). Keeps the last
+    ``keep_messages`` deliveries for inspection.
+    """
+
+    name = 'stub'
+
+    def __init__(self, batch_size: int = 500, latency: float = 0.0,
+                 invalid_prefix: str = 'invalid', keep_messages: int = 1000):
+        """
+        Initialize the stub.
+
+        Args:
+            batch_size (int): Tokens per send call
+            latency (float): Seconds each send call takes (simulates the network)
+            invalid_prefix (str): Tokens with this prefix are reported invalid
+            keep_messages (int): Number of recent deliveries kept in ``messages``
+        """
+        self.batch_size = batch_size
+        self.latency = latency
+        self.invalid_prefix = invalid_prefix
+        self.calls = 0
+        self.messages = []
+        self._keep_messages = keep_messages
+        self._lock = threading.Lock()
+
+    def send(self, tokens: List[str], message: PushMessage) -> PushResult:
+        if self.latency:
+            time.sleep(self.latency)
+        invalid = [token for token in tokens if token.startswith(self.invalid_prefix)]
+        with self._lock:
+            self.calls += 1
+            for token in tokens:
+                if not token.startswith(self.invalid_prefix):
+                    self.messages.append((token, message.title))
+            del self.messages[:-self._keep_messages]
+        return PushResult(sent=len(tokens) - len(invalid), invalid_tokens=invalid)
+
+
+class PushTarget:
+    """
+    Audience of a push: customers matching every given filter.
+
+    ``customer_ids`` selects customers directly; ``city`` and ``status``
+    filter on b2c_customer_master. With no filters every registered device
+    is targeted.
+    """
+
+    def __init__(self, customer_ids: Optional[List[str]] = None,
+                 city: Optional[str] = None, status: Optional[str] = None):
+        self.customer_ids = [str(customer_id) for customer_id in customer_ids] if customer_ids else None
+        self.city = city
+        self.status = status
+
+    def to_dict(self) -> dict:
+        return {'customerIds': self.customer_ids, 'city': self.city, 'status': self.status}
+
+    @classmethod
+    def from_dict(cls, values: dict) -> 'PushTarget':
+        return cls(values.get('customerIds'), values.get('city'), values.get('status'))
+
+    def describe(self) -> dict:
+        return {
+            'customerIds': len(self.customer_ids) if self.customer_ids else None,
+            'city': self.city,
+            'status': self.status
+        }
+
+
+def resolve_tokens(
+    target: PushTarget,
+    page_size: int = 1000,
+    cursor: Tuple[int, int] = (0, 0)
+) -> Iterator[Tuple[Tuple[int, int], List[dict]]]:
+    """
+    Read the target's device tokens one page at a time.
+
+    Pages are keyset-paginated on device_tokens.id; customer ID targets are
+    additionally read ``page_size`` customers at a time through
+    idx_customer_id. Each page comes with the cursor just past it, and
+    passing that cursor back continues after the page.
+
+    Args:
+        target (PushTarget): Audience
+        page_size (int): Rows per query
+        cursor (Tuple[int, int]): (offset into customer_ids, last
+            device_tokens.id read) to resume after; (0, 0) starts over
+
+    Yields:
+        Tuple[Tuple[int, int], List[dict]]: (cursor after the page, rows
+        with id, device_token and platform)
+    """
+    offset, last_id = cursor
+    if target.customer_ids:
+        for start in range(offset, len(target.customer_ids), page_size):
+            chunk = target.customer_ids[start:start + page_size]
+            for page in _token_pages(target, page_size, chunk, last_id if start == offset else 0):
+                yield (start, page[-1]['id']), page
+    else:
+        for page in _token_pages(target, page_size, None, last_id):
+            yield (0, page[-1]['id']), page
+
+
+def _token_pages(
+    target: PushTarget,
+    page_size: int,
+    customer_ids: Optional[List[str]],
+    last_id: int
+) -> Iterator[List[dict]]:
+    conditions = ["t.id > %s"]
+    params = []
+    join = ''
+    if customer_ids:
+        conditions.append(f"t.customer_id IN ({', '.join(['%s'] * len(customer_ids))})")
+        params.extend(customer_ids)
+    if target.city or target.status:
+        join = "JOIN b2c_customer_master c ON c.customer_id = t.customer_id"
+        if target.city:
+            conditions.append("c.city = %s")
+            params.append(target.city)
+        if target.status:
+            conditions.append("c.status = %s")
+            params.append(target.status)
+    query = (
+        f"SELECT t.id, t.device_token, t.platform FROM device_tokens t {join} "
+        f"WHERE {' AND '.join(conditions)} ORDER BY t.id LIMIT %s"
+    )
+
+    while True:
+        rows = db.execute_query(query, (last_id, *params, page_size), read_only=True)
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]['id']
+
+
+def prune_tokens(token_ids: List[int], batch_size: int = 500) -> int:
+    """
+    Delete device tokens the provider reported as invalid.
+
+    Args:
+        token_ids (List[int]): device_tokens.id values
+        batch_size (int): IDs per DELETE statement
+
+    Returns:
+        int: Rows deleted
+    """
+    deleted = 0
+    for start in range(0, len(token_ids), batch_size):
+        chunk = token_ids[start:start + batch_size]
+        deleted += db.execute_query(
+            f"DELETE FROM device_tokens WHERE id IN ({', '.join(['%s'] * len(chunk))})",
+            tuple(chunk),
+            fetch=False
+        )
+    return deleted
+
+
+class PushJob:
+    """Progress of one fan-out, as stored in push_jobs."""
+
+    def __init__(self, target: PushTarget, message: PushMessage, job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.target = target
+        self.message = message
+        self.state = JOB_QUEUED
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.counters = {'tokens': 0, 'batches': 0, 'sent': 0, 'failed': 0, 'invalid': 0, 'pruned': 0, 'skipped': 0}
+        # (offset into target.customer_ids, last device_tokens.id) of the
+        # last page whose batches have all completed
+        self.cursor = (0, 0)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_row(cls, row: dict) -> 'PushJob':
+        job = cls(
+            PushTarget.from_dict(json.loads(row['target'])),
+            PushMessage.from_dict(json.loads(row['message'])),
+            row['id']
+        )
+        job.state = row['state']
+        job.error = row['error']
+        job.created_at = row['created_at']
+        job.started_at = row['started_at']
+        job.finished_at = row['finished_at']
+        job.counters.update(json.loads(row['counters']))
+        job.cursor = (row['cursor_offset'], row['cursor_token_id'])
+        return job
+
+    def add(self, **counts) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                self.counters[name] += value
+
+    def counters_json(self) -> str:
+        with self._lock:
+            return json.dumps(self.counters)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        end = self.finished_at or time.time()
+        return {
+            'jobId': self.id,
+            'state': self.state,
+            'error': self.error,
+            'target': self.target.describe(),
+            'title': self.message.title,
+            'counters': counters,
+            'durationSeconds': round(end - self.started_at, 3) if self.started_at else None
+        }
+
+
+class PushJobStore:
+    """
+    push_jobs table access.
+
+    A worker claims a job by taking its lease (``owner`` and
+    ``heartbeat_at``); the lease is renewed with every progress checkpoint.
+    Queued jobs, and running jobs whose lease has expired because their
+    worker died, can be claimed by any worker.
+    """
+
+    _COLUMNS = (
+        "id, state, target, message, counters, error, cursor_offset, cursor_token_id, "
+        "created_at, started_at, finished_at"
+    )
+
+    def create(self, job: PushJob) -> None:
+        db.execute_query(
+            f"INSERT INTO {JOBS_TABLE} (id, state, target, message, counters, created_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            (job.id, job.state, json.dumps(job.target.to_dict()), json.dumps(job.message.to_dict()),
+             job.counters_json(), job.created_at),
+            fetch=False
+        )
+
+    def get(self, job_id: str) -> Optional[PushJob]:
+        rows = db.execute_query(
+            f"SELECT {self._COLUMNS} FROM {JOBS_TABLE} WHERE id = %s", (job_id,), read_only=True
+        )
+        return PushJob.from_row(rows[0]) if rows else None
+
+    def count(self, state: str) -> int:
+        rows = db.execute_query(
+            f"SELECT COUNT(*) AS jobs FROM {JOBS_TABLE} WHERE state = %s", (state,), read_only=True
+        )
+        return rows[0]['jobs']
+
+    def claim(self, owner: str, lease_seconds: float) -> Optional[PushJob]:
+        """
+        Take the lease on the oldest claimable job.
+
+        Args:
+            owner (str): Identity of the claiming worker
+            lease_seconds (float): Age after which a running job's lease is expired
+
+        Returns:
+            Optional[PushJob]: The claimed job (state running), or None
+        """
+        now = time.time()
+        expired = now - lease_seconds
+        candidates = db.execute_query(
+            f"SELECT id FROM {JOBS_TABLE} "
+            "WHERE state = %s OR (state = %s AND heartbeat_at < %s) ORDER BY created_at LIMIT 10",
+            (JOB_QUEUED, JOB_RUNNING, expired),
+            read_only=True
+        )
+        for candidate in candidates:
+            # Only one worker's conditional update matches
+            claimed = db.execute_query(
+                f"UPDATE {JOBS_TABLE} SET state = %s, owner = %s, heartbeat_at = %s, "
+                "started_at = COALESCE(started_at, %s) "
+                "WHERE id = %s AND (state = %s OR (state = %s AND heartbeat_at < %s))",
+                (JOB_RUNNING, owner, now, now, candidate['id'], JOB_QUEUED, JOB_RUNNING, expired),
+                fetch=False
+            )
+            if claimed:
+                return self.get(candidate['id'])
+        return None
+
+    def checkpoint(self, job: PushJob, owner: str) -> None:
+        """Save the job's counters and cursor and renew its lease."""
+        db.execute_query(
+            f"UPDATE {JOBS_TABLE} SET counters = %s, cursor_offset = %s, cursor_token_id = %s, heartbeat_at = %s "
+            "WHERE id = %s AND owner = %s",
+            (job.counters_json(), job.cursor[0], job.cursor[1], time.time(), job.id, owner),
+            fetch=False
+        )
+
+    def finish(self, job: PushJob, owner: str) -> None:
+        """Record the job's final state, counters and error."""
+        db.execute_query(
+            f"UPDATE {JOBS_TABLE} SET state = %s, error = %s, counters = %s, cursor_offset = %s, "
+            "cursor_token_id = %s, finished_at = %s, owner = NULL WHERE id = %s AND owner = %s",
+            (job.state, job.error, job.counters_json(), job.cursor[0], job.cursor[1], job.finished_at,
+             job.id, owner),
+            fetch=False
+        )
+
+    def release(self, job: PushJob, owner: str) -> None:
+        """Hand an unfinished job back to the queue at its saved cursor."""
+        db.execute_query(
+            f"UPDATE {JOBS_TABLE} SET state = %s, counters = %s, cursor_offset = %s, cursor_token_id = %s, "
+            "owner = NULL, heartbeat_at = NULL WHERE id = %s AND owner = %s",
+            (JOB_QUEUED, job.counters_json(), job.cursor[0], job.cursor[1], job.id, owner),
+            fetch=False
+        )
+
+    def purge(self, finished_before: float) -> int:
+        """Delete jobs that finished before ``finished_before`` (epoch seconds)."""
+        return db.execute_query(
+            f"DELETE FROM {JOBS_TABLE} WHERE state IN (%s, %s) AND finished_at < %s",
+            (JOB_DONE, JOB_FAILED, finished_before),
+            fetch=False
+        )
+
+    def stats(self) -> Dict[str, int]:
+        rows = db.execute_query(
+            f"SELECT state, COUNT(*) AS jobs FROM {JOBS_TABLE} GROUP BY state", read_only=True
+        )
+        jobs = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_DONE: 0, JOB_FAILED: 0}
+        jobs.update((row['state'], row['jobs']) for row in rows)
+        return jobs
+
+
+class PushFanout:
+    """
+    Background fan-out engine.
+
+    ``submit`` stores a queued job and returns immediately. In each worker
+    process a coordinator thread claims jobs from the store one at a time.
+    It streams token pages from ``resolve_tokens``, cuts them into
+    per-provider batches and sends them on a pool of ``concurrency`` sender
+    threads. At most ``2 * concurrency`` batches are in flight, so memory
+    stays bounded however large the audience is. Invalid tokens are
+    collected as batches complete and pruned in bulk.
+
+    Once every batch of a page has completed, the page's cursor is saved
+    with the counters. A job whose worker stops is handed back at that
+    cursor (``stop``), or claimed by another worker once its lease expires
+    (the worker died); either way it resumes after the last completed page.
+    Delivery is at least once: batches in flight when a worker dies are
+    sent again.
+
+    Threads start lazily in the process that first calls ``start``,
+    ``submit`` or ``get`` (safe to create before a prefork server forks).
+    """
+
+    def __init__(
+        self,
+        providers: Dict[str, PushProvider],
+        store: Optional[PushJobStore] = None,
+        concurrency: int = 8,
+        page_size: int = 1000,
+        max_queue: int = 20,
+        lease_seconds: float = 120,
+        poll_seconds: float = 5,
+        retention_seconds: float = 7 * 86400
+    ):
+        """
+        Initialize the engine.
+
+        Args:
+            providers (Dict[str, PushProvider]): Provider per device platform
+                ('android', 'ios'); tokens of other platforms are skipped
+            store (Optional[PushJobStore]): Job storage (default: push_jobs table)
+            concurrency (int): Provider batches sent in parallel
+            page_size (int): Tokens read per database query
+            max_queue (int): Jobs waiting to run, across all workers
+            lease_seconds (float): Time without a checkpoint after which a
+                running job is taken over by another worker
+            poll_seconds (float): How often an idle coordinator looks for jobs
+            retention_seconds (float): How long finished jobs stay readable
+        """
+        self.providers = providers
+        self.store = store or PushJobStore()
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.max_queue = max_queue
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._executor = None
+        self._coordinator_thread = None
+        self._owner = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def _ensure_started(self) -> None:
+        """Start the coordinator and sender threads once per process."""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+            self._wake = threading.Event()
+            self._stopping = threading.Event()
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='push-send')
+            self._coordinator_thread = threading.Thread(target=self._coordinator, name='push-fanout', daemon=True)
+            self._coordinator_thread.start()
+            self._pid = os.getpid()
+
+    def start(self) -> None:
+        """Start taking jobs in this process (including ones left by a stopped worker)."""
+        self._ensure_started()
+
+    def submit(self, target: PushTarget, message: PushMessage) -> PushJob:
+        """
+        Queue a fan-out without blocking.
+
+        Args:
+            target (PushTarget): Audience
+            message (PushMessage): Payload
+
+        Returns:
+            PushJob: The queued job
+
+        Raises:
+            queue.Full: Too many jobs are waiting, or this worker is stopping
+        """
+        self._ensure_started()
+        if self._stopping.is_set() or self.store.count(JOB_QUEUED) >= self.max_queue:
+            raise queue.Full
+        job = PushJob(target, message)
+        self.store.create(job)
+        self._wake.set()
+        return job
+
+    def get(self, job_id: str) -> Optional[PushJob]:
+        self._ensure_started()
+        return self.store.get(job_id)
+
+    def stop(self, timeout: float = 10.0) -> bool:
+        """
+        Stop taking jobs and hand the running one back to the queue.
+
+        Batches already sent to the providers are waited for and the job's
+        cursor saved, so another worker resumes it after them.
+
+        Args:
+            timeout (float): Seconds to wait for the coordinator
+
+        Returns:
+            bool: True if the coordinator stopped in time (otherwise the
+            running job is taken over when its lease expires)
+        """
+        if self._pid != os.getpid():
+            return True
+        self._stopping.set()
+        self._wake.set()
+        self._coordinator_thread.join(timeout)
+        self._executor.shutdown(wait=False)
+        return not self._coordinator_thread.is_alive()
+
+    def _coordinator(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = self.store.claim(self._owner, self.lease_seconds)
+            except Exception as e:
+                logger.warning("Could not claim a push job: %s", e)
+                job = None
+            if job is None:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+                continue
+            self._process(job)
+
+    def _process(self, job: PushJob) -> None:
+        """Run a claimed job and record how it ended."""
+        try:
+            finished = self.run(job)
+        except Exception as e:
+            job.state = JOB_FAILED
+            job.error = str(e)
+            logger.exception("Error in push fan-out %s: %s", job.id, e)
+        else:
+            if not finished:
+                self.store.release(job, self._owner)
+                logger.info("Push fan-out %s handed back at cursor %s", job.id, job.cursor)
+                return
+            job.state = JOB_DONE
+        job.finished_at = time.time()
+        try:
+            self.store.finish(job, self._owner)
+            self.store.purge(job.finished_at - self.retention_seconds)
+        except Exception as e:
+            # The lease expires and another worker resumes the job
+            logger.exception("Could not record the end of push fan-out %s: %s", job.id, e)
+
+    def run(self, job: PushJob) -> bool:
+        """
+        Fan out one job from its cursor on the calling thread's database connection.
+
+        Args:
+            job (PushJob): Job to run
+
+        Returns:
+            bool: True if the audience was exhausted, False if ``stop`` interrupted it
+        """
+        in_flight = threading.BoundedSemaphore(self.concurrency * 2)
+
+        def send(provider: PushProvider, rows: List[dict]):
+            try:
+                result = provider.send([row['device_token'] for row in rows], job.message)
+                job.add(batches=1, sent=result.sent, failed=result.failed)
+                return rows, result.invalid_tokens
+            except Exception as e:
+                logger.warning("Push provider %s failed a batch: %s", provider.name, e)
+                job.add(batches=1, failed=len(rows))
+                return rows, []
+            finally:
+                in_flight.release()
+
+        # Batch futures in submission order, each page followed by its cursor
+        pending = deque()
+        invalid_ids = []
+
+        def collect(wait: bool) -> None:
+            # Completed batches are collected in submission order; a page's
+            # cursor is reached once all of its batches are
+            while pending:
+                item = pending[0]
+                if isinstance(item, tuple):
+                    job.cursor = item
+                elif wait or item.done():
+                    rows, invalid_tokens = item.result()
+                    if invalid_tokens:
+                        invalid = set(invalid_tokens)
+                        invalid_ids.extend(row['id'] for row in rows if row['device_token'] in invalid)
+                else:
+                    break
+                pending.popleft()
+
+        def prune() -> None:
+            if invalid_ids:
+                job.add(invalid=len(invalid_ids), pruned=prune_tokens(invalid_ids))
+                invalid_ids.clear()
+
+        finished = True
+        for cursor, page in resolve_tokens(job.target, self.page_size, job.cursor):
+            job.add(tokens=len(page))
+            by_platform = {}
+            for row in page:
+                by_platform.setdefault((row['platform'] or '').lower(), []).append(row)
+
+            for platform, rows in by_platform.items():
+                provider = self.providers.get(platform)
+                if provider is None:
+                    job.add(skipped=len(rows))
+                    continue
+                for start in range(0, len(rows), provider.batch_size):
+                    # Blocks while the senders are saturated
+                    in_flight.acquire()
+                    try:
+                        future = self._executor.submit(send, provider, rows[start:start + provider.batch_size])
+                    except BaseException:
+                        # Executor shut down by stop(): the batch never runs
+                        in_flight.release()
+                        raise
+                    pending.append(future)
+            pending.append(cursor)
+
+            saved = job.cursor
+            collect(wait=False)
+            if len(invalid_ids) >= self.page_size:
+                prune()
+            if job.cursor != saved:
+                self.store.checkpoint(job, self._owner)
+            if self._stopping.is_set():
+                finished = False
+                break
+
+        collect(wait=True)
+        prune()
+        if not finished:
+            self.store.checkpoint(job, self._owner)
+        return finished
+
+    def stats(self) -> dict:
+        """
+        Job counts by state, across all workers.
+
+        Returns:
+            dict: Queue depth and job counts by state
+        """
+        jobs = self.store.stats()
+        return {'queued': jobs[JOB_QUEUED], 'jobs': jobs}
+
+
+def create_push_fanout(config) -> PushFanout:
+    """
+    Build the fan-out engine from configuration.
+
+    Args:
+        config: Config instance (PUSH_PROVIDER, PUSH_BATCH_SIZE, PUSH_CONCURRENCY, ...)
+
+    Returns:
+        PushFanout: Engine with one provider per platform
+    """
+    if config.PUSH_PROVIDER != 'stub':
+        raise ValueError(f"Unknown PUSH_PROVIDER '{config.PUSH_PROVIDER}' (available: stub)")
+    provider = StubPushProvider(batch_size=config.PUSH_BATCH_SIZE)
+    return PushFanout(
+        {'android': provider, 'ios': provider},
+        concurrency=config.PUSH_CONCURRENCY,
+        page_size=config.PUSH_PAGE_SIZE,
+        max_queue=config.PUSH_MAX_QUEUED,
+        lease_seconds=config.PUSH_LEASE_SECONDS,
+        poll_seconds=config.PUSH_POLL_SECONDS,
+        retention_seconds=config.PUSH_JOB_RETENTION_DAYS * 86400
+    )
@@ -0,0 +1,80 @@
+"""
+Named query registry.
+Hot statements executed as cached server-side prepared statements.
+"""
+
+
+class NamedQuery:
+    """
+    A registered SQL statement.
+
+    ``name`` keys the per-connection prepared-statement cache; ``read_only``
+    statements let the connection skip the session reset when it is returned.
+    """
+
+    __slots__ = ('name', 'sql', 'read_only')
+
+    def __init__(self, name: str, sql: str, read_only: bool = True):
+        self.name = name
+        self.sql = sql
+        self.read_only = read_only
+
+    def __repr__(self) -> str:
+        return f'NamedQuery({self.name!r})'
+
+
+# Full customer row; every endpoint reading a customer by ID shares it so a
+# single prepared statement (and cache entry) serves them all
+CUSTOMER_BY_ID = NamedQuery('customer_by_id', """
+    SELECT customer_id, customer_name, email, contact_no, mobile_normalized, address,
+           city, state, est_waste_qty, poc, user_type, reference,
+           status, latitude, longitude, created_at, updated_at
+    FROM b2c_customer_master
+    WHERE customer_id = %s
+""")
+
+# Login lookup on the unique mobile_normalized index
+CUSTOMER_BY_MOBILE = NamedQuery('customer_by_mobile', """
+    SELECT customer_id, customer_name, status, contact_no
+    FROM b2c_customer_master
+    WHERE mobile_normalized = %s
+    LIMIT 1
+""")
+
+# Legacy scan over every stored contact_no format, only used for rows
+# written without mobile_normalized by other systems (MOBILE_LOOKUP_FALLBACK);
+# parameters come from mobile_numbers.legacy_contact_formats
+CUSTOMER_BY_MOBILE_LEGACY = NamedQuery('customer_by_mobile_legacy', """
+    SELECT customer_id, customer_name, status, contact_no 
+    FROM b2c_customer_master 
+    WHERE contact_no = %s 
+       OR contact_no = %s 
+       OR contact_no = %s
+       OR contact_no = %s
+       OR contact_no LIKE %s
+    LIMIT 1
+""")
+
+DEVICE_TOKEN_UPSERT = NamedQuery('device_token_upsert', """
+    INSERT INTO device_tokens (customer_id, device_token, platform, updated_at)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        device_token = VALUES(device_token),
+        platform = VALUES(platform),
+        updated_at = VALUES(updated_at)
+""", read_only=False)
+
+# One page of a customer's notification feed plus its unread counter, read
+# newest first along idx_customer_feed (customer_id, id). The state row
+# always comes back (with NULL notification columns past the last page).
+NOTIFICATION_FEED = NamedQuery('notification_feed', """
+    SELECT s.unread_count, s.last_status, s.version,
+           n.id, n.notification_key, n.type, n.title, n.message,
+           n.icon, n.priority, n.is_read, n.created_at
+    FROM customer_notification_state s
+    LEFT JOIN customer_notifications n
+        ON n.customer_id = s.customer_id AND n.id < %s
+    WHERE s.customer_id = %s
+    ORDER BY n.id DESC
+    LIMIT %s
+""")
@@ -0,0 +1,232 @@
+"""
+Query statistics module.
+Per-statement timing keyed by a normalized fingerprint of the SQL, and the
+slow-query log.
+"""
+import logging
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Callable, List, Optional
+
+from config import Config
+
+
+slow_query_logger = logging.getLogger('slow_query')
+
+_COMMENT = re.compile(r'/\*.*?\*/|--[^\n]*|#[^\n]*', re.S)
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_NUMBER = re.compile(r'(?<![\w$])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?(?![\w$])', re.I)
+_PLACEHOLDER = re.compile(r'%\((\w+)\)s|%s')
+_VALUE_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_VALUE_ROWS = re.compile(r'(\(\?\+\))(?:\s*,\s*\(\?\+\))+')
+_SPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql: str) -> str:
+    """
+    Normalize a statement so executions that differ only in values group together.
+
+    Literals and driver placeholders become ``?``, ``IN (?, ?, ...)`` lists
+    and multi-row ``VALUES`` collapse to one entry, comments are removed
+    and whitespace is collapsed.
+
+    Args:
+        sql (str): Statement text
+
+    Returns:
+        str: Fingerprint (lower case)
+    """
+    text = _COMMENT.sub(' ', sql)
+    text = _STRING.sub('?', text)
+    text = _PLACEHOLDER.sub('?', text)
+    text = _NUMBER.sub('?', text)
+    text = _VALUE_LIST.sub('(?+)', text)
+    text = _VALUE_ROWS.sub(r'\1', text)
+    return _SPACE.sub(' ', text).strip().lower()
+
+
+class _Entry:
+    __slots__ = ('name', 'count', 'errors', 'total', 'max', 'samples', 'last_explained')
+
+    def __init__(self, name: str, window: int):
+        self.name = name
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        # Most recent durations; p50/p99 are computed over this window
+        self.samples = deque(maxlen=window)
+        self.last_explained = 0.0
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class QueryStats:
+    """
+    Rolling statistics per statement fingerprint.
+
+    Keeps count, errors, total and max time for every fingerprint since the
+    last reset, and the most recent ``window`` durations for percentiles.
+    At most ``max_fingerprints`` are tracked; statements beyond that are
+    counted under ``other``.
+    """
+
+    OTHER = 'other'
+
+    def __init__(
+        self,
+        window: int = 1000,
+        max_fingerprints: int = 1000,
+        slow_threshold: float = 0.2,
+        explain: bool = False,
+        explain_interval: float = 60.0
+    ):
+        """
+        Initialize the statistics.
+
+        Args:
+            window (int): Durations kept per fingerprint for p50/p99
+            max_fingerprints (int): Distinct fingerprints tracked
+            slow_threshold (float): Seconds above which a statement is logged as slow (0 disables)
+            explain (bool): Add EXPLAIN output to slow SELECT entries
+            explain_interval (float): Minimum seconds between EXPLAINs of the same fingerprint
+        """
+        self.window = window
+        self.max_fingerprints = max_fingerprints
+        self.slow_threshold = slow_threshold
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    @classmethod
+    def from_config(cls, config) -> 'QueryStats':
+        """
+        Build the statistics from Config.
+
+        Args:
+            config: Config object
+
+        Returns:
+            QueryStats: Configured instance
+        """
+        return cls(
+            window=config.DB_QUERY_STATS_WINDOW,
+            max_fingerprints=config.DB_QUERY_STATS_MAX_FINGERPRINTS,
+            slow_threshold=config.DB_SLOW_QUERY_MS / 1000.0,
+            explain=config.DB_SLOW_QUERY_EXPLAIN
+        )
+
+    def record(
+        self,
+        sql: str,
+        name: str,
+        seconds: float,
+        error: bool = False,
+        explain: Optional[Callable[[], list]] = None
+    ) -> None:
+        """
+        Record one execution.
+
+        Args:
+            sql (str): Statement text (with placeholders)
+            name (str): Registered query name, or 'adhoc'
+            seconds (float): Execution time
+            error (bool): The statement raised
+            explain (Optional[Callable[[], list]]): Runs ``EXPLAIN`` of the
+                statement with its parameters; used for slow SELECTs
+        """
+        key = fingerprint(sql)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_fingerprints:
+                    key = self.OTHER
+                    entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._entries[key] = _Entry(name, self.window)
+            entry.count += 1
+            entry.total += seconds
+            entry.samples.append(seconds)
+            if seconds > entry.max:
+                entry.max = seconds
+            if error:
+                entry.errors += 1
+            run_explain = False
+            if self.slow_threshold and seconds >= self.slow_threshold and not error:
+                now = time.monotonic()
+                if (
+                    self.explain and explain is not None and key.startswith('select')
+                    and now - entry.last_explained >= self.explain_interval
+                ):
+                    entry.last_explained = now
+                    run_explain = True
+
+        if self.slow_threshold and seconds >= self.slow_threshold:
+            self._log_slow(key, name, seconds, error, explain if run_explain else None)
+
+    def _log_slow(self, key: str, name: str, seconds: float, error: bool, explain) -> None:
+        fields = {'fingerprint': key, 'query': name, 'duration_ms': round(seconds * 1000, 3)}
+        if error:
+            fields['error'] = True
+        if explain is not None:
+            try:
+                fields['explain'] = explain()
+            except Exception as e:
+                fields['explain_error'] = str(e)
+        slow_query_logger.warning("Slow query", extra=fields)
+
+    def snapshot(self, sort: str = 'total', limit: Optional[int] = None) -> List[dict]:
+        """
+        Current statistics, most expensive first.
+
+        Args:
+            sort (str): 'total', 'count', 'p99', 'max' or 'errors'
+            limit (Optional[int]): Return at most this many fingerprints
+
+        Returns:
+            List[dict]: One entry per fingerprint (times in milliseconds)
+        """
+        with self._lock:
+            copies = [
+                (key, entry.name, entry.count, entry.errors, entry.total, entry.max, list(entry.samples))
+                for key, entry in self._entries.items()
+            ]
+        rows = []
+        for key, name, count, errors, total, slowest, samples in copies:
+            ordered = sorted(samples)
+            rows.append({
+                'fingerprint': key,
+                'query': name,
+                'count': count,
+                'errors': errors,
+                'total_ms': round(total * 1000, 3),
+                'mean_ms': round(total * 1000 / count, 3) if count else 0.0,
+                'p50_ms': round(_percentile(ordered, 0.5) * 1000, 3),
+                'p99_ms': round(_percentile(ordered, 0.99) * 1000, 3),
+                'max_ms': round(slowest * 1000, 3),
+            })
+        sort_key = {
+            'total': 'total_ms', 'count': 'count', 'p99': 'p99_ms', 'max': 'max_ms', 'errors': 'errors'
+        }.get(sort, 'total_ms')
+        rows.sort(key=lambda row: row[sort_key], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def reset(self) -> None:
+        """Forget all statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.started_at = time.time()
+
+
+# Statistics of this worker process
+query_stats = QueryStats.from_config(Config())
@@ -0,0 +1,406 @@
+"""
+Rate limiting module.
+Token buckets keyed by mobile number or client address, checked by the OTP
+endpoints before any database or SMS work.
+
+Each bucket holds ``capacity`` tokens and refills at ``capacity / period``
+tokens per second. A bucket is stored as a single timestamp, the time at
+which it would be full again (the generic cell rate algorithm), so a check
+is one read, one comparison and one write.
+
+Backends:
+    memory - per-process buckets (single worker / development)
+    sqlite - SQLite file shared by every worker on the same host
+    redis  - any server speaking the Redis protocol (multi-host)
+"""
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Iterable, Optional, Tuple
+
+from otp_store import RedisScript, RespClient
+
+
+logger = logging.getLogger(__name__)
+
+# Same update as the SQLite upsert: take a token (advance the full-again
+# timestamp by one interval) only while the bucket has one. ARGV: now,
+# interval, period. Returns the seconds to wait as a string ('0' if
+# allowed); the key expires when the bucket is full again.
+GCRA_CHECK_SCRIPT = RedisScript("""
+local now = tonumber(ARGV[1])
+local full_at = math.max(tonumber(redis.call('GET', KEYS[1]) or 0), now) + tonumber(ARGV[2])
+local wait = full_at - now - tonumber(ARGV[3])
+if wait > 0 then
+    return tostring(wait)
+end
+redis.call('SET', KEYS[1], tostring(full_at), 'PX', math.ceil((full_at - now) * 1000))
+return '0'
+""")
+
+# Give back one token (move the timestamp back by one interval)
+GCRA_REFUND_SCRIPT = RedisScript("""
+local full_at = tonumber(redis.call('GET', KEYS[1]))
+if not full_at then
+    return 0
+end
+local now = tonumber(ARGV[1])
+full_at = full_at - tonumber(ARGV[2])
+if full_at <= now then
+    redis.call('DEL', KEYS[1])
+else
+    redis.call('SET', KEYS[1], tostring(full_at), 'PX', math.ceil((full_at - now) * 1000))
+end
+return 1
+""")
+
+
+def parse_rate(spec: str) -> Optional[Tuple[int, float]]:
+    """
+    Parse a ``requests/seconds`` limit such as ``5/600``.
+
+    Args:
+        spec (str): Limit text; empty or ``0`` disables the limit
+
+    Returns:
+        Optional[Tuple[int, float]]: (capacity, period in seconds), or None when disabled
+    """
+    spec = (spec or '').strip()
+    if not spec or spec == '0':
+        return None
+    capacity, _, period = spec.partition('/')
+    capacity, period = int(capacity), float(period or 1)
+    if capacity <= 0 or period <= 0:
+        raise ValueError(f"Invalid rate limit {spec!r}; expected requests/seconds, e.g. 5/600")
+    return capacity, period
+
+
+class RateLimiter(ABC):
+    """
+    Base class for rate limiters.
+
+    ``check`` takes one token from the key's bucket and returns 0.0, or
+    leaves the bucket alone and returns the seconds until a token is
+    available. ``refund`` gives back a token taken by ``check``.
+    """
+
+    def __init__(self, name: str, capacity: int, period: float):
+        """
+        Initialize the limiter.
+
+        Args:
+            name (str): Limit name (keeps keys of different limits apart in shared backends)
+            capacity (int): Requests allowed in a burst
+            period (float): Seconds for an empty bucket to refill completely
+        """
+        self.name = name
+        self.capacity = capacity
+        self.period = period
+        # Seconds added per request
+        self.interval = period / capacity
+
+    @abstractmethod
+    def check(self, key: str) -> float:
+        """
+        Take one token for ``key``.
+
+        Args:
+            key (str): Mobile number or client address
+
+        Returns:
+            float: 0.0 if the request is allowed, otherwise seconds to wait
+        """
+
+    @abstractmethod
+    def refund(self, key: str) -> None:
+        """
+        Give back the token taken by an allowed ``check`` for ``key``.
+
+        Args:
+            key (str): Key passed to ``check``
+        """
+
+
+class InMemoryRateLimiter(RateLimiter):
+    """
+    Per-process buckets in a dict of full-again timestamps.
+
+    A key whose timestamp has passed has a full bucket and is equivalent to
+    a missing key, so when ``max_entries`` is reached those entries are
+    dropped first; if the dict is still full the oldest keys are dropped.
+    """
+
+    def __init__(self, name: str, capacity: int, period: float, max_entries: int = 100000):
+        super().__init__(name, capacity, period)
+        self.max_entries = max_entries
+        self._full_at = {}
+        self._lock = threading.Lock()
+
+    def check(self, key: str) -> float:
+        now = time.monotonic()
+        with self._lock:
+            full_at = self._full_at.get(key, now)
+            if full_at < now:
+                full_at = now
+            full_at += self.interval
+            wait = full_at - now - self.period
+            if wait > 0:
+                return wait
+            if len(self._full_at) >= self.max_entries and key not in self._full_at:
+                self._evict(now)
+            self._full_at[key] = full_at
+        return 0.0
+
+    def refund(self, key: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            full_at = self._full_at.get(key)
+            if full_at is None:
+                return
+            full_at -= self.interval
+            if full_at <= now:
+                del self._full_at[key]
+            else:
+                self._full_at[key] = full_at
+
+    def _evict(self, now: float) -> None:
+        """Drop full buckets, then the oldest keys until 10% is free (lock held)."""
+        entries = self._full_at
+        for key in [key for key, full_at in entries.items() if full_at <= now]:
+            del entries[key]
+        excess = len(entries) - int(self.max_entries * 0.9)
+        if excess > 0:
+            for key in list(entries)[:excess]:
+                del entries[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._full_at)
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    Base class for limiters shared between workers.
+
+    A per-process bucket with the same limit is checked first: the shared
+    bucket sees every request the local one sees, so a local refusal is
+    final and a client retrying in a loop is turned away without a round
+    trip to the shared store.
+    """
+
+    def __init__(self, name: str, capacity: int, period: float, max_entries: int = 100000):
+        super().__init__(name, capacity, period)
+        self._local = InMemoryRateLimiter(name, capacity, period, max_entries)
+
+    def check(self, key: str) -> float:
+        wait = self._local.check(key)
+        if wait:
+            return wait
+        wait = self._check_shared(key)
+        if wait:
+            # Refused by the other workers' requests: this one was not let
+            # through, so it must not count against the local bucket either
+            self._local.refund(key)
+        return wait
+
+    def refund(self, key: str) -> None:
+        self._local.refund(key)
+        self._refund_shared(key)
+
+    @abstractmethod
+    def _check_shared(self, key: str) -> float:
+        """Take one token for ``key`` from the shared store."""
+
+    @abstractmethod
+    def _refund_shared(self, key: str) -> None:
+        """Give back one token for ``key`` to the shared store."""
+
+
+class SQLiteRateLimiter(SharedRateLimiter):
+    """
+    Buckets in a SQLite file shared by all workers on one host.
+
+    Each check is a single upsert that only advances the timestamp while
+    the bucket has a token, so concurrent workers cannot overdraw it.
+    Full buckets are deleted every ``sweep_interval`` checks.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        capacity: int,
+        period: float,
+        path: str,
+        max_entries: int = 100000,
+        sweep_interval: int = 1000
+    ):
+        super().__init__(name, capacity, period, max_entries)
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._local_connections = threading.local()
+        self._checks = 0
+        self._checks_lock = threading.Lock()
+
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits ("
+            " bucket TEXT PRIMARY KEY,"
+            " full_at REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        connection = getattr(self._local_connections, 'connection', None)
+        if connection is None or getattr(self._local_connections, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local_connections.connection = connection
+            self._local_connections.pid = os.getpid()
+        return connection
+
+    def _check_shared(self, key: str) -> float:
+        connection = self._connection()
+        bucket = f'{self.name}:{key}'
+        now = time.time()
+        cursor = connection.execute(
+            "INSERT INTO rate_limits (bucket, full_at) VALUES (?, ?) "
+            "ON CONFLICT (bucket) DO UPDATE SET full_at = MAX(full_at, ?) + ? "
+            "WHERE MAX(full_at, ?) + ? - ? <= ?",
+            (bucket, now + self.interval, now, self.interval, now, self.interval, now, self.period)
+        )
+        with self._checks_lock:
+            self._checks += 1
+            sweep = self._checks % self.sweep_interval == 0
+        if sweep:
+            connection.execute("DELETE FROM rate_limits WHERE full_at <= ?", (now,))
+        if cursor.rowcount:
+            return 0.0
+        row = connection.execute("SELECT full_at FROM rate_limits WHERE bucket = ?", (bucket,)).fetchone()
+        if row is None:
+            return 0.0
+        return max(max(row[0], now) + self.interval - now - self.period, 0.001)
+
+    def _refund_shared(self, key: str) -> None:
+        self._connection().execute(
+            "UPDATE rate_limits SET full_at = full_at - ? WHERE bucket = ?",
+            (self.interval, f'{self.name}:{key}')
+        )
+
+
+class RedisRateLimiter(SharedRateLimiter):
+    """
+    Buckets on a Redis-protocol server, shared across hosts.
+
+    Each check runs the same timestamp update as the SQLite upsert in one
+    Lua script, which the server runs without interleaving other commands,
+    so concurrent workers cannot overdraw a bucket. Timestamps come from
+    the caller's clock (keep hosts NTP-synced); a key expires once its
+    bucket is full again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        capacity: int,
+        period: float,
+        url: str,
+        max_entries: int = 100000,
+        key_prefix: str = 'ratelimit:',
+        timeout: float = 2.0
+    ):
+        super().__init__(name, capacity, period, max_entries)
+        self.key_prefix = key_prefix
+        self._client = RespClient(url, timeout)
+
+    def _bucket(self, key: str) -> str:
+        return f'{self.key_prefix}{self.name}:{key}'
+
+    def _check_shared(self, key: str) -> float:
+        # Not retried: a resent script could take two tokens
+        wait = float(self._client.eval(
+            GCRA_CHECK_SCRIPT, (self._bucket(key),), (repr(time.time()), repr(self.interval), repr(self.period))
+        ))
+        return max(wait, 0.001) if wait > 0 else 0.0
+
+    def _refund_shared(self, key: str) -> None:
+        self._client.eval(GCRA_REFUND_SCRIPT, (self._bucket(key),), (repr(time.time()), repr(self.interval)))
+
+
+def client_address(peer: str, forwarded_for: Optional[str], trusted_proxies: int = 0) -> str:
+    """
+    Address of the client a request came from.
+
+    Args:
+        peer (str): Address of the TCP peer
+        forwarded_for (Optional[str]): X-Forwarded-For header
+        trusted_proxies (int): Proxies in front of the app that append to
+            X-Forwarded-For; entries further left can be forged by the client
+
+    Returns:
+        str: Client address
+    """
+    if trusted_proxies and forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(',') if hop.strip()]
+        if hops:
+            return hops[-min(trusted_proxies, len(hops))]
+    return peer or ''
+
+
+def check_limits(checks: Iterable[Tuple[Optional[RateLimiter], str]]) -> Tuple[Optional[str], int]:
+    """
+    Take a token from each limiter in turn, stopping at the first refusal.
+
+    Tokens already taken from earlier limiters are refunded on a refusal,
+    so attempts refused for one mobile number do not use up the caller's
+    per-client allowance.
+
+    Args:
+        checks: (limiter, key) pairs; None limiters (disabled) are skipped
+
+    Returns:
+        Tuple[Optional[str], int]: (name of the refusing limit, Retry-After
+        seconds), or (None, 0) when the request is allowed
+    """
+    taken = []
+    for limiter, key in checks:
+        if limiter is None:
+            continue
+        wait = limiter.check(key)
+        if wait:
+            for earlier, earlier_key in taken:
+                earlier.refund(earlier_key)
+            return limiter.name, max(1, math.ceil(wait))
+        taken.append((limiter, key))
+    return None, 0
+
+
+def create_rate_limiter(config, name: str, spec: str) -> Optional[RateLimiter]:
+    """
+    Build a rate limiter on the backend selected by configuration.
+
+    Args:
+        config: Config object (``RATE_LIMIT_BACKEND``, ``RATE_LIMIT_STORE_PATH``, ...)
+        name (str): Limit name
+        spec (str): Limit as ``requests/seconds`` (see ``parse_rate``)
+
+    Returns:
+        Optional[RateLimiter]: Configured limiter, or None when the limit is disabled
+    """
+    rate = parse_rate(spec)
+    if rate is None or not config.RATE_LIMIT_ENABLED:
+        return None
+    capacity, period = rate
+    backend = config.RATE_LIMIT_BACKEND.lower()
+    max_entries = config.RATE_LIMIT_MAX_ENTRIES
+
+    if backend == 'sqlite':
+        return SQLiteRateLimiter(name, capacity, period, config.RATE_LIMIT_STORE_PATH, max_entries)
+    if backend == 'redis':
+        return RedisRateLimiter(name, capacity, period, config.RATE_LIMIT_REDIS_URL, max_entries)
+    if backend != 'memory':
+        logger.warning("Unknown RATE_LIMIT_BACKEND %r, using in-memory rate limits", backend)
+    return InMemoryRateLimiter(name, capacity, period, max_entries)
@@ -0,0 +1,285 @@
+"""
+Response encoding module.
+Negotiates the body format (JSON, or MessagePack for clients that ask for
+it in ``Accept``) and compression (brotli or gzip from ``Accept-Encoding``)
+for every response, and serializes JSON with orjson when it is installed.
+
+orjson, msgpack and brotli are optional: without them responses fall back
+to the standard json module, JSON only and gzip only.
+"""
+import gzip
+from datetime import datetime, timezone
+from typing import Callable, Optional, Tuple
+
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+# Also accepted in Accept; the response uses MSGPACK_MIMETYPE
+MSGPACK_MIMETYPES = (MSGPACK_MIMETYPE, 'application/x-msgpack')
+
+COMPRESSIBLE_MIMETYPES = frozenset((
+    JSON_MIMETYPE, MSGPACK_MIMETYPE, 'application/x-ndjson', 'text/plain', 'text/html', 'text/csv'
+))
+
+if orjson is not None:
+    # Dates go through the same default as the standard provider (HTTP
+    # dates), and keys stay in insertion order
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+_WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def http_datetime(value: datetime) -> str:
+    """
+    Format a datetime as an HTTP date, as ``werkzeug.http.http_date`` does.
+
+    Naive values are taken as UTC. About ten times faster than the
+    email.utils based formatting, which matters for notification pages
+    that carry a timestamp per item.
+
+    Args:
+        value (datetime): Timestamp
+
+    Returns:
+        str: e.g. ``Thu, 01 Jan 2026 00:00:00 GMT``
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return (
+        f'{_WEEKDAYS[value.weekday()]}, {value.day:02d} {_MONTHS[value.month - 1]} {value.year:04d} '
+        f'{value.hour:02d}:{value.minute:02d}:{value.second:02d} GMT'
+    )
+
+
+def offered_mimetypes(msgpack_enabled: bool) -> Tuple[str, ...]:
+    """
+    Body formats the server can produce, preferred first.
+
+    Args:
+        msgpack_enabled (bool): RESPONSE_MSGPACK setting
+
+    Returns:
+        Tuple[str, ...]: Mimetypes to match against ``Accept``
+    """
+    if msgpack_enabled and msgpack is not None:
+        return (JSON_MIMETYPE,) + MSGPACK_MIMETYPES
+    return (JSON_MIMETYPE,)
+
+
+def negotiate_mimetype(accept: Optional[str], offered: Tuple[str, ...]) -> str:
+    """
+    Pick the body format for an ``Accept`` header.
+
+    JSON wins ties (``*/*``, no header), so only clients that ask for
+    MessagePack explicitly get it.
+
+    Args:
+        accept (Optional[str]): Raw Accept header
+        offered (Tuple[str, ...]): From ``offered_mimetypes``
+
+    Returns:
+        str: JSON_MIMETYPE or MSGPACK_MIMETYPE
+    """
+    if len(offered) == 1 or not accept:
+        return JSON_MIMETYPE
+    match = parse_accept_header(accept, MIMEAccept).best_match(offered, default=JSON_MIMETYPE)
+    return MSGPACK_MIMETYPE if match in MSGPACK_MIMETYPES else JSON_MIMETYPE
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the content coding for an ``Accept-Encoding`` header.
+
+    Args:
+        accept_encoding (Optional[str]): Raw Accept-Encoding header
+
+    Returns:
+        Optional[str]: 'br', 'gzip', or None to send the body as is
+    """
+    if not accept_encoding:
+        return None
+    offered = ('br', 'gzip') if brotli is not None else ('gzip',)
+    return parse_accept_header(accept_encoding).best_match(offered)
+
+
+def compress(body: bytes, coding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    """
+    Compress a response body.
+
+    Args:
+        body (bytes): Uncompressed body
+        coding (str): 'br' or 'gzip'
+        gzip_level (int): gzip compression level (1-9)
+        brotli_quality (int): brotli quality (0-11)
+
+    Returns:
+        bytes: Compressed body
+    """
+    if coding == 'br':
+        return brotli.compress(body, quality=brotli_quality)
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+def encoded_etag(etag: str, coding: str) -> str:
+    """
+    Entity tag of the compressed representation (``"abc"`` -> ``"abc-gzip"``).
+
+    Strong tags must differ between encodings; ``http_cache.etag_matches``
+    accepts the suffixed form back in If-None-Match.
+
+    Args:
+        etag (str): Quoted ETag header value
+        coding (str): Content coding
+
+    Returns:
+        str: Quoted entity tag
+    """
+    if etag.endswith('"'):
+        return f'{etag[:-1]}-{coding}"'
+    return etag
+
+
+def representation_etag(etag: str, mimetype: str) -> str:
+    """
+    Entity tag of the body format (``abc`` -> ``abc-msgpack`` for MessagePack).
+
+    JSON and MessagePack bodies of the same resource must not share a
+    strong tag, or a cache holding one would be revalidated for the other.
+    Applied to the unquoted tag before matching If-None-Match, so coding
+    suffixes from ``encoded_etag`` go after it (``abc-msgpack-gzip``).
+
+    Args:
+        etag (str): Unquoted entity tag from ``http_cache.make_etag``
+        mimetype (str): Negotiated mimetype
+
+    Returns:
+        str: Unquoted entity tag
+    """
+    if mimetype == MSGPACK_MIMETYPE:
+        return f'{etag}-msgpack'
+    return etag
+
+
+def request_mimetype(config) -> Tuple[str, Tuple[str, ...]]:
+    """
+    Body format for the current Flask request.
+
+    Args:
+        config: Flask app config (``RESPONSE_MSGPACK``)
+
+    Returns:
+        Tuple[str, Tuple[str, ...]]: (negotiated mimetype, offered mimetypes)
+    """
+    offered = (JSON_MIMETYPE,)
+    if has_request_context():
+        offered = offered_mimetypes(config.get('RESPONSE_MSGPACK', False))
+    return negotiate_mimetype(request.headers.get('Accept') if len(offered) > 1 else None, offered), offered
+
+
+def compress_response_body(
+    body: bytes,
+    mimetype: str,
+    accept_encoding: Optional[str],
+    config
+) -> Tuple[bytes, Optional[str]]:
+    """
+    Compress a body if the response type, size and client allow it.
+
+    Args:
+        body (bytes): Response body
+        mimetype (str): Response mimetype (without parameters)
+        accept_encoding (Optional[str]): Raw Accept-Encoding header
+        config: Config object (``RESPONSE_COMPRESSION_MIN_BYTES``, ...)
+
+    Returns:
+        Tuple[bytes, Optional[str]]: (body, content coding or None)
+    """
+    if len(body) < config.RESPONSE_COMPRESSION_MIN_BYTES or mimetype not in COMPRESSIBLE_MIMETYPES:
+        return body, None
+    coding = negotiate_encoding(accept_encoding)
+    if coding is None:
+        return body, None
+    return compress(body, coding, config.RESPONSE_GZIP_LEVEL, config.RESPONSE_BROTLI_QUALITY), coding
+
+
+def pack_msgpack(payload, default: Callable) -> bytes:
+    """
+    Serialize a payload as MessagePack.
+
+    Args:
+        payload: Response data
+        default (Callable): Converts values msgpack cannot encode (dates, Decimal, ...)
+
+    Returns:
+        bytes: Packed body
+    """
+    return msgpack.packb(payload, default=default, use_bin_type=True)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider serializing with orjson and negotiating MessagePack.
+
+    Output is always compact and keeps key order. Values orjson cannot
+    encode directly (dates, Decimal, UUID) go through the same ``default``
+    as Flask's provider, so they render exactly as before; anything orjson
+    rejects outright falls back to the standard json module.
+    """
+
+    sort_keys = False
+
+    @staticmethod
+    def default(value):
+        if isinstance(value, datetime):
+            return http_datetime(value)
+        return DefaultJSONProvider.default(value)
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def dumps_bytes(self, obj) -> bytes:
+        """Serialize to compact UTF-8 JSON."""
+        if orjson is not None:
+            try:
+                return orjson.dumps(obj, default=self.default, option=_ORJSON_OPTIONS)
+            except TypeError:
+                # Integers beyond 64 bits and other values orjson refuses
+                pass
+        return super().dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        mimetype, offered = request_mimetype(self._app.config)
+        if mimetype == MSGPACK_MIMETYPE:
+            body = pack_msgpack(obj, self.default)
+        else:
+            body = self.dumps_bytes(obj) + b'\n'
+        response = self._app.response_class(body, mimetype=mimetype)
+        if len(offered) > 1:
+            response.vary.add('Accept')
+        return response
@@ -0,0 +1,250 @@
+"""
+Production server entry point.
+Runs the app under gunicorn with a preloaded app, prefork workers sized from
+the CPU count, graceful reloads and worker recycling.
+
+Usage:
+    python serve.py                  # WSGI workers (threads per worker)
+    python serve.py --asgi           # asgi.py on uvicorn workers
+    python serve.py --print-config   # show the resolved settings and exit
+
+Signals (sent to the master process):
+    HUP     graceful reload: start new workers, let old ones finish their
+            requests. The app is preloaded, so new code needs a binary
+            upgrade instead: USR2, then TERM the old master.
+    TERM    graceful shutdown (waits up to SERVER_GRACEFUL_TIMEOUT)
+    TTIN/TTOU  add / remove one worker
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import time
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    # The helpers below stay importable; main() refuses to start
+    BaseApplication = object
+
+from app import create_app
+from config import Config
+from database import db
+
+
+logger = logging.getLogger(__name__)
+
+# Store settings whose 'memory' default is per process; serve.py runs
+# several workers, so unless set they default to 'sqlite' (see share_backends)
+SHARED_BACKENDS = ('OTP_STORE_BACKEND', 'RATE_LIMIT_BACKEND', 'IDEMPOTENCY_BACKEND', 'METRICS_BACKEND')
+
+
+def cpu_count() -> int:
+    """CPUs this process may run on (respects container CPU affinity)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def worker_count(config, asgi: bool = False) -> int:
+    """
+    Number of worker processes.
+
+    Args:
+        config: Config object
+        asgi (bool): Async workers (one event loop per CPU is enough)
+
+    Returns:
+        int: SERVER_WORKERS if set, otherwise sized from the CPU count
+    """
+    if config.SERVER_WORKERS > 0:
+        return config.SERVER_WORKERS
+    cpus = cpu_count()
+    workers = cpus if asgi else cpus * 2 + 1
+    return max(1, min(workers, config.SERVER_MAX_WORKERS))
+
+
+def post_fork(server, worker) -> None:
+    """
+    Open this worker's own database connections before it takes traffic,
+    and start taking push jobs (resuming ones left by stopped workers).
+    """
+    try:
+        opened = db.warm_pool()
+        logger.info("Worker %s: opened %s database connection(s)", worker.pid, opened)
+    except Exception as e:
+        # The pool opens connections on demand, so the worker can still serve
+        logger.warning("Worker %s could not warm the database pool: %s", worker.pid, e)
+    worker.app.extensions['push_fanout'].start()
+
+
+def worker_exit(server, worker) -> None:
+    """
+    Finish or hand off background work, then close the worker's idle
+    database connections.
+
+    The running push job is handed back to the queue at its cursor (new
+    ones are refused from here on) and queued OTP SMS are sent, within
+    SERVER_DRAIN_SECONDS in total.
+    """
+    extensions = worker.app.extensions
+    deadline = time.monotonic() + Config.SERVER_DRAIN_SECONDS
+    if not extensions['push_fanout'].stop(timeout=Config.SERVER_DRAIN_SECONDS):
+        logger.warning("Worker %s: push job not handed back in time; it resumes when its lease expires", worker.pid)
+    if not extensions['sms_dispatcher'].stop(timeout=max(deadline - time.monotonic(), 0)):
+        logger.warning("Worker %s: exited with OTP SMS still queued", worker.pid)
+    if extensions['shared_metrics'] is not None:
+        # Kept in the host's totals after this worker is gone
+        try:
+            extensions['shared_metrics'].publish()
+        except Exception as e:
+            logger.warning("Worker %s could not publish its final metrics: %s", worker.pid, e)
+    db.dispose()
+
+
+def share_backends(config, workers: int) -> list:
+    """
+    Switch stores left at their 'memory' default to 'sqlite' so that
+    several workers share OTPs, rate limits, idempotency keys and metrics.
+
+    Backends chosen in the environment are kept. Only Config is changed,
+    before the app is loaded.
+
+    Args:
+        config: Config object
+        workers (int): Worker processes
+
+    Returns:
+        list: Names of the settings that were switched
+    """
+    if workers <= 1:
+        return []
+    switched = []
+    for name in SHARED_BACKENDS:
+        if name not in os.environ and getattr(config, name) == 'memory':
+            setattr(Config, name, 'sqlite')
+            switched.append(name)
+    return switched
+
+
+def server_options(config, asgi: bool = False) -> dict:
+    """
+    gunicorn settings derived from Config.
+
+    Args:
+        config: Config object
+        asgi (bool): Serve asgi.py through uvicorn workers
+
+    Returns:
+        dict: gunicorn setting names and values
+    """
+    options = {
+        'bind': config.SERVER_BIND,
+        'workers': worker_count(config, asgi),
+        # create_app() (and the schema migrations) run once in the master
+        'preload_app': True,
+        'max_requests': config.SERVER_MAX_REQUESTS,
+        'max_requests_jitter': config.SERVER_MAX_REQUESTS_JITTER,
+        'timeout': config.SERVER_TIMEOUT,
+        'graceful_timeout': config.SERVER_GRACEFUL_TIMEOUT,
+        'keepalive': config.SERVER_KEEPALIVE,
+        'post_fork': post_fork,
+        'worker_exit': worker_exit,
+    }
+    if asgi:
+        options['worker_class'] = 'uvicorn.workers.UvicornWorker'
+    else:
+        options['worker_class'] = 'gthread'
+        options['threads'] = config.SERVER_THREADS
+    return options
+
+
+class ProductionServer(BaseApplication):
+    """gunicorn application serving ``create_app()`` (or the ASGI app)."""
+
+    def __init__(self, config, asgi: bool = False, overrides: dict = None):
+        self.settings = server_options(config, asgi)
+        self.settings.update(overrides or {})
+        self.asgi = asgi
+        super().__init__()
+
+    def load_config(self) -> None:
+        for name, value in self.settings.items():
+            self.cfg.set(name, value)
+
+    def load(self):
+        app = create_app()
+        # Read by the worker hooks
+        self.extensions = app.extensions
+        if self.asgi:
+            from asgi import create_asgi_app
+            app = create_asgi_app(app)
+        # Connections opened while loading (migrations) must not be shared
+        # with the forked workers; each worker opens its own in post_fork
+        db.dispose()
+        return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Run the production server')
+    parser.add_argument('--asgi', action='store_true', default=Config.SERVER_ASGI,
+                        help='Serve asgi.py through uvicorn workers')
+    parser.add_argument('--bind', help='Address to listen on (default SERVER_BIND)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default from SERVER_WORKERS / CPU count)')
+    parser.add_argument('--print-config', action='store_true', help='Show the resolved settings and exit')
+    args = parser.parse_args()
+
+    config = Config()
+    overrides = {}
+    if args.bind:
+        overrides['bind'] = args.bind
+    if args.workers:
+        overrides['workers'] = args.workers
+
+    server = ProductionServer(config, asgi=args.asgi, overrides=overrides)
+    workers = server.settings['workers']
+    connections = workers * (config.DB_POOL_SIZE + config.DB_POOL_MAX_OVERFLOW)
+    if args.asgi:
+        connections += workers * (config.DB_ASYNC_POOL_SIZE + config.DB_ASYNC_POOL_MAX_OVERFLOW)
+
+    print(f"Starting {'ASGI' if args.asgi else 'WSGI'} server on {server.settings['bind']} "
+          f"with {workers} worker(s)")
+    print(f"Database: {config.DB_NAME} @ {config.DB_HOST} "
+          f"(up to {connections} connections across workers)")
+    switched = share_backends(config, workers)
+    if switched:
+        print(f"Shared stores: {', '.join(switched)} not set, using 'sqlite' "
+              f"(set them to 'redis' for several hosts)")
+    if args.print_config:
+        for name, value in sorted(server.settings.items()):
+            if not callable(value):
+                print(f"  {name} = {value}")
+        return
+
+    if workers > 1 and config.OTP_STORE_BACKEND == 'memory':
+        # An OTP generated by one worker would be unknown to the others
+        raise SystemExit(
+            "OTP_STORE_BACKEND=memory cannot be shared by several workers; "
+            "use 'sqlite' or 'redis', or run with --workers 1"
+        )
+
+    if workers > 1 and config.RATE_LIMIT_BACKEND == 'memory':
+        print("Warning: RATE_LIMIT_BACKEND=memory is per worker, so each worker allows the full "
+              "OTP limit; use 'sqlite' or 'redis'")
+
+    if workers > 1 and config.IDEMPOTENCY_BACKEND == 'memory':
+        print("Warning: IDEMPOTENCY_BACKEND=memory is per worker, so a retry reaching another "
+              "worker runs again; use 'sqlite' or 'redis'")
+
+    missing = [
+        module for module in ('gunicorn', *(('uvicorn', 'httpx') if args.asgi else ()))
+        if importlib.util.find_spec(module) is None
+    ]
+    if missing:
+        raise SystemExit(f"{', '.join(missing)} not installed; run pip install -r requirements.txt")
+
+    server.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+"""
+SMS dispatch module.
+Delivers OTP SMS in the background so login requests never wait on the gateway.
+"""
+import heapq
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+# Delivery status values reported to clients
+STATUS_QUEUED = 'queued'
+STATUS_SENDING = 'sending'
+STATUS_RETRYING = 'retrying'
+STATUS_SENT = 'sent'
+STATUS_FAILED = 'failed'
+STATUS_TIMEOUT = 'timeout'
+STATUS_DROPPED = 'dropped'
+
+
+class SMSRetryableError(Exception):
+    """Raised by a sender when the attempt may succeed if retried (5xx, connection reset)."""
+
+
+class SMSJob:
+    """A single OTP SMS waiting for delivery."""
+
+    __slots__ = ('mobile_number', 'otp', 'deadline', 'attempts', 'status', 'detail')
+
+    def __init__(self, mobile_number: str, otp: str, deadline: float):
+        self.mobile_number = mobile_number
+        self.otp = otp
+        self.deadline = deadline
+        self.attempts = 0
+        self.status = STATUS_QUEUED
+        self.detail = None
+
+
+class SMSDispatcher:
+    """
+    Bounded background queue with a worker pool for OTP SMS delivery.
+
+    ``send(mobile_number, otp)`` performs one delivery attempt and returns a
+    final status (``'sent'``, ``'failed'`` or ``'timeout'``) or raises
+    ``SMSRetryableError``. Retryable failures are rescheduled with exponential
+    backoff until ``max_attempts`` is reached or the OTP expires. Timeouts are
+    not retried because the gateway may still deliver the message.
+
+    Worker threads start lazily in the process that first submits a job, so
+    the dispatcher is safe to create before a prefork server forks.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, str], str],
+        workers: int = 4,
+        max_queue: int = 1000,
+        max_attempts: int = 3,
+        backoff_seconds: float = 0.5,
+        backoff_max_seconds: float = 8.0,
+        on_status: Optional[Callable[[SMSJob], None]] = None
+    ):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            send (Callable): Performs one delivery attempt
+            workers (int): Number of worker threads
+            max_queue (int): Maximum number of jobs waiting for a worker
+            max_attempts (int): Delivery attempts per job, including the first
+            backoff_seconds (float): Delay before the first retry (doubles per retry)
+            backoff_max_seconds (float): Upper bound on the retry delay
+            on_status (Optional[Callable]): Called with the job on every status change
+        """
+        self._send = send
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self._on_status = on_status
+
+        self._queue: 'queue.Queue[Optional[SMSJob]]' = queue.Queue(maxsize=max_queue)
+        self._retries = []
+        self._retry_seq = itertools.count()
+        self._retry_cond = threading.Condition()
+        self._threads = []
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stopping = False
+
+        self._counters_lock = threading.Lock()
+        self.counters = {
+            'submitted': 0,
+            'dropped': 0,
+            'attempts': 0,
+            'retries': 0,
+            STATUS_SENT: 0,
+            STATUS_FAILED: 0,
+            STATUS_TIMEOUT: 0,
+        }
+
+    def _count(self, name: str) -> None:
+        with self._counters_lock:
+            self.counters[name] += 1
+
+    def _ensure_started(self) -> None:
+        """Start worker threads once per process."""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._stopping = False
+            self._threads = [
+                threading.Thread(target=self._worker, name=f'sms-dispatch-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            self._threads.append(
+                threading.Thread(target=self._scheduler, name='sms-dispatch-retry', daemon=True)
+            )
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def submit(self, mobile_number: str, otp: str, deadline: float) -> SMSJob:
+        """
+        Queue an OTP SMS without blocking.
+
+        Args:
+            mobile_number (str): 10-digit mobile number
+            otp (str): OTP to deliver
+            deadline (float): Epoch time after which delivery is pointless (OTP expiry)
+
+        Returns:
+            SMSJob: The queued job (status ``'dropped'`` if the queue is full)
+        """
+        self._ensure_started()
+        job = SMSJob(mobile_number, otp, deadline)
+        self._count('submitted')
+        if self._stopping:
+            self._count('dropped')
+            self._set_status(job, STATUS_DROPPED, 'Dispatcher stopping')
+            return job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self._count('dropped')
+            self._set_status(job, STATUS_DROPPED, 'Dispatch queue full')
+        return job
+
+    def _set_status(self, job: SMSJob, status: str, detail: Optional[str] = None) -> None:
+        job.status = status
+        job.detail = detail
+        if self._on_status:
+            try:
+                self._on_status(job)
+            except Exception as e:
+                logger.warning("SMS status callback failed: %s", e)
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self._attempt(job)
+
+    def _attempt(self, job: SMSJob) -> None:
+        if time.time() >= job.deadline:
+            self._count(STATUS_FAILED)
+            self._set_status(job, STATUS_FAILED, 'OTP expired before delivery')
+            return
+
+        job.attempts += 1
+        self._count('attempts')
+        self._set_status(job, STATUS_SENDING)
+        try:
+            status = self._send(job.mobile_number, job.otp)
+        except SMSRetryableError as e:
+            if job.attempts >= self.max_attempts:
+                self._count(STATUS_FAILED)
+                self._set_status(job, STATUS_FAILED, str(e))
+            else:
+                self._schedule_retry(job, str(e))
+            return
+        except Exception as e:
+            status, error = STATUS_FAILED, str(e)
+        else:
+            error = None
+
+        if status not in (STATUS_SENT, STATUS_FAILED, STATUS_TIMEOUT):
+            status = STATUS_FAILED
+        self._count(status)
+        self._set_status(job, status, error)
+
+    def _schedule_retry(self, job: SMSJob, detail: str) -> None:
+        delay = min(self.backoff_seconds * (2 ** (job.attempts - 1)), self.backoff_max_seconds)
+        self._count('retries')
+        self._set_status(job, STATUS_RETRYING, detail)
+        with self._retry_cond:
+            heapq.heappush(self._retries, (time.time() + delay, next(self._retry_seq), job))
+            self._retry_cond.notify()
+
+    def _scheduler(self) -> None:
+        """Move retries whose backoff has elapsed back onto the work queue."""
+        while True:
+            with self._retry_cond:
+                while not self._stopping:
+                    now = time.time()
+                    if self._retries and self._retries[0][0] <= now:
+                        break
+                    timeout = self._retries[0][0] - now if self._retries else None
+                    self._retry_cond.wait(timeout)
+                if self._stopping:
+                    return
+                _, _, job = heapq.heappop(self._retries)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._count('dropped')
+                self._set_status(job, STATUS_DROPPED, 'Dispatch queue full')
+
+    def stats(self) -> dict:
+        """
+        Snapshot of dispatcher counters and queue depth.
+
+        Returns:
+            dict: Counters plus ``queued`` and ``pending_retries``
+        """
+        with self._counters_lock:
+            snapshot = dict(self.counters)
+        snapshot['queued'] = self._queue.qsize()
+        snapshot['pending_retries'] = len(self._retries)
+        return snapshot
+
+    def stop(self, timeout: float = 5.0) -> bool:
+        """
+        Stop taking jobs and let the workers finish the queued ones.
+
+        Submissions from now on are dropped and pending retries are
+        abandoned. Waits at most ``timeout`` seconds in total; jobs still
+        queued after that are lost with the process.
+
+        Args:
+            timeout (float): Seconds to wait for the queue to drain
+
+        Returns:
+            bool: True if every worker finished in time
+        """
+        if self._pid != os.getpid():
+            return True
+        deadline = time.monotonic() + timeout
+        with self._retry_cond:
+            self._stopping = True
+            self._retry_cond.notify_all()
+        try:
+            for _ in range(self.workers):
+                self._queue.put(None, timeout=max(deadline - time.monotonic(), 0.001))
+        except queue.Full:
+            pass
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        drained = not any(thread.is_alive() for thread in self._threads)
+        if not drained:
+            logger.warning("SMS dispatcher stopped with %s job(s) still queued", self._queue.qsize())
+        return drained
@@ -0,0 +1,285 @@
+"""
+PRP SMS gateway client module.
+Sends OTP SMS over a persistent keep-alive connection pool.
+"""
+import json
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from metrics import SMS_SEND_LATENCY
+from sms_dispatch import SMSRetryableError, STATUS_SENT, STATUS_FAILED, STATUS_TIMEOUT
+
+
+logger = logging.getLogger(__name__)
+
+# Metrics label for sends that raised (gateway unreachable or 5xx)
+SEND_ERROR = 'error'
+
+
+def otp_payload(sender_id: str, template_name: str, mobile_number: str, otp: str) -> dict:
+    """
+    Build the SendSmsTemplateName request body for one OTP.
+
+    Args:
+        sender_id (str): Registered sender ID
+        template_name (str): Registered OTP template name
+        mobile_number (str): 10-digit mobile number
+        otp (str): OTP to deliver
+
+    Returns:
+        dict: JSON payload
+    """
+    # IMPORTANT: templateParams must be a STRING, not an array
+    return {
+        "sender": sender_id,
+        "templateName": template_name,
+        "smsReciever": [
+            {
+                # Mobile number format: 91{10-digit} (country code, no + sign)
+                "mobileNo": f"91{mobile_number}",
+                "templateParams": otp
+            }
+        ]
+    }
+
+
+def delivery_status(status_code: int, body: str) -> str:
+    """
+    Interpret a gateway response.
+
+    Args:
+        status_code (int): HTTP status code
+        body (str): Response body
+
+    Returns:
+        str: 'sent' or 'failed'
+
+    Raises:
+        SMSRetryableError: If the gateway returned a 5xx
+    """
+    if status_code >= 500:
+        raise SMSRetryableError(f"PRP API returned {status_code}")
+
+    if status_code != 200:
+        return STATUS_FAILED
+
+    # Check if response indicates success
+    try:
+        response_data = json.loads(body)
+    except ValueError as json_error:
+        # If response is not JSON but status is 200, consider it success
+        logger.warning("Could not parse PRP API response as JSON: %s", json_error)
+        return STATUS_SENT
+    if not isinstance(response_data, dict):
+        response_data = {}
+
+    # PRP API returns isSuccess: true for successful SMS
+    if (
+        response_data.get('isSuccess') is True
+        or response_data.get('status') == 'success'
+        or 'success' in body.lower()
+    ):
+        logger.info("PRP API confirmed SMS sent: %s", response_data.get('returnMessage', 'N/A'))
+        return STATUS_SENT
+    return STATUS_FAILED
+
+
+def _connect_failed(error: BaseException) -> bool:
+    """
+    Whether a connection error happened while connecting, before the request
+    was sent (urllib3's NewConnectionError somewhere in the cause chain).
+
+    Args:
+        error (BaseException): Exception raised by ``requests``
+
+    Returns:
+        bool: True if nothing can have reached the gateway
+    """
+    seen = set()
+    pending = [error]
+    while pending:
+        current = pending.pop()
+        if current is None or id(current) in seen:
+            continue
+        seen.add(id(current))
+        if isinstance(current, NewConnectionError):
+            return True
+        # requests wraps urllib3's MaxRetryError, whose reason is the cause
+        pending.append(getattr(current, 'reason', None))
+        pending.append(current.__cause__)
+        pending.append(current.__context__)
+        pending.extend(arg for arg in current.args if isinstance(arg, BaseException))
+    return False
+
+
+class SMSGatewayClient:
+    """
+    Client for the PRP ``SendSmsTemplateName`` endpoint.
+
+    Holds one ``requests.Session`` whose adapter keeps up to ``pool_maxsize``
+    keep-alive connections per host, so repeated sends skip the TCP and TLS
+    handshakes. Safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        sender_id: str,
+        template_name: str,
+        pool_maxsize: int = 10,
+        pool_block: bool = True,
+        connect_timeout: float = 2.0,
+        read_timeout: float = 3.0
+    ):
+        """
+        Initialize the client.
+
+        Args:
+            api_key (str): PRP API key
+            base_url (str): PRP API base URL
+            sender_id (str): Registered sender ID
+            template_name (str): Registered OTP template name
+            pool_maxsize (int): Keep-alive connections kept per host
+            pool_block (bool): Wait for a free connection instead of opening extra ones
+            connect_timeout (float): TCP/TLS connect timeout in seconds
+            read_timeout (float): Response read timeout in seconds
+        """
+        self.url = f"{base_url.rstrip('/')}/SendSmsTemplateName"
+        self.sender_id = sender_id
+        self.template_name = template_name
+        self.timeout = (connect_timeout, read_timeout)
+
+        self._adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=0
+        )
+        self._session = requests.Session()
+        self._session.mount('https://', self._adapter)
+        self._session.mount('http://', self._adapter)
+        # PRP expects the key in a lowercase 'apikey' header
+        self._session.headers.update({
+            'apikey': api_key,
+            'Content-Type': 'application/json'
+        })
+
+        self._stats_lock = threading.Lock()
+        self._sends = 0
+        self._timeouts = 0
+        self._errors = 0
+
+    @classmethod
+    def from_config(cls, config) -> 'SMSGatewayClient':
+        """
+        Build a client from the PRP_* settings.
+
+        Args:
+            config: Config object
+
+        Returns:
+            SMSGatewayClient: Configured client
+        """
+        return cls(
+            api_key=config.PRP_API_KEY,
+            base_url=config.PRP_API_BASE_URL,
+            sender_id=config.PRP_SENDER_ID,
+            template_name=config.PRP_TEMPLATE_NAME,
+            pool_maxsize=config.PRP_POOL_MAXSIZE,
+            connect_timeout=config.PRP_CONNECT_TIMEOUT,
+            read_timeout=config.PRP_READ_TIMEOUT
+        )
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def send_otp(self, mobile_number: str, otp: str) -> str:
+        """
+        Send one OTP SMS.
+
+        Args:
+            mobile_number (str): 10-digit mobile number
+            otp (str): OTP to deliver
+
+        Returns:
+            str: Final delivery status ('sent', 'failed' or 'timeout')
+
+        Raises:
+            SMSRetryableError: If the gateway cannot be reached (the request
+                was never sent) or returns a 5xx
+        """
+        payload = otp_payload(self.sender_id, self.template_name, mobile_number, otp)
+
+        self._count('_sends')
+        started = time.perf_counter()
+        result = SEND_ERROR
+        try:
+            try:
+                response = self._session.post(self.url, json=payload, timeout=self.timeout)
+            except requests.exceptions.ConnectTimeout as e:
+                # Nothing reached the gateway, so retrying cannot double-send
+                self._count('_errors')
+                raise SMSRetryableError(str(e))
+            except requests.exceptions.Timeout:
+                self._count('_timeouts')
+                logger.warning("PRP API timeout - SMS may still be delivered", extra={'mobile': mobile_number})
+                result = STATUS_TIMEOUT
+                return result
+            except requests.exceptions.ConnectionError as e:
+                self._count('_errors')
+                if _connect_failed(e):
+                    raise SMSRetryableError(str(e))
+                # Reset or aborted after the request went out: like a read
+                # timeout, the gateway may already have sent the SMS
+                logger.warning("PRP API connection lost - SMS may still be delivered", extra={'mobile': mobile_number})
+                result = STATUS_TIMEOUT
+                return result
+
+            logger.debug("PRP API response", extra={'status_code': response.status_code, 'response_body': response.text})
+
+            result = delivery_status(response.status_code, response.text)
+            return result
+        finally:
+            SMS_SEND_LATENCY.labels(result).observe(time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        """
+        Connection reuse metrics.
+
+        Returns:
+            dict: Sends, timeouts, errors, connections opened, requests made and
+            the fraction of requests served on a reused connection
+        """
+        connections_opened = 0
+        requests_made = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections_opened += pool.num_connections
+            requests_made += pool.num_requests
+
+        with self._stats_lock:
+            snapshot = {
+                'sends': self._sends,
+                'timeouts': self._timeouts,
+                'errors': self._errors,
+            }
+        snapshot['connections_opened'] = connections_opened
+        snapshot['requests'] = requests_made
+        snapshot['reuse_ratio'] = (
+            (requests_made - connections_opened) / requests_made if requests_made else 0.0
+        )
+        return snapshot
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self._session.close()
@@ -0,0 +1,941 @@
+"""
+Local stand-in services for development and offline testing.
+Lightweight fakes for the external services the backend talks to.
+
+Usage:
+    python standins.py redis --port 6390
+    python standins.py sms --port 8090 --latency-ms 50
+    python standins.py mysql --port 3390 --latency-ms 2
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import socketserver
+import struct
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Optional
+
+from idempotency import COMPLETE_SCRIPT, RELEASE_SCRIPT
+from otp_store import SWAP_SCRIPT
+from rate_limit import GCRA_CHECK_SCRIPT, GCRA_REFUND_SCRIPT
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    """Serve one Redis-protocol client connection."""
+
+    def handle(self):
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            self.wfile.write(self.server.execute(args))
+
+    def _read_command(self) -> Optional[list]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            # Inline command (e.g. typed into telnet)
+            return line.strip().split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+
+class RedisStandIn(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """
+    In-process server speaking the subset of the Redis protocol used by the app.
+
+    Supports PING, AUTH, SELECT, GET, GETDEL, SET (EX/PX/NX/XX/KEEPTTL), DEL,
+    EXISTS, PTTL, DBSIZE and the sorted set commands ZADD, ZREM, ZCARD,
+    ZREMRANGEBYSCORE and ZPOPMIN, with lazy key expiry.
+    EVAL and EVALSHA run the app's own Lua scripts, emulated in Python;
+    EVALSHA answers NOSCRIPT until a script has been sent with EVAL.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), _RespHandler)
+        self._data = {}
+        self._expiry = {}
+        self._lock = threading.Lock()
+        self._scripts = {
+            SWAP_SCRIPT.sha: self._swap,
+            GCRA_CHECK_SCRIPT.sha: self._gcra_check,
+            GCRA_REFUND_SCRIPT.sha: self._gcra_refund,
+            COMPLETE_SCRIPT.sha: self._complete,
+            RELEASE_SCRIPT.sha: self._release,
+        }
+        self._loaded_scripts = set()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'redis://{host}:{port}/0'
+
+    def start(self) -> 'RedisStandIn':
+        """Serve in a daemon thread and return self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def _alive(self, key: bytes) -> bool:
+        expires_at = self._expiry.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            self._data.pop(key, None)
+            self._expiry.pop(key, None)
+        return key in self._data
+
+    @staticmethod
+    def _array(items: list) -> bytes:
+        parts = [b'*%d\r\n' % len(items)]
+        parts.extend(b'$%d\r\n%s\r\n' % (len(item), item) for item in items)
+        return b''.join(parts)
+
+    @staticmethod
+    def _score(value: bytes) -> float:
+        # Accepts '-inf' / '+inf' like Redis
+        return float(value.decode('utf-8'))
+
+    def _zset(self, key: bytes, create: bool = False) -> Optional[dict]:
+        """Members and scores of a sorted set (None if missing and not created)."""
+        if self._alive(key):
+            return self._data[key]
+        if not create:
+            return None
+        self._data[key] = {}
+        return self._data[key]
+
+    def _execute_zset(self, command: bytes, args: list) -> bytes:
+        key = args[1]
+        if command == b'ZADD':
+            zset = self._zset(key, create=True)
+            added = 0
+            for score, member in zip(args[2::2], args[3::2]):
+                added += member not in zset
+                zset[member] = self._score(score)
+            return b':%d\r\n' % added
+        zset = self._zset(key)
+        if zset is None:
+            return b'*0\r\n' if command == b'ZPOPMIN' else b':0\r\n'
+        if command == b'ZCARD':
+            return b':%d\r\n' % len(zset)
+        if command == b'ZREM':
+            return b':%d\r\n' % sum(zset.pop(member, None) is not None for member in args[2:])
+        if command == b'ZREMRANGEBYSCORE':
+            low, high = self._score(args[2]), self._score(args[3])
+            removed = [member for member, score in zset.items() if low <= score <= high]
+            for member in removed:
+                del zset[member]
+            return b':%d\r\n' % len(removed)
+        # ZPOPMIN
+        count = int(args[2]) if len(args) > 2 else 1
+        popped = sorted(zset.items(), key=lambda item: (item[1], item[0]))[:count]
+        reply = []
+        for member, score in popped:
+            del zset[member]
+            reply.extend((member, repr(score).encode('utf-8')))
+        return self._array(reply)
+
+    def _swap(self, keys: list, args: list) -> bytes:
+        key = keys[0]
+        if not self._alive(key) or self._data[key] != args[0]:
+            return b':0\r\n'
+        self._data[key] = args[1]
+        return b':1\r\n'
+
+    def _set_full_at(self, key: bytes, full_at: float, now: float) -> None:
+        self._data[key] = repr(full_at).encode('utf-8')
+        self._expiry[key] = time.time() + (full_at - now)
+
+    def _gcra_check(self, keys: list, args: list) -> bytes:
+        key = keys[0]
+        now, interval, period = (float(arg) for arg in args)
+        full_at = max(float(self._data[key]) if self._alive(key) else 0.0, now) + interval
+        wait = full_at - now - period
+        if wait > 0:
+            reply = repr(wait).encode('utf-8')
+        else:
+            self._set_full_at(key, full_at, now)
+            reply = b'0'
+        return b'$%d\r\n%s\r\n' % (len(reply), reply)
+
+    def _gcra_refund(self, keys: list, args: list) -> bytes:
+        key = keys[0]
+        if not self._alive(key):
+            return b':0\r\n'
+        now, interval = (float(arg) for arg in args)
+        full_at = float(self._data[key]) - interval
+        if full_at <= now:
+            del self._data[key]
+            self._expiry.pop(key, None)
+        else:
+            self._set_full_at(key, full_at, now)
+        return b':1\r\n'
+
+    def _claimed_record(self, key: bytes, token: bytes) -> Optional[dict]:
+        """Idempotency record at ``key`` if it carries the claim ``token``."""
+        if not self._alive(key):
+            return None
+        record = json.loads(self._data[key])
+        return record if record.get('token') == token.decode('utf-8') else None
+
+    def _complete(self, keys: list, args: list) -> bytes:
+        key = keys[0]
+        if self._claimed_record(key, args[0]) is None:
+            return b':0\r\n'
+        self._data[key] = args[1]
+        self._expiry[key] = time.time() + int(args[2]) / 1000.0
+        return b':1\r\n'
+
+    def _release(self, keys: list, args: list) -> bytes:
+        key, index = keys
+        record = self._claimed_record(key, args[0])
+        if record is None or record.get('response') is not None:
+            return b':0\r\n'
+        del self._data[key]
+        self._expiry.pop(key, None)
+        zset = self._zset(index)
+        if zset is not None:
+            zset.pop(key, None)
+        return b':1\r\n'
+
+    def _execute_script(self, command: bytes, args: list) -> bytes:
+        if command == b'EVAL':
+            sha = hashlib.sha1(args[1]).hexdigest()
+            if sha not in self._scripts:
+                return b'-ERR script not emulated by the stand-in\r\n'
+            self._loaded_scripts.add(sha)
+        else:
+            sha = args[1].decode('utf-8')
+            if sha not in self._loaded_scripts:
+                return b'-NOSCRIPT No matching script. Please use EVAL.\r\n'
+        count = int(args[2])
+        return self._scripts[sha](args[3:3 + count], args[3 + count:])
+
+    def execute(self, args: list) -> bytes:
+        """Run one command and return its encoded reply."""
+        if not args:
+            return b'-ERR empty command\r\n'
+        command = args[0].upper()
+        with self._lock:
+            if command in (b'PING', b'AUTH', b'SELECT'):
+                return b'+PONG\r\n' if command == b'PING' else b'+OK\r\n'
+            if command in (b'GET', b'GETDEL'):
+                if not self._alive(args[1]):
+                    return b'$-1\r\n'
+                value = self._data[args[1]]
+                if command == b'GETDEL':
+                    del self._data[args[1]]
+                    self._expiry.pop(args[1], None)
+                return b'$%d\r\n%s\r\n' % (len(value), value)
+            if command == b'SET':
+                key, value = args[1], args[2]
+                options = [arg.upper() for arg in args[3:]]
+                alive = self._alive(key)
+                if (b'NX' in options and alive) or (b'XX' in options and not alive):
+                    return b'$-1\r\n'
+                self._data[key] = value
+                if b'KEEPTTL' not in options:
+                    self._expiry.pop(key, None)
+                for unit, scale in ((b'PX', 1000.0), (b'EX', 1.0)):
+                    if unit in options:
+                        ttl = float(args[3 + options.index(unit) + 1])
+                        self._expiry[key] = time.time() + ttl / scale
+                return b'+OK\r\n'
+            if command in (b'DEL', b'EXISTS'):
+                count = 0
+                for key in args[1:]:
+                    if self._alive(key):
+                        count += 1
+                        if command == b'DEL':
+                            del self._data[key]
+                            self._expiry.pop(key, None)
+                return b':%d\r\n' % count
+            if command == b'PTTL':
+                if not self._alive(args[1]):
+                    return b':-2\r\n'
+                expires_at = self._expiry.get(args[1])
+                if expires_at is None:
+                    return b':-1\r\n'
+                return b':%d\r\n' % int((expires_at - time.time()) * 1000)
+            if command in (b'ZADD', b'ZREM', b'ZCARD', b'ZREMRANGEBYSCORE', b'ZPOPMIN'):
+                return self._execute_zset(command, args)
+            if command in (b'EVAL', b'EVALSHA'):
+                return self._execute_script(command, args)
+            if command == b'DBSIZE':
+                return b':%d\r\n' % sum(1 for key in list(self._data) if self._alive(key))
+        return b'-ERR unknown command ' + command + b'\r\n'
+
+
+class _SMSGatewayHandler(BaseHTTPRequestHandler):
+    """Answer PRP SendSmsTemplateName requests over keep-alive HTTP/1.1."""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; avoid delayed-ACK stalls
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        server = self.server
+
+        if not self.path.rstrip('/').endswith('/SendSmsTemplateName'):
+            self._reply(404, {'isSuccess': False, 'returnMessage': 'Not found'})
+            return
+        if server.latency:
+            time.sleep(server.latency)
+        if server.failure_rate and random.random() < server.failure_rate:
+            self._reply(503, {'isSuccess': False, 'returnMessage': 'Service unavailable'})
+            return
+        try:
+            payload = json.loads(body)
+            receivers = payload['smsReciever']
+        except (ValueError, KeyError, TypeError):
+            self._reply(400, {'isSuccess': False, 'returnMessage': 'Invalid payload'})
+            return
+
+        server.record(self.headers.get('apikey'), payload.get('templateName'), receivers)
+        self._reply(200, {'isSuccess': True, 'returnMessage': 'SMS submitted successfully'})
+
+    def _reply(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        pass
+
+
+class SMSGatewayStandIn(ThreadingHTTPServer):
+    """
+    Local HTTP stand-in for the PRP SMS API.
+
+    Accepts ``POST <base>/SendSmsTemplateName`` and keeps the most recent
+    messages so tests can read back the OTP that would have been delivered.
+    ``latency`` and ``failure_rate`` simulate a slow or flaky gateway.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        keep_messages: int = 10000
+    ):
+        super().__init__((host, port), _SMSGatewayHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.messages = deque(maxlen=keep_messages)
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/BulkSMSapi/keyApiSendSMS'
+
+    def start(self) -> 'SMSGatewayStandIn':
+        """Serve in a daemon thread and return self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def record(self, api_key: Optional[str], template_name: Optional[str], receivers: list) -> None:
+        with self._lock:
+            self.requests += 1
+            for receiver in receivers:
+                self.messages.append({
+                    'apikey': api_key,
+                    'templateName': template_name,
+                    'mobileNo': receiver.get('mobileNo'),
+                    'templateParams': receiver.get('templateParams'),
+                })
+
+    def last_otp(self, mobile_number: str) -> Optional[str]:
+        """
+        Most recent OTP sent to a 10-digit mobile number.
+
+        Args:
+            mobile_number (str): 10-digit mobile number
+
+        Returns:
+            Optional[str]: OTP, or None if nothing was sent
+        """
+        target = f'91{mobile_number}'
+        with self._lock:
+            for message in reversed(self.messages):
+                if message['mobileNo'] == target:
+                    return message['templateParams']
+        return None
+
+
+# MySQL protocol constants used by the stand-in
+_MYSQL_CAPABILITIES = (
+    0x00000001    # CLIENT_LONG_PASSWORD
+    | 0x00000004  # CLIENT_LONG_FLAG
+    | 0x00000008  # CLIENT_CONNECT_WITH_DB
+    | 0x00000200  # CLIENT_PROTOCOL_41
+    | 0x00002000  # CLIENT_TRANSACTIONS
+    | 0x00008000  # CLIENT_SECURE_CONNECTION
+    | 0x00020000  # CLIENT_MULTI_RESULTS
+    | 0x00080000  # CLIENT_PLUGIN_AUTH
+    | 0x00100000  # CLIENT_CONNECT_ATTRS
+    | 0x00200000  # CLIENT_PLUGIN_AUTH_LENENC_CLIENT_DATA
+)
+_SERVER_STATUS_IN_TRANS = 0x0001
+_SERVER_STATUS_AUTOCOMMIT = 0x0002
+_COM_QUIT = 0x01
+_COM_INIT_DB = 0x02
+_COM_QUERY = 0x03
+_COM_PING = 0x0e
+_COM_CHANGE_USER = 0x11
+_COM_RESET_CONNECTION = 0x1f
+_CHARSET_UTF8MB4 = 255
+_CHARSET_BINARY = 63
+
+_CUSTOMER_LOOKUP = re.compile(
+    r"^\s*SELECT\s+(?P<columns>.+?)\s+FROM\s+b2c_customer_master\s+"
+    r"WHERE\s+(?P<column>customer_id|mobile_normalized)\s*=\s*'(?P<value>[^']*)'",
+    re.IGNORECASE | re.DOTALL
+)
+_SYSTEM_VARIABLES = re.compile(r"^\s*SELECT\s+(@@[\w.]+(?:\s*,\s*@@[\w.]+)*)\s*$", re.IGNORECASE)
+_SESSION_DEFAULTS = {
+    'sql_mode': 'STRICT_TRANS_TABLES,NO_ENGINE_SUBSTITUTION',
+    'time_zone': 'SYSTEM',
+    'autocommit': 1,
+}
+_SELECT_COLUMNS = re.compile(r"^\s*SELECT\s+(?P<columns>.+?)(?:\s+FROM\s|\s*$)", re.IGNORECASE | re.DOTALL)
+_LAST_INSERT_ID = re.compile(r"^\s*SELECT\s+LAST_INSERT_ID\(\)\s*$", re.IGNORECASE)
+_RESERVE_IDS = re.compile(
+    r"^\s*UPDATE\s+id_sequences\s+SET\s+next_value\s*=\s*LAST_INSERT_ID\(next_value\s*\+\s*(?P<count>\d+)\)"
+    r"\s+WHERE\s+name\s*=\s*'(?P<name>[^']*)'",
+    re.IGNORECASE
+)
+_INSERT = re.compile(
+    r"^\s*INSERT\s+(?P<ignore>IGNORE\s+)?INTO\s+(?P<table>\w+)\s*\((?P<columns>[^)]*)\)\s*VALUES\s*(?P<values>.*)$",
+    re.IGNORECASE | re.DOTALL
+)
+_UPDATE = re.compile(
+    r"^\s*UPDATE\s+(?P<table>\w+)\s+SET\s+(?P<assignments>.*?)\s+WHERE\s+(?P<where>.*)$",
+    re.IGNORECASE | re.DOTALL
+)
+_DELETE = re.compile(r"^\s*DELETE\s+FROM\s+(?P<table>\w+)\s+WHERE\s+(?P<where>.*)$", re.IGNORECASE | re.DOTALL)
+_FROM_TABLE = re.compile(r"\sFROM\s+(?P<table>\w+)", re.IGNORECASE)
+_LIMIT = re.compile(r"\sLIMIT\s+(?P<limit>\d+)", re.IGNORECASE)
+_FEED_CURSOR = re.compile(r"n\.id\s*<\s*(?P<cursor>\d+)", re.IGNORECASE)
+_UNREAD_DELTA = re.compile(r"unread_count\s*=\s*GREATEST\(\s*unread_count\s*\+\s*(?P<delta>-?\d+)", re.IGNORECASE)
+_SQL_VALUE = r"'(?:[^'\\]|\\.|'')*'|-?\d+(?:\.\d+)?|NULL"
+_LITERAL = re.compile(r"\s*(" + _SQL_VALUE + r")\s*", re.IGNORECASE | re.DOTALL)
+_ASSIGNMENT = re.compile(r"(?P<column>\w+)\s*=\s*(?P<value>" + _SQL_VALUE + r")", re.IGNORECASE | re.DOTALL)
+_CONDITION = re.compile(
+    r"(?:\w+\.)?(?P<column>\w+)\s*(?:=|<=>)\s*(?P<value>" + _SQL_VALUE + r")", re.IGNORECASE | re.DOTALL
+)
+_DATETIME_TEXT = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:\.\d+)?$")
+_ESCAPES = {'0': '\0', 'n': '\n', 'r': '\r', 'Z': '\x1a'}
+
+
+def _sql_value(literal: str):
+    """Python value of a SQL literal as written by the driver's client-side interpolation."""
+    if literal.upper() == 'NULL':
+        return None
+    if literal.startswith("'"):
+        text = re.sub(
+            r"\\(.)|''",
+            lambda match: _ESCAPES.get(match.group(1), match.group(1)) if match.group(1) is not None else "'",
+            literal[1:-1],
+            flags=re.DOTALL
+        )
+        if _DATETIME_TEXT.match(text):
+            return datetime.fromisoformat(text)
+        return text
+    if '.' in literal:
+        return Decimal(literal)
+    return int(literal)
+
+
+def _value_rows(text: str) -> list:
+    """Parse ``(v, v, ...), (v, ...)`` into lists of values."""
+    rows = []
+    position = 0
+    while True:
+        start = text.find('(', position)
+        if start < 0:
+            return rows
+        row = []
+        position = start + 1
+        while True:
+            match = _LITERAL.match(text, position)
+            if match is None:
+                return rows
+            row.append(_sql_value(match.group(1)))
+            position = match.end()
+            if text[position:position + 1] == ',':
+                position += 1
+                continue
+            position += 1
+            break
+        rows.append(row)
+
+
+def _conditions(where: str) -> dict:
+    """``column = literal`` terms of a WHERE clause (table prefixes dropped)."""
+    return {match.group('column'): _sql_value(match.group('value')) for match in _CONDITION.finditer(where)}
+
+
+def _select_columns(sql: str) -> list:
+    """Result column names of a SELECT (aliases and table prefixes resolved)."""
+    match = _SELECT_COLUMNS.match(sql)
+    if match is None:
+        return []
+    columns, depth, current = [], 0, ''
+    for character in match.group('columns'):
+        if character == ',' and depth == 0:
+            columns.append(current)
+            current = ''
+            continue
+        depth += (character == '(') - (character == ')')
+        current += character
+    columns.append(current)
+    names = []
+    for column in columns:
+        column = column.strip()
+        alias = re.search(r"\s+AS\s+(\w+)$", column, re.IGNORECASE)
+        names.append(alias.group(1) if alias else column.rsplit('.', 1)[-1])
+    return names
+
+
+def _lenenc_int(value: int) -> bytes:
+    if value < 251:
+        return bytes((value,))
+    if value < 1 << 16:
+        return b'\xfc' + struct.pack('<H', value)
+    if value < 1 << 24:
+        return b'\xfd' + struct.pack('<I', value)[:3]
+    return b'\xfe' + struct.pack('<Q', value)
+
+
+def _lenenc_str(value: bytes) -> bytes:
+    return _lenenc_int(len(value)) + value
+
+
+def _column_type(value) -> tuple:
+    """MySQL (type, charset) for a Python value."""
+    if isinstance(value, bool) or isinstance(value, int):
+        return 0x08, _CHARSET_BINARY          # LONGLONG
+    if isinstance(value, Decimal):
+        return 0xf6, _CHARSET_BINARY          # NEWDECIMAL
+    if isinstance(value, datetime):
+        return 0x0c, _CHARSET_BINARY          # DATETIME
+    return 0xfd, _CHARSET_UTF8MB4             # VAR_STRING
+
+
+def _text_value(value) -> bytes:
+    if value is None:
+        return b'\xfb'
+    if isinstance(value, datetime):
+        value = value.strftime('%Y-%m-%d %H:%M:%S')
+    return _lenenc_str(str(value).encode('utf-8'))
+
+
+class _MySQLHandler(socketserver.BaseRequestHandler):
+    """Serve one MySQL client connection (text protocol only)."""
+
+    def setup(self):
+        self.sequence = 0
+        self.in_transaction = False
+        self.last_insert_id = 0
+        self.buffer = b''
+
+    def handle(self):
+        self._handshake()
+        while True:
+            payload = self._read_packet()
+            if payload is None or payload[0] == _COM_QUIT:
+                return
+            command = payload[0]
+            if command == _COM_QUERY:
+                self._query(payload[1:].decode('utf-8', 'replace'))
+            elif command in (_COM_PING, _COM_INIT_DB, _COM_RESET_CONNECTION, _COM_CHANGE_USER):
+                if command != _COM_PING:
+                    self.in_transaction = False
+                self._send_ok()
+            else:
+                self._send_error(1047, 'Unknown command (stand-in supports the text protocol only)')
+
+    def _read_exact(self, size: int) -> Optional[bytes]:
+        while len(self.buffer) < size:
+            chunk = self.request.recv(65536)
+            if not chunk:
+                return None
+            self.buffer += chunk
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def _read_packet(self) -> Optional[bytes]:
+        header = self._read_exact(4)
+        if header is None:
+            return None
+        length = int.from_bytes(header[:3], 'little')
+        self.sequence = (header[3] + 1) & 0xff
+        return self._read_exact(length)
+
+    def _packet(self, payload: bytes) -> bytes:
+        data = len(payload).to_bytes(3, 'little') + bytes((self.sequence,)) + payload
+        self.sequence = (self.sequence + 1) & 0xff
+        return data
+
+    def _status(self) -> int:
+        if self.in_transaction:
+            return _SERVER_STATUS_IN_TRANS
+        return _SERVER_STATUS_AUTOCOMMIT
+
+    def _send_ok(self, affected_rows: int = 0) -> None:
+        payload = (
+            b'\x00' + _lenenc_int(affected_rows) + _lenenc_int(0)
+            + struct.pack('<HH', self._status(), 0)
+        )
+        self.request.sendall(self._packet(payload))
+
+    def _send_error(self, code: int, message: str) -> None:
+        payload = b'\xff' + struct.pack('<H', code) + b'#HY000' + message.encode('utf-8')
+        self.request.sendall(self._packet(payload))
+
+    def _eof(self) -> bytes:
+        return self._packet(b'\xfe' + struct.pack('<HH', 0, self._status()))
+
+    def _handshake(self) -> None:
+        salt = os.urandom(20)
+        payload = (
+            b'\x0a' + b'8.0.36-standin\x00'
+            + struct.pack('<I', threading.get_ident() & 0xffffffff)
+            + salt[:8] + b'\x00'
+            + struct.pack('<H', _MYSQL_CAPABILITIES & 0xffff)
+            + bytes((_CHARSET_UTF8MB4,))
+            + struct.pack('<H', _SERVER_STATUS_AUTOCOMMIT)
+            + struct.pack('<H', _MYSQL_CAPABILITIES >> 16)
+            + bytes((21,)) + b'\x00' * 10
+            + salt[8:] + b'\x00'
+            + b'mysql_native_password\x00'
+        )
+        self.sequence = 0
+        self.request.sendall(self._packet(payload))
+        # Any user and password are accepted
+        if self._read_packet() is not None:
+            self._send_ok()
+
+    def _query(self, sql: str) -> None:
+        server = self.server
+        keyword = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+        if keyword in ('START', 'BEGIN'):
+            self.in_transaction = True
+        elif keyword in ('COMMIT', 'ROLLBACK'):
+            self.in_transaction = False
+        elif keyword != 'SET' and server.latency:
+            time.sleep(server.latency)
+        with server.lock:
+            server.queries += 1
+
+        if keyword != 'SELECT':
+            affected, last_insert_id = server.execute(sql)
+            if last_insert_id is not None:
+                self.last_insert_id = last_insert_id
+            self._send_ok(affected)
+            return
+        if _LAST_INSERT_ID.match(sql):
+            self._send_result_set(['LAST_INSERT_ID()'], [{'LAST_INSERT_ID()': self.last_insert_id}])
+            return
+        columns, rows = server.select(sql)
+        if not columns:
+            self._send_ok()
+            return
+        self._send_result_set(columns, rows)
+
+    def _send_result_set(self, columns: list, rows: list) -> None:
+        sample = rows[0] if rows else {}
+        packets = [self._packet(_lenenc_int(len(columns)))]
+        for name in columns:
+            column_type, charset = _column_type(sample.get(name))
+            encoded_name = name.encode('utf-8')
+            packets.append(self._packet(
+                _lenenc_str(b'def') + _lenenc_str(b'') + _lenenc_str(b'') + _lenenc_str(b'')
+                + _lenenc_str(encoded_name) + _lenenc_str(encoded_name)
+                + b'\x0c' + struct.pack('<HIBHB', charset, 1024, column_type, 0, 0) + b'\x00\x00'
+            ))
+        packets.append(self._eof())
+        for row in rows:
+            packets.append(self._packet(b''.join(_text_value(row.get(name)) for name in columns)))
+        packets.append(self._eof())
+        self.request.sendall(b''.join(packets))
+
+
+class MySQLStandIn(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """
+    In-process server speaking enough of the MySQL client/server protocol for
+    the real drivers (``mysql.connector`` and ``mysql.connector.aio``).
+
+    Accepts any credentials and keeps in-memory versions of the tables the
+    app's hot paths use: customers (lookups by ``customer_id`` or
+    ``mobile_normalized``, signup inserts and profile updates), the
+    ``id_sequences`` allocator and the notification feed. Other SELECTs
+    return an empty result and other statements an empty OK. Writes apply
+    immediately (ROLLBACK does not undo them). ``latency`` is added to each
+    statement to stand in for a network round trip and server work.
+    Prepared statements are not supported; run the app with
+    DB_PREPARED_STATEMENTS=False.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+    # Benchmarks open many connections at once; the default backlog of 5
+    # drops SYNs and stalls clients for a full retransmit timeout
+    request_queue_size = 1024
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: float = 0.0,
+        customers: Iterable[dict] = ()
+    ):
+        super().__init__((host, port), _MySQLHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.customers = {}
+        self.by_mobile = {}
+        self.sequences = {}
+        # customer_notification_state and customer_notifications
+        self.feeds = {}
+        self.notifications = {}
+        self.next_notification_id = 1
+        for customer in customers:
+            self.add_customer(customer)
+
+    @property
+    def address(self) -> tuple:
+        return self.server_address[:2]
+
+    def start(self) -> 'MySQLStandIn':
+        """Serve in a daemon thread and return self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def add_customer(self, customer: dict) -> None:
+        """Add or replace a b2c_customer_master row."""
+        with self.lock:
+            self.customers[str(customer['customer_id'])] = customer
+            if customer.get('mobile_normalized'):
+                self.by_mobile[customer['mobile_normalized']] = customer
+
+    def select(self, sql: str) -> tuple:
+        """
+        Answer a SELECT.
+
+        Returns:
+            tuple: (column names, rows); no columns for unrecognised queries
+        """
+        variables = _SYSTEM_VARIABLES.match(sql)
+        if variables is not None:
+            # Driver probes such as SELECT @@session.sql_mode
+            columns = [name.strip() for name in variables.group(1).split(',')]
+            return columns, [{
+                name: _SESSION_DEFAULTS.get(name.rsplit('.', 1)[-1].lstrip('@').lower(), '')
+                for name in columns
+            }]
+        columns = _select_columns(sql)
+        match = _CUSTOMER_LOOKUP.match(sql)
+        if match is not None:
+            with self.lock:
+                if match.group('column') == 'customer_id':
+                    row = self.customers.get(match.group('value'))
+                else:
+                    row = self.by_mobile.get(match.group('value'))
+            return columns, [row] if row is not None else []
+        table = _FROM_TABLE.search(sql)
+        if table is not None and table.group('table').lower() == 'customer_notification_state':
+            return columns, self._select_feed(sql, columns)
+        return columns, []
+
+    def _select_feed(self, sql: str, columns: list) -> list:
+        """Notification feed page (LEFT JOIN of the state row and its notifications)."""
+        customer_id = str(_conditions(sql.split('WHERE', 1)[-1]).get('customer_id'))
+        with self.lock:
+            state = self.feeds.get(customer_id)
+            if state is None:
+                return []
+            cursor = _FEED_CURSOR.search(sql)
+            if cursor is None:
+                # Existence check or unread counter
+                return [dict(state, **{'1': 1})]
+            limit = _LIMIT.search(sql)
+            notifications = sorted(
+                (row for row in self.notifications.get(customer_id, {}).values()
+                 if row['id'] < int(cursor.group('cursor'))),
+                key=lambda row: row['id'], reverse=True
+            )[:int(limit.group('limit')) if limit else None]
+            rows = [dict(row, **state) for row in notifications] or [dict(state)]
+        return [{name: row.get(name) for name in columns} for row in rows]
+
+    def execute(self, sql: str) -> tuple:
+        """
+        Apply an INSERT, UPDATE or DELETE to the in-memory tables.
+
+        Returns:
+            tuple: (affected rows, LAST_INSERT_ID value or None)
+        """
+        match = _RESERVE_IDS.match(sql)
+        if match is not None:
+            with self.lock:
+                name = match.group('name')
+                if name not in self.sequences:
+                    ids = [int(key) for key in self.customers if key.isdigit()]
+                    self.sequences[name] = max(ids + [1000]) + 1
+                self.sequences[name] += int(match.group('count'))
+                return 1, self.sequences[name]
+        match = _INSERT.match(sql)
+        if match is not None:
+            columns = [column.strip() for column in match.group('columns').split(',')]
+            rows = [dict(zip(columns, values)) for values in _value_rows(match.group('values'))]
+            return self._insert(match.group('table').lower(), rows, bool(match.group('ignore'))), None
+        match = _UPDATE.match(sql)
+        if match is not None:
+            return self._update(match.group('table').lower(), match.group('assignments'), match.group('where')), None
+        match = _DELETE.match(sql)
+        if match is not None:
+            return self._delete(match.group('table').lower(), _conditions(match.group('where'))), None
+        return 0, None
+
+    def _insert(self, table: str, rows: list, ignore: bool) -> int:
+        if table == 'b2c_customer_master':
+            for row in rows:
+                self.add_customer(row)
+            return len(rows)
+        inserted = 0
+        with self.lock:
+            for row in rows:
+                customer_id = str(row.get('customer_id'))
+                if table == 'customer_notification_state':
+                    if customer_id in self.feeds:
+                        continue
+                    self.feeds[customer_id] = {
+                        'unread_count': row.get('unread_count', 0),
+                        'last_status': row.get('last_status'),
+                        'version': 0,
+                    }
+                elif table == 'customer_notifications':
+                    feed = self.notifications.setdefault(customer_id, {})
+                    if row.get('notification_key') in feed:
+                        continue
+                    feed[row.get('notification_key')] = dict(row, id=self.next_notification_id)
+                    self.next_notification_id += 1
+                else:
+                    continue
+                inserted += 1
+        return inserted
+
+    def _update(self, table: str, assignments: str, where: str) -> int:
+        values = {match.group('column'): _sql_value(match.group('value')) for match in _ASSIGNMENT.finditer(assignments)}
+        conditions = _conditions(where)
+        customer_id = str(conditions.get('customer_id'))
+        with self.lock:
+            if table == 'b2c_customer_master':
+                customer = self.customers.get(customer_id)
+                if customer is None:
+                    return 0
+                updated = dict(customer, **values)
+            elif table == 'customer_notification_state':
+                state = self.feeds.get(customer_id)
+                if state is None:
+                    return 0
+                if 'last_status' in conditions and state['last_status'] != conditions['last_status']:
+                    return 0
+                delta = _UNREAD_DELTA.search(assignments)
+                if delta is not None:
+                    state['unread_count'] = max(state['unread_count'] + int(delta.group('delta')), 0)
+                    state['version'] += 1
+                if 'last_status' in values:
+                    state['last_status'] = values['last_status']
+                return 1
+            elif table == 'customer_notifications':
+                changed = 0
+                for row in self.notifications.get(customer_id, {}).values():
+                    key = conditions.get('notification_key')
+                    if row.get('is_read') == 0 and (key is None or row.get('notification_key') == key):
+                        row.update(values)
+                        changed += 1
+                return changed
+            else:
+                return 0
+        self.add_customer(updated)
+        return 1
+
+    def _delete(self, table: str, conditions: dict) -> int:
+        if table != 'customer_notifications':
+            return 0
+        with self.lock:
+            feed = self.notifications.get(str(conditions.get('customer_id')), {})
+            row = feed.get(conditions.get('notification_key'))
+            if row is None or ('is_read' in conditions and row.get('is_read') != conditions['is_read']):
+                return 0
+            del feed[conditions['notification_key']]
+            return 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Run a local stand-in service')
+    subparsers = parser.add_subparsers(dest='service', required=True)
+    redis_parser = subparsers.add_parser('redis', help='Redis-protocol server')
+    redis_parser.add_argument('--host', default='127.0.0.1')
+    redis_parser.add_argument('--port', type=int, default=6390)
+    sms_parser = subparsers.add_parser('sms', help='PRP SMS API (SendSmsTemplateName)')
+    sms_parser.add_argument('--host', default='127.0.0.1')
+    sms_parser.add_argument('--port', type=int, default=8090)
+    sms_parser.add_argument('--latency-ms', type=float, default=0.0)
+    sms_parser.add_argument('--failure-rate', type=float, default=0.0)
+    mysql_parser = subparsers.add_parser('mysql', help='MySQL protocol server (customer lookups)')
+    mysql_parser.add_argument('--host', default='127.0.0.1')
+    mysql_parser.add_argument('--port', type=int, default=3390)
+    mysql_parser.add_argument('--latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.service == 'redis':
+        server = RedisStandIn(args.host, args.port)
+        print(f"Redis stand-in listening on {server.url}")
+        server.serve_forever()
+    elif args.service == 'sms':
+        server = SMSGatewayStandIn(
+            args.host, args.port,
+            latency=args.latency_ms / 1000.0,
+            failure_rate=args.failure_rate
+        )
+        print(f"SMS gateway stand-in listening; set PRP_API_BASE_URL={server.base_url}")
+        server.serve_forever()
+    elif args.service == 'mysql':
+        server = MySQLStandIn(args.host, args.port, latency=args.latency_ms / 1000.0)
+        host, port = server.address
+        print(f"MySQL stand-in listening; set DB_HOST={host} DB_PORT={port} DB_PREPARED_STATEMENTS=False")
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Shared fixtures for the backend tests.
+The backend modules are imported as top-level modules, as the app does.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from standins import RedisStandIn  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def redis_server():
+    """In-process Redis protocol server shared by the tests."""
+    server = RedisStandIn().start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class FakeClock:
+    """Stand-in for time.monotonic that only moves when told to."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Freeze time.monotonic; advance it with ``clock.advance(seconds)``."""
+    fake = FakeClock()
+    monkeypatch.setattr('time.monotonic', fake)
+    return fake
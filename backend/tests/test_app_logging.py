@@ -0,0 +1,26 @@
+"""Tests for log redaction."""
+import logging
+import sys
+
+from app_logging import JsonFormatter, RedactingFilter, TextFormatter
+
+
+def failed_record() -> logging.LogRecord:
+    try:
+        raise ValueError("Duplicate entry '9876543210' for key 'mobile'; otp=123456")
+    except ValueError as e:
+        return logging.LogRecord(
+            'app', logging.ERROR, __file__, 1, 'Error in signup: %s', (e,), exc_info=sys.exc_info()
+        )
+
+
+def test_exception_traceback_is_redacted():
+    record = failed_record()
+    assert RedactingFilter().filter(record)
+
+    for formatter in (JsonFormatter(), TextFormatter()):
+        line = formatter.format(record)
+        assert 'ValueError' in line
+        assert '9876543210' not in line
+        assert '123456' not in line
+        assert '******3210' in line
@@ -0,0 +1,175 @@
+"""Tests for the database connection pool."""
+import threading
+import time
+
+import pytest
+
+from connection_pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    """Records what the pool does to a raw MySQL connection."""
+
+    def __init__(self, number: int):
+        self.number = number
+        self.closed = False
+        self.in_transaction = False
+        self.resets = 0
+        self.rollbacks = 0
+        self.pings = 0
+        self.alive = True
+
+    def close(self):
+        self.closed = True
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def reset_session(self):
+        self.resets += 1
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if not self.alive:
+            raise OSError('gone')
+
+
+class Connector:
+    def __init__(self):
+        self.opened = []
+
+    def __call__(self):
+        connection = FakeConnection(len(self.opened))
+        self.opened.append(connection)
+        return connection
+
+
+@pytest.fixture
+def connector():
+    return Connector()
+
+
+def test_connection_is_reused(connector):
+    pool = ConnectionPool(connector, pool_size=2)
+    first = pool.get_connection()
+    number = first.number
+    first.close()
+    second = pool.get_connection()
+    assert second.number == number
+    assert len(connector.opened) == 1
+    assert pool.stats()['checkouts'] == 2
+
+
+def test_close_is_idempotent(connector):
+    pool = ConnectionPool(connector, pool_size=2)
+    connection = pool.get_connection()
+    connection.close()
+    connection.close()
+    assert pool.stats()['idle'] == 1
+
+
+def test_overflow_connections_are_closed_on_return(connector):
+    pool = ConnectionPool(connector, pool_size=1, max_overflow=1)
+    first = pool.get_connection()
+    second = pool.get_connection()
+    first.close()
+    second.close()
+    assert pool.stats()['open'] == 1
+    assert sum(connection.closed for connection in connector.opened) == 1
+
+
+def test_checkout_times_out_when_exhausted(connector):
+    pool = ConnectionPool(connector, pool_size=1, max_overflow=0, timeout=0.05)
+    pool.get_connection()
+    with pytest.raises(PoolTimeoutError):
+        pool.get_connection()
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_waiter_gets_returned_connection(connector):
+    pool = ConnectionPool(connector, pool_size=1, max_overflow=0, timeout=5)
+    held = pool.get_connection()
+    threading.Timer(0.05, held.close).start()
+    connection = pool.get_connection()
+    assert connection.number == held.number
+
+
+def test_clean_connection_skips_reset(connector):
+    pool = ConnectionPool(connector, pool_size=1)
+    pool.get_connection().close()
+    assert connector.opened[0].resets == 0
+
+
+def test_dirty_connection_is_reset(connector):
+    pool = ConnectionPool(connector, pool_size=1)
+    connection = pool.get_connection()
+    connection.statements['customer_by_id'] = object()
+    connection.dirty = True
+    connection.close()
+    assert connector.opened[0].resets == 1
+    # The reset deallocates prepared statements on the server
+    assert pool.get_connection().statements == {}
+
+
+def test_open_transaction_is_rolled_back(connector):
+    pool = ConnectionPool(connector, pool_size=1)
+    connection = pool.get_connection()
+    connector.opened[0].in_transaction = True
+    connection.close()
+    raw = connector.opened[0]
+    assert raw.rollbacks == 1
+    assert raw.resets == 1
+    assert not raw.in_transaction
+
+
+def test_statements_survive_clean_return(connector):
+    pool = ConnectionPool(connector, pool_size=1)
+    connection = pool.get_connection()
+    statement = object()
+    connection.statements['customer_by_id'] = statement
+    connection.close()
+    assert pool.get_connection().statements['customer_by_id'] is statement
+
+
+def test_old_connections_are_recycled(connector, monkeypatch):
+    pool = ConnectionPool(connector, pool_size=1, recycle=60)
+    pool.get_connection().close()
+    now = time.time()
+    monkeypatch.setattr('time.time', lambda: now + 120)
+    connection = pool.get_connection()
+    assert connection.number == 1
+    assert connector.opened[0].closed
+    assert pool.stats()['recycled'] == 1
+
+
+def test_dead_idle_connection_is_replaced(connector, monkeypatch):
+    pool = ConnectionPool(connector, pool_size=1)
+    pool.get_connection().close()
+    connector.opened[0].alive = False
+    now = time.time()
+    # Idle for more than a second, so it is pinged before reuse
+    monkeypatch.setattr('time.time', lambda: now + 5)
+    connection = pool.get_connection()
+    assert connection.number == 1
+    assert pool.stats()['ping_failures'] == 1
+
+
+def test_failed_connect_frees_the_slot():
+    def refuse():
+        raise OSError('refused')
+
+    pool = ConnectionPool(refuse, pool_size=1, max_overflow=0)
+    for _ in range(2):
+        with pytest.raises(OSError):
+            pool.get_connection()
+    assert pool.stats()['open'] == 0
+
+
+def test_warm_and_close_idle(connector):
+    pool = ConnectionPool(connector, pool_size=3)
+    assert pool.warm(5) == 3
+    assert pool.stats()['idle'] == 3
+    pool.close_idle()
+    assert pool.stats()['open'] == 0
+    assert all(connection.closed for connection in connector.opened)
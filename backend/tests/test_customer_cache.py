@@ -0,0 +1,147 @@
+"""Tests for the customer read-through cache."""
+import asyncio
+
+from customer_cache import CustomerCache
+
+
+ROW = {'customer_id': '1001', 'customer_name': 'A', 'city': 'Pune'}
+
+
+class Loader:
+    """Counts database loads and returns the current row."""
+
+    def __init__(self, row=ROW):
+        self.row = row
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return dict(self.row) if self.row is not None else None
+
+
+def test_hit_after_miss():
+    cache = CustomerCache()
+    loader = Loader()
+    assert cache.get('1001', loader) == ROW
+    assert cache.get(1001, loader) == ROW
+    assert loader.calls == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_returns_copies():
+    cache = CustomerCache()
+    cache.get('1001', Loader())['city'] = 'Changed'
+    assert cache.get('1001', Loader())['city'] == 'Pune'
+
+
+def test_missing_customer_not_cached():
+    cache = CustomerCache()
+    loader = Loader(row=None)
+    assert cache.get('1001', loader) is None
+    assert cache.get('1001', loader) is None
+    assert loader.calls == 2
+
+
+def test_entries_expire(clock):
+    cache = CustomerCache(ttl_seconds=30)
+    loader = Loader()
+    cache.get('1001', loader)
+    clock.advance(29)
+    cache.get('1001', loader)
+    assert loader.calls == 1
+    clock.advance(2)
+    cache.get('1001', loader)
+    assert loader.calls == 2
+
+
+def test_invalidate_forces_reload():
+    cache = CustomerCache()
+    loader = Loader()
+    cache.get('1001', loader)
+    cache.invalidate(1001)
+    loader.row = dict(ROW, city='Mumbai')
+    assert cache.get('1001', loader)['city'] == 'Mumbai'
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_load_racing_an_invalidation_is_not_cached():
+    cache = CustomerCache()
+
+    def stale_loader():
+        # A write lands while the old row is being read
+        cache.invalidate('1001')
+        return dict(ROW)
+
+    assert cache.get('1001', stale_loader) == ROW
+    fresh = Loader(dict(ROW, city='Mumbai'))
+    assert cache.get('1001', fresh)['city'] == 'Mumbai'
+    assert fresh.calls == 1
+
+
+def test_invalidation_of_another_customer_also_skips_fill():
+    # The generation is global, so any write during a load drops the fill
+    cache = CustomerCache()
+
+    def loader():
+        cache.invalidate('2002')
+        return dict(ROW)
+
+    cache.get('1001', loader)
+    assert cache.stats()['size'] == 0
+
+
+def test_clear_bumps_generation():
+    cache = CustomerCache()
+    loader = Loader()
+    cache.get('1001', loader)
+    cache.clear()
+    cache.get('1001', loader)
+    assert loader.calls == 2
+
+
+def test_put_stores_fresh_row():
+    cache = CustomerCache()
+    cache.put('1001', dict(ROW, city='Delhi'))
+    loader = Loader()
+    assert cache.get('1001', loader)['city'] == 'Delhi'
+    assert loader.calls == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = CustomerCache(max_entries=2)
+    for customer_id in ('1', '2'):
+        cache.get(customer_id, Loader())
+    # Touch '1' so '2' is the least recently used
+    cache.get('1', Loader())
+    cache.get('3', Loader())
+    loader = Loader()
+    cache.get('1', loader)
+    cache.get('2', loader)
+    assert loader.calls == 1
+    assert cache.stats()['evictions'] >= 1
+
+
+def test_disabled_cache_always_loads():
+    cache = CustomerCache(ttl_seconds=0)
+    loader = Loader()
+    cache.get('1001', loader)
+    cache.put('1001', ROW)
+    cache.get('1001', loader)
+    assert loader.calls == 2
+
+
+def test_get_async():
+    cache = CustomerCache()
+    loader = Loader()
+
+    async def load():
+        return loader()
+
+    async def run():
+        first = await cache.get_async('1001', load)
+        second = await cache.get_async('1001', load)
+        return first, second
+
+    assert asyncio.run(run()) == (ROW, ROW)
+    assert loader.calls == 1
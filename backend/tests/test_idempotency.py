@@ -0,0 +1,178 @@
+"""Tests for the idempotency key stores."""
+import itertools
+import threading
+import time
+
+import pytest
+
+from idempotency import (
+    IdempotencyCache, RedisIdempotencyStore, SQLiteIdempotencyStore, StoredResponse, request_fingerprint
+)
+
+
+_prefixes = itertools.count()
+
+FINGERPRINT = request_fingerprint('POST', '/api/signup', b'{"fullName": "A"}')
+RESPONSE = StoredResponse(201, [('Content-Type', 'application/json')], b'{"status":"success"}\n')
+
+
+def test_fingerprint_covers_method_path_and_body():
+    assert request_fingerprint('POST', '/api/signup', b'{}') == request_fingerprint('POST', '/api/signup', b'{}')
+    assert request_fingerprint('POST', '/api/signup', b'{}') != request_fingerprint('PUT', '/api/signup', b'{}')
+    assert request_fingerprint('POST', '/api/signup', b'{}') != request_fingerprint('POST', '/api/signup', b'[]')
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def make_stores(request, tmp_path, redis_server):
+    """Factory for two handles on one store, as two workers would have."""
+    def make(ttl_seconds=86400, max_entries=100, lock_seconds=60):
+        if request.param == 'memory':
+            cache = IdempotencyCache(ttl_seconds, max_entries)
+            return cache, cache
+        if request.param == 'sqlite':
+            path = str(tmp_path / 'idempotency.sqlite3')
+            return tuple(
+                SQLiteIdempotencyStore(path, ttl_seconds, max_entries, lock_seconds, sweep_interval=1)
+                for _ in range(2)
+            )
+        prefix = f'idempotency{next(_prefixes)}:'
+        return tuple(
+            RedisIdempotencyStore(redis_server.url, ttl_seconds, max_entries, lock_seconds, key_prefix=prefix)
+            for _ in range(2)
+        )
+    return make
+
+
+def test_first_request_owns_the_key(make_stores):
+    first, second = make_stores()
+    entry, owner = first.begin('signup:key', FINGERPRINT)
+    assert owner
+    duplicate, owner = second.begin('signup:key', FINGERPRINT)
+    assert not owner
+    assert duplicate.response is None
+    assert first.stats()['executed'] == 1
+
+
+def test_completed_response_is_replayed(make_stores):
+    first, second = make_stores()
+    entry, _ = first.begin('signup:key', FINGERPRINT)
+    first.complete('signup:key', entry, RESPONSE)
+
+    replay, owner = second.begin('signup:key', FINGERPRINT)
+    assert not owner
+    assert replay.fingerprint == FINGERPRINT
+    assert (replay.response.status, replay.response.headers, replay.response.body) == (
+        RESPONSE.status, RESPONSE.headers, RESPONSE.body
+    )
+
+
+def test_reused_key_reports_original_fingerprint(make_stores):
+    first, second = make_stores()
+    first.begin('signup:key', FINGERPRINT)
+    entry, owner = second.begin('signup:key', b'other request')
+    assert not owner
+    assert entry.fingerprint == FINGERPRINT
+
+
+def test_abandoned_key_can_be_claimed_again(make_stores):
+    first, second = make_stores()
+    entry, _ = first.begin('signup:key', FINGERPRINT)
+    first.abandon('signup:key', entry)
+    _, owner = second.begin('signup:key', FINGERPRINT)
+    assert owner
+
+
+def test_waiting_request_sees_completion(make_stores):
+    first, second = make_stores()
+    entry, _ = first.begin('signup:key', FINGERPRINT)
+    pending, _ = second.begin('signup:key', FINGERPRINT)
+
+    timer = threading.Timer(0.1, first.complete, ('signup:key', entry, RESPONSE))
+    timer.start()
+    assert second.wait('signup:key', pending, 5)
+    replay, owner = second.begin('signup:key', FINGERPRINT)
+    assert not owner
+    assert replay.response.body == RESPONSE.body
+
+
+def test_wait_times_out_while_owner_runs(make_stores):
+    first, second = make_stores()
+    first.begin('signup:key', FINGERPRINT)
+    pending, _ = second.begin('signup:key', FINGERPRINT)
+    started = time.monotonic()
+    assert not second.wait('signup:key', pending, 0.1)
+    assert time.monotonic() - started < 1
+
+
+def test_concurrent_duplicates_run_once(make_stores):
+    first, second = make_stores()
+    runs = []
+    replays = []
+    barrier = threading.Barrier(6)
+
+    def handle(store):
+        barrier.wait()
+        while True:
+            entry, owner = store.begin('signup:key', FINGERPRINT)
+            if owner:
+                runs.append(entry)
+                time.sleep(0.1)
+                store.complete('signup:key', entry, RESPONSE)
+                return
+            if entry.response is not None:
+                replays.append(entry.response.body)
+                return
+            assert store.wait('signup:key', entry, 5)
+
+    threads = [threading.Thread(target=handle, args=(store,)) for store in (first, second) * 3]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(runs) == 1
+    assert replays == [RESPONSE.body] * 5
+
+
+def test_keys_expire(make_stores):
+    first, second = make_stores(ttl_seconds=0.2)
+    entry, _ = first.begin('signup:key', FINGERPRINT)
+    first.complete('signup:key', entry, RESPONSE)
+    time.sleep(0.3)
+    _, owner = second.begin('signup:key', FINGERPRINT)
+    assert owner
+
+
+def test_max_entries(make_stores):
+    first, _ = make_stores(max_entries=3)
+    for i in range(6):
+        entry, _ = first.begin(f'signup:key{i}', FINGERPRINT)
+        first.complete(f'signup:key{i}', entry, RESPONSE)
+    assert first.stats()['size'] <= 3
+    assert first.stats()['evictions'] >= 3
+
+
+def test_disabled_with_zero_ttl():
+    assert not IdempotencyCache(ttl_seconds=0).enabled
+
+
+@pytest.mark.parametrize('kind', ['sqlite', 'redis'])
+def test_claim_of_dead_worker_expires(kind, tmp_path, redis_server):
+    if kind == 'sqlite':
+        path = str(tmp_path / 'idempotency.sqlite3')
+        dead, alive = (SQLiteIdempotencyStore(path, lock_seconds=0.2) for _ in range(2))
+    else:
+        dead, alive = (
+            RedisIdempotencyStore(redis_server.url, lock_seconds=0.2, key_prefix='idempotency-dead:')
+            for _ in range(2)
+        )
+    stale, _ = dead.begin('signup:key', FINGERPRINT)
+    time.sleep(0.3)
+    entry, owner = alive.begin('signup:key', FINGERPRINT)
+    assert owner
+
+    # The late original must not overwrite or release the new claim
+    dead.complete('signup:key', stale, StoredResponse(500, [], b'late'))
+    dead.abandon('signup:key', stale)
+    alive.complete('signup:key', entry, RESPONSE)
+    replay, _ = dead.begin('signup:key', FINGERPRINT)
+    assert replay.response.body == RESPONSE.body
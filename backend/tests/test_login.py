@@ -0,0 +1,80 @@
+"""Tests for the OTP login rules shared by the Flask and ASGI handlers."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from login import (
+    LoginError, approved_customer, check_otp, consumed_customer_id, generate_response, parse_generate_request,
+    parse_verify_request, too_many_requests
+)
+from sms_dispatch import STATUS_DROPPED, STATUS_QUEUED
+
+
+def record(otp='123456', **changes):
+    return dict({
+        'otp': otp,
+        'verified': False,
+        'customer_id': '1001',
+        'sms_status': STATUS_QUEUED,
+        'expires_at': datetime.now() + timedelta(minutes=5)
+    }, **changes)
+
+
+@pytest.mark.parametrize('data, message', [
+    (None, 'Mobile number is required'),
+    ({'mobileNumber': '  '}, 'Mobile number is required'),
+    ({'mobileNumber': '98765'}, 'Please enter a valid 10-digit mobile number'),
+])
+def test_generate_request_rejects_bad_numbers(data, message):
+    with pytest.raises(LoginError) as raised:
+        parse_generate_request(data)
+    assert raised.value.status == 400
+    assert raised.value.payload == {'status': 'error', 'message': message}
+
+
+def test_verify_request_is_trimmed():
+    assert parse_verify_request({'mobileNumber': ' 9876543210 ', 'otp': '123456 '}) == ('9876543210', '123456')
+    with pytest.raises(LoginError, match='OTP must be 6 digits'):
+        parse_verify_request({'mobileNumber': '9876543210', 'otp': '12345'})
+
+
+def test_only_approved_customers_log_in():
+    with pytest.raises(LoginError) as raised:
+        approved_customer([])
+    assert raised.value.status == 404
+    with pytest.raises(LoginError) as raised:
+        approved_customer([{'status': 'PENDING'}])
+    assert raised.value.status == 403
+    assert approved_customer([{'status': 'APPROVED', 'customer_id': '1001'}])['customer_id'] == '1001'
+
+
+def test_check_otp():
+    check_otp(record(), '123456')
+    with pytest.raises(LoginError) as raised:
+        check_otp(record(), '000000')
+    assert raised.value.payload['data'] == {'smsStatus': STATUS_QUEUED}
+    with pytest.raises(LoginError, match='expired'):
+        check_otp(record(expires_at=datetime.now() - timedelta(seconds=1)), '123456')
+    with pytest.raises(LoginError, match='already used'):
+        check_otp(record(verified=True), '123456')
+    with pytest.raises(LoginError) as raised:
+        check_otp(None, '123456')
+    assert raised.value.status == 404
+
+
+def test_lost_consume_race_is_already_used():
+    assert consumed_customer_id(record()) == '1001'
+    with pytest.raises(LoginError, match='already used'):
+        consumed_customer_id(None)
+
+
+def test_dropped_sms_returns_the_otp():
+    body = generate_response('9876543210', '123456', STATUS_DROPPED, debug=False)
+    assert body['data']['otp'] == '123456'
+    assert 'otp' not in generate_response('9876543210', '123456', STATUS_QUEUED, debug=False)['data']
+
+
+def test_too_many_requests_sets_retry_after():
+    error = too_many_requests(30)
+    assert error.status == 429
+    assert error.headers == {'Retry-After': '30'}
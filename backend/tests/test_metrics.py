@@ -0,0 +1,60 @@
+"""Tests for metrics summed over worker processes."""
+import multiprocessing
+
+import pytest
+
+from metrics import Registry, SharedMetrics
+
+
+def make_registry():
+    registry = Registry()
+    requests = registry.counter('requests_total', 'Requests', ('endpoint',))
+    in_flight = registry.gauge('in_flight', 'In flight')
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    return registry, requests, in_flight, latency
+
+
+def sample(text: str, name: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(name + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+@pytest.fixture
+def fork():
+    try:
+        return multiprocessing.get_context('fork')
+    except ValueError:
+        pytest.skip('needs fork()')
+
+
+def test_scrape_sums_workers_and_keeps_exited_counters(tmp_path, fork):
+    registry, requests, in_flight, latency = make_registry()
+    shared = SharedMetrics(registry, str(tmp_path / 'metrics.sqlite3'))
+    requests.labels('login').inc(2)
+    latency.labels().observe(0.5)
+    in_flight.labels().inc()
+
+    def worker():
+        # A forked worker inherits the registry and then counts on its own
+        requests.labels('login').inc(3)
+        latency.labels().observe(0.05)
+        shared.publish()
+
+    process = fork.Process(target=worker)
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+
+    text = shared.render()
+    # 2 here + 2 inherited and 3 more in the exited worker
+    assert sample(text, 'requests_total{endpoint="login"}') == 7
+    assert sample(text, 'latency_seconds_bucket{le="0.1"}') == 1
+    assert sample(text, 'latency_seconds_count') == 3
+    # Only this live process's gauge is left
+    assert sample(text, 'in_flight') == 1
+
+    # Folded into the retired row, so a second scrape gives the same totals
+    requests.labels('login').inc()
+    assert sample(shared.render(), 'requests_total{endpoint="login"}') == 8
@@ -0,0 +1,178 @@
+"""Tests for the OTP stores (memory, SQLite file, Redis protocol)."""
+import itertools
+import threading
+import time
+
+import pytest
+
+from otp_store import InMemoryOTPStore, OTPStore, RedisOTPStore, SQLiteOTPStore
+
+
+_prefixes = itertools.count()
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def make_store(request, tmp_path, redis_server):
+    """Factory building a fresh store of each backend."""
+    def make(ttl_seconds=300, max_entries=100):
+        if request.param == 'memory':
+            return InMemoryOTPStore(ttl_seconds, max_entries)
+        if request.param == 'sqlite':
+            return SQLiteOTPStore(str(tmp_path / 'otp.sqlite3'), ttl_seconds, max_entries, sweep_interval=1)
+        # A prefix per store keeps tests apart on the shared server
+        return RedisOTPStore(redis_server.url, ttl_seconds, max_entries, key_prefix=f'otp{next(_prefixes)}:')
+    return make
+
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        OTPStore()
+
+
+def test_set_and_get(make_store):
+    store = make_store()
+    expires_at = store.set('9876543210', {'otp': '123456', 'verified': False, 'customer_id': '1001'})
+
+    record = store.get('9876543210')
+    assert record['otp'] == '123456'
+    assert record['customer_id'] == '1001'
+    assert abs(record['expires_at'].timestamp() - expires_at.timestamp()) < 0.01
+    assert store.get('9000000000') is None
+
+
+def test_set_replaces_existing_record(make_store):
+    store = make_store()
+    store.set('9876543210', {'otp': '111111'})
+    store.set('9876543210', {'otp': '222222'})
+    assert store.get('9876543210')['otp'] == '222222'
+
+
+def test_update_keeps_expiry(make_store):
+    store = make_store()
+    store.set('9876543210', {'otp': '123456', 'sms_status': 'queued'})
+    record = store.get('9876543210')
+    assert store.update('9876543210', '123456', {'sms_status': 'sent'})
+
+    updated = store.get('9876543210')
+    assert updated['sms_status'] == 'sent'
+    assert updated['otp'] == '123456'
+    assert updated['expires_at'] == record['expires_at']
+
+
+def test_update_does_not_bring_back_deleted_record(make_store):
+    store = make_store()
+    store.set('9876543210', {'otp': '123456'})
+    store.delete('9876543210')
+    assert not store.update('9876543210', '123456', {'sms_status': 'sent'})
+    assert store.get('9876543210') is None
+
+
+def test_update_does_not_overwrite_newer_otp(make_store):
+    store = make_store()
+    store.set('9876543210', {'otp': '111111', 'sms_status': 'queued'})
+    # A new OTP is requested before the first one's status arrives
+    store.set('9876543210', {'otp': '222222', 'sms_status': 'queued'})
+    assert not store.update('9876543210', '111111', {'sms_status': 'sent'})
+
+    record = store.get('9876543210')
+    assert record['otp'] == '222222'
+    assert record['sms_status'] == 'queued'
+    assert store.consume('9876543210', '111111') is None
+    assert store.consume('9876543210', '222222') is not None
+
+
+def test_redis_update_rereads_after_concurrent_write(redis_server):
+    store = RedisOTPStore(redis_server.url, key_prefix='otp-race:')
+    store.set('9876543210', {'otp': '111111'})
+    command = store._client.command
+
+    def racing_command(*args, **kwargs):
+        reply = command(*args, **kwargs)
+        if args[0] == 'GET':
+            # A new OTP lands between the read and the swap
+            store._client.command = command
+            store.set('9876543210', {'otp': '222222'})
+        return reply
+
+    store._client.command = racing_command
+    assert not store.update('9876543210', '111111', {'sms_status': 'sent'})
+    record = store.get('9876543210')
+    assert record['otp'] == '222222'
+    assert 'sms_status' not in record
+
+
+def test_delete_missing_key_is_a_no_op(make_store):
+    make_store().delete('9876543210')
+
+
+def test_consume_returns_record_once(make_store):
+    store = make_store()
+    store.set('9876543210', {'otp': '123456'})
+
+    assert store.consume('9876543210', '000000') is None
+    assert store.get('9876543210') is not None
+    assert store.consume('9876543210', '123456')['otp'] == '123456'
+    assert store.consume('9876543210', '123456') is None
+    assert store.get('9876543210') is None
+
+
+def test_concurrent_consume_has_one_winner(make_store):
+    store = make_store()
+    store.set('9876543210', {'otp': '123456'})
+    results = []
+    barrier = threading.Barrier(8)
+
+    def verify():
+        barrier.wait()
+        results.append(store.consume('9876543210', '123456'))
+
+    threads = [threading.Thread(target=verify) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(result is not None for result in results) == 1
+
+
+def test_records_expire(make_store):
+    store = make_store(ttl_seconds=0.2)
+    store.set('9876543210', {'otp': '123456'})
+    time.sleep(0.3)
+    assert store.get('9876543210') is None
+    assert store.consume('9876543210', '123456') is None
+
+
+def test_oldest_records_evicted_beyond_max_entries(make_store):
+    store = make_store(max_entries=3)
+    for i in range(5):
+        store.set(f'900000000{i}', {'otp': str(i)})
+
+    assert store.get('9000000000') is None
+    assert store.get('9000000001') is None
+    assert [store.get(f'900000000{i}')['otp'] for i in (2, 3, 4)] == ['2', '3', '4']
+
+
+def test_sqlite_row_count_follows_writes(tmp_path):
+    store = SQLiteOTPStore(str(tmp_path / 'otp.sqlite3'), max_entries=100, sweep_interval=1000)
+    store.set('9000000001', {'otp': '1'})
+    store.set('9000000001', {'otp': '2'})
+    store.set('9000000002', {'otp': '3'})
+    store.set('9000000003', {'otp': '4'})
+    store.consume('9000000002', '3')
+    store.delete('9000000003')
+
+    connection = store._connection()
+    assert connection.execute("SELECT entries FROM otp_store_size").fetchone()[0] == 1
+    # A second handle on the same file keeps the count it finds
+    SQLiteOTPStore(store.path)
+    assert connection.execute("SELECT entries FROM otp_store_size").fetchone()[0] == 1
+
+
+def test_sqlite_sweep_deletes_at_most_one_interval(tmp_path):
+    store = SQLiteOTPStore(str(tmp_path / 'otp.sqlite3'), max_entries=1, sweep_interval=2)
+    for i in range(4):
+        store.set(f'900000000{i}', {'otp': str(i)})
+    # Sweeps ran after writes 2 and 4; each removed at most 2 rows
+    count = store._connection().execute("SELECT COUNT(*) FROM otp_store").fetchone()[0]
+    assert count == 1
+    assert store.get('9000000003')['otp'] == '3'
@@ -0,0 +1,154 @@
+"""Tests for the rate limiters and the OTP limit checks."""
+import itertools
+
+import pytest
+
+from rate_limit import (
+    InMemoryRateLimiter, RateLimiter, RedisRateLimiter, SQLiteRateLimiter, check_limits, client_address, parse_rate
+)
+
+
+_prefixes = itertools.count()
+
+
+def test_parse_rate():
+    assert parse_rate('5/600') == (5, 600.0)
+    assert parse_rate('10') == (10, 1.0)
+    assert parse_rate('') is None
+    assert parse_rate('0') is None
+    with pytest.raises(ValueError):
+        parse_rate('-1/60')
+
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        RateLimiter('otp', 5, 60)
+
+
+def test_burst_up_to_capacity(clock):
+    limiter = InMemoryRateLimiter('otp_mobile', 5, 600)
+    assert [limiter.check('9876543210') for _ in range(5)] == [0.0] * 5
+    # One token refills every period / capacity seconds
+    assert limiter.check('9876543210') == pytest.approx(120)
+
+
+def test_refill_at_constant_rate(clock):
+    limiter = InMemoryRateLimiter('otp_mobile', 5, 600)
+    for _ in range(5):
+        limiter.check('9876543210')
+
+    clock.advance(119)
+    assert limiter.check('9876543210') == pytest.approx(1)
+    clock.advance(1)
+    assert limiter.check('9876543210') == 0.0
+    assert limiter.check('9876543210') == pytest.approx(120)
+
+
+def test_idle_bucket_refills_completely(clock):
+    limiter = InMemoryRateLimiter('otp_mobile', 2, 60)
+    limiter.check('9876543210')
+    limiter.check('9876543210')
+    clock.advance(3600)
+    assert [limiter.check('9876543210') for _ in range(2)] == [0.0, 0.0]
+    assert limiter.check('9876543210') > 0
+
+
+def test_refusal_does_not_take_a_token(clock):
+    limiter = InMemoryRateLimiter('otp_mobile', 1, 60)
+    limiter.check('9876543210')
+    for _ in range(10):
+        assert limiter.check('9876543210') == pytest.approx(60)
+    clock.advance(60)
+    assert limiter.check('9876543210') == 0.0
+
+
+def test_keys_are_independent(clock):
+    limiter = InMemoryRateLimiter('otp_mobile', 1, 60)
+    assert limiter.check('9876543210') == 0.0
+    assert limiter.check('9876543211') == 0.0
+    assert limiter.check('9876543210') > 0
+
+
+def test_refund_gives_token_back(clock):
+    limiter = InMemoryRateLimiter('otp_client', 2, 60)
+    limiter.check('10.0.0.1')
+    limiter.check('10.0.0.1')
+    limiter.refund('10.0.0.1')
+    assert limiter.check('10.0.0.1') == 0.0
+    assert limiter.check('10.0.0.1') > 0
+
+
+def test_max_entries_bounds_memory(clock):
+    limiter = InMemoryRateLimiter('otp_client', 1, 60, max_entries=10)
+    for i in range(100):
+        limiter.check(f'10.0.0.{i}')
+    assert len(limiter) <= 10
+
+
+def test_check_limits_refunds_client_token_when_mobile_refuses(clock):
+    client = InMemoryRateLimiter('otp_client', 3, 60)
+    mobile = InMemoryRateLimiter('otp_mobile', 1, 600)
+
+    assert check_limits(((client, '10.0.0.1'), (mobile, '9876543210'))) == (None, 0)
+    for _ in range(10):
+        assert check_limits(((client, '10.0.0.1'), (mobile, '9876543210'))) == ('otp_mobile', 600)
+    # Only the allowed request used a client token
+    assert check_limits(((client, '10.0.0.1'), (mobile, '9876543211'))) == (None, 0)
+    assert check_limits(((client, '10.0.0.1'), (mobile, '9876543212'))) == (None, 0)
+    assert check_limits(((client, '10.0.0.1'), (mobile, '9876543213'))) == ('otp_client', 20)
+
+
+def test_check_limits_skips_disabled_limits():
+    assert check_limits(((None, '10.0.0.1'), (None, '9876543210'))) == (None, 0)
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def make_shared(request, tmp_path, redis_server):
+    """Factory for two limiters sharing one store, as two workers would."""
+    def make(capacity, period):
+        if request.param == 'sqlite':
+            path = str(tmp_path / 'rate_limits.sqlite3')
+            return SQLiteRateLimiter('otp', capacity, period, path), SQLiteRateLimiter('otp', capacity, period, path)
+        prefix = f'ratelimit{next(_prefixes)}:'
+        return (
+            RedisRateLimiter('otp', capacity, period, redis_server.url, key_prefix=prefix),
+            RedisRateLimiter('otp', capacity, period, redis_server.url, key_prefix=prefix)
+        )
+    return make
+
+
+def test_shared_limit_applies_across_workers(make_shared):
+    first, second = make_shared(4, 600)
+    results = [limiter.check('9876543210') for limiter in (first, second, first, second, first)]
+    assert results[:4] == [0.0] * 4
+    # A token frees up one interval later, not at the end of a fixed window
+    assert results[4] == pytest.approx(150, abs=1)
+
+
+def test_shared_refund(make_shared):
+    first, second = make_shared(2, 600)
+    first.check('9876543210')
+    second.check('9876543210')
+    second.refund('9876543210')
+    assert first.check('9876543210') == 0.0
+    assert second.check('9876543210') > 0
+
+
+def test_shared_refusal_leaves_local_bucket_alone(make_shared):
+    first, second = make_shared(2, 600)
+    second.check('9876543210')
+    second.check('9876543210')
+    assert first.check('9876543210') > 0
+    second.refund('9876543210')
+    second.refund('9876543210')
+    # The refused request did not use up a token of first's own bucket
+    assert first.check('9876543210') == 0.0
+    assert first.check('9876543210') == 0.0
+
+
+def test_client_address():
+    assert client_address('10.0.0.9', None) == '10.0.0.9'
+    # Without trusted proxies the header can be forged and is ignored
+    assert client_address('10.0.0.9', '1.2.3.4') == '10.0.0.9'
+    assert client_address('10.0.0.9', '6.6.6.6, 1.2.3.4', trusted_proxies=1) == '1.2.3.4'
+    assert client_address('10.0.0.9', '1.2.3.4, 10.0.0.8', trusted_proxies=2) == '1.2.3.4'
@@ -0,0 +1,67 @@
+"""Tests for the PRP SMS gateway clients' handling of connection failures."""
+import asyncio
+import socket
+import struct
+import threading
+
+import pytest
+
+from async_sms import AsyncSMSGatewayClient
+from sms_dispatch import SMSRetryableError, STATUS_TIMEOUT
+from sms_gateway import SMSGatewayClient
+
+
+def client_for(port: int) -> SMSGatewayClient:
+    return SMSGatewayClient('key', f'http://127.0.0.1:{port}', 'SENDER', 'otp_template')
+
+
+@pytest.fixture
+def resetting_server():
+    """Port of a server that reads the request, then resets the connection."""
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen()
+
+    def serve():
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                return
+            connection.recv(65536)
+            # Linger 0 makes close() send a RST
+            connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            connection.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield listener.getsockname()[1]
+    listener.close()
+
+
+def test_refused_connection_is_retryable():
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    with pytest.raises(SMSRetryableError):
+        client_for(port).send_otp('9876543210', '123456')
+
+
+def test_reset_after_sending_is_not_retried(resetting_server):
+    # The gateway may already have sent the SMS, so it must not be resent
+    client = client_for(resetting_server)
+    assert client.send_otp('9876543210', '123456') == STATUS_TIMEOUT
+    assert client.stats()['errors'] == 1
+
+
+def test_async_client_does_not_resend_after_reset(resetting_server):
+    client = AsyncSMSGatewayClient('key', f'http://127.0.0.1:{resetting_server}', 'SENDER', 'otp_template')
+
+    async def send():
+        try:
+            return await client.send_otp('9876543210', '123456')
+        finally:
+            await client.close()
+
+    assert asyncio.run(send()) == STATUS_TIMEOUT
+    assert client.stats()['requests'] == 1
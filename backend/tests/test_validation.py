@@ -0,0 +1,108 @@
+"""Tests for the declarative request validation and the customer schemas."""
+import pytest
+
+from customers import parse_profile_edit, parse_signup
+from validation import EMPTY_NULL, Field, Schema, ValidationError, digits, number, quantity
+
+
+SIGNUP = {
+    'fullName': ' Test Customer ',
+    'email': 'Test@Example.com',
+    'mobileNumber': '9876543210',
+    'houseNumber': '12',
+    'address': 'MG Road',
+    'city': 'Bengaluru',
+    'state': 'Karnataka',
+    'userType': 'Office',
+    'knowAboutUs': 'Friend',
+    'expectation': '23kgs',
+}
+
+
+def test_signup_normalizes_values():
+    customer = parse_signup(dict(SIGNUP, alternateContact='9123456780', latitude='12.5', longitude=77))
+    assert customer['customer_name'] == 'Test Customer'
+    assert customer['email'] == 'test@example.com'
+    assert customer['contact_no'] == '+919876543210'
+    assert customer['mobile_normalized'] == '9876543210'
+    assert customer['address'] == '12, MG Road'
+    assert customer['user_type'] == 'COMMERCIAL'
+    assert customer['est_waste_qty'] == 23.0
+    assert customer['poc'] == '+919123456780'
+    assert (customer['latitude'], customer['longitude']) == (12.5, 77.0)
+
+
+def test_signup_optional_fields_default_to_none():
+    customer = parse_signup(SIGNUP)
+    assert customer['poc'] is None
+    assert customer['latitude'] is None
+    assert customer['longitude'] is None
+
+
+def test_unknown_user_type_maps_to_others():
+    assert parse_signup(dict(SIGNUP, userType='Factory'))['user_type'] == 'OTHERS'
+
+
+def test_missing_fields_reported_together():
+    with pytest.raises(ValidationError) as error:
+        parse_signup(dict(SIGNUP, fullName='', city=None))
+    assert str(error.value) == 'Missing required fields: fullName, city'
+    assert error.value.errors == {'fullName': 'This field is required.', 'city': 'This field is required.'}
+
+
+def test_every_invalid_field_reported():
+    with pytest.raises(ValidationError) as error:
+        parse_signup(dict(SIGNUP, mobileNumber='98765', email='bench', expectation='none', latitude='north'))
+    assert set(error.value.errors) == {'mobileNumber', 'email', 'expectation', 'latitude'}
+    assert 'Invalid mobile number. Must be 10 digits.' in str(error.value)
+
+
+def test_missing_and_invalid_fields_combined():
+    with pytest.raises(ValidationError) as error:
+        parse_signup(dict(SIGNUP, fullName='', mobileNumber='123'))
+    assert str(error.value) == (
+        'Missing required fields: fullName. Invalid mobile number. Must be 10 digits.'
+    )
+
+
+def test_non_object_body_rejected():
+    with pytest.raises(ValidationError):
+        parse_signup(['not', 'a', 'dict'])
+
+
+@pytest.mark.parametrize('value', ['0', '0 kg', 'lots'])
+def test_quantity_must_be_positive(value):
+    with pytest.raises(ValueError):
+        quantity('bad')(value)
+
+
+def test_profile_edit_returns_only_sent_fields():
+    assert parse_profile_edit({'city': ' Pune ', 'email': 'A@B.co'}) == {'city': 'Pune', 'email': 'a@b.co'}
+
+
+def test_profile_edit_skips_empty_and_clears_nullable_fields():
+    values = parse_profile_edit({'fullName': '  ', 'alternateContact': '', 'latitude': ''})
+    assert values == {'poc': None, 'latitude': None}
+
+
+def test_profile_edit_still_validates():
+    with pytest.raises(ValidationError) as error:
+        parse_profile_edit({'alternateContact': '123'})
+    assert error.value.errors == {'alternateContact': 'Invalid alternate contact number. Must be 10 digits.'}
+
+
+def test_schema_applies_rules_in_order():
+    schema = Schema([
+        Field('code', rules=(digits(4, 'Four digits.'), int)),
+        Field('ratio', text=False, empty=EMPTY_NULL, rules=(number('Number.'),)),
+    ], partial=True)
+    assert schema.validate({'code': ' 0042 ', 'ratio': 2}) == {'code': 42, 'ratio': 2.0}
+    assert schema.validate({'ratio': None}) == {'ratio': None}
+    assert schema.validate({}) == {}
+
+
+def test_required_field_with_only_whitespace_is_invalid_not_missing():
+    schema = Schema([Field('code', required=True, rules=(digits(4, 'Four digits.'),))])
+    with pytest.raises(ValidationError) as error:
+        schema.validate({'code': '   '})
+    assert error.value.errors == {'code': 'Four digits.'}
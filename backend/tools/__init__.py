@@ -0,0 +1,4 @@
+"""
+Operational tools for the backend.
+Run from the backend directory, e.g. ``python -m tools.backfill_mobile_numbers``.
+"""
@@ -0,0 +1,66 @@
+"""
+Re-run of the normalized mobile number backfill (schema migration 6).
+
+Migration 6 fills ``b2c_customer_master.mobile_normalized`` in
+keyset-paginated batches, clears duplicates (keeping the approved / oldest
+customer) and creates the unique index used by the login lookup. Run this
+to pick up rows written by other systems since then, to preview the
+changes with --dry-run, or to pace a large table with --pause. Safe to
+re-run.
+
+Usage:
+    python -m tools.backfill_mobile_numbers --batch-size 1000
+    python -m tools.backfill_mobile_numbers --dry-run
+"""
+import argparse
+import logging
+
+from database import db
+from migrations import backfill_mobile_numbers, resolve_mobile_duplicates
+from mobile_numbers import MOBILE_COLUMN, MOBILE_INDEX
+
+
+TABLE = 'b2c_customer_master'
+
+
+def index_exists(cursor) -> bool:
+    cursor.execute(
+        "SELECT 1 FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+        (TABLE, MOBILE_INDEX)
+    )
+    return bool(cursor.fetchall())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Backfill b2c_customer_master.mobile_normalized')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    connection = db.get_connection()
+    cursor = connection.cursor(buffered=True)
+    try:
+        connection.dirty = True
+        print("Backfilling normalized mobile numbers")
+        counters = backfill_mobile_numbers(cursor, args.batch_size, args.pause, args.dry_run)
+
+        print("Resolving duplicate mobile numbers")
+        counters['cleared_duplicates'] = resolve_mobile_duplicates(cursor, args.dry_run)
+
+        if not index_exists(cursor):
+            print(f"Creating unique index {MOBILE_INDEX}")
+            if not args.dry_run:
+                cursor.execute(f"CREATE UNIQUE INDEX {MOBILE_INDEX} ON {TABLE} ({MOBILE_COLUMN})")
+    finally:
+        cursor.close()
+        connection.close()
+
+    print(f"Done{' (dry run)' if args.dry_run else ''}: "
+          + ', '.join(f"{name}={value}" for name, value in counters.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""
+Apply pending schema migrations (see migrations.py).
+
+Run once per deploy before starting the workers, or leave
+DB_MIGRATE_ON_STARTUP on to have the app do it when it starts.
+
+Usage:
+    python -m tools.migrate
+    python -m tools.migrate --status
+    python -m tools.migrate --target 2
+"""
+import argparse
+
+from migrations import migrate, status
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Apply schema migrations')
+    parser.add_argument('--status', action='store_true', help='List migrations without applying them')
+    parser.add_argument('--target', type=int, help='Stop after this version')
+    args = parser.parse_args()
+
+    if args.status:
+        for migration in status():
+            print(f"{migration['version']:>4}  {'applied' if migration['applied'] else 'pending':<8} {migration['name']}")
+        return
+
+    applied = migrate(args.target)
+    print(f"Applied {len(applied)} migration(s)" if applied else "Schema is up to date")
+
+
+if __name__ == '__main__':
+    main()
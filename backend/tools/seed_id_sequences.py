@@ -0,0 +1,71 @@
+"""
+Seed the ``id_sequences`` table used by IdAllocator.
+
+The table is created (and first seeded) by schema migration 2; this tool
+applies pending migrations and can move the sequence forward again with
+``--force``, e.g. after customers were inserted outside the app. Seeding
+reads the current maximum numeric customer_id once; after that the
+allocator never scans b2c_customer_master again.
+
+Usage:
+    python -m tools.seed_id_sequences
+"""
+import argparse
+
+from database import db
+from migrations import migrate
+
+
+# Customer IDs start from 1001
+CUSTOMER_ID_FIRST = 1001
+
+
+def seed_customer_id(force: bool) -> int:
+    """
+    Seed the 'customer_id' sequence just above the highest existing ID.
+
+    Args:
+        force (bool): Move an existing sequence forward if it is behind the table
+
+    Returns:
+        int: The sequence's next_value after seeding
+    """
+    max_id_result = db.execute_query(
+        "SELECT MAX(CAST(customer_id AS UNSIGNED)) as max_id "
+        "FROM b2c_customer_master WHERE customer_id REGEXP '^[0-9]+$'"
+    )
+    max_id = max_id_result[0].get('max_id') if max_id_result and max_id_result[0].get('max_id') else 0
+    next_value = max(int(max_id) + 1, CUSTOMER_ID_FIRST)
+
+    if force:
+        # Only ever move forward so IDs are never reused
+        db.execute_query(
+            "INSERT INTO id_sequences (name, next_value) VALUES ('customer_id', %s) "
+            "ON DUPLICATE KEY UPDATE next_value = GREATEST(next_value, VALUES(next_value))",
+            (next_value,),
+            fetch=False
+        )
+    else:
+        db.execute_query(
+            "INSERT IGNORE INTO id_sequences (name, next_value) VALUES ('customer_id', %s)",
+            (next_value,),
+            fetch=False
+        )
+
+    result = db.execute_query("SELECT next_value FROM id_sequences WHERE name = 'customer_id'")
+    return result[0]['next_value']
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Seed id_sequences')
+    parser.add_argument('--force', action='store_true',
+                        help='Advance existing sequences past the current maximum ID')
+    args = parser.parse_args()
+
+    migrate()
+    next_value = seed_customer_id(args.force)
+    print(f"customer_id sequence: next_value={next_value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""
+Request validation module.
+Declarative field schemas: each field's normalizers and checks are
+compiled once into a tuple of rules, a payload is validated in one pass
+and every failing field is reported together.
+"""
+import re
+from typing import Callable, Dict, Iterable, Mapping, Optional, Sequence
+
+
+# What a partial (edit) schema does with a field that is sent empty
+EMPTY_SKIP = 'skip'
+EMPTY_NULL = 'null'
+
+REQUIRED_MESSAGE = 'This field is required.'
+
+_NON_NUMERIC = re.compile(r'[^0-9.]')
+
+
+class ValidationError(ValueError):
+    """
+    Raised when a payload fails validation; the message is client-facing.
+
+    ``errors`` maps each failing field (as sent by the app) to its message.
+    """
+
+    def __init__(self, message: str, errors: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.errors = errors or {}
+
+
+# Rules: callables taking the normalized value and returning the value to
+# keep, raising ValueError with the client-facing message
+
+def lower(value: str) -> str:
+    return value.lower()
+
+
+def digits(count: int, message: str) -> Callable[[str], str]:
+    """Exactly ``count`` digits."""
+    def rule(value: str) -> str:
+        if not value.isdigit() or len(value) != count:
+            raise ValueError(message)
+        return value
+    return rule
+
+
+def email(message: str) -> Callable[[str], str]:
+    """Something@domain.tld (the app's long-standing loose check)."""
+    def rule(value: str) -> str:
+        if '@' not in value or '.' not in value.split('@')[1]:
+            raise ValueError(message)
+        return value
+    return rule
+
+
+def quantity(message: str) -> Callable[[str], float]:
+    """Positive number, ignoring units and other text (``"23kgs"`` -> 23.0)."""
+    def rule(value: str) -> float:
+        numeric = _NON_NUMERIC.sub('', value)
+        try:
+            number = float(numeric) if numeric else None
+        except ValueError:
+            number = None
+        if number is None or number <= 0:
+            raise ValueError(message)
+        return number
+    return rule
+
+
+def choice(mapping: Mapping[str, str], default: str) -> Callable[[str], str]:
+    """Translate through ``mapping``; unknown values become ``default``."""
+    def rule(value: str) -> str:
+        return mapping.get(value, default)
+    return rule
+
+
+def number(message: str) -> Callable[[object], float]:
+    """Any int, float or numeric string."""
+    def rule(value) -> float:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise ValueError(message)
+    return rule
+
+
+def prefix(text: str) -> Callable[[str], str]:
+    def rule(value: str) -> str:
+        return f'{text}{value}'
+    return rule
+
+
+class Field:
+    """
+    Declaration of one payload field.
+
+    Args:
+        name (str): Key in the request body (camelCase)
+        column (Optional[str]): Key in the validated result (default: ``name``)
+        required (bool): Must be present and non-empty
+        rules (Iterable[Callable]): Applied in order to the normalized value
+        text (bool): Normalize to a stripped string first (False keeps the raw value)
+        empty (str): In partial schemas, EMPTY_SKIP ignores an empty value and
+            EMPTY_NULL stores None (clearing the column)
+    """
+
+    __slots__ = ('name', 'column', 'required', 'rules', 'text', 'empty')
+
+    def __init__(
+        self,
+        name: str,
+        column: Optional[str] = None,
+        required: bool = False,
+        rules: Iterable[Callable] = (),
+        text: bool = True,
+        empty: str = EMPTY_SKIP
+    ):
+        self.name = name
+        self.column = column or name
+        self.required = required
+        self.rules = tuple(rules)
+        self.text = text
+        self.empty = empty
+
+
+# What an optional field left empty produces, decided per field when the
+# schema is compiled
+_EMPTY_OMIT = 0
+_EMPTY_NONE_IF_SENT = 1
+_EMPTY_NONE = 2
+
+
+class Schema:
+    """
+    Compiled set of fields.
+
+    A full schema (signup) returns every column, with None for optional
+    fields left empty. A partial schema (edit) returns only the fields the
+    payload sets.
+
+    Each field is compiled once, when the schema is built at import, into
+    a plan entry holding its keys, flags and tuple of rule callables, so
+    validating a payload is one loop over the plan.
+    """
+
+    def __init__(self, fields: Sequence[Field], partial: bool = False):
+        """
+        Compile the field declarations.
+
+        Args:
+            fields (Sequence[Field]): Fields in validation (and message) order
+            partial (bool): Only validate and return the fields present
+        """
+        self.fields = tuple(fields)
+        self.partial = partial
+        self._plan = tuple(
+            (field.name, field.column, field.required, field.text, self._empty_mode(field), field.rules)
+            for field in self.fields
+        )
+
+    def _empty_mode(self, field: Field) -> int:
+        if not self.partial:
+            return _EMPTY_NONE
+        return _EMPTY_NONE_IF_SENT if field.empty == EMPTY_NULL else _EMPTY_OMIT
+
+    def validate(self, data) -> dict:
+        """
+        Validate and normalize a payload.
+
+        Args:
+            data: Parsed request body
+
+        Returns:
+            dict: Normalized values keyed by column
+
+        Raises:
+            ValidationError: Listing every missing and invalid field
+        """
+        if not isinstance(data, dict):
+            raise ValidationError('Request body must be a JSON object.')
+
+        values = {}
+        missing = []
+        errors = {}
+        get = data.get
+        for name, column, required, text, empty_mode, rules in self._plan:
+            raw = get(name)
+            if text:
+                # str(raw or '') without the conversion for the usual str value
+                value = raw.strip() if raw.__class__ is str else str(raw or '').strip()
+                # Required fields must be sent; for optional ones whitespace
+                # only counts as empty
+                empty = not raw if required else not value
+            else:
+                value = None if raw == '' else raw
+                empty = value is None
+            if empty:
+                if required:
+                    missing.append(name)
+                elif empty_mode == _EMPTY_NONE or (empty_mode == _EMPTY_NONE_IF_SENT and name in data):
+                    values[column] = None
+                continue
+            if rules:
+                try:
+                    for rule in rules:
+                        value = rule(value)
+                except ValueError as e:
+                    errors[name] = str(e)
+                    continue
+            values[column] = value
+
+        if missing or errors:
+            raise _failed(missing, errors)
+        return values
+
+
+def _failed(missing: list, errors: dict) -> ValidationError:
+    """Build the error for a failed payload: missing fields first, then invalid ones."""
+    messages = list(errors.values())
+    if missing:
+        # Same wording as a payload that only misses fields
+        missing_message = f'Missing required fields: {", ".join(missing)}'
+        messages.insert(0, f'{missing_message}.' if messages else missing_message)
+    field_errors = dict.fromkeys(missing, REQUIRED_MESSAGE)
+    field_errors.update(errors)
+    return ValidationError(' '.join(messages), field_errors)